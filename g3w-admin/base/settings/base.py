@@ -247,6 +247,13 @@ SITE_TITLE = 'g3w-admin'
 QDJANGO_SERVER_URL = 'http://localhost'
 QDJANGO_PRJ_CACHE = True
 QDJANGO_PRJ_CACHE_KEY = 'qdjango_prj_'
+QDJANGO_LAYER_DATA_VERSION_KEY = 'qdjango_layer_data_version_'
+
+# Cache timeout (seconds) of the per layer and user constraint/ACL filter plans of the vector API
+QDJANGO_FILTER_PLAN_CACHE_TTL = 600
+
+# Cache timeout (seconds) of the per project and user ACL snapshots of the QGIS Server access control filters
+QDJANGO_ACL_SNAPSHOT_CACHE_TTL = 300
 
 # Data for proxy server
 PROXY_SERVER = False
@@ -464,3 +471,73 @@ QES_SEARCH_SORT = {
 # By project id and qgis_layer_id is posssible se fileds to index
 QES_INDEXING_FIELDS = {}
 
+
+# Vector API: over this number of features (provider planner estimate) the count
+# returned with 'approx_count=1' request parameter is approximate (only PostgreSQL layers)
+VECTOR_APPROX_COUNT_THRESHOLD = 100000
+
+# Vector API caches are invalidated by the changes made through G3W-ADMIN (editing, project reload):
+# changes made outside (QGIS desktop, SQL, other applications) are served only when the timeout expires.
+# Enable them only for layers not changed outside G3W-ADMIN or where stale data are acceptable.
+
+# Vector API: cache timeout (seconds) of 'unique' field values, 0 (default) to disable the cache
+VECTOR_UNIQUE_VALUES_CACHE_TTL = 0
+
+# Vector API: cache timeout (seconds) of config, data, featurecount and vector tiles responses,
+# 0 (default) to disable the cache.
+# Responses have ETag and Last-Modified headers and 'If-None-Match' requests are answered with 304
+VECTOR_RESPONSE_CACHE_TTL = 0
+
+# Vector API 'autofilter': over this number of feature ids the ids are stored in the cache backend
+# and referenced by a token, for VECTOR_FEATURE_IDS_TOKEN_TTL seconds
+VECTOR_FEATURE_IDS_TOKEN_THRESHOLD = 10000
+VECTOR_FEATURE_IDS_TOKEN_TTL = 3600
+
+# Number of decimals of coordinates in GeoJSON features returned by vector API
+GEOJSON_PRECISION = 6
+
+# Vector API: cache timeout (seconds) of the geometries simplified for 'resolution'/'map_scale' params,
+# 0 (default) to disable the cache. Like the caches above, changes made outside G3W-ADMIN are not seen
+# until the timeout expires
+VECTOR_SIMPLIFIED_GEOMETRY_CACHE_TTL = 0
+
+# Vector API 'mvt' mode: tile grid size and buffer around tiles (in tile grid units)
+VECTOR_MVT_EXTENT = 4096
+VECTOR_MVT_BUFFER = 64
+
+# Vector API 'arrow' mode: number of features of every Arrow record batch
+VECTOR_ARROW_BATCH_SIZE = 10000
+
+# Vector API 'search' filter: search indexes created by the `search_index` management command.
+# Cache timeout (seconds) of the indexed fields of a layer, directory of the SQLite sidecar files of ogr layers
+# (None to write them next to the layer files) and max number of feature ids of the sidecar prefilter
+VECTOR_SEARCH_INDEX_CACHE_TTL = 300
+VECTOR_SEARCH_INDEX_DIR = None
+VECTOR_SEARCH_INDEX_MAX_FIDS = 10000
+
+# Vector API asynchronous exports (`async=1` parameter of shp, gpkg, xls, csv and gpx modes):
+# directory of the exported files, shared by web and huey workers (default 'g3w_vector_exports'
+# in the system temporary directory), hours the files are kept and interval (hours) of the cleanup task
+# VECTOR_EXPORT_DIR = '/shared-volume/vector_exports/'
+VECTOR_EXPORT_RETENTION_HOURS = 24
+VECTOR_EXPORT_CLEANUP_CRONTAB_HOURS = '1'
+
+# Vector API export cache: LRU disk cache of the files exported by shp, gpkg, xls, csv and gpx modes.
+# Size budget in bytes (0 disables the cache) and directory (default 'g3w_vector_export_cache'
+# in the system temporary directory)
+VECTOR_EXPORT_CACHE_MAX_SIZE = 0
+# VECTOR_EXPORT_CACHE_DIR = '/shared-volume/vector_export_cache/'
+
+# Vector API downloads with relations (`down_with_relations` parameter): number of threads
+# writing the relation layers while the layer is written
+VECTOR_EXPORT_RELATIONS_WORKERS = 4
+
+# Raster API geotiff mode: creation options of the exported Cloud Optimized GeoTIFF
+# RASTER_EXPORT_COG_OPTIONS = ['COMPRESS=DEFLATE', 'BLOCKSIZE=512', 'OVERVIEWS=AUTO', 'BIGTIFF=IF_SAFER']
+
+# Raster API overview cache: overview pyramids of GDAL raster layers without overviews, read by downsampled
+# geotiff exports (`max_size` parameter). Size budget in bytes (0 disables the cache), resampling method
+# and directory (default 'g3w_raster_overview_cache' in the system temporary directory)
+RASTER_OVERVIEW_CACHE_MAX_SIZE = 0
+RASTER_OVERVIEW_CACHE_RESAMPLING = 'AVERAGE'
+# RASTER_OVERVIEW_CACHE_DIR = '/shared-volume/raster_overview_cache/'
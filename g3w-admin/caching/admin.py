@@ -11,11 +11,46 @@ __date__ = '2020-10-30'
 __copyright__ = 'Copyright 2015 - 2020, Gis3w'
 
 from django.contrib.admin import ModelAdmin, site
+from django.template.defaultfilters import filesizeformat
+from django.utils.translation import gettext_lazy as _
 from .models import G3WCachingLayer
+from .utils import get_config
 
 
 class G3WCachingLayerAdmin(ModelAdmin):
     model = G3WCachingLayer
+    list_display = ('__str__', 'cache_size', 'cache_tiles', 'cache_max_size', 'cache_hits', 'cache_misses')
+
+    def changelist_view(self, request, extra_context=None):
+        self._cache = get_config().cache
+        return super().changelist_view(request, extra_context)
+
+    def _usage(self, obj, key):
+        """Return a cache usage value of the caching layer, '-' if not tracked by the cache type"""
+        usage = self._cache.usage(str(obj))
+        return usage[key] if usage else '-'
+
+    def cache_size(self, obj):
+        size = self._usage(obj, 'size')
+        return filesizeformat(size) if size != '-' else size
+    cache_size.short_description = _('Cache size')
+
+    def cache_tiles(self, obj):
+        return self._usage(obj, 'tiles')
+    cache_tiles.short_description = _('Cached tiles')
+
+    def cache_max_size(self, obj):
+        size = self._usage(obj, 'max_size')
+        return filesizeformat(size) if size not in ('-', 0) else '-'
+    cache_max_size.short_description = _('Cache budget')
+
+    def cache_hits(self, obj):
+        return self._usage(obj, 'hits')
+    cache_hits.short_description = _('Cache hits')
+
+    def cache_misses(self, obj):
+        return self._usage(obj, 'misses')
+    cache_misses.short_description = _('Cache misses')
 
 
 site.register(G3WCachingLayer, G3WCachingLayerAdmin)
@@ -1,3 +1,4 @@
+from django.apps import apps
 from rest_framework.permissions import BasePermission
 from django.db.models.functions import Concat
 from usersmanage.configs import *
@@ -15,4 +16,20 @@ class TilePermission(BasePermission):
         #qs = G3WCachingLayer.objects.annotate(layer_key_name=Concat('app_name', 'layer_id'))
         #cl = qs.filter(layer_key_name=view.kwargs['layer_name'])
 
-        return True
\ No newline at end of file
+        return True
+
+
+class CacheUsagePermission(BasePermission):
+    """
+    Allows access only to users have permission change_project on project of the caching layer
+    """
+
+    def has_permission(self, request, view):
+
+        caching_layer = next((cl for cl in G3WCachingLayer.objects.all()
+                              if str(cl) == view.kwargs['layer_name']), None)
+        if request.user.is_superuser or not caching_layer:
+            return request.user.is_superuser
+
+        layer = apps.get_app_config(caching_layer.app_name).get_model('layer').objects.get(pk=caching_layer.layer_id)
+        return request.user.has_perm(f'{caching_layer.app_name}.change_project', layer.project)
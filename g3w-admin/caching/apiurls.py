@@ -9,7 +9,7 @@ __license__   = "MPL 2.0"
 
 from django.urls import re_path
 
-from .views import TileStacheTileApiView
+from .views import TileStacheTileApiView, TileStacheCacheUsageApiView
 
 
 urlpatterns = [
@@ -20,4 +20,10 @@ urlpatterns = [
         name='caching-api-tile'
     ),
 
+    re_path(
+        r'^api/(?P<layer_name>[-\w]+)/usage/$',
+        TileStacheCacheUsageApiView.as_view(),
+        name='caching-api-usage'
+    ),
+
 ]
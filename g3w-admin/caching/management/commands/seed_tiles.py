@@ -0,0 +1,106 @@
+# coding=utf-8
+"""
+    Seed the tile cache of caching layers.
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from caching.models import G3WCachingLayer
+from caching.utils.seed import TILESTACHE_SEED_WORKERS, TileSeeder, parse_extent
+
+
+class Command(BaseCommand):
+    """
+    Render the tile pyramid of caching layers for a zoom range, on the project max extent (default),
+    on the extents of the geo constraints of the layer or on a custom extent.
+
+    Metatiles are rendered by a pool of processes and written by the configured TilestacheCache backend,
+    an interrupted seeding restarts from the metatiles not yet rendered.
+    """
+
+    help = 'Seed the tile cache of caching layers, i.e. after a project update.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('layers', nargs='+',
+                            help='Caching layer names, i.e. qdjango12 (<app name><layer pk>)')
+        parser.add_argument('--min-zoom', dest='min_zoom', default=0, type=int,
+                            help='First zoom level, default 0')
+        parser.add_argument('--max-zoom', dest='max_zoom', required=True, type=int,
+                            help='Last zoom level')
+        parser.add_argument('--extent', dest='extent',
+                            help='xmin,ymin,xmax,ymax in the CRS of the tiles (the project group CRS), '
+                                 'default project max extent')
+        parser.add_argument('--geoconstraints', dest='geoconstraints', action='store_true', default=False,
+                            help='Seed the extents of the geo constraints of the layer')
+        parser.add_argument('--extension', dest='extension', default='png',
+                            help='Tile format extension, default png')
+        parser.add_argument('--workers', dest='workers', default=TILESTACHE_SEED_WORKERS, type=int,
+                            help=f'Rendering processes, 0 to render in this process, default {TILESTACHE_SEED_WORKERS}')
+        parser.add_argument('--force', dest='force', action='store_true', default=False,
+                            help='Render also the cached tiles')
+        parser.add_argument('--restart', dest='restart', action='store_true', default=False,
+                            help='Ignore the progress of a previous interrupted seeding')
+        parser.add_argument('--async', dest='run_async', action='store_true', default=False,
+                            help='Run the seeding as huey task')
+
+    def handle(self, *args, **options):
+
+        if options['min_zoom'] < 0 or options['max_zoom'] < options['min_zoom']:
+            raise CommandError('Invalid zoom range')
+
+        try:
+            extents = [parse_extent(options['extent'])] if options['extent'] else None
+        except ValueError as e:
+            raise CommandError(e)
+
+        caching_layers = {str(cl): cl for cl in G3WCachingLayer.objects.all()}
+
+        for layer_key_name in options['layers']:
+
+            if layer_key_name not in caching_layers:
+                raise CommandError(f'Caching layer {layer_key_name} does not exist')
+
+            if options['run_async']:
+                from caching.tasks import seed_tiles_task
+
+                result = seed_tiles_task(caching_layers[layer_key_name].pk, options['min_zoom'], options['max_zoom'],
+                                         extent=options['extent'], geoconstraints=options['geoconstraints'],
+                                         extension=options['extension'], force=options['force'],
+                                         workers=options['workers'], restart=options['restart'])
+                self.stdout.write(f'{layer_key_name}: seeding task {result.id} enqueued')
+                continue
+
+            try:
+                seeder = TileSeeder(caching_layers[layer_key_name], options['min_zoom'], options['max_zoom'],
+                                    extents=extents, geoconstraints=options['geoconstraints'],
+                                    extension=options['extension'], force=options['force'])
+            except ValueError as e:
+                raise CommandError(e)
+
+            if not seeder.extents:
+                self.stdout.write(self.style.WARNING(f'{layer_key_name}: no extent to seed'))
+                continue
+
+            start = time.time()
+            last_report = [0]
+
+            def progress(done, total):
+                # Report every 5 seconds and on completion
+                now = time.time()
+                if done == total or now - last_report[0] >= 5:
+                    self.stdout.write(f'{layer_key_name}: {done}/{total} metatiles '
+                                      f'({done * 100 // total if total else 100}%)')
+                    last_report[0] = now
+
+            rendered = seeder.seed(workers=options['workers'], progress=progress, restart=options['restart'])
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{layer_key_name}: {rendered} metatiles rendered in {time.time() - start:.1f}s'))
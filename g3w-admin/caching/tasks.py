@@ -0,0 +1,66 @@
+# coding=utf-8
+""""Huey tasks for Caching
+
+.. note:: This program is free software; you can redistribute it and/or modify
+          it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+from huey_monitor.tqdm import ProcessInfo
+
+from qdjango.tasks import db_task
+from .models import G3WCachingLayer
+from .utils.seed import TileSeeder, parse_extent
+
+
+@db_task(context=True)
+def seed_tiles_task(caching_layer_pk, min_zoom, max_zoom, extent=None, geoconstraints=False, extension='png',
+                    force=False, workers=None, restart=False, task=None):
+    """Seed the tile cache of a caching layer asynchronously, an interrupted seeding restarts
+    from the metatiles not yet rendered.
+
+    Returns: number of rendered metatiles
+
+    :param caching_layer_pk: G3WCachingLayer pk
+    :type caching_layer_pk: int
+    :param min_zoom: first zoom level
+    :type min_zoom: int
+    :param max_zoom: last zoom level
+    :type max_zoom: int
+    :param extent: optional, 'xmin,ymin,xmax,ymax' in the CRS of the tiles, default project max extent
+    :type extent: str
+    :param geoconstraints: optional, True to seed the extents of the geo constraints of the layer
+    :type geoconstraints: bool
+    :param extension: optional, tile format extension
+    :type extension: str
+    :param force: optional, True to render cached tiles
+    :type force: bool
+    :param workers: optional, number of rendering processes, default TILESTACHE_SEED_WORKERS setting
+    :type workers: int
+    :param restart: optional, True to ignore the progress of a previous interrupted seeding
+    :type restart: bool
+    :rtype: int
+    """
+
+    caching_layer = G3WCachingLayer.objects.get(pk=caching_layer_pk)
+
+    process_info = ProcessInfo(
+        task,
+        desc=f'Seed tiles of caching layer {caching_layer}'
+    )
+
+    seeder = TileSeeder(caching_layer, min_zoom, max_zoom, extents=[parse_extent(extent)] if extent else None,
+                        geoconstraints=geoconstraints, extension=extension, force=force)
+
+    process_info.update_total(len(seeder.get_metatiles()))
+
+    done = [0]
+
+    def progress(count, total):
+        process_info.update(n=count - done[0])
+        done[0] = count
+
+    return seeder.seed(workers=workers, progress=progress, restart=restart)
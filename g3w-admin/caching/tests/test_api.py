@@ -14,7 +14,7 @@ __copyright__ = 'Copyright 2015 - 2020, Gis3w'
 from django.test.client import Client
 from django.test.testcases import LiveServerTestCase
 from django.test import override_settings
-from django.core.management import call_command
+from django.core.management import call_command, CommandError
 from django.urls import reverse
 from django.core.files import File
 from django.core.exceptions import ObjectDoesNotExist
@@ -24,10 +24,22 @@ from usersmanage.tests.utils import setup_testing_user, teardown_testing_users
 from qdjango.utils.data import QgisProject
 from qdjango.tests.base import QGS_FILE
 from core.models import Group as CoreGroup, G3WSpatialRefSys
-from .base import CURRENT_PATH, TEST_BASE_PATH
+from .base import CURRENT_PATH, TEST_BASE_PATH, CachingTestBase
 from qdjango.models import Layer
+from qdjango.cache import TilestacheProvider
 from caching.models import G3WCachingLayer
+from caching.utils.seed import TileSeeder
+from caching.utils.cache import CACHE_CLASSES
+from caching.utils.diskcache import ACCESS_RECORD, ManagedDiskCache
+from TileStache.Caches import Disk
+from ModestMaps.Core import Coordinate
+from qgis.core import QgsRectangle
+from io import StringIO
+from unittest.mock import patch
+import os
 import requests
+import tempfile
+import time
 
 @override_settings(
     TILESTACHE_CACHE_NAME='default',
@@ -103,3 +115,199 @@ class CachingAPITests(LiveServerTestCase):
     def tearDownClass(cls):
         teardown_testing_users(cls)
         super().tearDownClass()
+
+
+class CachingProviderTests(CachingTestBase):
+    """QDJANGO_SERVER_URL doesn't point to a running server: tiles are rendered in process"""
+
+    def test_tilestache_provider(self):
+        """Testing tiles rendering by QGIS Server without HTTP requests"""
+
+        layer = Layer.objects.get(project=self.project.instance, qgs_layer_id='spatialite_points20190604101052075')
+        G3WCachingLayer.objects.create(app_name='qdjango', layer_id=layer.pk)
+
+        config = TilestacheConfig()
+        provider = config.config.layers[f'qdjango{layer.pk}'].provider
+        self.assertIsInstance(provider, TilestacheProvider)
+
+        with patch('urllib.request.urlopen', side_effect=AssertionError('HTTP request to QDJANGO_SERVER_URL')):
+            image = provider.renderArea(256, 256, 'EPSG:4326', -180, -90, 180, 90, 0)
+
+        self.assertEqual(image.size, (256, 256))
+        self.assertEqual(image.mode, 'RGBA')
+
+        # Points are rendered
+        self.assertIsNotNone(image.getbbox())
+
+        # Tile API
+        assign_perm('view_project', self.anonymoususer, self.project.instance)
+        for l in self.project.instance.layer_set.all():
+            assign_perm("view_layer", self.anonymoususer, l)
+
+        TilestacheConfig.set_cache_config_dict(config.config_dict)
+
+        client = Client()
+        self.assertTrue(client.login(username=self.test_admin1.username, password=self.test_admin1.username))
+        res = client.get(reverse('caching-api-tile', args=[f'qdjango{layer.pk}', 0, 0, 0, 'png']))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'image/png')
+        client.logout()
+
+    def test_seed_tiles(self):
+        """Testing tile cache seeding"""
+
+        layer = Layer.objects.get(project=self.project.instance, qgs_layer_id='spatialite_points20190604101052075')
+        caching_layer = G3WCachingLayer.objects.create(app_name='qdjango', layer_id=layer.pk)
+        TilestacheConfig.set_cache_config_dict(TilestacheConfig().config_dict)
+
+        with tempfile.TemporaryDirectory() as state_dir, override_settings(TILESTACHE_SEED_STATE_DIR=state_dir):
+
+            seeder = TileSeeder(caching_layer, 0, 2, extents=[QgsRectangle(-20, -10, 20, 10)], force=True)
+            metatiles = seeder.get_metatiles()
+            self.assertTrue(len(metatiles) > 0)
+            self.assertEqual(sorted(set(m[0] for m in metatiles)), [0, 1, 2])
+
+            # Default extent: project max extent
+            self.assertTrue(len(TileSeeder(caching_layer, 0, 2).get_metatiles()) > 0)
+
+            # Resume: the first metatile has been rendered by a previous run
+            os.makedirs(state_dir, exist_ok=True)
+            with open(seeder.state_path, 'w') as f:
+                f.write('{}/{}/{}\n'.format(*metatiles[0]))
+
+            progress = []
+            rendered = seeder.seed(workers=0, progress=lambda done, total: progress.append((done, total)))
+
+            self.assertEqual(rendered, len(metatiles) - 1)
+            self.assertEqual(progress[0], (1, len(metatiles)))
+            self.assertEqual(progress[-1], (len(metatiles), len(metatiles)))
+            self.assertFalse(os.path.exists(seeder.state_path))
+
+            # Tiles are written by the TileStache cache
+            tilestache_layer = seeder.tilestache_layer
+            for zoom, column, row in metatiles[1:]:
+                self.assertIsNotNone(tilestache_layer.config.cache.read(
+                    tilestache_layer, Coordinate(row, column, zoom), 'PNG'))
+
+            # Command
+            out = StringIO()
+            call_command('seed_tiles', str(caching_layer), '--max-zoom', '1', '--extent', '-20,-10,20,10',
+                         '--workers', '0', stdout=out)
+            self.assertIn(f'{caching_layer}: ', out.getvalue())
+            self.assertIn('metatiles rendered', out.getvalue())
+
+            with self.assertRaises(CommandError):
+                call_command('seed_tiles', 'qdjango0', '--max-zoom', '1', stdout=out)
+
+
+class ManagedDiskCacheTests(CachingTestBase):
+    """Testing size bounded disk cache"""
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+
+        layer = Layer.objects.get(project=self.project.instance, qgs_layer_id='spatialite_points20190604101052075')
+        self.caching_layer = G3WCachingLayer.objects.create(app_name='qdjango', layer_id=layer.pk)
+        self.layer_key_name = str(self.caching_layer)
+
+    def _get_config(self, **kwargs):
+        settings = {
+            'TILESTACHE_CACHE_TYPE': 'ManagedDisk',
+            'TILESTACHE_CACHE_DISK_PATH': self.cache_dir.name,
+            'TILESTACHE_CACHE_DISK_CHECK_INTERVAL': 3600,
+        }
+        settings.update(kwargs)
+        with override_settings(**settings):
+            return TilestacheConfig(config_dict={'cache': CACHE_CLASSES['Manageddisk']().cache_dict, 'layers': {}})
+
+    def test_eviction(self):
+        """Testing LRU and LFU eviction under layer budget"""
+
+        for eviction in ('LRU', 'LFU'):
+            config = self._get_config(TILESTACHE_CACHE_DISK_LAYER_MAX_SIZE=7000,
+                                      TILESTACHE_CACHE_DISK_EVICTION=eviction)
+            config.add_layer(self.layer_key_name, self.caching_layer)
+            layer = config.config.layers[self.layer_key_name]
+            disk_cache = config.config.cache
+            self.assertIsInstance(disk_cache, ManagedDiskCache)
+            disk_cache.reset_layer(self.layer_key_name)
+
+            # 8 tiles of 1000 bytes, saved without budget checks
+            coords = [Coordinate(row, 0, 3) for row in range(8)]
+            for coord in coords:
+                Disk.save(disk_cache, b'0' * 1000, layer, coord, 'PNG')
+                os.utime(disk_cache._fullpath(layer, coord, 'PNG'), (0, 0))
+
+            # Tiles read twice, first tile read often after, second tile read once just now
+            now = time.time()
+            with patch('caching.utils.diskcache.time') as mock_time:
+                mock_time.time.return_value = now + 50
+                for coord in coords[2:]:
+                    for i in range(2):
+                        self.assertIsNotNone(disk_cache.read(layer, coord, 'PNG'))
+                mock_time.time.return_value = now + 100
+                for i in range(5):
+                    self.assertIsNotNone(disk_cache.read(layer, coords[0], 'PNG'))
+                mock_time.time.return_value = now + 200
+                self.assertIsNotNone(disk_cache.read(layer, coords[1], 'PNG'))
+            self.assertIsNone(disk_cache.read(layer, Coordinate(100, 100, 3), 'PNG'))
+
+            # Budget exceeded: evicted down to 90% of the budget
+            self.assertEqual(disk_cache.enforce_budgets(), 2)
+
+            # Access log is aggregated to one record per cached tile
+            self.assertEqual(os.path.getsize(disk_cache._access_log_path(self.layer_key_name)),
+                             6 * ACCESS_RECORD.size)
+
+            usage = config.cache.usage(self.layer_key_name)
+            self.assertEqual(usage['size'], 6000)
+            self.assertEqual(usage['tiles'], 6)
+            self.assertEqual(usage['evicted'], 2)
+            self.assertEqual(usage['max_size'], 7000)
+            self.assertEqual(usage['hits'], 18)
+            self.assertEqual(usage['misses'], 1)
+            self.assertEqual(usage['hit_ratio'], 18 / 19)
+
+            cached = [disk_cache.read(layer, coord, 'PNG') is not None for coord in coords[:2]]
+            if eviction == 'LRU':
+                # Least recently read tiles are evicted
+                self.assertEqual(cached, [True, True])
+            else:
+                # Least frequently read tiles are evicted
+                self.assertEqual(cached, [True, False])
+
+    def test_global_budget_and_reset(self):
+        """Testing global budget, usage API and cache reset"""
+
+        config = self._get_config(TILESTACHE_CACHE_DISK_MAX_SIZE=5000)
+        config.add_layer(self.layer_key_name, self.caching_layer)
+        layer = config.config.layers[self.layer_key_name]
+        disk_cache = config.config.cache
+
+        # Budget checked when 5% of the budget has been written
+        for row in range(6):
+            disk_cache.save(b'0' * 1000, layer, Coordinate(row, 0, 2), 'PNG')
+        self.assertEqual(len(disk_cache.scan_layer(self.layer_key_name)), 4)
+
+        # Usage API
+        TilestacheConfig.set_cache_config_dict(config.config_dict)
+        url = reverse('caching-api-usage', args=[self.layer_key_name])
+        with override_settings(TILESTACHE_CACHE_TYPE='ManagedDisk', TILESTACHE_CACHE_DISK_PATH=self.cache_dir.name):
+            client = Client()
+            self.assertEqual(client.get(url).status_code, 403)
+
+            self.assertTrue(client.login(username=self.test_admin1.username, password=self.test_admin1.username))
+            res = client.get(url)
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.json()['usage']['tiles'], len(disk_cache.scan_layer(self.layer_key_name)))
+
+            self.assertEqual(client.get(reverse('caching-api-usage', args=['qdjango0'])).status_code, 404)
+            client.logout()
+
+            # Reset
+            config.erase_cache_layer(self.layer_key_name)
+            self.assertEqual(disk_cache.scan_layer(self.layer_key_name), [])
+            self.assertEqual(config.cache.usage(self.layer_key_name)['size'], 0)
+            self.assertEqual(config.cache.usage(self.layer_key_name)['hits'], 0)
@@ -21,6 +21,12 @@ class TilestacheCache(object):
     def reset_cache_layer(self, layer_key_name):
         pass
 
+    def usage(self, layer_key_name):
+        """
+        Return cache usage of a layer, None if not available for the cache type
+        """
+        return None
+
 
 class TilestacheCacheTest(object):
 
@@ -63,6 +69,40 @@ class TilestacheCacheDisk(TilestacheCache):
         shutil.rmtree("{}/{}".format(self.cache_dict['path'], layer_key_name), ignore_errors=True)
 
 
+class TilestacheCacheManagedDisk(TilestacheCache):
+    """
+    Class to manage tilestache disk cache with size budgets and LRU/LFU eviction,
+    see caching.utils.diskcache.ManagedDiskCache
+    """
+
+    def _init_cache_dict(self):
+        self.cache_dict = {
+            'class': 'caching.utils.diskcache:ManagedDiskCache',
+            'kwargs': {
+                'path': getattr(settings, 'TILESTACHE_CACHE_DISK_PATH', '/tmp/tilestache_g3wsuite'),
+                'umask': getattr(settings, 'TILESTACHE_CACHE_DISK_UMASK', '0000'),
+                'max_size': getattr(settings, 'TILESTACHE_CACHE_DISK_MAX_SIZE', 0),
+                'layer_max_size': getattr(settings, 'TILESTACHE_CACHE_DISK_LAYER_MAX_SIZE', 0),
+                'layer_max_sizes': getattr(settings, 'TILESTACHE_CACHE_DISK_LAYER_MAX_SIZES', {}),
+                'eviction': getattr(settings, 'TILESTACHE_CACHE_DISK_EVICTION', 'LRU'),
+                'check_interval': getattr(settings, 'TILESTACHE_CACHE_DISK_CHECK_INTERVAL', 300)
+            }
+        }
+
+    def _get_disk_cache(self):
+        from .diskcache import ManagedDiskCache
+        return ManagedDiskCache(**self.cache_dict['kwargs'])
+
+    def reset_cache_layer(self, layer_key_name):
+        self._get_disk_cache().reset_layer(layer_key_name)
+
+    def usage(self, layer_key_name):
+        usage = self._get_disk_cache().usage(layer_key_name)
+        requests = usage['hits'] + usage['misses']
+        usage['hit_ratio'] = usage['hits'] / requests if requests else None
+        return usage
+
+
 class TilestacheCacheMemcache(TilestacheCache):
     """
     Class to manage tilestache of memcached type
@@ -102,6 +142,7 @@ class TilestacheCacheMemcache(TilestacheCache):
 
 CACHE_CLASSES = {
         'Disk': TilestacheCacheDisk,
+        'Manageddisk': TilestacheCacheManagedDisk,
         'Memcache': TilestacheCacheMemcache,
         'Test': TilestacheCacheTest,
         'S3': TilestacheCacheS3
@@ -0,0 +1,458 @@
+# coding=utf-8
+""""Size bounded TileStache disk cache.
+
+Tiles are stored as by the TileStache Disk cache ('safe' directories layout), the cache has a global
+and per layer size budget: when a budget is exceeded the least recently (LRU) or least frequently (LFU)
+used tiles are evicted.
+
+Tile accesses are appended to a compact binary access log per layer (`.access/<layer>.log`, a fixed size
+record per access), the log is aggregated to one record per tile at every eviction check.
+File modification times are not updated on access: TileStache reads them for the layer cache lifespan.
+
+Hit and miss counters (`.access/<layer>.counters`) and the usage of every layer (`.access/<layer>.usage`)
+are stored in the cache directory too, so they are shared by every process using the cache.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import fcntl
+import json
+import logging
+import os
+import shutil
+import struct
+import threading
+import time
+
+from TileStache.Caches import Disk
+
+logger = logging.getLogger('g3wadmin.debug')
+
+# Access log record: access time, zoom, column, row, number of accesses
+ACCESS_RECORD = struct.Struct('<IBIIH')
+
+# Budgets are enforced down to this fraction of the budget, to not evict at every check
+EVICTION_LOW_WATERMARK = 0.9
+
+# Access log records and counters are flushed by every process after this number of accesses or seconds
+FLUSH_ACCESSES = 100
+FLUSH_INTERVAL = 5
+
+# Counters file: hits, misses
+COUNTERS_RECORD = struct.Struct('<QQ')
+
+# Per process state, shared by the cache instances of the same cache directory
+_lock = threading.Lock()
+_states = {}
+
+
+class ManagedDiskCache(Disk):
+    """
+    TileStache disk cache with size budgets and LRU/LFU eviction.
+
+    :param path: cache directory
+    :param umask: optional, umask of the created files and directories
+    :param max_size: optional, global size budget in bytes, 0 for no budget
+    :param layer_max_size: optional, default size budget of every layer in bytes, 0 for no budget
+    :param layer_max_sizes: optional, size budgets of layers, {layer name: bytes}
+    :param eviction: optional, eviction policy, 'LRU' or 'LFU'
+    :param check_interval: optional, seconds between budget checks of a process,
+                           budgets are checked also when 5% of the budget has been written
+    """
+
+    def __init__(self, path, umask='0022', max_size=0, layer_max_size=0, layer_max_sizes=None, eviction='LRU',
+                 check_interval=300):
+
+        super().__init__(path, umask=int(umask, 8) if isinstance(umask, str) else umask, dirs='safe')
+
+        self.max_size = max_size
+        self.layer_max_size = layer_max_size
+        self.layer_max_sizes = layer_max_sizes or {}
+        self.eviction = eviction.upper()
+        self.check_interval = check_interval
+
+        with _lock:
+            self.state = _states.setdefault(self.cachepath, {
+                'records': {},
+                'hits': {},
+                'misses': {},
+                'accesses': 0,
+                'flushed': time.time(),
+                'written': 0,
+                'checked': time.time(),
+            })
+
+    # Paths
+    # -----
+
+    def _access_dir(self):
+
+        return os.path.join(self.cachepath, '.access')
+
+    def _access_log_path(self, layer_name):
+
+        return os.path.join(self._access_dir(), f'{layer_name}.log')
+
+    def _counters_path(self, layer_name):
+
+        return os.path.join(self._access_dir(), f'{layer_name}.counters')
+
+    def _usage_path(self, layer_name):
+
+        return os.path.join(self._access_dir(), f'{layer_name}.usage')
+
+    def layer_budget(self, layer_name):
+        """Returns the size budget of a layer in bytes, 0 for no budget"""
+
+        return self.layer_max_sizes.get(layer_name, self.layer_max_size)
+
+    # TileStache cache interface
+    # --------------------------
+
+    def read(self, layer, coord, format):
+
+        body = super().read(layer, coord, format)
+
+        layer_name = layer.name()
+        with _lock:
+            if body is None:
+                self.state['misses'][layer_name] = self.state['misses'].get(layer_name, 0) + 1
+            else:
+                self.state['hits'][layer_name] = self.state['hits'].get(layer_name, 0) + 1
+                self.state['records'].setdefault(layer_name, []).append(
+                    ACCESS_RECORD.pack(int(time.time()), coord.zoom, coord.column, coord.row, 1))
+            self.state['accesses'] += 1
+            flush = self.state['accesses'] >= FLUSH_ACCESSES or time.time() - self.state['flushed'] >= FLUSH_INTERVAL
+
+        if flush:
+            self.flush()
+
+        return body
+
+    def save(self, body, layer, coord, format):
+
+        super().save(body, layer, coord, format)
+
+        budgets = [b for b in [self.max_size, self.layer_budget(layer.name())] if b > 0]
+        if not budgets:
+            return
+
+        with _lock:
+            self.state['written'] += len(body)
+            check = self.state['written'] >= min(budgets) * 0.05 or \
+                time.time() - self.state['checked'] >= self.check_interval
+            if check:
+                self.state['written'] = 0
+                self.state['checked'] = time.time()
+
+        if check:
+            self.enforce_budgets()
+
+    # Access log and counters
+    # -----------------------
+
+    def flush(self):
+        """Appends the buffered access records to the access logs and updates the hit/miss counters"""
+
+        with _lock:
+            records, self.state['records'] = self.state['records'], {}
+            hits, self.state['hits'] = self.state['hits'], {}
+            misses, self.state['misses'] = self.state['misses'], {}
+            self.state['accesses'] = 0
+            self.state['flushed'] = time.time()
+
+        if records or hits or misses:
+            os.makedirs(self._access_dir(), exist_ok=True)
+        for layer_name, layer_records in records.items():
+            # Appends of a single write are not interleaved with the appends of other processes
+            with open(self._access_log_path(layer_name), 'ab') as f:
+                f.write(b''.join(layer_records))
+
+        for layer_name in set(hits) | set(misses):
+            self._add_counters(layer_name, hits.get(layer_name, 0), misses.get(layer_name, 0))
+
+    def _add_counters(self, layer_name, hits, misses):
+        """Adds hits and misses to the counters file of a layer, locked against the other processes"""
+
+        fd = os.open(self._counters_path(layer_name), os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            data = os.pread(fd, COUNTERS_RECORD.size, 0)
+            old_hits, old_misses = COUNTERS_RECORD.unpack(data) if len(data) == COUNTERS_RECORD.size else (0, 0)
+            os.pwrite(fd, COUNTERS_RECORD.pack(old_hits + hits, old_misses + misses), 0)
+        finally:
+            os.close(fd)
+
+    def read_counters(self, layer_name):
+        """
+        Returns the hit and miss counters of a layer
+
+        :return: (hits, misses)
+        :rtype: tuple
+        """
+
+        try:
+            with open(self._counters_path(layer_name), 'rb') as f:
+                fcntl.flock(f, fcntl.LOCK_SH)
+                data = f.read(COUNTERS_RECORD.size)
+        except FileNotFoundError:
+            return 0, 0
+
+        return COUNTERS_RECORD.unpack(data) if len(data) == COUNTERS_RECORD.size else (0, 0)
+
+    def _write_usage(self, layer_name, usage):
+        """Writes the usage file of a layer, replaced atomically"""
+
+        path = self._usage_path(layer_name)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}'
+        with open(tmp_path, 'w') as f:
+            json.dump(usage, f)
+        os.replace(tmp_path, path)
+
+    def _read_usage(self, layer_name):
+        """Returns the usage of a layer written by the last budget check, None if missing"""
+
+        try:
+            with open(self._usage_path(layer_name)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def read_access_log(self, path):
+        """
+        Returns the aggregated accesses of an access log
+
+        :param path: access log path
+        :return: {(zoom, column, row): [last access time, accesses]}
+        :rtype: dict
+        """
+
+        accesses = {}
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return accesses
+
+        # A partial record at the end of the log is ignored
+        size = len(data) - len(data) % ACCESS_RECORD.size
+        for atime, zoom, column, row, count in ACCESS_RECORD.iter_unpack(data[:size]):
+            access = accesses.setdefault((zoom, column, row), [0, 0])
+            access[0] = max(access[0], atime)
+            access[1] += count
+
+        return accesses
+
+    # Eviction
+    # --------
+
+    def scan_layer(self, layer_name):
+        """
+        Returns the cached tiles of a layer
+
+        :return: list of (zoom, column, row, path, size, mtime)
+        :rtype: list
+        """
+
+        tiles = []
+        layer_dir = os.path.join(self.cachepath, layer_name)
+        for dirpath, dirnames, filenames in os.walk(layer_dir):
+            parts = os.path.relpath(dirpath, layer_dir).split(os.sep)
+            if len(parts) != 4:
+                continue
+            zoom, x1, x2, y1 = parts
+            for filename in filenames:
+                # Files being written and lock directories are not tiles
+                y2 = filename.split('.')[0]
+                try:
+                    coord = int(zoom), int(x1 + x2), int(y1 + y2)
+                    path = os.path.join(dirpath, filename)
+                    stat = os.stat(path)
+                except (ValueError, OSError):
+                    continue
+                tiles.append(coord + (path, stat.st_size, stat.st_mtime))
+
+        return tiles
+
+    def _eviction_key(self, tile, accesses):
+        """Sort key of the tiles, first tiles are evicted first"""
+
+        last, count = accesses.get(tile[:3], (0, 0))
+        last = max(last, tile[5])
+        return (count, last) if self.eviction == 'LFU' else (last, count)
+
+    def layer_names(self):
+        """Returns the names of the cached layers"""
+
+        if not os.path.isdir(self.cachepath):
+            return []
+        return [e.name for e in os.scandir(self.cachepath) if e.is_dir() and not e.name.startswith('.')]
+
+    def enforce_budgets(self):
+        """
+        Evicts tiles while the global or the layer budgets are exceeded, aggregates the access logs
+        and updates the usage of the layers. Skipped when another process is running it.
+
+        :return: number of evicted tiles, None if skipped
+        :rtype: int, None
+        """
+
+        self.flush()
+
+        os.makedirs(self._access_dir(), exist_ok=True)
+        with open(os.path.join(self._access_dir(), '.lock'), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None
+
+            try:
+                return self._enforce_budgets()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _enforce_budgets(self):
+
+        layers = {}
+        for layer_name in self.layer_names():
+
+            # Access records appended from now on go to a new log
+            log_path = self._access_log_path(layer_name)
+            aggregating_path = log_path + '.aggregating'
+            try:
+                if os.path.exists(aggregating_path):
+                    # Left by an interrupted check
+                    with open(log_path, 'rb') as log, open(aggregating_path, 'ab') as f:
+                        f.write(log.read())
+                    os.remove(log_path)
+                else:
+                    os.rename(log_path, aggregating_path)
+            except FileNotFoundError:
+                pass
+
+            accesses = self.read_access_log(aggregating_path)
+            tiles = sorted(self.scan_layer(layer_name), key=lambda t: self._eviction_key(t, accesses))
+            layers[layer_name] = {
+                'accesses': accesses,
+                'aggregating_path': aggregating_path,
+                'tiles': tiles,
+                'size': sum(t[4] for t in tiles),
+                'count': len(tiles),
+                'cached': {t[:3] for t in tiles},
+                'evicted': 0,
+            }
+
+        def evict(layer, tile):
+            try:
+                os.remove(tile[3])
+            except OSError:
+                return False
+            layer['size'] -= tile[4]
+            layer['count'] -= 1
+            layer['evicted'] += 1
+            layer['accesses'].pop(tile[:3], None)
+            return True
+
+        # Layer budgets
+        for layer_name, layer in layers.items():
+            budget = self.layer_budget(layer_name)
+            if budget <= 0 or layer['size'] <= budget:
+                continue
+            while layer['tiles'] and layer['size'] > budget * EVICTION_LOW_WATERMARK:
+                evict(layer, layer['tiles'].pop(0))
+
+        # Global budget, tiles of all layers by eviction order
+        if self.max_size > 0 and sum(l['size'] for l in layers.values()) > self.max_size:
+            total = sum(l['size'] for l in layers.values())
+            candidates = sorted(
+                ((self._eviction_key(t, l['accesses']), layer_name, t)
+                 for layer_name, l in layers.items() for t in l['tiles']),
+                key=lambda c: c[0])
+            for __, layer_name, tile in candidates:
+                if total <= self.max_size * EVICTION_LOW_WATERMARK:
+                    break
+                if evict(layers[layer_name], tile):
+                    total -= tile[4]
+
+        evicted = 0
+        for layer_name, layer in layers.items():
+
+            # One record per cached tile, records of removed tiles are dropped
+            records = [ACCESS_RECORD.pack(last, *tile, min(count, 0xFFFF))
+                       for tile, (last, count) in layer['accesses'].items() if tile in layer['cached']]
+            if records:
+                with open(self._access_log_path(layer_name), 'ab') as f:
+                    f.write(b''.join(records))
+            try:
+                os.remove(layer['aggregating_path'])
+            except FileNotFoundError:
+                pass
+
+            self._write_usage(layer_name, {
+                'size': layer['size'],
+                'tiles': layer['count'],
+                'evicted': layer['evicted'],
+                'updated': time.time(),
+            })
+            evicted += layer['evicted']
+
+        if evicted:
+            logger.info(f'[TILESTACHE DISK CACHE] {evicted} tiles evicted from {self.cachepath}')
+
+        return evicted
+
+    # Usage
+    # -----
+
+    def usage(self, layer_name):
+        """
+        Returns the usage of a layer, the size is updated by the budget checks
+
+        :param layer_name: TileStache layer name
+        :return: {'size', 'tiles', 'max_size', 'evicted', 'updated', 'hits', 'misses'}
+        :rtype: dict
+        """
+
+        self.flush()
+
+        usage = self._read_usage(layer_name)
+        if usage is None:
+            tiles = self.scan_layer(layer_name)
+            usage = {
+                'size': sum(t[4] for t in tiles),
+                'tiles': len(tiles),
+                'evicted': 0,
+                'updated': time.time(),
+            }
+            os.makedirs(self._access_dir(), exist_ok=True)
+            self._write_usage(layer_name, usage)
+
+        hits, misses = self.read_counters(layer_name)
+        usage.update({
+            'max_size': self.layer_budget(layer_name),
+            'hits': hits,
+            'misses': misses,
+        })
+
+        return usage
+
+    def reset_layer(self, layer_name):
+        """Removes the tiles, the access log, the counters and the usage of a layer"""
+
+        with _lock:
+            self.state['records'].pop(layer_name, None)
+            self.state['hits'].pop(layer_name, None)
+            self.state['misses'].pop(layer_name, None)
+
+        shutil.rmtree(os.path.join(self.cachepath, layer_name), ignore_errors=True)
+        for path in (self._access_log_path(layer_name), self._access_log_path(layer_name) + '.aggregating',
+                     self._counters_path(layer_name), self._usage_path(layer_name)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
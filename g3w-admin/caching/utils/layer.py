@@ -3,7 +3,7 @@ from django.http.request import QueryDict
 
 class TilestacheLayerBase(object):
 
-    layer_type = "url template"
+    layer_type = "class"
 
     def __init__(self, caching_layer, layer_key_name):
 
@@ -0,0 +1,301 @@
+# coding=utf-8
+""""Seeding of the tile cache of caching layers.
+
+The metatiles of a caching layer are rendered for a zoom range and a list of extents (project max extent,
+geo constraint extents or a custom extent) by a pool of processes: every process renders metatiles
+with TileStache, the tiles are written by the configured TilestacheCache backend.
+
+Completed metatiles are appended to a state file: an interrupted seeding restarts from the
+metatiles not yet rendered.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import ast
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+import TileStache
+from ModestMaps.Core import Coordinate
+from django.apps import apps
+from django.conf import settings
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsCoordinateTransformContext,
+    QgsRectangle,
+)
+
+from qdjango.models import GeoConstraintRule
+from . import get_config
+
+# Number of seeding processes, 0 to render in the current process
+TILESTACHE_SEED_WORKERS = getattr(settings, 'TILESTACHE_SEED_WORKERS', 2)
+
+
+def get_seed_state_dir():
+    """Returns the directory of the state files of the seeding jobs"""
+
+    return getattr(settings, 'TILESTACHE_SEED_STATE_DIR', None) or \
+        os.path.join(tempfile.gettempdir(), 'g3w_tilestache_seed')
+
+
+def parse_extent(value):
+    """
+    Returns the rectangle of an extent string
+
+    :param value: 'xmin,ymin,xmax,ymax'
+    :rtype: QgsRectangle
+    :raises ValueError: on malformed extents
+    """
+
+    coords = [float(c) for c in value.split(',')]
+    if len(coords) != 4 or coords[0] >= coords[2] or coords[1] >= coords[3]:
+        raise ValueError(f'Invalid extent: {value}')
+
+    return QgsRectangle(*coords)
+
+
+# TileStache configuration of the seeding processes
+_process_config = None
+
+
+def render_metatile(layer, zoom, column, row, extension, force):
+    """
+    Renders a metatile, the tiles are saved by the TileStache cache
+
+    :param layer: TileStache layer
+    :param zoom: zoom level
+    :param column: column of the first tile of the metatile
+    :param row: row of the first tile of the metatile
+    :param extension: tile format extension, i.e. 'png'
+    :param force: True to render cached tiles
+    :return: the metatile
+    :rtype: tuple
+    """
+
+    TileStache.getTile(layer, Coordinate(row, column, zoom), extension, ignore_cached=force)
+
+    return zoom, column, row
+
+
+def _process_render_metatile(layer_key_name, zoom, column, row, extension, force):
+    """Renders a metatile in a seeding process, the TileStache configuration is loaded once per process"""
+
+    global _process_config
+
+    if _process_config is None:
+        _process_config = get_config().config
+
+    return render_metatile(_process_config.layers[layer_key_name], zoom, column, row, extension, force)
+
+
+class TileSeeder(object):
+    """
+    Renders the metatiles of a caching layer.
+
+    :param caching_layer: G3WCachingLayer instance
+    :param min_zoom: first zoom level
+    :param max_zoom: last zoom level
+    :param extents: optional, list of QgsRectangle in the CRS of the tiles, default project max extent
+    :param geoconstraints: optional, True to seed the extents of the geo constraints of the layer
+    :param extension: optional, tile format extension, default 'png'
+    :param force: optional, True to render cached tiles
+    """
+
+    def __init__(self, caching_layer, min_zoom, max_zoom, extents=None, geoconstraints=False, extension='png',
+                 force=False):
+
+        self.caching_layer = caching_layer
+        self.layer_key_name = str(caching_layer)
+        self.zooms = list(range(min_zoom, max_zoom + 1))
+        self.extension = extension
+        self.force = force
+
+        try:
+            self.tilestache_layer = get_config().config.layers[self.layer_key_name]
+        except KeyError:
+            raise ValueError(f'Caching layer {self.layer_key_name} is not configured')
+
+        self.layer = apps.get_app_config(caching_layer.app_name).get_model('layer').objects.get(
+            pk=caching_layer.layer_id)
+        self.crs = QgsCoordinateReferenceSystem(f'EPSG:{self.layer.project.group.srid.auth_srid}')
+
+        if extents:
+            self.extents = extents
+        elif geoconstraints:
+            self.extents = self.get_geoconstraint_extents()
+        else:
+            self.extents = [self.get_project_extent()]
+
+    def get_project_extent(self):
+        """Returns the max extent of the project, the initial extent if not set
+
+        :rtype: QgsRectangle
+        """
+
+        project = self.layer.project
+        extent = ast.literal_eval(project.max_extent or project.initial_extent)
+
+        return QgsRectangle(float(extent['xmin']), float(extent['ymin']), float(extent['xmax']), float(extent['ymax']))
+
+    def get_geoconstraint_extents(self):
+        """Returns the extents of the active geo constraint rules of the layer
+
+        :rtype: list
+        """
+
+        extents = []
+        for rule in GeoConstraintRule.objects.filter(constraint__layer=self.layer, constraint__active=True):
+            geometry, __ = rule.get_constraint_geometry()
+            if not geometry:
+                continue
+
+            rect = QgsRectangle(*geometry.extent)
+            layer_crs = QgsCoordinateReferenceSystem(f'EPSG:{geometry.srid}')
+            if layer_crs != self.crs:
+                rect = QgsCoordinateTransform(layer_crs, self.crs, QgsCoordinateTransformContext()). \
+                    transformBoundingBox(rect)
+            extents.append(rect)
+
+        return extents
+
+    def get_metatiles(self):
+        """
+        Returns the metatiles covering the extents for every zoom level
+
+        :return: sorted list of (zoom, column, row) of the first tile of the metatiles
+        :rtype: list
+        """
+
+        projection = self.tilestache_layer.projection
+        metatile = self.tilestache_layer.metatile
+
+        metatiles = set()
+        for zoom in self.zooms:
+
+            # Tile grids are linear in the tiles CRS: tile size and origin from the first tiles
+            origin = projection.coordinateProj(Coordinate(0, 0, zoom))
+            corner = projection.coordinateProj(Coordinate(1, 1, zoom))
+            width = corner.x - origin.x
+            height = corner.y - origin.y
+
+            for extent in self.extents:
+                columns = sorted(math.floor((x - origin.x) / width) for x in (extent.xMinimum(), extent.xMaximum()))
+                rows = sorted(math.floor((y - origin.y) / height) for y in (extent.yMinimum(), extent.yMaximum()))
+
+                first_column = max(columns[0], 0) // metatile.columns * metatile.columns
+                first_row = max(rows[0], 0) // metatile.rows * metatile.rows
+                for column in range(first_column, columns[1] + 1, metatile.columns):
+                    for row in range(first_row, rows[1] + 1, metatile.rows):
+                        metatiles.add((zoom, column, row))
+
+        return sorted(metatiles)
+
+    @property
+    def state_path(self):
+        """Path of the state file, it depends on layer, zoom levels, extents and format"""
+
+        digest = hashlib.md5(json.dumps([
+            self.layer_key_name,
+            self.zooms,
+            [e.toString() for e in self.extents],
+            self.extension
+        ]).encode('utf-8')).hexdigest()
+
+        return os.path.join(get_seed_state_dir(), f'{self.layer_key_name}-{digest}.state')
+
+    def read_state(self):
+        """Returns the metatiles rendered by previous runs
+
+        :rtype: set
+        """
+
+        done = set()
+        try:
+            with open(self.state_path) as f:
+                for line in f:
+                    try:
+                        done.add(tuple(int(v) for v in line.split('/')))
+                    except ValueError:
+                        # Partial line of an interrupted run
+                        continue
+        except FileNotFoundError:
+            pass
+
+        return done
+
+    def seed(self, workers=None, progress=None, restart=False):
+        """
+        Renders the metatiles not rendered by previous runs
+
+        :param workers: optional, number of processes, default TILESTACHE_SEED_WORKERS setting,
+                        0 to render in the current process
+        :param progress: optional, callable called with (done, total) number of metatiles
+        :param restart: optional, True to ignore the metatiles rendered by previous runs
+        :return: number of metatiles rendered
+        :rtype: int
+        """
+
+        workers = TILESTACHE_SEED_WORKERS if workers is None else workers
+
+        # Daemon processes (i.e. some task queue workers) cannot start processes
+        if multiprocessing.current_process().daemon:
+            workers = 0
+
+        metatiles = self.get_metatiles()
+        os.makedirs(get_seed_state_dir(), exist_ok=True)
+        if restart and os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+        done = self.read_state()
+        todo = [m for m in metatiles if m not in done]
+        total = len(metatiles)
+        count = total - len(todo)
+
+        if progress:
+            progress(count, total)
+
+        with open(self.state_path, 'a') as state:
+
+            def completed(metatile):
+                nonlocal count
+                state.write('{}/{}/{}\n'.format(*metatile))
+                state.flush()
+                count += 1
+                if progress:
+                    progress(count, total)
+
+            if workers == 0:
+                for zoom, column, row in todo:
+                    completed(render_metatile(self.tilestache_layer, zoom, column, row, self.extension, self.force))
+            else:
+                # Spawned processes: QGIS is not fork safe, Django (and QGIS) are set up by every process
+                with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                         initializer=django.setup) as executor:
+                    futures = [executor.submit(_process_render_metatile, self.layer_key_name, zoom, column, row,
+                                               self.extension, self.force) for zoom, column, row in todo]
+                    try:
+                        for future in as_completed(futures):
+                            completed(future.result())
+                    except BaseException:
+                        # Rendered metatiles are kept in the state file for the next run
+                        for future in futures:
+                            future.cancel()
+                        raise
+
+        # Seeding completed: the next run starts over
+        os.remove(self.state_path)
+
+        return len(todo)
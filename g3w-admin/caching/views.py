@@ -17,7 +17,7 @@ from core.models import BaseLayer
 from .forms import ActiveCachingLayerForm
 from .models import G3WCachingLayer
 from .utils import get_config, TilestacheConfig
-from .api.permissions import TilePermission
+from .api.permissions import TilePermission, CacheUsagePermission
 from django.core.cache import caches
 from qdjango.models import Layer as QdjangoLayer
 from qgis.core import QgsCoordinateReferenceSystem
@@ -251,3 +251,26 @@ class TileStacheTileApiView(APIView):
                 },
                 status=status.HTTP_404_NOT_FOUND
             )
+
+
+class TileStacheCacheUsageApiView(APIView):
+    """
+    Returns tile cache usage of a caching layer: size, number of tiles, budget, hits and misses.
+    Available for cache types tracking usage (ManagedDisk)
+    """
+
+    permission_classes = (
+        CacheUsagePermission,
+    )
+
+    def get(self, request, layer_name):
+
+        if layer_name not in [str(cl) for cl in G3WCachingLayer.objects.all()]:
+            return Response({'status': 'layer not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        usage = get_config().cache.usage(layer_name)
+        if usage is None:
+            return Response({'status': 'error', 'message': 'Cache type does not track usage'},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        return Response({'status': 'ok', 'layer': layer_name, 'usage': usage})
@@ -1,9 +1,15 @@
+import hashlib
 import json
+import math
 from copy import copy
 
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
-from django.http import Http404, HttpRequest
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.urls import resolve, reverse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_etags
 from django.utils.translation import gettext_lazy as _
 from qgis.core import (
     QgsJsonExporter,
@@ -11,12 +17,17 @@ from qgis.core import (
     QgsCoordinateReferenceSystem,
     QgsCoordinateTransformContext,
     QgsFeatureRequest,
-    QgsWkbTypes,
-    QgsVectorLayer,
     QgsJsonUtils,
     QgsFeature,
     QgsExpressionContext,
-    QgsExpressionContextUtils
+    QgsExpressionContextUtils,
+    QgsCsException,
+    QgsGeometry,
+    QgsRectangle,
+    QgsSimplifyMethod,
+    QgsTopologyPreservingSimplifier,
+    QgsUnitTypes,
+    QgsVectorDataProvider
 )
 
 from qgis.PyQt.QtCore import QVariant
@@ -24,18 +35,39 @@ from qgis.PyQt.QtCore import QVariant
 from rest_framework import exceptions, status
 from rest_framework.exceptions import APIException
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
 from core.api.authentication import CsrfExemptSessionAuthentication
 from core.api.filters import IntersectsBBoxFilter
+from core.api.renderers import RawJSON, RawJSONRenderer
 from core.signals import (before_return_vector_data_layer,
                           post_create_maplayerattributes,
                           post_serialize_maplayer)
 from core.utils.structure import (APIVectorLayerStructure, mapLayerAttributes,
                                   mapLayerAttributesFromQgisLayer)
 from core.utils.vector import BaseUserMediaHandler as UserMediaHandler
-from core.utils.qgisapi import get_qgis_features, count_qgis_features, server_fid
+from core.utils.geojson import (
+    GEOJSON_PRECISION,
+    GeoJSONFeatureSerializer,
+    encode_value,
+    geometry_to_geojson,
+    dumps as geojson_dumps
+)
+from core.utils.qgisapi import (
+    get_qgis_features,
+    iter_qgis_features,
+    count_qgis_features,
+    get_qgis_feature_ids,
+    get_qgis_unique_values,
+    cache_feature_ids,
+    server_fid,
+    FieldFormattingPlan,
+    encode_cursor,
+    CursorError
+)
 from qdjango.apps import QGS_APPLICATION
 
 from natsort import natsorted
@@ -55,6 +87,30 @@ MODE_FILTER_TOKEN = 'filtertoken'
 MODE_GEOTIFF = 'geotiff' # For raster layers
 MODE_FEATURE_COUNT = 'featurecount'
 MODE_EDITORFORMSTRUCTURE_COUNT = 'editorformstructure'
+MODE_MVT = 'mvt'
+MODE_FGB = 'fgb'
+MODE_ARROW = 'arrow'
+
+# Cache timeout (seconds) of 'unique' values, 0 to disable the cache
+VECTOR_UNIQUE_VALUES_CACHE_TTL = getattr(settings, 'VECTOR_UNIQUE_VALUES_CACHE_TTL', 0)
+
+# Cache timeout (seconds) of the geometries simplified for 'resolution'/'map_scale' params, 0 to disable the cache
+VECTOR_SIMPLIFIED_GEOMETRY_CACHE_TTL = getattr(settings, 'VECTOR_SIMPLIFIED_GEOMETRY_CACHE_TTL', 0)
+
+# Cache timeout (seconds) of vector API responses (config, data and featurecount modes), 0 to disable the cache
+VECTOR_RESPONSE_CACHE_TTL = getattr(settings, 'VECTOR_RESPONSE_CACHE_TTL', 0)
+
+# Over this number of 'autofilter' feature ids, ids are stored in the cache backend and referenced by a token
+VECTOR_FEATURE_IDS_TOKEN_THRESHOLD = getattr(settings, 'VECTOR_FEATURE_IDS_TOKEN_THRESHOLD', 10000)
+
+# Placeholder for the features array inside the streamed GeoJSON response
+STREAM_FEATURES_PLACEHOLDER = '__G3W_STREAM_FEATURES__'
+
+# Placeholder for the next page cursor inside the streamed GeoJSON response
+STREAM_NEXT_CURSOR_PLACEHOLDER = '__G3W_STREAM_NEXT_CURSOR__'
+
+# Minimum size (in characters) of every chunk sent by the streamed GeoJSON response
+STREAM_CHUNK_SIZE = 65536
 
 MIME_TYPES_MOD = {
     MODE_SHP: {
@@ -80,6 +136,18 @@ MIME_TYPES_MOD = {
     MODE_GEOTIFF: {
         'mime_type': 'image/tiff',
         'ext': 'tif'
+    },
+    MODE_MVT: {
+        'mime_type': 'application/vnd.mapbox-vector-tile',
+        'ext': 'pbf'
+    },
+    MODE_FGB: {
+        'mime_type': 'application/flatgeobuf',
+        'ext': 'fgb'
+    },
+    MODE_ARROW: {
+        'mime_type': 'application/vnd.apache.arrow.stream',
+        'ext': 'arrows'
     }
 }
 
@@ -199,6 +267,12 @@ class BaseVectorApiView(G3WAPIView):
         CsrfExemptSessionAuthentication,
     )
 
+    # Data mode features are serialized to JSON bytes, see get_feature_json_writer()
+    renderer_classes = (
+        RawJSONRenderer,
+        BrowsableAPIRenderer
+    )
+
     # Parameter for locking features data into db
     app_name = None
 
@@ -220,12 +294,21 @@ class BaseVectorApiView(G3WAPIView):
         MODE_DATA
     ]
 
+    # Modes call with cached responses and ETag, see get_response_cache_key()
+    cacheable_modes_call = []
+
     pagination_class = G3WAPIPaginator
 
     # For qgis layer style management
     style = None
     current_style = None
 
+    # Number of decimals of GeoJSON coordinates, see get_simplification()
+    geometry_precision = GEOJSON_PRECISION
+
+    # Simplifier of geometries for providers not simplifying them, see set_simplify_method()
+    local_simplifier = None
+
     @property
     def paginator(self):
         """
@@ -317,6 +400,28 @@ class BaseVectorApiView(G3WAPIView):
 
         pass
 
+    def coordinate_transform(self, from_srid, to_srid):
+        """
+        Return the QgsCoordinateTransform between two EPSG codes,
+        transforms are cached by CRS pair for the lifetime of the view instance.
+
+        :param from_srid: source EPSG code
+        :param to_srid: destination EPSG code
+        :return: QgsCoordinateTransform
+        """
+
+        if not hasattr(self, '_coordinate_transforms'):
+            self._coordinate_transforms = {}
+
+        key = (from_srid, to_srid)
+        if key not in self._coordinate_transforms:
+            self._coordinate_transforms[key] = QgsCoordinateTransform(
+                QgsCoordinateReferenceSystem(f'EPSG:{from_srid}'),
+                QgsCoordinateReferenceSystem(f'EPSG:{to_srid}'),
+                QgsCoordinateTransformContext())
+
+        return self._coordinate_transforms[key]
+
     def reproject_feature(self, feature, to_layer=False):
         """
         Reproject single geometry feature
@@ -333,22 +438,62 @@ class BaseVectorApiView(G3WAPIView):
             from_srid = self.layer.srid
             to_srid = self.layer.project.group.srid.auth_srid
 
-        to_srid = QgsCoordinateReferenceSystem(f'EPSG:{to_srid}')
-        from_srid = QgsCoordinateReferenceSystem(f'EPSG:{from_srid}')
-        ct = QgsCoordinateTransform(
-            from_srid, to_srid, QgsCoordinateTransformContext())
+        ct = self.coordinate_transform(from_srid, to_srid)
 
         # Use QGIS APi for QgsFeature instance
         if isinstance(feature, QgsFeature):
             geometry = feature.geometry()
             geometry.transform(ct)
             feature.setGeometry(geometry)
-        else:
-            qgis_feature = QgsJsonUtils.stringToFeatureList(json.dumps(feature))[
-                0]
-            geometry = qgis_feature.geometry()
+        elif feature.get('geometry'):
+            if hasattr(QgsJsonUtils, 'geometryFromGeoJson'):
+                geometry = QgsJsonUtils.geometryFromGeoJson(json.dumps(feature['geometry']))
+            else:
+                geometry = QgsJsonUtils.stringToFeatureList(json.dumps(feature))[0].geometry()
             geometry.transform(ct)
-            feature['geometry'] = json.loads(geometry.asJson())
+            feature['geometry'] = geometry_to_geojson(geometry, precision=17)
+
+    def set_destination_crs(self, qgis_feature_request):
+        """
+        Set the project CRS as destination CRS of the QgsFeatureRequest when layer data have to be reprojected:
+        geometries are transformed by the QGIS feature iterator.
+        With a destination CRS the filter rect is in the project CRS, see IntersectsBBoxFilter.
+
+        :param qgis_feature_request: QgsFeatureRequest instance
+        """
+
+        if self.reproject:
+            qgis_feature_request.setDestinationCrs(
+                QgsCoordinateReferenceSystem(f'EPSG:{self.layer.project.group.srid.auth_srid}'),
+                QgsCoordinateTransformContext())
+
+    def check_destination_crs(self, qgis_feature_request, layer_crs_geometries=False):
+        """
+        Filter expressions using the geometry (i.e. geo constraints) are built in the layer CRS:
+        in this case remove the destination CRS from the QgsFeatureRequest and
+        reproject the filter rect to the layer CRS, features will be reprojected one by one.
+
+        :param qgis_feature_request: QgsFeatureRequest instance with filters applied
+        :param layer_crs_geometries: True to read geometries in the layer CRS anyway
+                                     (i.e. geometries simplified by local_simplifier)
+        :return: True if geometries are reprojected by the QGIS feature iterator
+        """
+
+        if not qgis_feature_request.destinationCrs().isValid():
+            return False
+
+        expression = qgis_feature_request.filterExpression()
+        if not layer_crs_geometries and (expression is None or not expression.needsGeometry()):
+            return True
+
+        filter_rect = qgis_feature_request.filterRect()
+        if filter_rect is not None and not filter_rect.isNull():
+            ct = self.coordinate_transform(self.layer.project.group.srid.auth_srid, self.layer.srid)
+            qgis_feature_request.setFilterRect(ct.transformBoundingBox(filter_rect))
+
+        qgis_feature_request.setDestinationCrs(QgsCoordinateReferenceSystem(), QgsCoordinateTransformContext())
+
+        return False
 
     def reproject_featurecollection(self, featurecollection, to_layer=False):
         """
@@ -476,6 +621,9 @@ class BaseVectorApiView(G3WAPIView):
             #if len(visiblefields) != len(vector_params['fields']):
                 #pass
 
+        # Reproject geometries by QgsFeatureRequest
+        self.set_destination_crs(qgis_feature_request)
+
         # Apply filter backends, store original subset string
         original_subset_string = self.metadata_layer.qgis_layer.subsetString()
         if hasattr(self, 'filter_backends'):
@@ -485,36 +633,64 @@ class BaseVectorApiView(G3WAPIView):
             except Exception as e:
                 raise APIException(e)
 
+        # Geometries simplified for the client map resolution
+        simplify_tolerance, precision = self.get_simplification()
+        if simplify_tolerance:
+            self.set_simplify_method(qgis_feature_request, simplify_tolerance)
+        if precision is not None:
+            self.geometry_precision = precision
+
+        # Features to reproject one by one
+        # Geometries simplified locally are read in the layer CRS, the tolerance unit
+        reproject_features = self.reproject and not self.check_destination_crs(
+            qgis_feature_request, layer_crs_geometries=self.local_simplifier is not None)
+
         # Paging cannot be a backend filter
-        if 'page' in self.request_data:
+        # 'cursor' (keyset pagination) takes precedence over 'page'
+        if 'cursor' in self.request_data:
+            kwargs['cursor'] = self.request_data.get('cursor')
+            kwargs['page_size'] = self.request_data.get('page_size', 10)
+        elif 'page' in self.request_data:
             kwargs['page'] = self.request_data.get('page')
             kwargs['page_size'] = self.request_data.get('page_size', 10)
 
-        # Make sure we have all attrs we need to build the server FID
-        provider = self.metadata_layer.qgis_layer.dataProvider()
+        # Streaming mode: features are serialized while the QgsFeatureIterator is consumed
+        if self.is_stream_request():
+            response = self.response_data_stream(request, qgis_feature_request, visiblefields,
+                                                 reproject_features=reproject_features, **kwargs)
 
-        def set_qfr_attridx(qgs_feature_request, provider):
-            """
-            Internal function to set the attribute indexes for the feature request
-            """
-            if qgis_feature_request.flags() & QgsFeatureRequest.SubsetOfAttributes:
-                attrs = qgis_feature_request.subsetOfAttributes()
-                for attr_idx in provider.pkAttributeIndexes():
-                    if attr_idx not in attrs:
-                        attrs.append(attr_idx)
-                qgis_feature_request.setSubsetOfAttributes(attrs)
-
-        # Get feature: apply pagination if 'page' parameters is set
-        self.features = get_qgis_features(
-            self.metadata_layer.qgis_layer, qgis_feature_request, **kwargs)
+            # Restore the original subset string, the iterator is already created
+            self.metadata_layer.qgis_layer.setSubsetString(original_subset_string)
+            return response
 
-        # Reproject feature if layer CRS != Project CRS
-        if self.reproject:
+        # 'unique' and 'fformatter' modes need only the field values, not the features
+        unique_mode = 'unique' in self.request_data or 'fformatter' in self.request_data
+
+        # Get feature: apply pagination if 'page' or 'cursor' parameters are set
+        if unique_mode:
+            self.features = []
+        else:
+            try:
+                if simplify_tolerance and VECTOR_SIMPLIFIED_GEOMETRY_CACHE_TTL > 0:
+                    self.features = self.get_simplified_features(qgis_feature_request, simplify_tolerance, **kwargs)
+                else:
+                    self.features = get_qgis_features(
+                        self.metadata_layer.qgis_layer, qgis_feature_request, **kwargs)
+                    for f in self.features:
+                        self.simplify_feature(f)
+            except CursorError as e:
+                raise exceptions.ParseError(e)
+
+        # Cursor for the next page, None if this is the last one
+        next_cursor = None
+        if 'cursor' in kwargs and len(self.features) == int(kwargs['page_size']):
+            next_cursor = encode_cursor(self.metadata_layer.qgis_layer, qgis_feature_request, self.features[-1])
+
+        # Reproject feature if layer CRS != Project CRS and it is not done by QgsFeatureRequest
+        if reproject_features:
             for f in self.features:
                 self.reproject_feature(f)
 
-        ex = QgsJsonExporter(self.metadata_layer.qgis_layer)
-
         # If 'unique' request params is set,
         # api return a list of unique
         # field name sent with 'unique' param.
@@ -523,13 +699,13 @@ class BaseVectorApiView(G3WAPIView):
         # api return a list array [original_field_value, formatted_field_value]
         # field name sent with 'fformatter' param.
         # --------------------------------------
-        # IDEA:     for big data it'll be iterate over features to get unique
-        #           c++ iteration is fast. Instead memory layer with too many features can be a problem.
+        # Unique values are selected by the provider (SELECT DISTINCT) when possible,
+        # see get_unique_values().
         #
         # Get parameter from GET or POST requests
 
 
-        if ('unique' in self.request_data or 'fformatter' in self.request_data):
+        if unique_mode:
 
             uniques = None
 
@@ -540,7 +716,6 @@ class BaseVectorApiView(G3WAPIView):
             qfield = self.metadata_layer.qgis_layer.fields()[qfieldidx]
             r_qfieldidx = qfieldidx
             qlayer = self.metadata_layer.qgis_layer
-            qfeatures = self.features
 
             # Get QgsFieldFormatter
             if 'fformatter' in self.request_data:
@@ -573,6 +748,9 @@ class BaseVectorApiView(G3WAPIView):
                         req = HttpRequest()
                         req.method = 'GET'
                         req.user = request.user
+
+                        # Host of the main request, used by the response cache key and media URLs
+                        req.META['HTTP_HOST'] = request.get_host()
                         req.resolver_match = resolve(url)
                         req.GET['unique'] = r_pvalue
 
@@ -591,25 +769,14 @@ class BaseVectorApiView(G3WAPIView):
 
 
             if not uniques:
-
-                vl = QgsVectorLayer(QgsWkbTypes.displayString(self.metadata_layer.qgis_layer.wkbType()),
-                                    "temporary_vector", "memory")
-                pr = vl.dataProvider()
-
-                # add fields
-                pr.addAttributes(self.metadata_layer.qgis_layer.fields())
-                vl.updateFields()  # tell the vector layer to fetch changes from the provider
-
-                res = pr.addFeatures(self.features)
-
-                uniques = vl.uniqueValues(qfieldidx)
+                uniques = self.get_unique_values(pvalue, qgis_feature_request)
 
             values = []
             for u in uniques:
                 try:
                     if u:
                         if 'unique' in self.request_data:
-                            values.append(json.loads(QgsJsonUtils.encodeValue(u)))
+                            values.append(encode_value(u))
                         else:
                             fvalue = qfformatter.representValue(
                                 self.metadata_layer.qgis_layer,
@@ -633,7 +800,7 @@ class BaseVectorApiView(G3WAPIView):
                                     to_append = True
 
                             if to_append:
-                                values.append([json.loads(QgsJsonUtils.encodeValue(u)), fvalue])
+                                values.append([encode_value(u), fvalue])
                 except Exception as e:
                     logger.error(f'Response vector widget unique: {e}')
                     continue
@@ -652,22 +819,8 @@ class BaseVectorApiView(G3WAPIView):
                 'count': len(values)
             })
 
-            try:
-                del(vl)
-            except:
-                pass
-
         else:
 
-            ex.setTransformGeometries(False)
-
-            # Search for fields date datetime and time
-            date_fields = []
-            for f in self.metadata_layer.qgis_layer.fields():
-                if f.typeName().lower() in ('date', 'datetime', 'time', 'timestamp'):
-                    date_fields.append(f)
-
-
             # check for formatter query url param and check if != 0
             export_features = False
             formatter = str(self.request_data.get('formatter', request.data.get('formatter')))
@@ -675,99 +828,551 @@ class BaseVectorApiView(G3WAPIView):
                 if formatter.isnumeric() and int(formatter) == 1:
                     export_features = True
 
-            if export_features:
-                feature_collection = json.loads(
-                    ex.exportFeatures(self.features))
+            # Features are written as JSON bytes, copied into the response body by RawJSONRenderer
+            feature_json = self.get_feature_json_writer(visiblefields, export_features=export_features)
+            feature_collection = RawJSON(b''.join((
+                b'{"type":"FeatureCollection","features":[',
+                b','.join(feature_json(f) for f in self.features),
+                b']}'
+            )))
+
+            api_vector_data = {
+                'data': feature_collection,
+                'count': count_qgis_features(self.metadata_layer.qgis_layer, qgis_feature_request,
+                                             approximate=self.is_approx_count_request(), **kwargs),
+                'geometryType': self.metadata_layer.geometry_type
+            }
+
+            if 'cursor' in kwargs:
+                api_vector_data['next'] = next_cursor
+
+            # Case with 'autofilter' parameter: get every id from qgis_feature_request
+            # ------------------------------------------------------------------------
+            if 'autofilter' in self.request_data and str(self.request_data['autofilter']) == '1':
+                self.set_total_feature_ids(qgis_feature_request, **kwargs)
+
+
+            self.results.update(APIVectorLayerStructure(**api_vector_data).as_dict())
+
+            # FIXME: add extra fields data by signals and receivers
+            # FIXME: featurecollection = post_serialize_maplayer.send(layer_serializer, layer=self.layer_name)
+            # FIXME: Not sure how to map this to the new QGIS API
+
+        # Restore the original subset string
+        self.metadata_layer.qgis_layer.setSubsetString(original_subset_string)
+
+    def get_unique_values(self, field_name, qgis_feature_request):
+        """
+        Returns the unique values of a field for the features matching qgis_feature_request.
+        'unique_limit' request param limits the number of values returned by 'unique' mode, values
+        are filtered by prefix with the 'suggest' request param (field|value) when it is set for
+        the same field, or with the 'unique_prefix' request param.
+        Values are cached for VECTOR_UNIQUE_VALUES_CACHE_TTL seconds, cache is invalidated by layer data changes.
+        :param field_name: field name
+        :param qgis_feature_request: QgsFeatureRequest instance with filters applied
+        :return: list of values
+        """
+
+        limit = prefix = None
+        if 'unique' in self.request_data:
+            prefix = self.request_data.get('unique_prefix') or None
+            if not prefix and self.request_data.get('suggest'):
+                s_field, s_value = self.request_data.get('suggest').split('|')
+                if s_field == field_name:
+                    prefix = s_value or None
+            try:
+                limit = int(self.request_data['unique_limit']) if 'unique_limit' in self.request_data else None
+            except ValueError:
+                raise exceptions.ParseError(_('unique_limit parameter must be an integer'))
+
+        qgis_layer = self.metadata_layer.qgis_layer
+
+        if VECTOR_UNIQUE_VALUES_CACHE_TTL <= 0:
+            return get_qgis_unique_values(qgis_layer, field_name, qgis_feature_request, limit=limit, prefix=prefix)
+
+        # The key contains every filter applied to the request, user constraints included
+        key_data = json.dumps([
+            field_name,
+            limit,
+            prefix,
+            qgis_layer.subsetString(),
+            qgis_feature_request.filterExpression().expression() if qgis_feature_request.filterExpression() else None,
+            qgis_feature_request.filterRect().toString(),
+            qgis_feature_request.filterFid(),
+            sorted(qgis_feature_request.filterFids())
+        ])
+        cache_key = 'vector_unique_{}_{}_{}'.format(
+            self.layer.pk, self.layer.data_version, hashlib.md5(key_data.encode('utf-8')).hexdigest())
+
+        values = cache.get(cache_key)
+        if values is None:
+            values = get_qgis_unique_values(qgis_layer, field_name, qgis_feature_request, limit=limit, prefix=prefix)
+            cache.set(cache_key, values, VECTOR_UNIQUE_VALUES_CACHE_TTL)
+
+        return values
+
+    def get_simplification(self):
+        """
+        Return the simplification tolerance of geometries (layer CRS units) and the number of decimals
+        of coordinates for the client map resolution, from request params:
+
+        `resolution`: map units (project CRS) per pixel
+        `map_scale`: map scale denominator, with optional `dpi` (default 96)
+        `quantize`: 1 to round coordinates to the resolution
+
+        The tolerance is rounded down to a power of 2, so near resolutions share the cached geometries.
+
+        :return: tuple (tolerance, precision), (None, None) when no simplification is requested
+        """
+
+        try:
+            if 'resolution' in self.request_data:
+                resolution = float(self.request_data['resolution'])
+            elif 'map_scale' in self.request_data:
+                project_crs = QgsCoordinateReferenceSystem(f'EPSG:{self.layer.project.group.srid.auth_srid}')
+                meters_per_unit = QgsUnitTypes.fromUnitToUnitFactor(project_crs.mapUnits(),
+                                                                    QgsUnitTypes.DistanceMeters)
+                dpi = float(self.request_data.get('dpi', 96))
+                resolution = float(self.request_data['map_scale']) * 0.0254 / dpi / meters_per_unit
             else:
+                return None, None
+        except (ValueError, ZeroDivisionError):
+            raise exceptions.ParseError(_('resolution, map_scale and dpi parameters must be positive numbers'))
 
-                # to exclude QgsFormater used into QgsJsonExporter is necessary build by hand single json feature
-                ex.setIncludeAttributes(False)
+        if not math.isfinite(resolution) or resolution <= 0:
+            raise exceptions.ParseError(_('resolution, map_scale and dpi parameters must be positive numbers'))
 
-                feature_collection = {
-                    'type': 'FeatureCollection',
-                    'features': []
-                }
+        precision = None
+        if str(self.request_data.get('quantize')) == '1':
+            precision = min(17, max(0, math.ceil(-math.log10(resolution))))
 
-                for feature in self.features:
-                    fnames = []
-                    for f in feature.fields():
-                        fnames.append(f.name())
+        # From project CRS to layer CRS units, at the center of the layer
+        tolerance = resolution
+        if self.reproject:
+            try:
+                center = self.coordinate_transform(self.layer.srid, self.layer.project.group.srid.auth_srid) \
+                    .transform(self.metadata_layer.qgis_layer.extent().center())
+                rect = self.coordinate_transform(self.layer.project.group.srid.auth_srid, self.layer.srid) \
+                    .transformBoundingBox(QgsRectangle(center.x(), center.y(),
+                                                       center.x() + resolution, center.y() + resolution))
+                tolerance = max(rect.width(), rect.height())
+            except QgsCsException as e:
+                logger.warning(f'[VECTOR API] Simplification tolerance of layer {self.layer.pk}: {e}')
+                return None, precision
+
+        if tolerance <= 0:
+            return None, precision
+
+        return 2 ** math.floor(math.log2(tolerance)), precision
+
+    def set_simplify_method(self, qgis_feature_request, tolerance):
+        """
+        Set a topology preserving simplification of geometries:
+        the simplification is executed by the provider when it is supported (PostGIS ST_SimplifyPreserveTopology),
+        otherwise geometries are simplified by self.local_simplifier, see simplify_feature().
 
-                    jsonfeature = json.loads(ex.exportFeature(feature, dict(zip(fnames, feature.attributes()))))
+        :param qgis_feature_request: QgsFeatureRequest instance
+        :param tolerance: simplification tolerance in layer CRS units
+        """
 
-                    feature_collection['features'].append(jsonfeature)
+        provider = self.metadata_layer.qgis_layer.dataProvider()
+        if provider.capabilities() & QgsVectorDataProvider.SimplifyGeometriesWithTopologicalValidation:
+            simplify_method = QgsSimplifyMethod()
+            simplify_method.setMethodType(QgsSimplifyMethod.PreserveTopology)
+            simplify_method.setTolerance(tolerance)
+            qgis_feature_request.setSimplifyMethod(simplify_method)
+        else:
+            self.local_simplifier = QgsTopologyPreservingSimplifier(tolerance)
 
-            # Update date and datetime fields value if widget is active
-            if len(date_fields) > 0:
-                for jfeature in feature_collection['features']:
-                    feature = self.metadata_layer.qgis_layer.getFeature(jfeature['id'])
-                    for f in date_fields:
-                        field_idx = self.metadata_layer.qgis_layer.fields().indexFromName(f.name())
-                        options = self.metadata_layer.qgis_layer.editorWidgetSetup(field_idx).config()
-                        if 'field_iso_format' in options:
-                            try:
-
-                                # Formatter 0
-                                if export_features:
-                                    jfeature['properties'][f.name()] = feature.attribute(f.name()) \
-                                        .toString(options['display_format'])
-                                else:
-                                    if not options['field_iso_format']:
-                                        jfeature['properties'][f.name()] = feature.attribute(f.name()) \
-                                            .toString(options['field_format'])
-
-                            except:
-                                pass
+    def simplify_feature(self, feature):
+        """
+        Simplify the feature geometry with self.local_simplifier, if set.
+        Geometries must be in the layer CRS, see check_destination_crs().
+
+        :param feature: QgsFeature instance
+        """
 
+        if self.local_simplifier is not None and feature.hasGeometry():
+            feature.setGeometry(self.local_simplifier.simplify(feature.geometry()))
+
+    def get_simplified_features(self, qgis_feature_request, tolerance, **kwargs):
+        """
+        Return the features with simplified geometries, geometries are cached by layer data version
+        and tolerance for VECTOR_SIMPLIFIED_GEOMETRY_CACHE_TTL seconds:
+        features are read without geometry and only the geometries not in cache are read and simplified.
+
+        :param qgis_feature_request: QgsFeatureRequest instance with filters and simplify method applied
+                                     (or local_simplifier set)
+        :param tolerance: simplification tolerance in layer CRS units
+        :param kwargs: get_qgis_features kwargs (pagination)
+        :return: list of QgsFeature
+        """
+
+        qgis_layer = self.metadata_layer.qgis_layer
+
+        features_request = QgsFeatureRequest(qgis_feature_request)
+        features_request.setFlags(features_request.flags() | QgsFeatureRequest.NoGeometry)
+        features = get_qgis_features(qgis_layer, features_request, **kwargs)
+        if not features:
+            return features
+
+        destination_crs = qgis_feature_request.destinationCrs()
+        key_prefix = 'vector_geom_{}_{}_{}_{}_'.format(
+            self.layer.pk, self.layer.data_version, repr(tolerance),
+            destination_crs.authid() if destination_crs.isValid() else '')
+
+        cached = cache.get_many([f'{key_prefix}{f.id()}' for f in features])
+        geometries = {}
+        for f in features:
+            wkb = cached.get(f'{key_prefix}{f.id()}')
+            if wkb is not None:
+                geometry = QgsGeometry()
+                if wkb:
+                    geometry.fromWkb(wkb)
+                geometries[f.id()] = geometry
+
+        missing = [f.id() for f in features if f.id() not in geometries]
+        if missing:
+            geometries_request = QgsFeatureRequest(qgis_feature_request)
+            geometries_request.setFilterFids(missing)
+            geometries_request.setFilterRect(QgsRectangle())
+            geometries_request.setOrderBy(QgsFeatureRequest.OrderBy())
+            geometries_request.setLimit(-1)
+            geometries_request.setNoAttributes()
+
+            to_cache = {}
+            for f in qgis_layer.getFeatures(geometries_request):
+                self.simplify_feature(f)
+                geometries[f.id()] = f.geometry()
+                to_cache[f'{key_prefix}{f.id()}'] = bytes(f.geometry().asWkb()) if f.hasGeometry() else b''
+            cache.set_many(to_cache, VECTOR_SIMPLIFIED_GEOMETRY_CACHE_TTL)
+
+        for f in features:
+            if f.id() in geometries:
+                f.setGeometry(geometries[f.id()])
+
+        return features
+
+    def set_total_feature_ids(self, qgis_feature_request, **kwargs):
+        """
+        Set self.total_feature_ids with the server FIDs of every feature matching qgis_feature_request,
+        used by 'autofilter' parameter.
+        Only ids are read (pushed down to the provider as a SELECT of the primary key when possible).
+        Over VECTOR_FEATURE_IDS_TOKEN_THRESHOLD ids, the ids are stored in the cache backend and
+        self.total_feature_ids_token ('fidstoken' in response) is set to the token to retrieve them.
+        :param qgis_feature_request: QgsFeatureRequest instance with filters applied
+        :param kwargs: get_qgis_features kwargs, pagination is ignored
+        """
+
+        # Remove pagination
+        for k in ('page', 'page_size', 'cursor'):
+            if k in kwargs:
+                del(kwargs[k])
+
+        self.total_feature_ids = get_qgis_feature_ids(
+            self.metadata_layer.qgis_layer, qgis_feature_request, **kwargs)
+
+        self.total_feature_ids_token = None
+        if len(self.total_feature_ids) > VECTOR_FEATURE_IDS_TOKEN_THRESHOLD:
+            self.total_feature_ids_token = cache_feature_ids(self.layer.pk, self.total_feature_ids)
+            self.results.update({'fidstoken': self.total_feature_ids_token})
+
+    def get_formatting_plan(self, layer=None, qgis_layer=None):
+        """
+        Return the date/time fields formatting plan of the layer, cached per layer, style and project version
+        :param layer: optional, layer model instance, default self.layer
+        :param qgis_layer: optional, QGIS layer of the layer, default self.metadata_layer.qgis_layer
+        :return: FieldFormattingPlan
+        """
+
+        layer = layer or self.layer
+        qgis_layer = qgis_layer or self.metadata_layer.qgis_layer
+
+        return FieldFormattingPlan.for_layer(qgis_layer, (layer.pk, layer.project.modified.isoformat()))
+
+    def get_feature_json_writer(self, visiblefields=None, reproject_features=False, export_features=False):
+        """
+        Return a function writing the GeoJSON feature of data mode responses as JSON bytes:
+        date/time fields formatted, media values, server feature id and only the fields visible for the user.
+
+        Features are written straight to bytes by GeoJSONFeatureSerializer.feature_bytes() when values
+        don't have to be changed (no formatting plan and no media fields), through a GeoJSON dict otherwise.
+
+        :param visiblefields: list of fields visible for the user, None for all fields
+        :param reproject_features: True to reproject features one by one
+        :param export_features: True to format values with QgsJsonExporter (formatter=1 request param)
+        :return: function feature -> bytes
+        """
+
+        qgis_layer = self.metadata_layer.qgis_layer
+        provider = qgis_layer.dataProvider()
+
+        # Formatting of date, datetime and time fields
+        formatting_plan = self.get_formatting_plan()
+
+        edittypes = self.layer.get_edittypes() if self.layer.edittypes else {}
+        has_media = any(data['widgetv2type'] == 'ExternalResource' for data in edittypes.values())
+
+        if export_features:
+            ex = QgsJsonExporter(qgis_layer, self.geometry_precision)
+            ex.setTransformGeometries(False)
+        else:
+            serializer = GeoJSONFeatureSerializer(qgis_layer.fields(), attributes=visiblefields or None,
+                                                  precision=self.geometry_precision)
+
+        def feature_json(feature):
+
+            if reproject_features:
+                self.reproject_feature(feature)
+
+            if not export_features and not formatting_plan and not has_media:
+                return serializer.feature_bytes(feature, fid=server_fid(feature, provider))
+
+            if export_features:
+                jfeature = json.loads(ex.exportFeature(feature))
+            else:
+                jfeature = serializer.feature(feature)
+
+            # Update date and datetime fields value if widget is active
+            if formatting_plan:
+                formatting_plan.apply(feature, jfeature, formatted=export_features)
 
             # Change media
-            self.change_media(feature_collection)
+            UserMediaHandler(layer=self.layer, feature=jfeature).new_value(change=True)
 
             # Patch feature IDs with server featureIDs
-            fids_map = {}
-            for f in self.features:
-                fids_map[f.id()] = server_fid(f, provider)
+            jfeature['id'] = server_fid(feature, provider)
 
-            for i in range(len(feature_collection['features'])):
-                f = feature_collection['features'][i]
-                f['id'] = fids_map[f['id']]
+            if visiblefields:
+                jfeature['properties'] = {k: v for k, v in jfeature['properties'].items() if k in visiblefields}
 
-                if visiblefields:
-                    f['properties'] = {k: f['properties'][k] for k in f['properties'] if k in visiblefields}
-            api_vector_data = {
-                'data': feature_collection,
-                'count': count_qgis_features(self.metadata_layer.qgis_layer, qgis_feature_request, **kwargs),
-                'geometryType': self.metadata_layer.geometry_type
-            }
+            return geojson_dumps(jfeature)
 
-            # Case with 'autofilter' parameter: get every id from qgis_feature_request
-            # ------------------------------------------------------------------------
-            if 'autofilter' in self.request_data and str(self.request_data['autofilter']) == '1':
+        return feature_json
 
-                    # Remove pagination
-                    for k in ('page', 'page_size'):
-                        if k in kwargs:
-                            del(kwargs[k])
+    def is_stream_request(self):
+        """
+        Check if the data have to be returned as a streamed GeoJSON:
+        'stream' request param set to 1 and no 'unique' or 'fformatter' params.
+        :return: bool
+        """
 
-                    # Reset limit
-                    if qgis_feature_request.limit() != -1:
-                        qgis_feature_request = QgsFeatureRequest(qgis_feature_request)
-                        qgis_feature_request.setLimit(-1)
+        return ('stream' in self.request_data
+                and str(self.request_data['stream']) == '1'
+                and 'unique' not in self.request_data
+                and 'fformatter' not in self.request_data)
 
-                        set_qfr_attridx(qgis_feature_request, provider)
+    def is_approx_count_request(self):
+        """
+        Check if the features count can be a provider planner estimate:
+        'approx_count' request param set to 1.
+        :return: bool
+        """
 
-                    self.total_feature_ids = [str(server_fid(f, provider)) for f in get_qgis_features(
-                        self.metadata_layer.qgis_layer, qgis_feature_request, **kwargs)]
+        return 'approx_count' in self.request_data and str(self.request_data['approx_count']) == '1'
 
+    def response_data_stream(self, request, qgis_feature_request, visiblefields=None, reproject_features=False,
+                             **kwargs):
+        """
+        Return a StreamingHttpResponse with the same structure of data mode response:
+        every feature is read from the live QgsFeatureIterator and written to the response,
+        so the memory usage doesn't depend on the number of features.
 
-            self.results.update(APIVectorLayerStructure(**api_vector_data).as_dict())
+        :param request: DjangoREST API request object
+        :param qgis_feature_request: QgsFeatureRequest instance with filters applied
+        :param visiblefields: list of fields visible for the user, None for all fields
+        :param reproject_features: True to reproject features one by one
+        :param kwargs: get_qgis_features kwargs (pagination)
+        :return: StreamingHttpResponse
+        """
 
-            # FIXME: add extra fields data by signals and receivers
-            # FIXME: featurecollection = post_serialize_maplayer.send(layer_serializer, layer=self.layer_name)
-            # FIXME: Not sure how to map this to the new QGIS API
+        qgis_layer = self.metadata_layer.qgis_layer
 
-        # Restore the original subset string
-        self.metadata_layer.qgis_layer.setSubsetString(original_subset_string)
+        # Check for formatter query url param
+        formatter = str(self.request_data.get('formatter', request.data.get('formatter')))
+        export_features = formatter.isnumeric() and int(formatter) == 1
+
+        # Create the iterator now: it works on a snapshot of the layer with the filters applied
+        features_request = QgsFeatureRequest(qgis_feature_request)
+        try:
+            features = iter_qgis_features(qgis_layer, features_request, **kwargs)
+        except CursorError as e:
+            raise exceptions.ParseError(e)
+
+        # Build the response envelope, features are written in place of the placeholder
+        api_vector_data = {
+            'data': {
+                'type': 'FeatureCollection',
+                'features': STREAM_FEATURES_PLACEHOLDER
+            },
+            'count': count_qgis_features(qgis_layer, QgsFeatureRequest(qgis_feature_request),
+                                         approximate=self.is_approx_count_request(), **kwargs),
+            'geometryType': self.metadata_layer.geometry_type
+        }
+
+        if 'cursor' in kwargs:
+            api_vector_data['next'] = STREAM_NEXT_CURSOR_PLACEHOLDER
+
+        self.results.update(APIVectorLayerStructure(**api_vector_data).as_dict())
+
+        if 'autofilter' in self.request_data and str(self.request_data['autofilter']) == '1':
+            self.set_total_feature_ids(QgsFeatureRequest(qgis_feature_request), **kwargs)
+
+        self.add_extra_response_data()
+
+        head, tail = json.dumps(self.results.results, cls=JSONEncoder).split(
+            json.dumps(STREAM_FEATURES_PLACEHOLDER))
+
+        feature_json = self.get_feature_json_writer(visiblefields, reproject_features=reproject_features,
+                                                    export_features=export_features)
+
+        def stream():
+            chunk = [head.encode('utf-8'), b'[']
+            chunk_size = 0
+            separator = b''
+            nfeatures = 0
+            feature = None
+            for feature in features:
+                nfeatures += 1
+                self.simplify_feature(feature)
+                jfeature = feature_json(feature)
+                chunk.extend((separator, jfeature))
+                chunk_size += len(jfeature)
+                separator = b','
+                if chunk_size >= STREAM_CHUNK_SIZE:
+                    yield b''.join(chunk)
+                    chunk = []
+                    chunk_size = 0
+
+            # Cursor for the next page, null if this is the last one
+            next_cursor = None
+            if 'cursor' in kwargs and nfeatures == int(kwargs['page_size']):
+                next_cursor = encode_cursor(qgis_layer, features_request, feature)
+
+            tail_data = tail.replace(json.dumps(STREAM_NEXT_CURSOR_PLACEHOLDER), json.dumps(next_cursor))
+            chunk.extend((b']', tail_data.encode('utf-8')))
+            yield b''.join(chunk)
+
+        return StreamingHttpResponse(stream(), content_type='application/json')
+
+    def get_extra_response_data(self):
+        """
+        Return the extra data returned by before_return_vector_data_layer receivers
+        :return: dict
+        """
+
+        extra = {}
+        extra_data = before_return_vector_data_layer.send(self)
+        for ed in extra_data:
+            if ed[1] and ed[0].__name__ in ('add_constraints', 'add_atomic_capabilities', 'add_filter_token'):
+                extra.update(ed[1])
+
+        return extra
+
+    def add_extra_response_data(self):
+        """
+        Add to results the extra data returned by before_return_vector_data_layer receivers
+        """
+
+        self.results.results.update(self.get_extra_response_data())
+
+    def get_acl_fingerprint(self, request):
+        """
+        Method to implement in child class: return a string that changes with the user's effective
+        constraints and visible fields on the layer, it's part of the response cache key.
+        :param request: API request object
+        :return: str
+        """
+
+        return str(request.user.pk)
+
+    def get_response_cache_key(self, request):
+        """
+        Return the cache key of the response, None if the response cannot be cached.
+        Only GET requests of cacheable_modes_call modes are cached, streamed and 'autofilter' requests are not.
+
+        The key combines the normalized request parameters, the layer data version
+        (see qdjango Layer.data_version) and the user's ACL fingerprint.
+
+        :param request: API request object
+        :return: str, None
+        """
+
+        if (VECTOR_RESPONSE_CACHE_TTL <= 0
+                or request.method != 'GET'
+                or self.mode_call not in self.cacheable_modes_call
+                or str(self.request_data.get('autofilter')) == '1'
+                or (self.mode_call == MODE_DATA and self.is_stream_request())):
+            return None
+
+        key_data = json.dumps([
+            self.__class__.__name__,
+            # URL kwargs: mode, layer, tile coordinates...
+            sorted((k, str(v)) for k, v in self.kwargs.items()),
+            self.layer.project.modified.isoformat(),
+            # Media URLs contain the request domain
+            request.get_host(),
+            request.is_secure(),
+            sorted((k, self.request_data.getlist(k)) for k in self.request_data.keys()),
+            self.get_acl_fingerprint(request)
+        ])
+
+        return 'vector_response_{}_{}_{}'.format(
+            self.layer.pk, self.layer.data_version, hashlib.md5(key_data.encode('utf-8')).hexdigest())
+
+    def get_cached_response(self, request, cache_key):
+        """
+        Return the response, results are read from and stored into the cache.
+        ETag and Last-Modified headers are set, with a matching 'If-None-Match' header
+        a 304 response is returned without querying the layer.
+
+        :param request: API request object
+        :param cache_key: key returned by get_response_cache_key()
+        :return: Response
+        """
+
+        # Extra data depend on user permissions: they are not cached but they are part of the ETag
+        extra = self.get_extra_response_data()
+        etag = '"{}"'.format(hashlib.md5(
+            (cache_key + json.dumps(extra, sort_keys=True, cls=JSONEncoder)).encode('utf-8')).hexdigest())
+
+        # Data version is the time (ns) of the last data change
+        last_modified = self.layer.data_version / 1e9 or self.layer.project.modified.timestamp()
+
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            cached = cache.get(cache_key)
+            if cached is None:
+                response = self.get_response_data(request)
+
+                # Binary responses (i.e. vector tiles) are cached as (content, content type)
+                if response is not None:
+                    if type(response) != HttpResponse or response.status_code != 200:
+                        return response
+                    cached = (response.content, response['Content-Type'])
+                else:
+                    cached = self.results.results
+
+                try:
+                    cache.set(cache_key, cached, VECTOR_RESPONSE_CACHE_TTL)
+                except Exception as e:
+                    logger.warning(f'[VECTOR API] Response of layer {self.layer.pk} not cached: {e}')
+
+            if isinstance(cached, tuple):
+                response = HttpResponse(cached[0], content_type=cached[1])
+            else:
+                self.results.results = cached
+                self.results.update(extra)
+                response = Response(self.results.results)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+
+        # Responses depend on the user: browsers have to revalidate them
+        patch_cache_control(response, private=True, no_cache=True)
+
+        return response
 
     def set_reprojecting_status(self):
         """
@@ -841,7 +1446,11 @@ class BaseVectorApiView(G3WAPIView):
             self.metadata_layer.qgis_layer.styleManager().setCurrentStyle(self.style)
 
         # get results
-        response = self.get_response_data(request)
+        cache_key = self.get_response_cache_key(request)
+        if cache_key:
+            response = self.get_cached_response(request, cache_key)
+        else:
+            response = self.get_response_data(request)
 
         # Reset style
         try:
@@ -853,10 +1462,7 @@ class BaseVectorApiView(G3WAPIView):
         if response is None:
 
             # before to send response
-            extra_data = before_return_vector_data_layer.send(self)
-            for ed in extra_data:
-                if ed[1] and ed[0].__name__ in ('add_constraints', 'add_atomic_capabilities', 'add_filter_token'):
-                    self.results.results.update(ed[1])
+            self.add_extra_response_data()
 
             # response a APIVectorLayer
             return Response(self.results.results)
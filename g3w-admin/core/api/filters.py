@@ -25,6 +25,7 @@ from qgis.core import (
 from rest_framework.exceptions import ParseError
 from urllib.parse import unquote
 from core.utils.qgisapi import get_qgis_layer, get_qgis_features
+from core.utils.searchindex import search_prefilter
 from qdjango.models import Layer
 import re
 
@@ -79,7 +80,8 @@ class BaseFilterBackend():
 
 
 class SearchFilter(BaseFilterBackend):
-    """A filter backend that does an ILIKE string search in all fields"""
+    """A filter backend that does an ILIKE string search in all fields,
+    prefiltered by the layer search index when one exists (see core.utils.searchindex)"""
 
     def apply_filter(self, request, metadata_layer, qgis_feature_request, view):
 
@@ -95,6 +97,7 @@ class SearchFilter(BaseFilterBackend):
         if search_value:
 
             search_parts = []
+            field_names = [f.name() for f in qgis_layer.fields() if self._is_valid_field(qgis_layer, f.name(), view)]
 
             for search_term in search_value.split(','):
 
@@ -102,12 +105,9 @@ class SearchFilter(BaseFilterBackend):
                 exp_template = '{field_name} ILIKE ' + search_term
                 exp_parts = []
 
-                for f in qgis_layer.fields():
-
-                    if not self._is_valid_field(qgis_layer, f.name(), view):
-                        continue
+                for field_name in field_names:
                     exp_parts.append(exp_template.format(
-                        field_name=self._quote_identifier(f.name())))
+                        field_name=self._quote_identifier(field_name)))
 
                 if exp_parts:
                     search_parts.append(' OR '.join(exp_parts))
@@ -117,6 +117,15 @@ class SearchFilter(BaseFilterBackend):
                 search_expression = '(' + ' AND '.join(search_parts) + ')'
                 qgis_feature_request.combineFilterExpression(search_expression)
 
+                # Provider side prefilter by the layer search index, if any
+                prefilter = search_prefilter(qgis_layer, search_value.split(','), field_names)
+                if prefilter:
+                    original_subset_string = qgis_layer.subsetString()
+                    if original_subset_string:
+                        qgis_layer.setSubsetString(f'({original_subset_string}) AND ({prefilter})')
+                    else:
+                        qgis_layer.setSubsetString(prefilter)
+
 
 class OrderingFilter(BaseFilterBackend):
     """A filter backend that defines ordering"""
@@ -203,7 +212,8 @@ class IntersectsBBoxFilter(BaseFilterBackend):
                 raise NotImplementedError(
                     'IntersectsBBoxFilter within operator not yet implemented')
 
-            if hasattr(view, 'reproject') and view.reproject:
+            # With a destination CRS the filter rect is in the destination (project) CRS
+            if hasattr(view, 'reproject') and view.reproject and not qgis_feature_request.destinationCrs().isValid():
                 from_srid = view.layer.project.group.srid.auth_srid
                 to_srid = view.layer.srid
                 ct = QgsCoordinateTransform(QgsCoordinateReferenceSystem(
@@ -0,0 +1,51 @@
+# coding=utf-8
+""""DjangoREST renderers for G3W-ADMIN API views.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+from rest_framework.renderers import JSONRenderer
+
+# Written by the encoder in place of RawJSON values, replaced by their bytes
+RAW_JSON_PLACEHOLDER = '__G3W_RAW_JSON_{}__'
+
+
+class RawJSON(bytes):
+    """
+    JSON bytes already serialized (i.e. by core.utils.geojson.GeoJSONFeatureSerializer),
+    written as they are into the response body by RawJSONRenderer.
+    """
+    pass
+
+
+class RawJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer for response data containing RawJSON values: their bytes are copied
+    into the rendered JSON without being decoded and encoded again.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+
+        raw = []
+
+        class RawJSONEncoder(self.encoder_class):
+
+            def default(self, obj):
+                if isinstance(obj, RawJSON):
+                    raw.append(obj)
+                    return RAW_JSON_PLACEHOLDER.format(len(raw) - 1)
+                return super().default(obj)
+
+        renderer = JSONRenderer()
+        renderer.encoder_class = RawJSONEncoder
+        ret = renderer.render(data, accepted_media_type, renderer_context)
+
+        for i, value in enumerate(raw):
+            ret = ret.replace('"{}"'.format(RAW_JSON_PLACEHOLDER.format(i)).encode('utf-8'), value, 1)
+
+        return ret
@@ -34,19 +34,26 @@ urlpatterns = [
     # Vector data API management
     #############################################################
     re_path(
-        r'^' + settings.VECTOR_URL[1:] + r'(?P<mode_call>data|config|shp|xls|gpkg|gpx|csv|filtertoken|featurecount|editorformstructure)/(?P<project_type>[-_\w\d]+)/(?P<project_id>[0-9]+)/'
+        r'^' + settings.VECTOR_URL[1:] + r'(?P<mode_call>data|config|shp|xls|gpkg|gpx|csv|fgb|arrow|filtertoken|featurecount|editorformstructure)/(?P<project_type>[-_\w\d]+)/(?P<project_id>[0-9]+)/'
         r'(?P<layer_name>[-_\w\d]+)/$',
         layer_vector_view,
         name='core-vector-api'
     ),
 
     re_path(
-        r'^' + settings.VECTOR_URL[1:] + r'(?P<mode_call>shp|xls|gpx|csv|gpkg)/(?P<project_type>[-_\w\d]+)/(?P<project_id>[0-9]+)/'
-        r'(?P<layer_name>[-_\w\d]+).(?P<ext>zip|xls|gpx|csv|gpkg)$',
+        r'^' + settings.VECTOR_URL[1:] + r'(?P<mode_call>shp|xls|gpx|csv|gpkg|fgb|arrow)/(?P<project_type>[-_\w\d]+)/(?P<project_id>[0-9]+)/'
+        r'(?P<layer_name>[-_\w\d]+).(?P<ext>zip|xls|gpx|csv|gpkg|fgb|arrows)$',
         layer_vector_view,
         name='core-vector-api-ext'
     ),
 
+    re_path(
+        r'^' + settings.VECTOR_URL[1:] + r'(?P<mode_call>mvt)/(?P<project_type>[-_\w\d]+)/(?P<project_id>[0-9]+)/'
+        r'(?P<layer_name>[-_\w\d]+)/(?P<z>[0-9]+)/(?P<x>[0-9]+)/(?P<y>[0-9]+).pbf$',
+        layer_vector_view,
+        name='core-vector-api-mvt'
+    ),
+
     re_path(
         r'^' + settings.VECTOR_URL[1:] + r'(?P<mode_call>widget)/(?P<widget_type>[-_\w\d]+)/data/'
         r'(?P<project_type>[-_\w\d]+)/(?P<project_id>[0-9]+)/'
@@ -0,0 +1,143 @@
+# coding=utf-8
+"""
+    Benchmark of GeoJSON features serialization.
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import json
+import math
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from qgis.core import (
+    QgsFeature,
+    QgsField,
+    QgsGeometry,
+    QgsJsonExporter,
+    QgsPointXY,
+    QgsVectorLayer
+)
+from qgis.PyQt.QtCore import QDate, QDateTime, QVariant
+
+from core.utils.geojson import GeoJSONFeatureSerializer, orjson
+from qdjango.models import Layer
+
+
+class Command(BaseCommand):
+    """
+    Compare the GeoJSON serialization of QgsJsonExporter (exportFeature -> json.loads -> json.dumps,
+    the former vector API data path) with core.utils.geojson.GeoJSONFeatureSerializer.
+    """
+
+    help = 'Benchmark GeoJSON serialization of features: QgsJsonExporter round trip vs fast serializer. ' \
+           'Features come from a synthetic memory layer or from a qdjango layer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--features', dest='features', default=10000, type=int,
+                            help='Number of synthetic features')
+        parser.add_argument('--geometry', dest='geometry', default='point',
+                            choices=('point', 'linestring', 'polygon'), help='Synthetic geometry type')
+        parser.add_argument('--vertices', dest='vertices', default=20, type=int,
+                            help='Vertices of synthetic linestrings and polygons')
+        parser.add_argument('--layer', dest='layer', type=int,
+                            help='qdjango Layer pk to use instead of a synthetic layer')
+        parser.add_argument('--repeat', dest='repeat', default=3, type=int,
+                            help='Runs for every serializer, the best one is reported')
+
+    def synthetic_layer(self, nfeatures, geometry, vertices):
+        """Returns a memory layer with nfeatures features and attributes of the common types"""
+
+        qgis_layer = QgsVectorLayer(f'{geometry}?crs=EPSG:4326', 'benchmark', 'memory')
+        provider = qgis_layer.dataProvider()
+        provider.addAttributes([
+            QgsField('id', QVariant.Int),
+            QgsField('name', QVariant.String),
+            QgsField('value', QVariant.Double),
+            QgsField('day', QVariant.Date),
+            QgsField('updated', QVariant.DateTime),
+        ])
+        qgis_layer.updateFields()
+
+        features = []
+        for i in range(nfeatures):
+            x, y = (i % 360) - 180 + 0.123456789, (i % 170) - 85 + 0.987654321
+            if geometry == 'point':
+                geom = QgsGeometry.fromPointXY(QgsPointXY(x, y))
+            else:
+                ring = [QgsPointXY(x + 0.5 * math.cos(2 * math.pi * v / vertices),
+                                   y + 0.5 * math.sin(2 * math.pi * v / vertices)) for v in range(vertices)]
+                if geometry == 'linestring':
+                    geom = QgsGeometry.fromPolylineXY(ring)
+                else:
+                    geom = QgsGeometry.fromPolygonXY([ring + ring[:1]])
+
+            feature = QgsFeature(qgis_layer.fields())
+            feature.setGeometry(geom)
+            feature.setAttributes([i, f'feature {i}', i / 7, QDate(2020, 1, 1).addDays(i % 365),
+                                   QDateTime(QDate(2020, 1, 1).addDays(i % 365))])
+            features.append(feature)
+
+        provider.addFeatures(features)
+        return qgis_layer
+
+    def handle(self, *args, **options):
+
+        if options['layer']:
+            try:
+                qgis_layer = Layer.objects.get(pk=options['layer']).qgis_layer
+            except Layer.DoesNotExist:
+                raise CommandError(f'Layer {options["layer"]} does not exist')
+            if not isinstance(qgis_layer, QgsVectorLayer):
+                raise CommandError(f'Layer {options["layer"]} is not a vector layer')
+        else:
+            qgis_layer = self.synthetic_layer(options['features'], options['geometry'], options['vertices'])
+
+        features = list(qgis_layer.getFeatures())
+        fnames = qgis_layer.fields().names()
+
+        exporter = QgsJsonExporter(qgis_layer)
+        exporter.setTransformGeometries(False)
+        exporter.setIncludeAttributes(False)
+
+        def exporter_round_trip():
+            return [json.dumps(json.loads(exporter.exportFeature(f, dict(zip(fnames, f.attributes())))))
+                    for f in features]
+
+        serializer = GeoJSONFeatureSerializer(qgis_layer.fields())
+
+        def fast_serializer():
+            return [serializer.feature_bytes(f) for f in features]
+
+        results = {}
+        for name, func in (('QgsJsonExporter round trip', exporter_round_trip),
+                           ('GeoJSONFeatureSerializer', fast_serializer)):
+            timings = []
+            for __ in range(max(1, options['repeat'])):
+                start = time.perf_counter()
+                output = func()
+                timings.append(time.perf_counter() - start)
+            results[name] = (min(timings), output)
+
+        # Check the outputs are equivalent
+        mismatches = 0
+        for exported, serialized in zip(results['QgsJsonExporter round trip'][1], results['GeoJSONFeatureSerializer'][1]):
+            if json.loads(exported) != json.loads(serialized):
+                mismatches += 1
+
+        self.stdout.write(f'Layer: {qgis_layer.name()} - features: {len(features)} - '
+                          f'JSON encoder: {"orjson" if orjson is not None else "json"}')
+        for name, (elapsed, __) in results.items():
+            rate = len(features) / elapsed if elapsed else float('inf')
+            self.stdout.write(f'{name:<30} {elapsed * 1000:10.1f} ms {rate:12.0f} features/s')
+
+        baseline = results['QgsJsonExporter round trip'][0]
+        fast = results['GeoJSONFeatureSerializer'][0]
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {baseline / fast if fast else float("inf"):.2f}x'))
+
+        if mismatches:
+            self.stdout.write(self.style.WARNING(f'Features with different output: {mismatches}'))
@@ -0,0 +1,422 @@
+# coding=utf-8
+"""
+    Benchmark of the vector API on synthetic GeoPackage and SpatiaLite layers.
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import gc
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+from osgeo import gdal, ogr, osr
+from qgis.core import Qgis, QgsCoordinateReferenceSystem, QgsProject, QgsVectorLayer
+
+from base.version import get_version
+from core.api.views import layer_vector_view
+from core.models import Group, G3WSpatialRefSys
+from qdjango.utils.data import QgisProject
+
+# Benchmark cases: name -> (vector API mode, method, parameters)
+BENCHMARK_CASES = {
+    'data': ('data', 'GET', {}),
+    'data_paged': ('data', 'GET', {'page': 1, 'page_size': 100}),
+    'data_paged_deep': ('data', 'GET', {'page': 'middle', 'page_size': 100}),
+    'count': ('featurecount', 'GET', {}),
+    'unique': ('data', 'GET', {'unique': 'category'}),
+    'fformatter': ('data', 'GET', {'fformatter': 'category'}),
+    'bbox': ('data', 'GET', {'in_bbox': '-20,-10,20,10'}),
+    'field': ('data', 'GET', {'field': 'int_value|gt|500000'}),
+    'expression': ('data', 'POST', {'expression': '"real_value" < 0.1 AND "flag" = true'}),
+    'shp': ('shp', 'GET', {}),
+    'gpkg': ('gpkg', 'GET', {}),
+    'xls': ('xls', 'GET', {}),
+    'csv': ('csv', 'GET', {}),
+    'gpx': ('gpx', 'GET', {}),
+}
+
+BENCHMARK_FORMATS = ('gpkg', 'spatialite')
+
+CATEGORIES = [f'category {i}' for i in range(50)]
+
+
+class Command(BaseCommand):
+    """
+    Measure latency and peak memory of vector API requests on synthetic layers with 10k, 100k and 1M
+    point features and attributes of the common types.
+
+    Layers are written once into the data directory and reused by the next runs, the project is
+    loaded into the database inside a transaction rolled back at the end of the benchmark.
+
+    Latency is measured over --repeat runs, memory with one more run: peak of Python allocations (tracemalloc)
+    and growth of the process peak resident memory (C++ allocations of QGIS and GDAL included).
+
+    The JSON report can be compared with the report of another commit with --compare.
+    """
+
+    help = 'Benchmark vector API modes and filters on synthetic GeoPackage and SpatiaLite layers, ' \
+           'emits a JSON report.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', dest='sizes', default='10000,100000,1000000',
+                            help='Comma separated numbers of features of the synthetic layers')
+        parser.add_argument('--formats', dest='formats', default=','.join(BENCHMARK_FORMATS),
+                            help=f'Comma separated formats of the synthetic layers: {", ".join(BENCHMARK_FORMATS)}')
+        parser.add_argument('--cases', dest='cases', default=','.join(BENCHMARK_CASES),
+                            help=f'Comma separated benchmark cases: {", ".join(BENCHMARK_CASES)}')
+        parser.add_argument('--repeat', dest='repeat', default=3, type=int,
+                            help='Runs of every case for latency')
+        parser.add_argument('--data-dir', dest='data_dir',
+                            help='Directory of the synthetic layers, default <DATASOURCE_PATH>/benchmark_vector_api')
+        parser.add_argument('--regenerate', dest='regenerate', action='store_true', default=False,
+                            help='Write again the synthetic layers')
+        parser.add_argument('--user', dest='user',
+                            help='Username of the requests user, default the first superuser')
+        parser.add_argument('--cached', dest='cached', action='store_true', default=False,
+                            help='Keep the vector API caches (responses, unique values, exports) as '
+                                 'configured in settings, disabled by default')
+        parser.add_argument('--output', dest='output',
+                            help='Path of the JSON report, default standard output')
+        parser.add_argument('--compare', dest='compare',
+                            help='Path of a previous JSON report to compare with')
+
+    # Synthetic data
+    # --------------
+
+    def synthetic_layer(self, data_dir, fmt, nfeatures, regenerate=False):
+        """
+        Writes a synthetic points layer, reused if it exists
+
+        :param data_dir: directory of the layer file
+        :param fmt: 'gpkg' or 'spatialite'
+        :param nfeatures: number of features
+        :param regenerate: write the layer also if it exists
+        :return: path of the layer file
+        :rtype: str
+        """
+
+        path = os.path.join(data_dir, f'bench_{nfeatures}.{"gpkg" if fmt == "gpkg" else "sqlite"}')
+        if os.path.exists(path):
+            if not regenerate:
+                return path
+            os.remove(path)
+
+        self.stdout.write(f'Writing {nfeatures} features into {path}')
+
+        if fmt == 'gpkg':
+            ds = ogr.GetDriverByName('GPKG').CreateDataSource(path)
+        else:
+            ds = ogr.GetDriverByName('SQLite').CreateDataSource(path, options=['SPATIALITE=YES'])
+        if ds is None:
+            raise CommandError(f'Cannot create {path}: {gdal.GetLastErrorMsg()}')
+
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(4326)
+        lyr = ds.CreateLayer('bench', srs, ogr.wkbPoint, options=['GEOMETRY_NAME=geom', 'FID=fid'])
+
+        fields = [
+            ('int_value', ogr.OFTInteger, None),
+            ('big_value', ogr.OFTInteger64, None),
+            ('real_value', ogr.OFTReal, None),
+            ('name', ogr.OFTString, None),
+            ('category', ogr.OFTString, None),
+            ('day', ogr.OFTDate, None),
+            ('updated', ogr.OFTDateTime, None),
+            ('flag', ogr.OFTInteger, ogr.OFSTBoolean),
+            ('notes', ogr.OFTString, None),
+        ]
+        for name, ftype, subtype in fields:
+            field = ogr.FieldDefn(name, ftype)
+            if subtype is not None:
+                field.SetSubType(subtype)
+            lyr.CreateField(field)
+
+        # Fixed seed: the same data for every run
+        rnd = random.Random(nfeatures)
+        defn = lyr.GetLayerDefn()
+
+        lyr.StartTransaction()
+        for i in range(nfeatures):
+            feature = ogr.Feature(defn)
+            feature.SetField('int_value', rnd.randint(0, 1000000))
+            feature.SetField('big_value', rnd.randint(0, 2 ** 40))
+            feature.SetField('real_value', rnd.random())
+            feature.SetField('name', f'feature {i}')
+            feature.SetField('category', CATEGORIES[rnd.randrange(len(CATEGORIES))])
+            feature.SetField('day', 2020, 1 + i % 12, 1 + i % 28, 0, 0, 0, 0)
+            feature.SetField('updated', 2020, 1 + i % 12, 1 + i % 28, i % 24, i % 60, i % 60, 0)
+            feature.SetField('flag', i % 2)
+            if i % 3:
+                feature.SetField('notes', 'lorem ipsum dolor sit amet ' * (1 + i % 5))
+            feature.SetGeometry(ogr.CreateGeometryFromWkt(
+                f'POINT ({rnd.uniform(-180, 180)} {rnd.uniform(-85, 85)})'))
+            lyr.CreateFeature(feature)
+
+            if i % 100000 == 99999:
+                lyr.CommitTransaction()
+                lyr.StartTransaction()
+        lyr.CommitTransaction()
+
+        ds = None
+
+        return path
+
+    def synthetic_project(self, data_dir, layers):
+        """
+        Writes the QGIS project of the synthetic layers
+
+        :param data_dir: directory of the project file
+        :param layers: list of (format, number of features, layer file path)
+        :return: path of the project file
+        :rtype: str
+        """
+
+        qgs_project = QgsProject()
+        qgs_project.setTitle('Benchmark vector API')
+        qgs_project.setCrs(QgsCoordinateReferenceSystem('EPSG:4326'))
+
+        for fmt, nfeatures, path in layers:
+            name = f'bench_{fmt}_{nfeatures}'
+            if fmt == 'gpkg':
+                qgis_layer = QgsVectorLayer(f'{path}|layername=bench', name, 'ogr')
+            else:
+                qgis_layer = QgsVectorLayer(f'dbname=\'{path}\' table="bench" (geom)', name, 'spatialite')
+
+            if not qgis_layer.isValid():
+                raise CommandError(f'Invalid layer {path}')
+            qgs_project.addMapLayer(qgis_layer)
+
+        project_path = os.path.join(data_dir, 'benchmark_vector_api.qgs')
+        if not qgs_project.write(project_path):
+            raise CommandError(f'Cannot write {project_path}: {qgs_project.error()}')
+
+        return project_path
+
+    # Measures
+    # --------
+
+    @staticmethod
+    def consume(response):
+        """Renders the response and reads its content, returns the content size"""
+
+        if hasattr(response, 'render') and not response.is_rendered:
+            response.render()
+
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+
+        response.close()
+        return size
+
+    def run_case(self, user, project, layer, case, nfeatures, repeat):
+        """
+        Runs a benchmark case
+
+        :return: case result
+        :rtype: dict
+        """
+
+        mode, method, params = BENCHMARK_CASES[case]
+        if params.get('page') == 'middle':
+            params = dict(params, page=max(1, nfeatures // 2 // params['page_size']))
+
+        factory = RequestFactory()
+
+        def request():
+            if method == 'POST':
+                req = factory.post('/', data=json.dumps(params), content_type='application/json')
+            else:
+                req = factory.get('/', params)
+            req.user = user
+            req._dont_enforce_csrf_checks = True
+
+            response = layer_vector_view(req, 'qdjango', project.pk, layer.qgs_layer_id, mode_call=mode)
+            return response.status_code, self.consume(response)
+
+        timings = []
+        status, size = None, None
+        for __ in range(max(1, repeat)):
+            gc.collect()
+            start = time.perf_counter()
+            status, size = request()
+            timings.append(time.perf_counter() - start)
+
+        # Memory run: tracemalloc slows down Python code, it is not used for latency
+        gc.collect()
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        tracemalloc.start()
+        try:
+            request()
+            __, python_peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+
+        return {
+            'mode': mode,
+            'method': method,
+            'params': params,
+            'status': status,
+            'size': size,
+            'latency': {
+                'min': min(timings),
+                'median': statistics.median(timings),
+                'mean': statistics.mean(timings),
+                'max': max(timings),
+            },
+            'python_peak_memory': python_peak,
+            # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+            'rss_peak_growth': rss_growth if platform.system() == 'Darwin' else rss_growth * 1024,
+        }
+
+    # Report
+    # ------
+
+    @staticmethod
+    def git_commit():
+        """Returns the git commit of the code, None outside a git repository"""
+
+        try:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                                           stderr=subprocess.DEVNULL).decode('utf-8').strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def compare(self, report, previous):
+        """Writes the median latency and memory changes from a previous report"""
+
+        previous_results = {(r['format'], r['features'], r['case']): r for r in previous['results']}
+
+        self.stdout.write(f'Comparison with {previous.get("git_commit") or previous.get("created")}')
+        for r in report['results']:
+            p = previous_results.get((r['format'], r['features'], r['case']))
+            if p is None or not p['latency']['median']:
+                continue
+
+            ratio = r['latency']['median'] / p['latency']['median']
+            line = f'{r["format"]:<11} {r["features"]:>8} {r["case"]:<16} median x{ratio:5.2f} ' \
+                   f'python peak {(r["python_peak_memory"] - p["python_peak_memory"]) / 2 ** 20:+9.1f} MB'
+            if ratio > 1.1:
+                self.stdout.write(self.style.WARNING(line))
+            elif ratio < 0.9:
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(line)
+
+    def handle(self, *args, **options):
+
+        sizes = [int(s) for s in options['sizes'].split(',') if s]
+        formats = [f for f in options['formats'].split(',') if f]
+        cases = [c for c in options['cases'].split(',') if c]
+
+        for fmt in formats:
+            if fmt not in BENCHMARK_FORMATS:
+                raise CommandError(f'Format {fmt} is not available')
+        for case in cases:
+            if case not in BENCHMARK_CASES:
+                raise CommandError(f'Case {case} is not available')
+
+        users = get_user_model().objects.filter(is_superuser=True)
+        if options['user']:
+            users = get_user_model().objects.filter(username=options['user'])
+        user = users.order_by('pk').first()
+        if user is None:
+            raise CommandError('User not found')
+
+        data_dir = options['data_dir'] or os.path.join(settings.DATASOURCE_PATH, 'benchmark_vector_api')
+        os.makedirs(data_dir, exist_ok=True)
+
+        layers = []
+        for fmt in formats:
+            for nfeatures in sizes:
+                layers.append((fmt, nfeatures, self.synthetic_layer(data_dir, fmt, nfeatures, options['regenerate'])))
+        project_path = self.synthetic_project(data_dir, layers)
+
+        report = {
+            'created': datetime.now().isoformat(),
+            'git_commit': self.git_commit(),
+            'g3w_version': get_version(),
+            'qgis_version': Qgis.QGIS_VERSION,
+            'gdal_version': gdal.__version__,
+            'python_version': platform.python_version(),
+            'repeat': options['repeat'],
+            'cached': options['cached'],
+            'results': []
+        }
+
+        caches = {}
+        if not options['cached']:
+            caches = {'VECTOR_RESPONSE_CACHE_TTL': 0, 'VECTOR_UNIQUE_VALUES_CACHE_TTL': 0}
+
+        qgis_file = None
+        with transaction.atomic(), \
+                mock.patch.multiple('core.api.base.views', **caches), \
+                override_settings(VECTOR_EXPORT_CACHE_MAX_SIZE=getattr(settings, 'VECTOR_EXPORT_CACHE_MAX_SIZE', 0)
+                                  if options['cached'] else 0):
+            try:
+                group = Group.objects.create(
+                    name='benchmark-vector-api',
+                    title='Benchmark vector API',
+                    header_logo_img='',
+                    srid=G3WSpatialRefSys.objects.get(auth_srid=4326)
+                )
+
+                with open(project_path, 'r') as f:
+                    qgis_project = QgisProject(File(f))
+                    qgis_project.group = group
+                    qgis_project.save()
+                project = qgis_project.instance
+                qgis_file = project.qgis_file.path
+
+                project.layer_set.update(download=True, download_xls=True, download_gpx=True,
+                                         download_csv=True, download_gpkg=True)
+
+                for fmt, nfeatures, __ in layers:
+                    layer = project.layer_set.get(name=f'bench_{fmt}_{nfeatures}')
+                    for case in cases:
+                        result = self.run_case(user, project, layer, case, nfeatures, options['repeat'])
+                        result.update({'format': fmt, 'features': nfeatures, 'case': case})
+                        report['results'].append(result)
+
+                        self.stdout.write(
+                            f'{fmt:<11} {nfeatures:>8} {case:<16} status {result["status"]} '
+                            f'median {result["latency"]["median"] * 1000:10.1f} ms '
+                            f'python peak {result["python_peak_memory"] / 2 ** 20:8.1f} MB '
+                            f'rss growth {result["rss_peak_growth"] / 2 ** 20:8.1f} MB')
+            finally:
+                # The benchmark project is not kept
+                transaction.set_rollback(True)
+                if qgis_file and os.path.exists(qgis_file):
+                    os.remove(qgis_file)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Report written into {options["output"]}'))
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.compare(report, json.load(f))
@@ -0,0 +1,67 @@
+# coding=utf-8
+"""
+    Create, rebuild or drop the search indexes of vector layers.
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+from django.core.management.base import BaseCommand, CommandError
+from qgis.core import QgsVectorLayer
+
+from core.utils.searchindex import get_search_index
+from qdjango.models import Layer
+
+
+class Command(BaseCommand):
+    """
+    Create the search index used by the 'search' filter of vector API:
+    a GIN trigram index for postgres layers, a sidecar SQLite FTS5 table for ogr file layers.
+    """
+
+    help = 'Create, rebuild or drop the search indexes of qdjango vector layers (postgres and ogr file layers).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('layers', nargs='*', type=int, help='qdjango Layer pks')
+        parser.add_argument('--project', dest='project', type=int,
+                            help='Index every postgres and ogr layer of the qdjango project')
+        parser.add_argument('--fields', dest='fields',
+                            help='Comma separated field names to index, default every field')
+        parser.add_argument('--drop', dest='drop', action='store_true', default=False,
+                            help='Drop the search indexes')
+
+    def handle(self, *args, **options):
+
+        layers = Layer.objects.filter(layer_type__in=('postgres', 'ogr'))
+        if options['project']:
+            layers = layers.filter(project_id=options['project'])
+        elif options['layers']:
+            layers = layers.filter(pk__in=options['layers'])
+        else:
+            raise CommandError('Set layer pks or --project')
+
+        fields = options['fields'].split(',') if options['fields'] else None
+
+        for layer in layers:
+            qgis_layer = layer.qgis_layer
+            if not isinstance(qgis_layer, QgsVectorLayer):
+                continue
+
+            index = get_search_index(qgis_layer)
+            if index is None:
+                self.stdout.write(self.style.WARNING(f'Layer {layer.pk} ({layer.name}): data source not supported'))
+                continue
+
+            try:
+                if options['drop']:
+                    index.drop()
+                    self.stdout.write(f'Layer {layer.pk} ({layer.name}): search index dropped')
+                else:
+                    indexed = index.create(fields)
+                    self.stdout.write(self.style.SUCCESS(
+                        f'Layer {layer.pk} ({layer.name}): search index of {", ".join(indexed)}'))
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Layer {layer.pk} ({layer.name}): {e}'))
@@ -24,6 +24,15 @@ pre_save_maplayer = django.dispatch.Signal()
 # signal to add extra maplayers attribute: i.e. iternet
 pre_delete_maplayer = django.dispatch.Signal()
 
+"""Signal sent after the edited features of a layer are committed to the backend.
+
+Arguments:
+    layer_metadata: layer metadata (includes qgis_layer)
+    server_fids: server feature ids of the added and updated features
+    user: current user from the request
+"""
+post_commit_maplayer = django.dispatch.Signal()
+
 # signal to add extra maplayers attribute: i.e. iternet
 post_serialize_maplayer = django.dispatch.Signal()
 
@@ -12,11 +12,13 @@ __copyright__ = 'Copyright 2019, Gis3w'
 
 import json
 import os
+from io import StringIO
 
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.cache import caches
 from django.core.files import File
+from django.core.management import call_command
 from django.test import override_settings
 from django.test.client import JSON_CONTENT_TYPE_RE
 from django.urls import reverse
@@ -31,6 +33,7 @@ from qdjango.utils.data import QgisProject
 
 from .base import CoreTestBase
 
+from osgeo import gdal
 from qgis.core import QgsRasterLayer
 from qgis.PyQt.QtCore import QTemporaryDir
 
@@ -116,6 +119,40 @@ class CoreApiTest(CoreTestBase):
         self.assertIsNone(resp["featurelocks"])
         self.assertIsNotNone(resp["vector"]["count"])
 
+    def testCoreVectorApiDataStream(self):
+        """Test core-vector-api data with 'stream' parameter"""
+
+        response = self._testApiCall(
+            'core-vector-api', ['data', 'qdjango', '1', 'spatialite_points20190604101052075'])
+        resp = json.loads(response.content)
+
+        response = self._testApiCall(
+            'core-vector-api', ['data', 'qdjango', '1', 'spatialite_points20190604101052075'], {
+                'stream': 1
+            })
+        self.assertTrue(response.streaming)
+        stream_resp = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(stream_resp, resp)
+
+        # With pagination
+        world = Layer.objects.get(name='world')
+        params = {
+            'in_bbox': '-5,-4,12,80',
+            'page': 2,
+            'page_size': 8,
+            'ordering': 'ogc_fid',
+        }
+        resp = json.loads(self._testApiCall(
+            'core-vector-api', ['data', 'qdjango', '1', world.qgs_layer_id], params).content)
+
+        params['stream'] = 1
+        response = self._testApiCall(
+            'core-vector-api', ['data', 'qdjango', '1', world.qgs_layer_id], params)
+        stream_resp = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(stream_resp['vector']['data']['features']), 8)
+        self.assertEqual(stream_resp['vector']['count'], 36)
+        self.assertEqual(stream_resp, resp)
+
     def testCoreVectorApiXls(self):
         """Test core-vector-api data XLS"""
 
@@ -422,6 +459,49 @@ class CoreApiTest(CoreTestBase):
         self.assertEqual(len(resp['vector']['data']['features']), 0)
         self.assertEqual(resp['vector']['count'], 36)
 
+    def testCursorPagination(self):
+        """Test keyset pagination with 'cursor' parameter"""
+
+        world = Layer.objects.get(name='world')
+
+        # Get all pages by cursor: 4 full pages plus one of four
+        params = {
+            'in_bbox': '-5,-4,12,80',
+            'cursor': '',
+            'page_size': 8,
+            'ordering': 'ogc_fid',
+        }
+        ids = []
+        for page in range(1, 6):
+            resp = json.loads(self._testApiCall('core-vector-api', ['data', 'qdjango', '1', world.qgs_layer_id],
+                                                params).content)
+            self.assertEqual(resp['vector']['count'], 36)
+            self.assertEqual(len(resp['vector']['data']['features']), 8 if page < 5 else 4)
+            ids += [f['id'] for f in resp['vector']['data']['features']]
+            params['cursor'] = resp['vector']['next']
+
+        self.assertIsNone(resp['vector']['next'])
+
+        # Same features as offset pagination
+        resp = json.loads(self._testApiCall('core-vector-api', ['data', 'qdjango', '1', world.qgs_layer_id], {
+            'in_bbox': '-5,-4,12,80',
+            'page': 1,
+            'page_size': 36,
+            'ordering': 'ogc_fid',
+        }).content)
+        self.assertEqual(ids, [f['id'] for f in resp['vector']['data']['features']])
+
+        # No 'next' key without cursor
+        self.assertNotIn('next', resp['vector'])
+
+        # Not valid cursor
+        self.assertTrue(self.client.login(username=self.test_admin1.username, password=self.test_admin1.username))
+        response = self.client.get(self._getPath('core-vector-api', ['data', 'qdjango', '1', world.qgs_layer_id], {
+            'cursor': 'not_valid'
+        }))
+        self.assertEqual(response.status_code, 400)
+        self.client.logout()
+
     def testQGISApplication(self):
         """Test global QgsApplication instance was initialized"""
 
@@ -554,13 +634,19 @@ class CoreApiTest(CoreTestBase):
         temp = QTemporaryDir()
         fname = temp.path() + '/temp.tif'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         rl = QgsRasterLayer(fname)
         self.assertTrue(rl.isValid())
         self.assertEqual(rl.height(), 720)
         self.assertEqual(rl.width(), 1440)
 
+        # Cloud Optimized GeoTIFF: tiled with internal overviews
+        ds = gdal.Open(fname)
+        self.assertNotEqual(ds.GetRasterBand(1).GetBlockSize(), [1440, 1])
+        self.assertTrue(ds.GetRasterBand(1).GetOverviewCount() > 0)
+        ds = None
+
         # With map_extent parameter
         path = self._getPath('core-raster-api', ['geotiff', 'qdjango', '1', 'bluemarble20181008111156906'], {
             'map_extent': '1.07707156376701,34.84554059116634,24.894006142840222,48.28618010521657'
@@ -574,13 +660,71 @@ class CoreApiTest(CoreTestBase):
         temp = QTemporaryDir()
         fname = temp.path() + '/temp1.tif'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         rl = QgsRasterLayer(fname)
         self.assertTrue(rl.isValid())
         self.assertEqual(rl.height(), 53)
         self.assertEqual(rl.width(), 95)
 
+        # With max_size parameter, downsampled export read from the overview cache
+        temp_cache = QTemporaryDir()
+        path = self._getPath('core-raster-api', ['geotiff', 'qdjango', '1', 'bluemarble20181008111156906'], {
+            'max_size': 360
+        })
+
+        with override_settings(RASTER_OVERVIEW_CACHE_DIR=temp_cache.path(), RASTER_OVERVIEW_CACHE_MAX_SIZE=10 ** 8):
+            response = self.api_client.get(path)
+        self.assertEqual(response.status_code, 200)
+
+        fname = temp.path() + '/temp2.tif'
+        with open(fname, 'wb+') as f:
+            f.write(b''.join(response.streaming_content))
+
+        rl = QgsRasterLayer(fname)
+        self.assertTrue(rl.isValid())
+        self.assertEqual(rl.height(), 180)
+        self.assertEqual(rl.width(), 360)
+
+        path = self._getPath('core-raster-api', ['geotiff', 'qdjango', '1', 'bluemarble20181008111156906'], {
+            'max_size': 0
+        })
+        response = self.api_client.get(path)
+        self.assertEqual(response.status_code, 500)
+
+    def testBenchmarkVectorApiCommand(self):
+        """Test benchmark_vector_api management command"""
+
+        temp = QTemporaryDir()
+        report_path = temp.path() + '/report.json'
+
+        call_command('benchmark_vector_api', sizes='100', cases='data_paged,count,unique,expression,csv', repeat=1,
+                     data_dir=temp.path(), user=self.test_admin1.username, output=report_path, stdout=StringIO())
+
+        with open(report_path) as f:
+            report = json.load(f)
+
+        self.assertEqual(len(report['results']), 10)
+        for result in report['results']:
+            self.assertEqual(result['status'], 200)
+            self.assertEqual(result['features'], 100)
+            self.assertTrue(result['size'] > 0)
+            self.assertTrue(result['latency']['median'] > 0)
+            self.assertTrue(result['python_peak_memory'] > 0)
+
+        self.assertTrue(os.path.exists(temp.path() + '/bench_100.gpkg'))
+        self.assertTrue(os.path.exists(temp.path() + '/bench_100.sqlite'))
+
+        # The benchmark project is not kept
+        self.assertFalse(Project.objects.filter(title='Benchmark vector API').exists())
+
+        # Layers are reused, compare with the previous report
+        out = StringIO()
+        call_command('benchmark_vector_api', sizes='100', formats='gpkg', cases='count', repeat=1,
+                     data_dir=temp.path(), user=self.test_admin1.username, compare=report_path, stdout=out)
+        self.assertFalse('Writing' in out.getvalue())
+        self.assertTrue('Comparison with' in out.getvalue())
+
     def testCoreInterfaceOwsView(self):
         """ Test for interface ows view """
 
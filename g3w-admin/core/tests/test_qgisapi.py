@@ -26,6 +26,14 @@ from .base import CoreTestBase
 from core.utils.qgisapi import (
     get_qgis_layer,
     get_qgis_features,
+    count_qgis_features,
+    get_qgis_feature_ids,
+    get_qgis_unique_values,
+    cache_feature_ids,
+    get_cached_feature_ids,
+    FieldFormattingPlan,
+    encode_cursor,
+    CursorError,
     expression_eval,
     ExpressionEvalError,
     ExpressionForbiddenError,
@@ -35,7 +43,28 @@ from core.utils.qgisapi import (
     ExpressionParseError,
 
 )
-from qgis.core import QgsRectangle, QgsJsonExporter
+from core.utils.pushdown import (
+    compile_feature_request,
+    provider_count,
+    provider_feature_ids,
+    provider_unique_values,
+    PushdownNotSupported
+)
+from core.utils.searchindex import get_search_index, search_prefilter
+from qgis.core import (
+    QgsRectangle,
+    QgsJsonExporter,
+    QgsFeatureRequest,
+    QgsVectorLayer,
+    QgsField,
+    QgsFeature,
+    QgsEditorWidgetSetup,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsCoordinateTransformContext,
+    QgsVectorFileWriter
+)
+from qgis.PyQt.QtCore import QVariant, QDate, QDateTime, QTime, NULL, QTemporaryDir
 
 # Re-use test data from qdjango module
 DATASOURCE_PATH = os.path.join(os.getcwd(), 'qdjango', 'tests', 'data')
@@ -138,6 +167,184 @@ class CoreQgisApiTest(APITestCase):
         features = get_qgis_features(qgis_layer, page_size=1000)
         self.assertEqual(len(features), 2)
 
+    def testGetQgisFeaturesCursor(self):
+        """Test QGIS API get_qgis_features with keyset pagination"""
+
+        qgis_layer = get_qgis_layer(self.layer)
+        self.assertTrue(qgis_layer.isValid())
+
+        # First page
+        qgis_feature_request = QgsFeatureRequest()
+        features = get_qgis_features(qgis_layer, qgis_feature_request, cursor='', page_size=1)
+        self.assertEqual(len(features), 1)
+        self.assertEqual(features[0]['name'], 'a point')
+
+        # Second page
+        cursor = encode_cursor(qgis_layer, qgis_feature_request, features[0])
+        features = get_qgis_features(qgis_layer, QgsFeatureRequest(), cursor=cursor, page_size=1)
+        self.assertEqual(len(features), 1)
+        self.assertEqual(features[0]['name'], 'another point')
+
+        # No more pages
+        cursor = encode_cursor(qgis_layer, QgsFeatureRequest(), features[0])
+        features = get_qgis_features(qgis_layer, QgsFeatureRequest(), cursor=cursor, page_size=1)
+        self.assertEqual(len(features), 0)
+
+        # Descending ordering
+        features = get_qgis_features(qgis_layer, QgsFeatureRequest(), ordering='-name', cursor='', page_size=1)
+        self.assertEqual(features[0]['name'], 'another point')
+        qgis_feature_request = QgsFeatureRequest()
+        qgis_feature_request.setOrderBy(QgsFeatureRequest.OrderBy([QgsFeatureRequest.OrderByClause('"name"', False)]))
+        cursor = encode_cursor(qgis_layer, qgis_feature_request, features[0])
+        features = get_qgis_features(qgis_layer, QgsFeatureRequest(), ordering='-name', cursor=cursor, page_size=1)
+        self.assertEqual(len(features), 1)
+        self.assertEqual(features[0]['name'], 'a point')
+
+        # Cursor built with another ordering
+        with self.assertRaises(CursorError):
+            get_qgis_features(qgis_layer, QgsFeatureRequest(), ordering='name', cursor=cursor, page_size=1)
+
+        # Not valid cursor
+        with self.assertRaises(CursorError):
+            get_qgis_features(qgis_layer, QgsFeatureRequest(), cursor='not_valid', page_size=1)
+
+    def testCountQgisFeaturesPushdown(self):
+        """Test QGIS API count_qgis_features executed on provider side"""
+
+        qgis_layer = get_qgis_layer(self.layer)
+        self.assertTrue(qgis_layer.isValid())
+
+        self.assertEqual(provider_count(qgis_layer), 2)
+        self.assertEqual(count_qgis_features(qgis_layer), 2)
+
+        # Expression filter
+        qgis_feature_request = QgsFeatureRequest()
+        qgis_feature_request.setFilterExpression('"name" ILIKE \'%another%\'')
+        self.assertEqual(compile_feature_request(qgis_layer, qgis_feature_request),
+                         '(("name" LIKE \'%another%\' ESCAPE \'\\\'))')
+        self.assertEqual(provider_count(qgis_layer, qgis_feature_request), 1)
+        self.assertEqual(count_qgis_features(qgis_layer, qgis_feature_request), 1)
+
+        qgis_feature_request = QgsFeatureRequest()
+        qgis_feature_request.setFilterExpression('"pkuid" IN (1, 2) AND NOT "name" = \'a point\'')
+        self.assertEqual(provider_count(qgis_layer, qgis_feature_request), 1)
+
+        # Filter options and subset strings
+        self.assertEqual(count_qgis_features(qgis_layer, search_filter='another'), 1)
+        self.assertEqual(count_qgis_features(qgis_layer, extra_subset_string='name != \'another point\''), 1)
+        self.assertEqual(qgis_layer.subsetString(), '')
+
+        # Filter rect in destination CRS
+        destination_crs = QgsCoordinateReferenceSystem('EPSG:3857')
+        ct = QgsCoordinateTransform(qgis_layer.crs(), destination_crs, QgsCoordinateTransformContext())
+        qgis_feature_request = QgsFeatureRequest()
+        qgis_feature_request.setDestinationCrs(destination_crs, QgsCoordinateTransformContext())
+        qgis_feature_request.setFilterRect(ct.transformBoundingBox(qgis_layer.extent()))
+        self.assertEqual(provider_count(qgis_layer, qgis_feature_request), 2)
+        self.assertEqual(len(list(qgis_layer.getFeatures(qgis_feature_request))), 2)
+
+        # Not supported expressions fall back to iteration
+        qgis_feature_request = QgsFeatureRequest()
+        qgis_feature_request.setFilterExpression('length("name") > 7')
+        with self.assertRaises(PushdownNotSupported):
+            compile_feature_request(qgis_layer, qgis_feature_request)
+        self.assertIsNone(provider_count(qgis_layer, qgis_feature_request))
+        self.assertEqual(count_qgis_features(qgis_layer, qgis_feature_request), 1)
+
+    def testGetQgisUniqueValues(self):
+        """Test QGIS API get_qgis_unique_values"""
+
+        qgis_layer = get_qgis_layer(self.layer)
+        self.assertTrue(qgis_layer.isValid())
+
+        self.assertEqual(provider_unique_values(qgis_layer, 'name'), ['a point', 'another point'])
+        self.assertEqual(get_qgis_unique_values(qgis_layer, 'name'), ['a point', 'another point'])
+        self.assertEqual(get_qgis_unique_values(qgis_layer, 'name', limit=1), ['a point'])
+        self.assertEqual(get_qgis_unique_values(qgis_layer, 'name', prefix='AN'), ['another point'])
+        self.assertEqual(get_qgis_unique_values(qgis_layer, 'name', prefix='%'), [])
+
+        qgis_feature_request = QgsFeatureRequest()
+        qgis_feature_request.setFilterExpression('"pkuid" = 2')
+        self.assertEqual(get_qgis_unique_values(qgis_layer, 'name', qgis_feature_request), ['another point'])
+
+        # Not supported expressions fall back to iteration
+        qgis_feature_request = QgsFeatureRequest()
+        qgis_feature_request.setFilterExpression('length("name") > 7')
+        self.assertIsNone(provider_unique_values(qgis_layer, 'name', qgis_feature_request))
+        self.assertEqual(get_qgis_unique_values(qgis_layer, 'name', qgis_feature_request), ['another point'])
+        self.assertEqual(get_qgis_unique_values(qgis_layer, 'name', qgis_feature_request, prefix='a'),
+                         ['another point'])
+
+    def testGetQgisFeatureIds(self):
+        """Test QGIS API get_qgis_feature_ids and feature ids cache token"""
+
+        qgis_layer = get_qgis_layer(self.layer)
+        self.assertTrue(qgis_layer.isValid())
+
+        self.assertEqual(sorted(provider_feature_ids(qgis_layer)), ['1', '2'])
+        self.assertEqual(sorted(get_qgis_feature_ids(qgis_layer)), ['1', '2'])
+
+        # Limit is ignored
+        qgis_feature_request = QgsFeatureRequest()
+        qgis_feature_request.setLimit(1)
+        self.assertEqual(sorted(get_qgis_feature_ids(qgis_layer, qgis_feature_request)), ['1', '2'])
+
+        self.assertEqual(get_qgis_feature_ids(qgis_layer, search_filter='another'), ['2'])
+        self.assertEqual(get_qgis_feature_ids(qgis_layer, extra_subset_string='name != \'another point\''), ['1'])
+        self.assertEqual(qgis_layer.subsetString(), '')
+
+        # Not supported expressions fall back to iteration
+        qgis_feature_request = QgsFeatureRequest()
+        qgis_feature_request.setFilterExpression('length("name") > 7')
+        self.assertIsNone(provider_feature_ids(qgis_layer, qgis_feature_request))
+        self.assertEqual(get_qgis_feature_ids(qgis_layer, qgis_feature_request), ['2'])
+
+        # Cache token
+        token = cache_feature_ids(self.layer.pk, ['1', '2'])
+        self.assertEqual(get_cached_feature_ids(self.layer.pk, token), ['1', '2'])
+        self.assertIsNone(get_cached_feature_ids(self.layer.pk + 1, token))
+        self.assertEqual(get_cached_feature_ids(self.layer.pk, cache_feature_ids(self.layer.pk, [])), [])
+
+    def testFieldFormattingPlan(self):
+        """Test FieldFormattingPlan for date and datetime fields"""
+
+        qgis_layer = QgsVectorLayer('NoGeometry', 'dates', 'memory')
+        qgis_layer.dataProvider().addAttributes([
+            QgsField('name', QVariant.String),
+            QgsField('day', QVariant.Date, 'date'),
+            QgsField('updated', QVariant.DateTime, 'datetime'),
+            QgsField('noformat', QVariant.Date, 'date'),
+        ])
+        qgis_layer.updateFields()
+
+        self.assertFalse(FieldFormattingPlan(qgis_layer))
+
+        qgis_layer.setEditorWidgetSetup(1, QgsEditorWidgetSetup('DateTime', {
+            'field_iso_format': False, 'field_format': 'dd/MM/yyyy', 'display_format': 'd/M/yy'}))
+        qgis_layer.setEditorWidgetSetup(2, QgsEditorWidgetSetup('DateTime', {
+            'field_iso_format': True, 'field_format': 'yyyy-MM-dd HH:mm:ss', 'display_format': 'dd/MM/yyyy HH:mm'}))
+
+        plan = FieldFormattingPlan(qgis_layer)
+        self.assertTrue(plan)
+
+        feature = QgsFeature(qgis_layer.fields())
+        feature.setAttributes(['a', QDate(2020, 1, 31), QDateTime(QDate(2020, 1, 31), QTime(10, 30)),
+                               QDate(2020, 1, 31)])
+
+        self.assertEqual(plan.formatted_values(feature), {'day': '31/01/2020'})
+        self.assertEqual(plan.formatted_values(feature, formatted=True),
+                         {'day': '31/1/20', 'updated': '31/01/2020 10:30'})
+
+        jfeature = {'properties': {'name': 'a', 'day': '2020-01-31', 'updated': '2020-01-31T10:30:00',
+                                   'noformat': '2020-01-31'}}
+        plan.apply(feature, jfeature)
+        self.assertEqual(jfeature['properties'], {'name': 'a', 'day': '31/01/2020',
+                                                  'updated': '2020-01-31T10:30:00', 'noformat': '2020-01-31'})
+
+        # NULL values are not formatted
+        feature.setAttributes(['a', NULL, NULL, NULL])
+        self.assertEqual(plan.formatted_values(feature), {})
+
     def testGetQgisFeaturesOrdering(self):
         """Test QGIS API get_qgis_features with ordering"""
 
@@ -184,6 +391,67 @@ class CoreQgisApiTest(APITestCase):
         features = get_qgis_features(qgis_layer, search_filter='not_exists')
         self.assertEqual(len(features), 0)
 
+    def testSearchIndexSidecar(self):
+        """Test search index of ogr file layers: sidecar FTS5 table used as prefilter of search_filter"""
+
+        temp = QTemporaryDir()
+        memory_layer = QgsVectorLayer('Point?crs=EPSG:4326&field=name:string&field=value:integer', 'points', 'memory')
+        features = []
+        for i, name in enumerate(('first point', 'another point', 'Third Point', 'no match', None)):
+            feature = QgsFeature(memory_layer.fields())
+            feature.setAttributes([name, i * 100])
+            features.append(feature)
+        memory_layer.dataProvider().addFeatures(features)
+
+        save_options = QgsVectorFileWriter.SaveVectorOptions()
+        save_options.driverName = 'GPKG'
+        save_options.layerName = 'points'
+        path = os.path.join(temp.path(), 'points.gpkg')
+        error_code, __, __, __ = QgsVectorFileWriter.writeAsVectorFormatV3(
+            memory_layer, path, memory_layer.transformContext(), save_options)
+        self.assertEqual(error_code, QgsVectorFileWriter.NoError)
+
+        qgis_layer = QgsVectorLayer(f'{path}|layername=points', 'points', 'ogr')
+        self.assertTrue(qgis_layer.isValid())
+
+        expected = {term: sorted(f.id() for f in get_qgis_features(qgis_layer, search_filter=term))
+                    for term in ('point', 'POINT', 'another', '200', 'not_exists')}
+
+        index = get_search_index(qgis_layer)
+        self.assertIsNone(index.indexed_fields())
+        self.assertIsNone(search_prefilter(qgis_layer, ['point'], ['name', 'value']))
+
+        self.assertEqual(index.create(), ['fid', 'name', 'value'])
+        self.assertTrue(os.path.exists(index.sidecar_path))
+        self.assertEqual(index.indexed_fields(), ['fid', 'name', 'value'])
+
+        self.assertEqual(search_prefilter(qgis_layer, ['point'], ['name', 'value']), '"fid" IN (1, 2, 3)')
+
+        # Short terms and not indexed fields: no prefilter
+        self.assertIsNone(search_prefilter(qgis_layer, ['po'], ['name']))
+        self.assertIsNone(search_prefilter(qgis_layer, ['point'], ['name', 'not_indexed']))
+
+        # Same results with the prefilter, the layer subset string is restored
+        for term, fids in expected.items():
+            self.assertEqual(sorted(f.id() for f in get_qgis_features(qgis_layer, search_filter=term)), fids)
+        self.assertEqual(qgis_layer.subsetString(), '')
+
+        # Sync of edited features
+        qgis_layer.dataProvider().changeAttributeValues({4: {1: 'new point'}})
+        index.update_features([4])
+        self.assertEqual(search_prefilter(qgis_layer, ['new point'], ['name']), '"fid" IN (4)')
+
+        # Features not found: the index is disabled until rebuilt
+        index.update_features([-1])
+        self.assertIsNone(index.indexed_fields())
+        self.assertIsNone(search_prefilter(qgis_layer, ['new point'], ['name']))
+        self.assertTrue(os.path.exists(index.sidecar_path))
+
+        index.create(['name'])
+        self.assertEqual(index.indexed_fields(), ['name'])
+        index.drop()
+        self.assertIsNone(index.indexed_fields())
+
     def testGetQgisFeaturesAttributeFilters(self):
         """Test QGIS API attribute filters"""
 
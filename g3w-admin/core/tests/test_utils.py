@@ -11,6 +11,7 @@ __date__ = '2020-04-18'
 __copyright__ = 'Copyright 2015 - 2020, Gis3w'
 
 
+import json
 import re
 
 from crispy_forms.layout import Div
@@ -25,6 +26,7 @@ from guardian.exceptions import GuardianError
 from guardian.shortcuts import assign_perm, get_anonymous_user
 from import_export.resources import ModelResource
 
+from core.api.renderers import RawJSON, RawJSONRenderer
 from core.models import Group, StatusLog
 from core.admin import StatusLogAdmin
 from core.utils.db import build_dango_connection_name
@@ -32,12 +34,18 @@ from core.utils.decorators import project_type_permission_required
 from core.utils.forms import crispyBoxBaseLayer, crispyBoxMacroGroups
 from core.utils.general import *
 from core.utils.geo import camel_geometry_type
+from core.utils.geojson import GeoJSONFeatureSerializer, dumps, encode_value, geometry_to_geojson
 from core.utils.ie import modelresource_factory
+from core.utils.qgisapi import FieldFormattingPlan
+from core.utils.mvt import MVT_LINESTRING, MVT_POINT, MVT_POLYGON, MvtTileEncoder, encode_geometry, tile_bounds
 from core.utils.projects import countAllProjects
 from core.utils.response import send_file
 from core.utils.logs.db_handler import DatabaseLogHandler
 from core.utils.slugify import django_slugify, django_slugify_allow_unicode, pyslugify
 from qdjango.models import Project
+from qgis.core import (QgsEditorWidgetSetup, QgsFeature, QgsField, QgsGeometry, QgsJsonExporter, QgsJsonUtils,
+                       QgsVectorLayer)
+from qgis.PyQt.QtCore import QDate, QDateTime, QTime, QVariant, NULL
 
 from .base import CoreTestBase
 from .utils import CURRENT_PATH, TEST_BASE_PATH
@@ -236,6 +244,154 @@ class CoreUtilsTest(CoreTestBase):
         self.assertEqual(pyslugify('jaja---lol-méméméoo--a'), 'jaja-lol-mememeoo-a')
         self.assertEqual(pyslugify('i love 🦄'), 'i-love')
 
+    def test_geojson_serializer(self):
+        """ Test core.utils.geojson serializer against QgsJsonExporter output """
+
+        # Geometries
+        for wkt in ('Point (1.1234567 2)',
+                    'PointZ (1 2 3)',
+                    'PointM (1 2 3)',
+                    'LineString (0 0, 1 1, 2 0)',
+                    'Polygon ((0 0, 1 0, 1 1, 0 0), (0.2 0.1, 0.8 0.1, 0.8 0.7, 0.2 0.1))',
+                    'MultiPoint ((0 0), (1 1))',
+                    'MultiLineStringZ ((0 0 1, 1 1 2), (2 2 3, 3 3 4))',
+                    'MultiPolygon (((0 0, 1 0, 1 1, 0 0)), ((2 2, 3 2, 3 3, 2 2)))',
+                    'GeometryCollection (Point (1 2), LineString (0 0, 1 1))',
+                    'CircularString (0 0, 1 1, 2 0)'):
+            geometry = QgsGeometry.fromWkt(wkt)
+            self.assertFalse(geometry.isNull(), wkt)
+            self.assertEqual(geometry_to_geojson(geometry), json.loads(geometry.asJson(6)), wkt)
+
+        self.assertIsNone(geometry_to_geojson(QgsGeometry()))
+
+        # Values
+        self.assertIsNone(encode_value(NULL))
+        self.assertEqual(encode_value(QDate(2020, 1, 31)), '2020-01-31')
+        self.assertEqual(encode_value({'a': [1, QDate(2020, 1, 31)]}), {'a': [1, '2020-01-31']})
+        self.assertEqual(json.loads(dumps({'v': NULL, 't': QTime(10, 30), 's': 'àè'})),
+                         {'v': None, 't': json.loads(QgsJsonUtils.encodeValue(QTime(10, 30))), 's': 'àè'})
+
+        # Features
+        qgis_layer = QgsVectorLayer('Polygon?crs=EPSG:4326', 'geojson', 'memory')
+        qgis_layer.dataProvider().addAttributes([
+            QgsField('id', QVariant.Int),
+            QgsField('name', QVariant.String),
+            QgsField('value', QVariant.Double),
+            QgsField('day', QVariant.Date),
+            QgsField('updated', QVariant.DateTime),
+        ])
+        qgis_layer.updateFields()
+
+        feature = QgsFeature(qgis_layer.fields())
+        feature.setGeometry(QgsGeometry.fromWkt('Polygon ((0 0, 1 0, 1 1, 0 0))'))
+        feature.setAttributes([1, 'àè "quoted"', 1.5, QDate(2020, 1, 31),
+                               QDateTime(QDate(2020, 1, 31), QTime(10, 30))])
+        no_geometry_feature = QgsFeature(qgis_layer.fields())
+        no_geometry_feature.setAttributes([2, NULL, NULL, NULL, NULL])
+        qgis_layer.dataProvider().addFeatures([feature, no_geometry_feature])
+
+        exporter = QgsJsonExporter(qgis_layer)
+        exporter.setIncludeAttributes(False)
+        serializer = GeoJSONFeatureSerializer(qgis_layer.fields())
+        fnames = qgis_layer.fields().names()
+
+        for f in qgis_layer.getFeatures():
+            expected = json.loads(exporter.exportFeature(f, dict(zip(fnames, f.attributes()))))
+            self.assertEqual(serializer.feature(f), expected)
+            self.assertEqual(json.loads(serializer.feature_bytes(f)), expected)
+            self.assertEqual(serializer.feature(f, fid='layer.1')['id'], 'layer.1')
+
+        serializer = GeoJSONFeatureSerializer(qgis_layer.fields(), attributes=['name'], with_geometry=False)
+        f = next(qgis_layer.getFeatures())
+        self.assertEqual(serializer.feature(f), {'type': 'Feature', 'id': f.id(), 'geometry': None,
+                                                 'properties': {'name': 'àè "quoted"'}})
+
+        # Feature bytes are copied as they are into the rendered response
+        data = {'vector': {'data': RawJSON(b''.join((b'{"type":"FeatureCollection","features":[',
+                                                       serializer.feature_bytes(f, fid='layer.1'), b']}'))),
+                           'count': 1}}
+        rendered = json.loads(RawJSONRenderer().render(data))
+        self.assertEqual(rendered['vector']['count'], 1)
+        self.assertEqual(rendered['vector']['data']['features'][0]['id'], 'layer.1')
+        self.assertEqual(rendered['vector']['data']['features'][0]['properties'], {'name': 'àè "quoted"'})
+
+    def test_field_formatting_plan(self):
+        """ Test core.utils.qgisapi.FieldFormattingPlan cache and export value converter """
+
+        qgis_layer = QgsVectorLayer('Point?crs=epsg:4326&field=name:string&field=day:date', 'dates', 'memory')
+        day_idx = qgis_layer.fields().indexOf('day')
+        qgis_layer.setEditorWidgetSetup(day_idx, QgsEditorWidgetSetup('DateTime', {
+            'field_iso_format': False,
+            'field_format': 'dd/MM/yyyy',
+            'display_format': 'd MMM yyyy'
+        }))
+
+        plan = FieldFormattingPlan.for_layer(qgis_layer, ('dates', 1))
+        self.assertTrue(plan)
+        self.assertIs(FieldFormattingPlan.for_layer(qgis_layer, ('dates', 1)), plan)
+        self.assertIsNot(FieldFormattingPlan.for_layer(qgis_layer, ('dates', 2)), plan)
+
+        converter = plan.value_converter()
+        self.assertEqual(converter.fieldDefinition(qgis_layer.fields()[day_idx]).type(), QVariant.String)
+        self.assertEqual(converter.fieldDefinition(qgis_layer.fields()[0]), qgis_layer.fields()[0])
+        self.assertEqual(converter.convert(day_idx, QDate(2024, 3, 5)), '05/03/2024')
+        self.assertEqual(converter.convert(0, 'name'), 'name')
+        self.assertEqual(converter.clone().convert(day_idx, QDate(2024, 3, 5)), '05/03/2024')
+
+        # No formats, no converter
+        self.assertIsNone(FieldFormattingPlan(QgsVectorLayer('Point?field=name:string', 'plain', 'memory'))
+                          .value_converter())
+
+    def test_mvt_encoder(self):
+        """ Test core.utils.mvt vector tiles encoding """
+
+        bounds = tile_bounds(0, 0, 0)
+        self.assertAlmostEqual(bounds.xMinimum(), -20037508.342789244)
+        self.assertAlmostEqual(bounds.yMaximum(), 20037508.342789244)
+        bounds = tile_bounds(1, 1, 0)
+        self.assertAlmostEqual(bounds.xMinimum(), 0)
+        self.assertAlmostEqual(bounds.yMinimum(), 0)
+
+        # Geometry commands, examples from the MVT specification
+        self.assertEqual(encode_geometry(MVT_POINT, [(25, 17)]), [9, 50, 34])
+        self.assertEqual(encode_geometry(MVT_LINESTRING, [[(2, 2), (2, 10), (10, 10)]]), [9, 4, 4, 18, 0, 16, 16, 0])
+        self.assertEqual(encode_geometry(MVT_POLYGON, [[(3, 6), (8, 12), (20, 34)]]), [9, 6, 12, 18, 10, 12, 24, 44, 15])
+
+        # Clipping, snapping and winding order: tile 1/1/0 is the north-east quarter of the world
+        encoder = MvtTileEncoder(1, 1, 0, extent=256, buffer=0)
+        half = 20037508.342789244
+        geometry_type, parts = encoder.tile_parts(QgsGeometry.fromWkt(
+            f'Polygon ((-{half} 0, {half} 0, {half} {half}, -{half} {half}, -{half} 0))'))
+        self.assertEqual(geometry_type, MVT_POLYGON)
+        self.assertEqual(len(parts), 1)
+        self.assertEqual(sorted(parts[0]), [(0, 0), (0, 256), (256, 0), (256, 256)])
+        area = sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(parts[0], parts[0][1:] + parts[0][:1]))
+        self.assertGreater(area, 0)
+
+        self.assertEqual(encoder.tile_parts(QgsGeometry.fromWkt(f'Point (-{half / 2} {half / 2})')), (None, []))
+        self.assertEqual(encoder.tile_parts(QgsGeometry.fromWkt(f'Point ({half / 2} {half / 2})')),
+                         (MVT_POINT, [(128, 128)]))
+
+        # Tile bytes
+        qgis_layer = QgsVectorLayer('Point?crs=EPSG:3857', 'mvt', 'memory')
+        qgis_layer.dataProvider().addAttributes([QgsField('name', QVariant.String)])
+        qgis_layer.updateFields()
+        feature = QgsFeature(qgis_layer.fields())
+        feature.setGeometry(QgsGeometry.fromWkt(f'Point ({half / 2} {half / 2})'))
+        feature.setAttributes(['a'])
+        qgis_layer.dataProvider().addFeatures([feature])
+
+        self.assertEqual(encoder.add_layer('mvt', qgis_layer.getFeatures(), [(0, 'name')]), 1)
+        tile = encoder.encode()
+        self.assertEqual(tile[0], 0x1a)
+        self.assertIn(b'mvt', tile)
+        self.assertIn(b'name', tile)
+
+        empty = MvtTileEncoder(1, 0, 0)
+        self.assertEqual(empty.add_layer('mvt', qgis_layer.getFeatures()), 0)
+        self.assertEqual(empty.encode(), b'')
+        self.assertEqual(len(serializer.feature_collection(qgis_layer.getFeatures())['features']), 2)
+
 class TestDbLogger(TestCase):
     def setUp(self):
 
@@ -0,0 +1,193 @@
+# coding=utf-8
+"""Binary vector outputs written from QGIS feature iterators: FlatGeobuf and Arrow IPC.
+
+FlatGeobuf is written by the GDAL driver into a file on disk, the packed Hilbert R-tree spatial index
+needs every feature before the first one is written, then the file is streamed.
+
+Arrow IPC streams are written by pyarrow, one record batch at a time while the features are read,
+with the geometries as WKB (GeoArrow 'geoarrow.wkb' extension metadata).
+
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import io
+import json
+import logging
+
+from django.conf import settings
+from qgis.core import QgsFeature, QgsVectorFileWriter
+from qgis.PyQt.QtCore import QDate, QDateTime, QTime, QVariant
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger('module_core')
+
+# Number of features of every Arrow record batch
+ARROW_BATCH_SIZE = getattr(settings, 'VECTOR_ARROW_BATCH_SIZE', 10000)
+
+
+class ColumnarWriterError(Exception):
+    """Raised when a binary output cannot be written"""
+    pass
+
+
+def project_features(features, attributes, fields):
+    """Yields copies of the features with only the attributes in `attributes`
+
+    :param features: QGIS features
+    :type features: iterable of QgsFeature
+    :param attributes: indexes of the attributes to keep
+    :type attributes: list
+    :param fields: fields of the copies (the fields of `attributes`)
+    :type fields: QgsFields
+    """
+
+    for feature in features:
+        values = feature.attributes()
+        out = QgsFeature(fields, feature.id())
+        out.setAttributes([values[idx] for idx in attributes])
+        if feature.hasGeometry():
+            out.setGeometry(feature.geometry())
+        yield out
+
+
+def write_ogr_file(features, fields, wkb_type, crs, transform_context, driver, path, layer_name,
+                   layer_options=None):
+    """Writes the features into a file with an OGR driver
+
+    :param features: QGIS features with `fields` attributes
+    :type features: iterable of QgsFeature
+    :param fields: fields of the features
+    :type fields: QgsFields
+    :param wkb_type: geometry type
+    :param crs: CRS of the geometries
+    :type crs: QgsCoordinateReferenceSystem
+    :param transform_context: transform context
+    :param driver: OGR driver name
+    :param path: path of the file to write
+    :param layer_name: name of the layer inside the file
+    :param layer_options: OGR layer creation options
+    :type layer_options: list, optional
+    :raises ColumnarWriterError: on writer errors
+    """
+
+    save_options = QgsVectorFileWriter.SaveVectorOptions()
+    save_options.driverName = driver
+    save_options.fileEncoding = 'utf-8'
+    save_options.layerName = layer_name
+    save_options.layerOptions = layer_options or []
+
+    writer = QgsVectorFileWriter.create(path, fields, wkb_type, crs, transform_context, save_options)
+    try:
+        if writer.hasError() != QgsVectorFileWriter.NoError:
+            raise ColumnarWriterError(writer.errorMessage())
+
+        for feature in features:
+            if not writer.addFeature(feature):
+                raise ColumnarWriterError(writer.errorMessage())
+    finally:
+        # Flush and close the file
+        del writer
+
+
+# Arrow
+# ------------------------------------------------------------
+
+def _arrow_type(field):
+    """Returns the pyarrow type and the python value converter of a QgsField"""
+
+    field_type = field.type()
+    if field_type == QVariant.Bool:
+        return pyarrow.bool_(), bool
+    if field_type in (QVariant.Int, QVariant.UInt):
+        return pyarrow.int32() if field_type == QVariant.Int else pyarrow.uint32(), int
+    if field_type in (QVariant.LongLong, QVariant.ULongLong):
+        return pyarrow.int64() if field_type == QVariant.LongLong else pyarrow.uint64(), int
+    if field_type == QVariant.Double:
+        return pyarrow.float64(), float
+    if field_type == QVariant.Date:
+        return pyarrow.date32(), lambda v: v.toPyDate() if isinstance(v, QDate) else v
+    if field_type == QVariant.DateTime:
+        return pyarrow.timestamp('ms'), lambda v: v.toPyDateTime() if isinstance(v, QDateTime) else v
+    if field_type == QVariant.Time:
+        return pyarrow.time64('us'), lambda v: v.toPyTime() if isinstance(v, QTime) else v
+    if field_type == QVariant.ByteArray:
+        return pyarrow.binary(), bytes
+
+    def _to_string(value):
+        if isinstance(value, (list, dict)):
+            return json.dumps(value)
+        return str(value)
+
+    return pyarrow.string(), _to_string
+
+
+def _is_null(value):
+    return value is None or (isinstance(value, QVariant) and value.isNull())
+
+
+def iter_arrow_ipc(features, fields, crs, batch_size=ARROW_BATCH_SIZE):
+    """Yields an Arrow IPC stream of the features, one record batch at a time.
+    Geometries are written as WKB in the 'geometry' column with 'geoarrow.wkb' extension metadata.
+    Requires pyarrow.
+
+    :param features: QGIS features with `fields` attributes
+    :type features: iterable of QgsFeature
+    :param fields: fields of the features
+    :type fields: QgsFields
+    :param crs: CRS of the geometries
+    :type crs: QgsCoordinateReferenceSystem
+    :param batch_size: features of every record batch
+    """
+
+    columns = []
+    arrow_fields = []
+    for field in fields:
+        arrow_type, converter = _arrow_type(field)
+        columns.append((field.name(), converter))
+        arrow_fields.append(pyarrow.field(field.name(), arrow_type))
+
+    arrow_fields.append(pyarrow.field('geometry', pyarrow.binary(), metadata={
+        'ARROW:extension:name': 'geoarrow.wkb',
+        'ARROW:extension:metadata': json.dumps({'crs': crs.toWkt(crs.WKT2_2019) if crs.isValid() else None})
+    }))
+    schema = pyarrow.schema(arrow_fields)
+
+    sink = io.BytesIO()
+    writer = pyarrow.ipc.new_stream(sink, schema)
+
+    def _flush():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    def _batch(rows):
+        data = {name: [row[i] for row in rows] for i, (name, __) in enumerate(columns)}
+        data['geometry'] = [row[-1] for row in rows]
+        return pyarrow.RecordBatch.from_pydict(data, schema=schema)
+
+    rows = []
+    for feature in features:
+        values = feature.attributes()
+        row = [None if _is_null(values[i]) else converter(values[i]) for i, (__, converter) in enumerate(columns)]
+        row.append(bytes(feature.geometry().asWkb()) if feature.hasGeometry() else None)
+        rows.append(row)
+
+        if len(rows) >= batch_size:
+            writer.write_batch(_batch(rows))
+            rows = []
+            yield _flush()
+
+    if rows:
+        writer.write_batch(_batch(rows))
+    writer.close()
+    yield _flush()
@@ -0,0 +1,294 @@
+# coding=utf-8
+"""Fast GeoJSON serialization of QGIS features.
+
+Features are converted in a single pass: geometries are decoded from WKB straight into GeoJSON
+coordinates and attribute values (QVariant types included) are encoded by a JSON encoder hook,
+without the QgsJsonExporter string -> json.loads -> json.dumps round trip.
+
+orjson is used when it is installed, the standard library json module otherwise.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import base64
+import json
+import math
+from struct import unpack_from
+
+from django.conf import settings
+from qgis.core import QgsGeometry, QgsJsonUtils, QgsWkbTypes
+from qgis.PyQt.QtCore import QByteArray, QVariant
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Number of decimals of GeoJSON coordinates, same default of QgsJsonExporter
+GEOJSON_PRECISION = getattr(settings, 'GEOJSON_PRECISION', 6)
+
+# Python types serialized as they are
+NATIVE_TYPES = (str, int, float, bool, type(None))
+
+# WKB geometry types (flags and dimensions removed)
+WKB_POINT = 1
+WKB_LINESTRING = 2
+WKB_POLYGON = 3
+WKB_MULTIPOINT = 4
+WKB_MULTILINESTRING = 5
+WKB_MULTIPOLYGON = 6
+WKB_GEOMETRYCOLLECTION = 7
+
+GEOJSON_TYPES = {
+    WKB_POINT: 'Point',
+    WKB_LINESTRING: 'LineString',
+    WKB_POLYGON: 'Polygon',
+    WKB_MULTIPOINT: 'MultiPoint',
+    WKB_MULTILINESTRING: 'MultiLineString',
+    WKB_MULTIPOLYGON: 'MultiPolygon',
+    WKB_GEOMETRYCOLLECTION: 'GeometryCollection',
+}
+
+# EWKB and QGIS 2.5D flags
+WKB_Z_FLAG = 0x80000000
+WKB_M_FLAG = 0x40000000
+WKB_SRID_FLAG = 0x20000000
+
+
+def encode_value(value):
+    """Returns a JSON serializable python value for a QGIS attribute value
+
+    :param value: attribute value, python or Qt type
+    :return: python value (str, int, float, bool, None, list or dict)
+    """
+
+    if type(value) in NATIVE_TYPES:
+        return value
+    if isinstance(value, QVariant):
+        return None if value.isNull() else encode_value(value.value())
+    if isinstance(value, dict):
+        return {str(k): encode_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(v) for v in value]
+    if isinstance(value, (QByteArray, bytes)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+
+    # Qt date and time types and everything else: same representation of QgsJsonExporter
+    return json.loads(QgsJsonUtils.encodeValue(value))
+
+
+def _default(obj):
+    """Encoder hook for types not natively supported by the JSON encoder"""
+
+    value = encode_value(obj)
+    if value is obj:
+        raise TypeError(f'Type is not JSON serializable: {type(obj).__name__}')
+    return value
+
+
+def dumps(obj):
+    """Serializes obj (QVariant values included) to JSON bytes
+
+    :param obj: python object
+    :return: JSON UTF-8 bytes
+    :rtype: bytes
+    """
+
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class WkbReader(object):
+    """
+    Decodes WKB (ISO, EWKB and QGIS 2.5D variants) into GeoJSON geometry dicts.
+    Z values are kept, M values are dropped.
+    """
+
+    def __init__(self, wkb, precision=GEOJSON_PRECISION):
+        self.wkb = wkb
+        self.offset = 0
+        self.precision = precision
+
+    def read(self):
+        """Returns the GeoJSON geometry dict"""
+
+        byte_order, base_type, dims, has_z = self._read_header()
+
+        if base_type == WKB_POINT:
+            coordinates = self._read_points(byte_order, 1, dims, has_z)[0]
+
+            # Empty point: NaN coordinates
+            if any(math.isnan(c) for c in coordinates):
+                coordinates = []
+            return {'type': 'Point', 'coordinates': coordinates}
+
+        if base_type == WKB_LINESTRING:
+            return {'type': 'LineString', 'coordinates': self._read_linestring(byte_order, dims, has_z)}
+
+        if base_type == WKB_POLYGON:
+            return {'type': 'Polygon', 'coordinates': self._read_polygon(byte_order, dims, has_z)}
+
+        if base_type in (WKB_MULTIPOINT, WKB_MULTILINESTRING, WKB_MULTIPOLYGON, WKB_GEOMETRYCOLLECTION):
+            nparts = self._read_uint(byte_order)
+            parts = [self.read() for __ in range(nparts)]
+
+            if base_type == WKB_GEOMETRYCOLLECTION:
+                return {'type': 'GeometryCollection', 'geometries': parts}
+            return {'type': GEOJSON_TYPES[base_type], 'coordinates': [p['coordinates'] for p in parts]}
+
+        raise ValueError(f'WKB geometry type not supported: {base_type}')
+
+    def _read_uint(self, byte_order):
+        value = unpack_from(byte_order + 'I', self.wkb, self.offset)[0]
+        self.offset += 4
+        return value
+
+    def _read_header(self):
+        byte_order = '<' if self.wkb[self.offset] == 1 else '>'
+        self.offset += 1
+        geometry_type = self._read_uint(byte_order)
+
+        has_z = bool(geometry_type & WKB_Z_FLAG)
+        has_m = bool(geometry_type & WKB_M_FLAG)
+        if geometry_type & WKB_SRID_FLAG:
+            self.offset += 4
+        geometry_type &= 0x0FFFFFFF
+
+        # ISO WKB: 1000 Z, 2000 M, 3000 ZM
+        dimensions, geometry_type = divmod(geometry_type, 1000)
+        has_z = has_z or dimensions in (1, 3)
+        has_m = has_m or dimensions in (2, 3)
+
+        return byte_order, geometry_type, 2 + has_z + has_m, has_z
+
+    def _read_points(self, byte_order, npoints, dims, has_z):
+        values = unpack_from(f'{byte_order}{npoints * dims}d', self.wkb, self.offset)
+        self.offset += 8 * npoints * dims
+
+        precision = self.precision
+        keep = 3 if has_z else 2
+        return [[round(v, precision) for v in values[i:i + keep]] for i in range(0, len(values), dims)]
+
+    def _read_linestring(self, byte_order, dims, has_z):
+        return self._read_points(byte_order, self._read_uint(byte_order), dims, has_z)
+
+    def _read_polygon(self, byte_order, dims, has_z):
+        return [self._read_linestring(byte_order, dims, has_z) for __ in range(self._read_uint(byte_order))]
+
+
+def wkb_to_geojson(wkb, precision=GEOJSON_PRECISION):
+    """Returns the GeoJSON geometry dict from WKB
+
+    :param wkb: WKB geometry
+    :type wkb: bytes, QByteArray
+    :param precision: number of decimals of coordinates
+    :type precision: int
+    :rtype: dict
+    """
+
+    return WkbReader(bytes(wkb), precision).read()
+
+
+def geometry_to_geojson(geometry, precision=GEOJSON_PRECISION):
+    """Returns the GeoJSON geometry dict of a QgsGeometry, None for null geometries.
+    Curved geometries are segmentized, like QgsJsonExporter does.
+
+    :param geometry: QGIS geometry
+    :type geometry: QgsGeometry
+    :param precision: number of decimals of coordinates
+    :type precision: int
+    :rtype: dict, None
+    """
+
+    if geometry is None or geometry.isNull():
+        return None
+
+    if QgsWkbTypes.isCurvedType(geometry.wkbType()):
+        geometry = QgsGeometry(geometry.constGet().segmentize())
+
+    return wkb_to_geojson(geometry.asWkb(), precision)
+
+
+class GeoJSONFeatureSerializer(object):
+    """
+    Serializes QgsFeature instances to GeoJSON Feature dicts or bytes.
+
+    :param fields: the fields of the features
+    :type fields: QgsFields
+    :param attributes: names of the attributes to serialize, None for every attribute
+    :type attributes: list, optional
+    :param precision: number of decimals of coordinates
+    :type precision: int, optional
+    :param with_geometry: False to serialize features without geometry
+    :type with_geometry: bool, optional
+    """
+
+    def __init__(self, fields, attributes=None, precision=GEOJSON_PRECISION, with_geometry=True):
+
+        self.precision = precision
+        self.with_geometry = with_geometry
+
+        # (index, name) of the attributes to serialize, computed once
+        self.attributes = [(idx, name) for idx, name in enumerate(fields.names())
+                           if attributes is None or name in attributes]
+
+    def geometry(self, feature):
+        if not self.with_geometry or not feature.hasGeometry():
+            return None
+        return geometry_to_geojson(feature.geometry(), self.precision)
+
+    def feature(self, feature, fid=None):
+        """Returns the GeoJSON Feature dict, attribute values are JSON serializable
+
+        :param feature: QGIS feature
+        :type feature: QgsFeature
+        :param fid: id of the GeoJSON feature, defaults to the QGIS feature id
+        :rtype: dict
+        """
+
+        values = feature.attributes()
+        return {
+            'type': 'Feature',
+            'id': feature.id() if fid is None else fid,
+            'geometry': self.geometry(feature),
+            'properties': {name: encode_value(values[idx]) for idx, name in self.attributes}
+        }
+
+    def feature_bytes(self, feature, fid=None):
+        """Returns the GeoJSON Feature as JSON bytes,
+        attribute values are encoded directly by the JSON encoder
+
+        :param feature: QGIS feature
+        :type feature: QgsFeature
+        :param fid: id of the GeoJSON feature, defaults to the QGIS feature id
+        :rtype: bytes
+        """
+
+        values = feature.attributes()
+        return dumps({
+            'type': 'Feature',
+            'id': feature.id() if fid is None else fid,
+            'geometry': self.geometry(feature),
+            'properties': {name: values[idx] for idx, name in self.attributes}
+        })
+
+    def feature_collection(self, features):
+        """Returns the GeoJSON FeatureCollection dict
+
+        :param features: QGIS features
+        :type features: iterable of QgsFeature
+        :rtype: dict
+        """
+
+        return {
+            'type': 'FeatureCollection',
+            'features': [self.feature(f) for f in features]
+        }
@@ -0,0 +1,352 @@
+# coding=utf-8
+"""Mapbox Vector Tile (MVT 2.1) encoding of QGIS features.
+
+Geometries are clipped to the (buffered) tile extent, simplified to the tile resolution and
+snapped to the tile grid. Tiles are written with a minimal protocol buffers encoder,
+so no extra dependency is needed.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import json
+import struct
+
+from django.conf import settings
+from qgis.core import QgsGeometry, QgsRectangle, QgsWkbTypes
+
+from core.utils.geojson import encode_value
+
+# Size of the tile grid
+MVT_EXTENT = getattr(settings, 'VECTOR_MVT_EXTENT', 4096)
+
+# Buffer around the tile, in tile grid units: avoids clipping artifacts of lines and polygons
+MVT_BUFFER = getattr(settings, 'VECTOR_MVT_BUFFER', 64)
+
+# Half side of the EPSG:3857 world
+WEB_MERCATOR_HALF_SIDE = 20037508.342789244
+
+# MVT geometry types
+MVT_POINT = 1
+MVT_LINESTRING = 2
+MVT_POLYGON = 3
+
+# MVT geometry commands
+CMD_MOVE_TO = 1
+CMD_LINE_TO = 2
+CMD_CLOSE_PATH = 7
+
+
+def tile_bounds(z, x, y):
+    """Returns the EPSG:3857 extent of the XYZ tile (y origin at top)
+
+    :param z: zoom level
+    :param x: tile column
+    :param y: tile row
+    :rtype: QgsRectangle
+    """
+
+    size = 2 * WEB_MERCATOR_HALF_SIDE / (2 ** z)
+    xmin = -WEB_MERCATOR_HALF_SIDE + x * size
+    ymax = WEB_MERCATOR_HALF_SIDE - y * size
+    return QgsRectangle(xmin, ymax - size, xmin + size, ymax)
+
+
+# Protocol buffers
+# ------------------------------------------------------------
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field, data):
+    return _key(field, 2) + _varint(len(data)) + data
+
+
+def _varint_field(field, value):
+    return _key(field, 0) + _varint(value)
+
+
+def _packed_field(field, values):
+    return _bytes_field(field, b''.join(_varint(v) for v in values))
+
+
+def _command(command, count):
+    return (command & 0x7) | (count << 3)
+
+
+# Geometries
+# ------------------------------------------------------------
+
+def _ring_area(ring):
+    """Twice the signed area of a ring of tile coordinates (positive when clockwise on screen)"""
+
+    area = 0
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        area += x1 * y2 - x2 * y1
+    return area
+
+
+def encode_geometry(geometry_type, parts):
+    """Returns the MVT geometry commands
+
+    :param geometry_type: MVT_POINT, MVT_LINESTRING or MVT_POLYGON
+    :param parts: points [(x, y), ...] for MVT_POINT, lines [[(x, y), ...], ...] for MVT_LINESTRING,
+                  rings (not closed, exterior rings followed by their interior rings) for MVT_POLYGON
+    :return: list of unsigned integers
+    :rtype: list
+    """
+
+    commands = []
+    cx = cy = 0
+
+    if geometry_type == MVT_POINT:
+        commands.append(_command(CMD_MOVE_TO, len(parts)))
+        for x, y in parts:
+            commands.extend((_zigzag(x - cx), _zigzag(y - cy)))
+            cx, cy = x, y
+        return commands
+
+    for part in parts:
+        x, y = part[0]
+        commands.extend((_command(CMD_MOVE_TO, 1), _zigzag(x - cx), _zigzag(y - cy)))
+        cx, cy = x, y
+        commands.append(_command(CMD_LINE_TO, len(part) - 1))
+        for x, y in part[1:]:
+            commands.extend((_zigzag(x - cx), _zigzag(y - cy)))
+            cx, cy = x, y
+        if geometry_type == MVT_POLYGON:
+            commands.append(_command(CMD_CLOSE_PATH, 1))
+
+    return commands
+
+
+class MvtTileEncoder(object):
+    """
+    Builds a vector tile from QGIS features with geometries in EPSG:3857.
+
+    :param z: zoom level
+    :param x: tile column
+    :param y: tile row
+    :param extent: size of the tile grid
+    :param buffer: buffer around the tile in tile grid units
+    """
+
+    def __init__(self, z, x, y, extent=MVT_EXTENT, buffer=MVT_BUFFER):
+
+        self.extent = extent
+        self.bounds = tile_bounds(z, x, y)
+        self.resolution = self.bounds.width() / extent
+
+        self.clip_rect = QgsRectangle(self.bounds)
+        self.clip_rect.grow(buffer * self.resolution)
+
+        self.layers = []
+
+    def tile_parts(self, geometry):
+        """Returns the MVT geometry type and the parts of a geometry in tile coordinates,
+        (None, []) if nothing is left after clipping and snapping
+
+        :param geometry: geometry in EPSG:3857
+        :type geometry: QgsGeometry
+        :rtype: tuple
+        """
+
+        if geometry is None or geometry.isNull():
+            return None, []
+
+        if QgsWkbTypes.isCurvedType(geometry.wkbType()):
+            geometry = QgsGeometry(geometry.constGet().segmentize())
+
+        geometry_type = QgsWkbTypes.geometryType(geometry.wkbType())
+
+        if geometry_type == QgsWkbTypes.PointGeometry:
+            points = []
+            for part in geometry.asGeometryCollection():
+                point = part.asPoint()
+                if self.clip_rect.contains(point):
+                    points.append(self.to_tile(point))
+            return (MVT_POINT, points) if points else (None, [])
+
+        if geometry_type not in (QgsWkbTypes.LineGeometry, QgsWkbTypes.PolygonGeometry):
+            return None, []
+
+        if not self.clip_rect.contains(geometry.boundingBox()):
+            if not self.clip_rect.intersects(geometry.boundingBox()):
+                return None, []
+            if hasattr(geometry, 'clipped'):
+                geometry = geometry.clipped(self.clip_rect)
+            else:
+                geometry = geometry.intersection(QgsGeometry.fromRect(self.clip_rect))
+
+        # Vertices closer than the tile resolution are not visible
+        simplified = geometry.simplify(self.resolution)
+        if simplified is not None and not simplified.isNull():
+            geometry = simplified
+
+        parts = []
+        for part in geometry.asGeometryCollection():
+            if QgsWkbTypes.geometryType(part.wkbType()) != geometry_type:
+                continue
+
+            if geometry_type == QgsWkbTypes.LineGeometry:
+                line = self.snap(part.asPolyline())
+                if len(line) >= 2:
+                    parts.append(line)
+                continue
+
+            for i, ring in enumerate(part.asPolygon()):
+                ring = self.snap(ring)
+                if len(ring) > 1 and ring[0] == ring[-1]:
+                    ring = ring[:-1]
+                if len(ring) < 3:
+                    if i == 0:
+                        break
+                    continue
+
+                # Exterior rings clockwise, interior rings counter-clockwise
+                area = _ring_area(ring)
+                if area == 0:
+                    if i == 0:
+                        break
+                    continue
+                if (i == 0) != (area > 0):
+                    ring.reverse()
+                parts.append(ring)
+
+        if not parts:
+            return None, []
+
+        return (MVT_LINESTRING if geometry_type == QgsWkbTypes.LineGeometry else MVT_POLYGON), parts
+
+    def to_tile(self, point):
+        return (int(round((point.x() - self.bounds.xMinimum()) / self.resolution)),
+                int(round((self.bounds.yMaximum() - point.y()) / self.resolution)))
+
+    def snap(self, points):
+        """Returns the points in tile coordinates, without consecutive duplicates"""
+
+        snapped = []
+        for point in points:
+            point = self.to_tile(point)
+            if not snapped or snapped[-1] != point:
+                snapped.append(point)
+        return snapped
+
+    def add_layer(self, name, features, attributes=None, fid_callback=None):
+        """Adds a layer to the tile
+
+        :param name: name of the tile layer
+        :param features: features with geometries in EPSG:3857
+        :type features: iterable of QgsFeature
+        :param attributes: (index, name) of the attributes to add as feature properties, None for no properties
+        :type attributes: list, optional
+        :param fid_callback: callable returning extra properties (dict) of a feature, i.e. server feature ids
+        :type fid_callback: callable, optional
+        :return: number of features added
+        :rtype: int
+        """
+
+        keys, key_index = [], {}
+        values, value_index = [], {}
+        encoded_features = []
+
+        def _tag(key, value):
+            value = encode_value(value)
+            if value is None:
+                return None
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value)
+
+            if key not in key_index:
+                key_index[key] = len(keys)
+                keys.append(key)
+
+            value_key = (type(value), value)
+            if value_key not in value_index:
+                value_index[value_key] = len(values)
+                values.append(value)
+
+            return key_index[key], value_index[value_key]
+
+        for feature in features:
+            geometry_type, parts = self.tile_parts(feature.geometry())
+            if geometry_type is None:
+                continue
+
+            properties = []
+            if attributes:
+                feature_values = feature.attributes()
+                properties.extend((name, feature_values[idx]) for idx, name in attributes)
+            if fid_callback is not None:
+                properties.extend(fid_callback(feature).items())
+
+            tags = []
+            for key, value in properties:
+                tag = _tag(key, value)
+                if tag is not None:
+                    tags.extend(tag)
+
+            data = b''
+            if feature.id() >= 0:
+                data += _varint_field(1, feature.id())
+            if tags:
+                data += _packed_field(2, tags)
+            data += _varint_field(3, geometry_type)
+            data += _packed_field(4, encode_geometry(geometry_type, parts))
+            encoded_features.append(data)
+
+        if not encoded_features:
+            return 0
+
+        layer = _varint_field(15, 2) + _bytes_field(1, name.encode('utf-8'))
+        layer += b''.join(_bytes_field(2, f) for f in encoded_features)
+        layer += b''.join(_bytes_field(3, k.encode('utf-8')) for k in keys)
+        layer += b''.join(_bytes_field(4, self.encode_value(v)) for v in values)
+        layer += _varint_field(5, self.extent)
+
+        self.layers.append(layer)
+
+        return len(encoded_features)
+
+    @staticmethod
+    def encode_value(value):
+        """Returns the MVT Value message of a python value"""
+
+        if isinstance(value, bool):
+            return _varint_field(7, int(value))
+        if isinstance(value, int):
+            if value < 0:
+                return _varint_field(6, _zigzag(value))
+            return _varint_field(5, value)
+        if isinstance(value, float):
+            return _key(3, 1) + struct.pack('<d', value)
+        return _bytes_field(1, str(value).encode('utf-8'))
+
+    def encode(self):
+        """Returns the tile bytes
+
+        :rtype: bytes
+        """
+
+        return b''.join(_bytes_field(3, layer) for layer in self.layers)
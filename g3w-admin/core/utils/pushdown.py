@@ -0,0 +1,614 @@
+# coding=utf-8
+"""Provider side (SQL) execution of QGIS feature requests.
+
+Translates a QgsFeatureRequest (layer subset string, filter expression, filter rect and filter fids)
+into a SQL WHERE clause for postgres, spatialite and GeoPackage (ogr) layers,
+so aggregations like counting can be executed by the database instead of iterating features.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import json
+import logging
+
+from django.conf import settings
+from qgis.core import (
+    QgsCoordinateTransform,
+    QgsCsException,
+    QgsDataSourceUri,
+    QgsExpression,
+    QgsExpressionNode,
+    QgsExpressionNodeBinaryOperator,
+    QgsExpressionNodeUnaryOperator,
+    QgsFeatureRequest,
+    QgsFields,
+    QgsProviderRegistry
+)
+from qgis.PyQt.QtCore import QVariant, QDate, QDateTime, QTime
+
+logger = logging.getLogger('module_core')
+
+# Over this number of estimated features, approximate counts return the planner estimate
+VECTOR_APPROX_COUNT_THRESHOLD = getattr(settings, 'VECTOR_APPROX_COUNT_THRESHOLD', 100000)
+
+
+class PushdownNotSupported(Exception):
+    """Raised when a feature request cannot be translated into provider SQL"""
+    pass
+
+
+class ProviderSql(object):
+    """
+    Base class for provider SQL dialects: builds and executes SQL for a QGIS vector layer.
+    """
+
+    provider = None
+
+    # SQL operator for case insensitive LIKE
+    ilike = 'ILIKE'
+
+    # Escape clause for LIKE operators
+    like_escape = ''
+
+    # SQL for QGIS boolean literals
+    true, false = 'TRUE', 'FALSE'
+
+    def __init__(self, qgis_layer):
+        self.qgis_layer = qgis_layer
+        self.uri = QgsDataSourceUri(qgis_layer.source())
+        self.fields = qgis_layer.fields()
+
+        pk_idxs = qgis_layer.dataProvider().pkAttributeIndexes()
+        self.pk_columns = [self.fields[idx].name() for idx in pk_idxs]
+
+    # Connection
+    # ------------------------------------------------------------
+
+    def connection_uri(self):
+        """Returns the uri to create the provider connection"""
+
+        return self.qgis_layer.source()
+
+    def execute(self, sql):
+        """Executes the SQL and returns the rows
+
+        :param sql: SQL query
+        :type sql: str
+        :return: list of rows
+        :rtype: list
+        """
+
+        md = QgsProviderRegistry.instance().providerMetadata(self.provider)
+        conn = md.createConnection(self.connection_uri(), {})
+        logger.debug(f'Pushdown SQL on layer {self.qgis_layer.name()}: {sql}')
+        return conn.executeSql(sql)
+
+    # Quoting
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def quote_identifier(identifier):
+        """Returns a quoted SQL identifier"""
+
+        return '"%s"' % identifier.replace('"', '""')
+
+    def quote_value(self, value):
+        """Returns a SQL literal for a python/QVariant value"""
+
+        if value is None or (isinstance(value, QVariant) and value.isNull()):
+            return 'NULL'
+        if isinstance(value, bool):
+            return self.true if value else self.false
+        if isinstance(value, (int, float)):
+            return repr(value)
+        if isinstance(value, QDateTime):
+            value = value.toString('yyyy-MM-dd HH:mm:ss')
+        elif isinstance(value, QDate):
+            value = value.toString('yyyy-MM-dd')
+        elif isinstance(value, QTime):
+            value = value.toString('HH:mm:ss')
+        if not isinstance(value, str):
+            raise PushdownNotSupported(f'Literal type not supported: {type(value)}')
+
+        return "'%s'" % value.replace("'", "''")
+
+    # Layer information
+    # ------------------------------------------------------------
+
+    def table(self):
+        """Returns the SQL table reference for FROM clause"""
+
+        raise NotImplementedError("All subclasses must implement this method")
+
+    def geometry_column(self):
+        """Returns the quoted geometry column"""
+
+        if not self.uri.geometryColumn():
+            raise PushdownNotSupported('Layer without geometry column')
+        return self.quote_identifier(self.uri.geometryColumn())
+
+    def srid(self):
+        """Returns the SRID of the layer geometries"""
+
+        return self.qgis_layer.crs().postgisSrid()
+
+    def column(self, name):
+        """Returns the quoted column for a layer field name, only provider fields are allowed"""
+
+        idx = self.fields.lookupField(name)
+        if idx < 0 or self.fields.fieldOrigin(idx) != QgsFields.OriginProvider:
+            raise PushdownNotSupported(f'Field "{name}" is not a provider field')
+        return self.quote_identifier(self.fields[idx].name())
+
+    def is_string_column(self, name):
+        idx = self.fields.lookupField(name)
+        return idx >= 0 and self.fields[idx].type() == QVariant.String
+
+    def prefix_condition(self, name, prefix):
+        """Returns the SQL condition for case insensitive values of the field starting with prefix"""
+
+        column = self.column(name)
+        if not self.is_string_column(name):
+            column = f'CAST({column} AS TEXT)'
+        pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        return f'{column} {self.ilike} {self.quote_value(pattern)}{self.like_escape}'
+
+    def fid_column(self):
+        """Returns the column corresponding to the QGIS feature id ($id)"""
+
+        if len(self.pk_columns) != 1:
+            raise PushdownNotSupported('$id is not mapped to a single primary key')
+        idx = self.fields.lookupField(self.pk_columns[0])
+        if self.fields[idx].type() not in self.fid_column_types:
+            raise PushdownNotSupported('$id is not mapped to an integer primary key')
+        return self.quote_identifier(self.pk_columns[0])
+
+    fid_column_types = (QVariant.Int, QVariant.LongLong)
+
+    # Spatial filters
+    # ------------------------------------------------------------
+
+    def bbox_condition(self, rect):
+        """Returns the SQL condition for features intersecting the QgsRectangle"""
+
+        raise PushdownNotSupported(f'BBOX filter not supported by {self.provider}')
+
+    def geometry_from_wkt(self, wkt_sql):
+        """Returns the SQL geometry built from a WKT SQL literal"""
+
+        raise PushdownNotSupported(f'Geometry functions not supported by {self.provider}')
+
+    def spatial_predicate(self, name, left, right):
+        """Returns the SQL for a spatial predicate function (intersects, contains, ...)"""
+
+        raise PushdownNotSupported(f'Geometry functions not supported by {self.provider}')
+
+    # Estimates
+    # ------------------------------------------------------------
+
+    def estimate_count(self, where):
+        """Returns the planner estimate of the number of rows, None if not available"""
+
+        return None
+
+
+class PostgresSql(ProviderSql):
+
+    provider = 'postgres'
+    fid_column_types = (QVariant.Int, )
+
+    def table(self):
+        table = self.uri.quotedTablename()
+        if self.uri.table().startswith('('):
+            return f'{self.uri.table()} AS "_g3w_subquery"'
+        return table
+
+    def bbox_condition(self, rect):
+        return '{geom} && ST_MakeEnvelope({xmin!r}, {ymin!r}, {xmax!r}, {ymax!r}, {srid})'.format(
+            geom=self.geometry_column(), xmin=rect.xMinimum(), ymin=rect.yMinimum(),
+            xmax=rect.xMaximum(), ymax=rect.yMaximum(), srid=self.srid())
+
+    def geometry_from_wkt(self, wkt_sql):
+        return f'ST_GeomFromText({wkt_sql}, {self.srid()})'
+
+    def spatial_predicate(self, name, left, right):
+        return f'ST_{name.capitalize()}({left}, {right})'
+
+    def estimate_count(self, where):
+        rows = self.execute(f'EXPLAIN (FORMAT JSON) SELECT 1 FROM {self.table()} WHERE {where}')
+        plan = rows[0][0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class SpatialiteSql(ProviderSql):
+
+    provider = 'spatialite'
+    ilike = 'LIKE'
+    like_escape = " ESCAPE '\\'"
+    true, false = '1', '0'
+
+    def table(self):
+        return self.quote_identifier(self.uri.table())
+
+    def bbox_condition(self, rect):
+        return 'MbrIntersects({geom}, BuildMbr({xmin!r}, {ymin!r}, {xmax!r}, {ymax!r}))'.format(
+            geom=self.geometry_column(), xmin=rect.xMinimum(), ymin=rect.yMinimum(),
+            xmax=rect.xMaximum(), ymax=rect.yMaximum())
+
+    def geometry_from_wkt(self, wkt_sql):
+        return f'GeomFromText({wkt_sql}, {self.srid()})'
+
+    def spatial_predicate(self, name, left, right):
+        return f'ST_{name.capitalize()}({left}, {right})'
+
+
+class GeoPackageSql(ProviderSql):
+
+    provider = 'ogr'
+    ilike = 'LIKE'
+    like_escape = " ESCAPE '\\'"
+    true, false = '1', '0'
+
+    def __init__(self, qgis_layer):
+        super().__init__(qgis_layer)
+        parts = QgsProviderRegistry.instance().decodeUri('ogr', qgis_layer.source())
+        self.path = parts.get('path', '')
+        self.layer_name = parts.get('layerName')
+
+        if not self.path.lower().endswith('.gpkg') or not self.layer_name:
+            raise PushdownNotSupported('Only GeoPackage layers are supported by ogr provider')
+
+        # OGR SQL subset strings cannot be embedded
+        if qgis_layer.subsetString().strip().lower().startswith('select'):
+            raise PushdownNotSupported('OGR SQL subset string')
+
+    def connection_uri(self):
+        return self.path
+
+    def table(self):
+        return self.quote_identifier(self.layer_name)
+
+    def geometry_column(self):
+        geometry_column = self.qgis_layer.dataProvider().geometryColumnName() \
+            if hasattr(self.qgis_layer.dataProvider(), 'geometryColumnName') else ''
+        if not geometry_column:
+            raise PushdownNotSupported('Layer without geometry column')
+        return geometry_column
+
+    def bbox_condition(self, rect):
+
+        # Use the GeoPackage RTree spatial index
+        rtree = self.quote_identifier(f'rtree_{self.layer_name}_{self.geometry_column()}')
+        return '{fid} IN (SELECT id FROM {rtree} WHERE maxx >= {xmin!r} AND minx <= {xmax!r} ' \
+               'AND maxy >= {ymin!r} AND miny <= {ymax!r})'.format(
+                fid=self.fid_column(), rtree=rtree, xmin=rect.xMinimum(), ymin=rect.yMinimum(),
+                xmax=rect.xMaximum(), ymax=rect.yMaximum())
+
+
+def get_provider_sql(qgis_layer):
+    """Returns the ProviderSql instance for the layer
+
+    :param qgis_layer: the QGIS vector layer instance
+    :type qgis_layer: QgsVectorLayer
+    :raises PushdownNotSupported: if the layer provider is not supported
+    :rtype: ProviderSql
+    """
+
+    classes = {c.provider: c for c in (PostgresSql, SpatialiteSql, GeoPackageSql)}
+    try:
+        return classes[qgis_layer.providerType()](qgis_layer)
+    except KeyError:
+        raise PushdownNotSupported(f'Provider {qgis_layer.providerType()} not supported')
+
+
+class ExpressionSqlCompiler(object):
+    """
+    Compiles a QgsExpression into a SQL condition for a ProviderSql dialect.
+    Raises PushdownNotSupported for every node that has not an exact SQL translation.
+    """
+
+    BINARY_OPERATORS = {
+        QgsExpressionNodeBinaryOperator.boOr: 'OR',
+        QgsExpressionNodeBinaryOperator.boAnd: 'AND',
+        QgsExpressionNodeBinaryOperator.boEQ: '=',
+        QgsExpressionNodeBinaryOperator.boNE: '<>',
+        QgsExpressionNodeBinaryOperator.boLE: '<=',
+        QgsExpressionNodeBinaryOperator.boGE: '>=',
+        QgsExpressionNodeBinaryOperator.boLT: '<',
+        QgsExpressionNodeBinaryOperator.boGT: '>',
+        QgsExpressionNodeBinaryOperator.boPlus: '+',
+        QgsExpressionNodeBinaryOperator.boMinus: '-',
+        QgsExpressionNodeBinaryOperator.boMul: '*',
+        QgsExpressionNodeBinaryOperator.boConcat: '||',
+    }
+
+    SPATIAL_PREDICATES = ('intersects', 'contains', 'within', 'disjoint', 'touches', 'crosses', 'overlaps')
+
+    def __init__(self, provider_sql):
+        self.sql = provider_sql
+
+    def compile(self, expression):
+        """Returns the SQL condition for a QgsExpression or an expression string"""
+
+        if not isinstance(expression, QgsExpression):
+            expression = QgsExpression(expression)
+        if expression.hasParserError() or not expression.rootNode():
+            raise PushdownNotSupported(f'Expression parser error: {expression.parserErrorString()}')
+
+        return self.compile_node(expression.rootNode())
+
+    def compile_node(self, node):
+
+        node_type = node.nodeType()
+
+        if node_type == QgsExpressionNode.ntLiteral:
+            return self.sql.quote_value(node.value())
+
+        if node_type == QgsExpressionNode.ntColumnRef:
+            return self.sql.column(node.name())
+
+        if node_type == QgsExpressionNode.ntUnaryOperator:
+            operand = self.compile_node(node.operand())
+            if node.op() == QgsExpressionNodeUnaryOperator.uoNot:
+                return f'(NOT {operand})'
+            return f'(-{operand})'
+
+        if node_type == QgsExpressionNode.ntBinaryOperator:
+            return self.compile_binary(node)
+
+        if node_type == QgsExpressionNode.ntInOperator:
+            values = [self.compile_node(n) for n in node.list().list()]
+            if not values:
+                raise PushdownNotSupported('Empty IN list')
+            return '({left} {op} ({values}))'.format(
+                left=self.compile_node(node.node()), op='NOT IN' if node.isNotIn() else 'IN',
+                values=', '.join(values))
+
+        if node_type == QgsExpressionNode.ntFunction:
+            return self.compile_function(node)
+
+        raise PushdownNotSupported(f'Expression node not supported: {node.dump()}')
+
+    def compile_binary(self, node):
+
+        op = node.op()
+        left_node, right_node = node.opLeft(), node.opRight()
+
+        if op in (QgsExpressionNodeBinaryOperator.boILike, QgsExpressionNodeBinaryOperator.boNotILike,
+                  QgsExpressionNodeBinaryOperator.boLike, QgsExpressionNodeBinaryOperator.boNotLike):
+
+            case_insensitive = op in (QgsExpressionNodeBinaryOperator.boILike,
+                                      QgsExpressionNodeBinaryOperator.boNotILike)
+            negate = op in (QgsExpressionNodeBinaryOperator.boNotILike, QgsExpressionNodeBinaryOperator.boNotLike)
+
+            # LIKE is case insensitive in SQLite: no exact translation
+            if not case_insensitive and self.sql.ilike == 'LIKE':
+                raise PushdownNotSupported('Case sensitive LIKE not supported')
+
+            left = self.compile_node(left_node)
+
+            # QGIS compares the string representation of values
+            if (left_node.nodeType() != QgsExpressionNode.ntColumnRef
+                    or not self.sql.is_string_column(left_node.name())):
+                left = f'CAST({left} AS TEXT)'
+
+            return '({left} {neg}{op} {right}{escape})'.format(
+                left=left, neg='NOT ' if negate else '', op=self.sql.ilike if case_insensitive else 'LIKE',
+                right=self.compile_node(right_node), escape=self.sql.like_escape)
+
+        if op in (QgsExpressionNodeBinaryOperator.boIs, QgsExpressionNodeBinaryOperator.boIsNot):
+            left = self.compile_node(left_node)
+            right = self.compile_node(right_node)
+            negate = op == QgsExpressionNodeBinaryOperator.boIsNot
+            if right == 'NULL':
+                return f'({left} IS {"NOT " if negate else ""}NULL)'
+            if self.sql.provider == 'postgres':
+                return f'({left} IS {"" if negate else "NOT "}DISTINCT FROM {right})'
+            return f'({left} IS {"NOT " if negate else ""}{right})'
+
+        if op not in self.BINARY_OPERATORS:
+            raise PushdownNotSupported(f'Binary operator not supported: {node.text()}')
+
+        return '({left} {op} {right})'.format(
+            left=self.compile_node(left_node), op=self.BINARY_OPERATORS[op], right=self.compile_node(right_node))
+
+    def compile_function(self, node):
+
+        name = QgsExpression.Functions()[node.fnIndex()].name().lower()
+        args = node.args().list() if node.args() else []
+
+        if name == '$id':
+            return self.sql.fid_column()
+
+        if name == '$geometry':
+            return self.sql.geometry_column()
+
+        if name in ('lower', 'upper') and len(args) == 1:
+            return f'{name.upper()}({self.compile_node(args[0])})'
+
+        if name == 'geom_from_wkt' and len(args) == 1 and args[0].nodeType() == QgsExpressionNode.ntLiteral:
+            return self.sql.geometry_from_wkt(self.compile_node(args[0]))
+
+        if name in self.SPATIAL_PREDICATES and len(args) == 2:
+            return self.sql.spatial_predicate(name, self.compile_node(args[0]), self.compile_node(args[1]))
+
+        raise PushdownNotSupported(f'Function not supported: {name}')
+
+
+def compile_feature_request(qgis_layer, qgis_feature_request=None, provider_sql=None):
+    """Returns the SQL WHERE condition equivalent to the layer subset string combined
+    with the QgsFeatureRequest filters (filter rect, filter expression, filter fids).
+
+    :param qgis_layer: the QGIS vector layer instance
+    :type qgis_layer: QgsVectorLayer
+    :param qgis_feature_request: the QGIS feature request
+    :type qgis_feature_request: QgsFeatureRequest, optional
+    :param provider_sql: ProviderSql instance, created if not provided
+    :type provider_sql: ProviderSql, optional
+    :raises PushdownNotSupported: if a filter cannot be translated
+    :return: SQL condition, 'TRUE' condition is '1 = 1'
+    :rtype: str
+    """
+
+    if provider_sql is None:
+        provider_sql = get_provider_sql(qgis_layer)
+
+    parts = []
+
+    subset_string = qgis_layer.subsetString()
+    if subset_string:
+        parts.append(subset_string)
+
+    if qgis_feature_request is not None:
+
+        if hasattr(qgis_feature_request, 'spatialFilterType') and \
+                qgis_feature_request.spatialFilterType() not in (0, 1):  # NoFilter, BoundingBox
+            raise PushdownNotSupported('Distance within spatial filter')
+
+        rect = qgis_feature_request.filterRect()
+        if rect is not None and not rect.isNull() and not rect.isEmpty():
+
+            # With a destination CRS the filter rect is in the destination CRS, like the QGIS iterators do
+            destination_crs = qgis_feature_request.destinationCrs()
+            if destination_crs.isValid() and destination_crs != qgis_layer.crs():
+                try:
+                    rect = QgsCoordinateTransform(qgis_layer.crs(), destination_crs,
+                                                  qgis_feature_request.transformContext()).transformBoundingBox(
+                        rect, QgsCoordinateTransform.ReverseTransform)
+                except QgsCsException as e:
+                    raise PushdownNotSupported(f'Filter rect transform error: {e}')
+
+            parts.append(provider_sql.bbox_condition(rect))
+
+        filter_type = qgis_feature_request.filterType()
+        if filter_type == QgsFeatureRequest.FilterExpression:
+            parts.append(ExpressionSqlCompiler(provider_sql).compile(qgis_feature_request.filterExpression()))
+        elif filter_type == QgsFeatureRequest.FilterFid:
+            parts.append(f'{provider_sql.fid_column()} = {int(qgis_feature_request.filterFid())}')
+        elif filter_type == QgsFeatureRequest.FilterFids:
+            fids = ', '.join(str(int(fid)) for fid in qgis_feature_request.filterFids())
+            parts.append(f'{provider_sql.fid_column()} IN ({fids})' if fids else '1 = 0')
+
+    if not parts:
+        return '1 = 1'
+
+    return ' AND '.join(f'({p})' for p in parts)
+
+
+def provider_count(qgis_layer, qgis_feature_request=None, approximate=False):
+    """Returns the number of features matching the request counted by the provider
+    with a SELECT count(*), None if the request cannot be executed on provider side.
+
+    :param qgis_layer: the QGIS vector layer instance
+    :type qgis_layer: QgsVectorLayer
+    :param qgis_feature_request: the QGIS feature request
+    :type qgis_feature_request: QgsFeatureRequest, optional
+    :param approximate: return the planner estimate when it is over VECTOR_APPROX_COUNT_THRESHOLD,
+                        only for providers with planner estimates (postgres)
+    :type approximate: bool
+    :rtype: int, None
+    """
+
+    try:
+        provider_sql = get_provider_sql(qgis_layer)
+        where = compile_feature_request(qgis_layer, qgis_feature_request, provider_sql)
+
+        if approximate:
+            estimate = provider_sql.estimate_count(where)
+            if estimate is not None and estimate >= VECTOR_APPROX_COUNT_THRESHOLD:
+                return estimate
+
+        rows = provider_sql.execute(f'SELECT count(*) FROM {provider_sql.table()} WHERE {where}')
+        return int(rows[0][0])
+
+    except PushdownNotSupported as e:
+        logger.debug(f'Provider count fallback for layer {qgis_layer.name()}: {e}')
+    except Exception as e:
+        logger.warning(f'Provider count error for layer {qgis_layer.name()}: {e}')
+
+    return None
+
+
+def provider_unique_values(qgis_layer, field_name, qgis_feature_request=None, limit=None, prefix=None):
+    """Returns the sorted distinct not NULL values of a field for the features matching the request,
+    selected by the provider with a SELECT DISTINCT, None if the request cannot be executed on provider side.
+
+    :param qgis_layer: the QGIS vector layer instance
+    :type qgis_layer: QgsVectorLayer
+    :param field_name: name of the field
+    :type field_name: str
+    :param qgis_feature_request: the QGIS feature request
+    :type qgis_feature_request: QgsFeatureRequest, optional
+    :param limit: max number of values to return
+    :type limit: int, optional
+    :param prefix: return only values starting with prefix (case insensitive)
+    :type prefix: str, optional
+    :rtype: list, None
+    """
+
+    try:
+        provider_sql = get_provider_sql(qgis_layer)
+        column = provider_sql.column(field_name)
+        where = compile_feature_request(qgis_layer, qgis_feature_request, provider_sql)
+
+        conditions = [where, f'{column} IS NOT NULL']
+        if prefix:
+            conditions.append(provider_sql.prefix_condition(field_name, prefix))
+
+        sql = f'SELECT DISTINCT {column} FROM {provider_sql.table()} WHERE {" AND ".join(conditions)} ' \
+              f'ORDER BY {column}'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+
+        return [row[0] for row in provider_sql.execute(sql)]
+
+    except PushdownNotSupported as e:
+        logger.debug(f'Provider unique values fallback for layer {qgis_layer.name()}: {e}')
+    except Exception as e:
+        logger.warning(f'Provider unique values error for layer {qgis_layer.name()}: {e}')
+
+    return None
+
+
+def provider_feature_ids(qgis_layer, qgis_feature_request=None):
+    """Returns the server FIDs (see core.utils.qgisapi.server_fid) of the features matching the request,
+    selected by the provider with a SELECT of the primary key columns only,
+    None if the request cannot be executed on provider side.
+
+    :param qgis_layer: the QGIS vector layer instance
+    :type qgis_layer: QgsVectorLayer
+    :param qgis_feature_request: the QGIS feature request
+    :type qgis_feature_request: QgsFeatureRequest, optional
+    :rtype: list, None
+    """
+
+    try:
+        provider_sql = get_provider_sql(qgis_layer)
+        if not provider_sql.pk_columns:
+            raise PushdownNotSupported('Layer without primary key')
+
+        for name in provider_sql.pk_columns:
+            idx = provider_sql.fields.lookupField(name)
+            if provider_sql.fields[idx].type() not in provider_sql.fid_column_types + (QVariant.String, ):
+                raise PushdownNotSupported(f'Primary key column "{name}" type not supported')
+
+        columns = ', '.join(provider_sql.column(name) for name in provider_sql.pk_columns)
+        where = compile_feature_request(qgis_layer, qgis_feature_request, provider_sql)
+
+        # Same rules of server_fid(): empty values are skipped, values are joined by '@@'
+        return ['@@'.join(str(v) for v in row if v) for row in provider_sql.execute(
+            f'SELECT {columns} FROM {provider_sql.table()} WHERE {where}')]
+
+    except PushdownNotSupported as e:
+        logger.debug(f'Provider feature ids fallback for layer {qgis_layer.name()}: {e}')
+    except Exception as e:
+        logger.warning(f'Provider feature ids error for layer {qgis_layer.name()}: {e}')
+
+    return None
@@ -14,10 +14,10 @@ __copyright__ = 'Copyright 2020, Gis3W'
 
 import logging
 import json
+import base64
+import uuid
+from itertools import islice
 
-from qgis.core import QgsFeatureRequest, QgsRectangle, QgsVectorLayer
-
-from qdjango.models import Project
 from qgis.core import (
     QgsFeatureRequest,
     QgsRectangle,
@@ -30,23 +30,37 @@ from qgis.core import (
     QgsWkbTypes,
     QgsCoordinateTransform,
     QgsCoordinateReferenceSystem,
-    QgsCoordinateTransformContext
+    QgsCoordinateTransformContext,
+    QgsField,
+    QgsVectorFileWriter
 )
 
 
 from qgis.PyQt.QtCore import (
     QDate,
     QDateTime,
-    QTime
+    QTime,
+    QVariant
 )
 
+from django.conf import settings
+from django.core.cache import cache
 from django.utils.translation import gettext_lazy as _
 from qdjango.apps import get_qgs_project
 from qdjango.models import Layer, Project
+from core.utils.pushdown import provider_count, provider_feature_ids, provider_unique_values
+from core.utils.searchindex import search_prefilter
 
 
 logger = logging.getLogger(__file__)
 
+# Time to live (seconds) of the feature ids stored by `cache_feature_ids`
+VECTOR_FEATURE_IDS_TOKEN_TTL = getattr(settings, 'VECTOR_FEATURE_IDS_TOKEN_TTL', 3600)
+
+# Field formatting plans of the process by layer, style and project version, see `FieldFormattingPlan.for_layer`
+_formatting_plans = {}
+FORMATTING_PLANS_MAX = 1000
+
 
 # Functions block list for QgsExpression evaluation
 FORBIDDEN_FUNCTIONS = (
@@ -122,6 +136,35 @@ def server_fid(feature, provider) -> str:
     return '@@'.join(bits)
 
 
+def cache_feature_ids(layer_pk, server_fids):
+    """Stores a list of server FIDs in the cache backend and returns the token to retrieve them
+
+    :param layer_pk: pk of the qdjango layer the server FIDs belong to
+    :param server_fids: list of server FIDs
+    :return: the token for `get_cached_feature_ids`
+    :rtype: str
+    """
+
+    token = uuid.uuid4().hex
+    cache.set(f'vector_fids_{layer_pk}_{token}', ','.join(server_fids), VECTOR_FEATURE_IDS_TOKEN_TTL)
+    return token
+
+
+def get_cached_feature_ids(layer_pk, token):
+    """Returns the list of server FIDs stored by `cache_feature_ids`,
+    None if the token is not valid for the layer or it is expired
+
+    :param layer_pk: pk of the qdjango layer the server FIDs belong to
+    :param token: the token returned by `cache_feature_ids`
+    :rtype: list, None
+    """
+
+    server_fids = cache.get(f'vector_fids_{layer_pk}_{token}')
+    if server_fids is None:
+        return None
+    return server_fids.split(',') if server_fids else []
+
+
 def get_layer_fids_from_server_fids(server_fids, layer):
     """From a list of server_fids for a QGIS vector layer return layer fids
 
@@ -138,6 +181,128 @@ def get_layer_fids_from_server_fids(server_fids, layer):
 
     return [f.id() for f in features]
 
+
+class CursorError(Exception):
+    """Raised when a pagination cursor is not valid for the feature request"""
+    pass
+
+
+def _cursor_ordering(qgis_layer, qgis_feature_request):
+    """Returns the keyset ordering for cursor pagination: the fields of the request ordering
+    followed by the primary key fields (or $id), as a list of (field name, ascending) tuples.
+    A None field name stands for $id.
+
+    :param qgis_layer: the QGIS vector layer instance
+    :type qgis_layer: QgsVectorLayer
+    :param qgis_feature_request: the QGIS feature request
+    :type qgis_feature_request: QgsFeatureRequest
+    :raises CursorError: if an ordering clause is not a simple field
+    :rtype: list
+    """
+
+    names = qgis_layer.fields().names()
+
+    ordering = []
+    for clause in qgis_feature_request.orderBy():
+        expression = clause.expression()
+        if expression.expression() == '$id':
+            ordering.append((None, clause.ascending()))
+            continue
+        if not expression.isField():
+            raise CursorError(_('Cursor pagination supports ordering by fields only!'))
+        idx = QgsExpression.expressionToLayerFieldIndex(expression.expression(), qgis_layer)
+        if idx >= 0:
+            ordering.append((names[idx], clause.ascending()))
+
+    # Add primary keys (or $id) as tie-breaker
+    pk_names = [names[idx] for idx in qgis_layer.dataProvider().pkAttributeIndexes()] or [None]
+    ordering_names = [field_name for field_name, __ in ordering]
+    ordering += [(name, True) for name in pk_names if name not in ordering_names]
+
+    return ordering
+
+
+def _cursor_key_expression(field_name):
+    """Returns the expression for a keyset ordering field"""
+
+    return '$id' if field_name is None else QgsExpression.quotedColumnRef(field_name)
+
+
+def _cursor_filter_expression(ordering, values):
+    """Returns the expression that selects the features after the keyset `values`.
+    Ascending keys are ordered with NULLs last, descending keys with NULLs first.
+
+    :param ordering: list of (field name, ascending) tuples
+    :param values: list of keyset values of the last feature of the previous page
+    :rtype: str
+    """
+
+    parts = []
+    equals = []
+    for (field_name, ascending), value in zip(ordering, values):
+        column = _cursor_key_expression(field_name)
+
+        if value is None:
+            after = None if ascending else f'{column} IS NOT NULL'
+        else:
+            after = '{column} {op} {value}'.format(
+                column=column, op='>' if ascending else '<', value=QgsExpression.quotedValue(value))
+            if ascending:
+                after = f'({after} OR {column} IS NULL)'
+
+        if after is not None:
+            parts.append(' AND '.join(equals + [after]))
+
+        equals.append(f'{column} IS NULL' if value is None else f'{column} = {QgsExpression.quotedValue(value)}')
+
+    if not parts:
+        return 'FALSE'
+
+    return ' OR '.join(f'({p})' for p in parts)
+
+
+def encode_cursor(qgis_layer, qgis_feature_request, feature):
+    """Returns the opaque pagination cursor to get the features following `feature`,
+    the cursor is built from the ordering key and the primary keys values of the feature.
+
+    :param qgis_layer: the QGIS vector layer instance
+    :type qgis_layer: QgsVectorLayer
+    :param qgis_feature_request: the QGIS feature request used to fetch the feature
+    :type qgis_feature_request: QgsFeatureRequest
+    :param feature: the last feature of the current page
+    :type feature: QgsFeature
+    :return: cursor token
+    :rtype: str
+    """
+
+    ordering = _cursor_ordering(qgis_layer, qgis_feature_request)
+    values = [feature.id() if field_name is None else json.loads(QgsJsonUtils.encodeValue(feature[field_name]))
+              for field_name, __ in ordering]
+
+    token = json.dumps({'o': ordering, 'v': values}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(token.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Returns the (ordering, values) tuple stored in a cursor token
+
+    :param cursor: cursor token
+    :type cursor: str
+    :raises CursorError: if the token is not valid
+    :rtype: tuple
+    """
+
+    try:
+        token = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        ordering = [(field_name, bool(ascending)) for field_name, ascending in token['o']]
+        values = token['v']
+        assert len(ordering) == len(values)
+    except Exception:
+        raise CursorError(_('Invalid pagination cursor!'))
+
+    return ordering, values
+
+
 def get_qgis_layer(layer_info):
     """Returns a QGIS vector layer from a layer information record.
     The layer is normally not a clone but it is the live
@@ -160,50 +325,23 @@ def get_qgis_layer(layer_info):
         return QgsVectorLayer(datasource, name, provider_name)
 
 
-def __get_qgis_features(qgis_layer,
-                        qgis_feature_request=None,
-                        bbox_filter=None,
-                        attribute_filters=None,
-                        search_filter=None,
-                        with_geometry=True,
-                        page=None,
-                        page_size=None,
-                        ordering=None,
-                        exclude_fields=None,
-                        extra_expression=None,
-                        extra_subset_string=None):
-    """Private implementation for count and get"""
-
-    if qgis_feature_request is None:
-        qgis_feature_request = QgsFeatureRequest()
-
-    if exclude_fields is not None:
-        if exclude_fields == '__all__':
-            qgis_feature_request.setNoAttributes()
-        else:
-            qgis_feature_request.setSubsetOfAttributes([name for name in qgis_layer.fields().names() if name not in exclude_fields], qgis_layer.fields())
+def __set_qgis_feature_request_filters(qgis_layer,
+                                       qgis_feature_request,
+                                       bbox_filter=None,
+                                       attribute_filters=None,
+                                       search_filter=None,
+                                       extra_expression=None):
+    """Private implementation: combines the filter options into the QgsFeatureRequest"""
 
     expression_parts = []
 
     if extra_expression is not None:
         expression_parts.append(extra_expression)
 
-    if not with_geometry:
-        qgis_feature_request.setFlags(QgsFeatureRequest.NoGeometry)
-
     if bbox_filter is not None:
         assert isinstance(bbox_filter, QgsRectangle)
         qgis_feature_request.setFilterRect(bbox_filter)
 
-    # Ordering
-    if ordering is not None:
-        ascending = True
-        if ordering.startswith('-'):
-            ordering = ordering[1:]
-            ascending = False
-        order_by = QgsFeatureRequest.OrderBy([QgsFeatureRequest.OrderByClause('"%s"' % ordering, ascending)])
-        qgis_feature_request.setOrderBy(order_by)
-
     # Search
     if search_filter is not None:
         exp_template = '"{field_name}" ILIKE \'%' + search_filter.replace('\'', '\\\'') + '%\''
@@ -219,10 +357,86 @@ def __get_qgis_features(qgis_layer,
             exp_parts.append('"{field_name}" ILIKE \'%{field_value}%\''.format(field_name=field_name.replace('"', '\\"'), field_value=str(field_value).replace('\'', '\\\'')))
         expression_parts.append(' AND '.join(exp_parts))
 
+    if expression_parts:
+        qgis_feature_request.combineFilterExpression('(' + ') AND ('.join(expression_parts) + ')')
+
+
+def __iter_qgis_features(qgis_layer,
+                         qgis_feature_request=None,
+                         bbox_filter=None,
+                         attribute_filters=None,
+                         search_filter=None,
+                         with_geometry=True,
+                         page=None,
+                         page_size=None,
+                         ordering=None,
+                         exclude_fields=None,
+                         extra_expression=None,
+                         extra_subset_string=None,
+                         cursor=None):
+    """Private implementation for iter, count and get.
+
+    The QgsFeatureIterator is created immediately: the feature source is a snapshot of the layer
+    (subset string included), so the layer can be restored before the features are consumed.
+    """
+
+    if qgis_feature_request is None:
+        qgis_feature_request = QgsFeatureRequest()
+
+    if exclude_fields is not None:
+        if exclude_fields == '__all__':
+            qgis_feature_request.setNoAttributes()
+        else:
+            qgis_feature_request.setSubsetOfAttributes([name for name in qgis_layer.fields().names() if name not in exclude_fields], qgis_layer.fields())
+
+    if not with_geometry:
+        qgis_feature_request.setFlags(QgsFeatureRequest.NoGeometry)
+
+    # Ordering
+    if ordering is not None:
+        ascending = True
+        if ordering.startswith('-'):
+            ordering = ordering[1:]
+            ascending = False
+        order_by = QgsFeatureRequest.OrderBy([QgsFeatureRequest.OrderByClause('"%s"' % ordering, ascending)])
+        qgis_feature_request.setOrderBy(order_by)
+
+    __set_qgis_feature_request_filters(qgis_layer, qgis_feature_request, bbox_filter, attribute_filters,
+                                       search_filter, extra_expression)
+
+    expression_parts = []
     offset = 0
-    feature_count = qgis_layer.featureCount()
 
-    if page is not None and page_size is not None:
+    if cursor is not None:
+
+        # Keyset pagination: the page starts after the feature stored in the cursor.
+        # Work on a copy, the cursor filter must not leak into the caller request (i.e. counting)
+        qgis_feature_request = QgsFeatureRequest(qgis_feature_request)
+        page_size = int(page_size or 10)
+        ordering = _cursor_ordering(qgis_layer, qgis_feature_request)
+
+        if cursor:
+            cursor_ordering, values = decode_cursor(cursor)
+            if cursor_ordering != ordering:
+                raise CursorError(_('Pagination cursor does not match the request ordering!'))
+            expression_parts.append(_cursor_filter_expression(ordering, values))
+
+        qgis_feature_request.setOrderBy(QgsFeatureRequest.OrderBy([
+            QgsFeatureRequest.OrderByClause(_cursor_key_expression(field_name), ascending, not ascending)
+            for field_name, ascending in ordering]))
+
+        # Keyset fields are needed to build the next cursor
+        if qgis_feature_request.flags() & QgsFeatureRequest.SubsetOfAttributes:
+            attrs = qgis_feature_request.subsetOfAttributes()
+            for field_name, __ in ordering:
+                idx = qgis_layer.fields().lookupField(field_name) if field_name is not None else -1
+                if idx >= 0 and idx not in attrs:
+                    attrs.append(idx)
+            qgis_feature_request.setSubsetOfAttributes(attrs)
+
+        qgis_feature_request.setLimit(page_size)
+
+    elif page is not None and page_size is not None:
         page_size = int(page_size)
         page = int(page)
         offset = page_size * (page - 1)
@@ -243,7 +457,12 @@ def __get_qgis_features(qgis_layer,
         bbox=qgis_feature_request.filterRect()
     ))
 
-    features = []
+    # Provider side prefilter by the layer search index, if any
+    if search_filter is not None:
+        prefilter = search_prefilter(qgis_layer, [search_filter], qgis_layer.fields().names())
+        if prefilter:
+            extra_subset_string = prefilter if extra_subset_string is None \
+                else f'({extra_subset_string}) AND ({prefilter})'
 
     original_subset_string = qgis_layer.subsetString()
     if extra_subset_string is not None:
@@ -255,22 +474,16 @@ def __get_qgis_features(qgis_layer,
 
     iterator = qgis_layer.getFeatures(qgis_feature_request)
 
-    try:
-        for _ in range(offset):
-            next(iterator)
-        if page_size is not None:
-            for __ in range(page_size):
-                features.append(next(iterator))
-        else:
-            while True:
-                features.append(next(iterator))
-    except StopIteration:
-        pass
-
     if extra_subset_string is not None:
         qgis_layer.setSubsetString(original_subset_string)
 
-    return features
+    return islice(iterator, offset, offset + page_size if page_size is not None else None)
+
+
+def __get_qgis_features(*args, **kwargs):
+    """Private implementation for count and get"""
+
+    return list(__iter_qgis_features(*args, **kwargs))
 
 
 def get_qgis_features(qgis_layer,
@@ -284,7 +497,8 @@ def get_qgis_features(qgis_layer,
                       ordering=None,
                       exclude_fields=None,
                       extra_expression=None,
-                      extra_subset_string=None):
+                      extra_subset_string=None,
+                      cursor=None):
     """Returns a list of QgsFeatures from the QGIS vector layer,
     with optional filter options.
 
@@ -318,6 +532,9 @@ def get_qgis_features(qgis_layer,
     :type: extra_expression: str, optional
     :param: extra_subset_string: extra subset string (provider side WHERE condition) for filtering features
     :type: extra_subset_string: str, optional
+    :param: cursor: keyset pagination cursor returned by `encode_cursor`, empty string for the first page,
+                    when set `page` is ignored and `page_size` features are returned
+    :type: cursor: str, optional
     :return: list of features
     :rtype: QgsFeature list
     """
@@ -333,7 +550,49 @@ def get_qgis_features(qgis_layer,
                       ordering,
                       exclude_fields,
                       extra_expression,
-                      extra_subset_string)
+                      extra_subset_string,
+                      cursor=cursor)
+
+
+def iter_qgis_features(qgis_layer,
+                       qgis_feature_request=None,
+                       bbox_filter=None,
+                       attribute_filters=None,
+                       search_filter=None,
+                       with_geometry=True,
+                       page=None,
+                       page_size=None,
+                       ordering=None,
+                       exclude_fields=None,
+                       extra_expression=None,
+                       extra_subset_string=None,
+                       cursor=None):
+    """Returns an iterator of QgsFeatures from the QGIS vector layer,
+    it accepts the same arguments of `get_qgis_features`.
+
+    Features are fetched from the provider while the iterator is consumed,
+    the QgsFeatureIterator is created when this function is called so every
+    change to the layer state (i.e. subset string) made after the call
+    doesn't affect the returned features.
+
+    :return: iterator of features
+    :rtype: QgsFeature iterator
+    """
+
+    return __iter_qgis_features(qgis_layer,
+                                qgis_feature_request,
+                                bbox_filter,
+                                attribute_filters,
+                                search_filter,
+                                with_geometry,
+                                page,
+                                page_size,
+                                ordering,
+                                exclude_fields,
+                                extra_expression,
+                                extra_subset_string,
+                                cursor=cursor)
+
 
 def count_qgis_features(qgis_layer,
                       qgis_feature_request=None,
@@ -342,10 +601,15 @@ def count_qgis_features(qgis_layer,
                       search_filter=None,
                       extra_expression=None,
                       extra_subset_string=None,
+                      approximate=False,
                       **kwargs):
-    """Returns a list of QgsFeatures from the QGIS vector layer,
+    """Returns the number of features from the QGIS vector layer,
     with optional filter options.
 
+    When the filters can be translated into SQL (postgres, spatialite and GeoPackage layers)
+    the count is executed by the provider with a SELECT count(*), otherwise
+    the features are iterated.
+
     The API can be used in two distinct ways (that are not mutually exclusive):
 
     1. pass in a pre-configured QgsFeatureRequest instance
@@ -362,46 +626,54 @@ def count_qgis_features(qgis_layer,
     :type attribute_filters: dict, optional
     :param search_filter: string filter for all fields
     :type search_filter: str, optional
-    :param: exclude_fields: list of fields to exclude from returned data, '__all__' for no attributes
     :param: extra_expression: extra expression for filtering features
     :type: extra_expression: str, optional
     :param: extra_subset_string: extra subset string (provider side WHERE condition) for filtering features
     :type: extra_subset_string: str, optional
-    :return: list of features
-    :rtype: QgsFeature list
+    :param approximate: allow the provider planner estimate for large counts (postgres only),
+                        see VECTOR_APPROX_COUNT_THRESHOLD setting, defaults to False
+    :type approximate: bool, optional
+    :return: number of features
+    :rtype: int
     """
 
     # Remove no_filters condition because featureCount()
     # is cached,  so it could fail on multi-processes deploy
     # ------------------------------------------------------
 
-    # Fast track for no filters
-    # no_filters = (attribute_filters is None
-    #     and (bbox_filter is None or bbox_filter.isEmpty()) and
-    #     attribute_filters is None and
-    #     extra_expression is None and
-    #     extra_subset_string is None)
-    #
-    # if qgis_feature_request is not None:
-    #     no_filters = (no_filters and
-    #         qgis_feature_request.filterRect().isEmpty() and
-    #         qgis_feature_request.filterType() == QgsFeatureRequest.FilterNone)
-    # else:
     if not qgis_feature_request:
         qgis_feature_request = QgsFeatureRequest()
 
-    # if no_filters:
-    #     # Try to patch a possible Oracle views QGIS featureCount bug.
-    #     qgs_fc = qgis_layer.featureCount()
-    #     if qgs_fc != -1:
-    #         return qgis_layer.featureCount()
-
     qgis_feature_request.setNoAttributes()
     if qgis_feature_request.limit() != -1:
         qgis_feature_request = QgsFeatureRequest(qgis_feature_request)
         qgis_feature_request.setLimit(-1)
 
-    return len(__get_qgis_features(qgis_layer,
+    # Provider side count
+    # ------------------------------------------------------
+    pushdown_request = QgsFeatureRequest(qgis_feature_request)
+    __set_qgis_feature_request_filters(qgis_layer, pushdown_request, bbox_filter, attribute_filters,
+                                       search_filter, extra_expression)
+
+    original_subset_string = qgis_layer.subsetString()
+    if extra_subset_string is not None:
+        if original_subset_string:
+            qgis_layer.setSubsetString("({original_subset_string}) AND ({extra_subset_string})".format(original_subset_string=original_subset_string, extra_subset_string=extra_subset_string))
+        else:
+            qgis_layer.setSubsetString(extra_subset_string)
+
+    try:
+        count = provider_count(qgis_layer, pushdown_request, approximate=approximate)
+    finally:
+        if extra_subset_string is not None:
+            qgis_layer.setSubsetString(original_subset_string)
+
+    if count is not None:
+        return count
+
+    # Fallback: iterate features
+    # ------------------------------------------------------
+    return sum(1 for __ in __iter_qgis_features(qgis_layer,
                       qgis_feature_request,
                       bbox_filter,
                       attribute_filters,
@@ -415,6 +687,278 @@ def count_qgis_features(qgis_layer,
                       extra_subset_string))
 
 
+def get_qgis_feature_ids(qgis_layer,
+                         qgis_feature_request=None,
+                         bbox_filter=None,
+                         attribute_filters=None,
+                         search_filter=None,
+                         extra_expression=None,
+                         extra_subset_string=None,
+                         **kwargs):
+    """Returns the server FIDs (see `server_fid`) of every feature from the QGIS vector layer,
+    with optional filter options. Limit and pagination of the request are ignored.
+
+    When the filters can be translated into SQL (postgres, spatialite and GeoPackage layers)
+    only the primary key columns are selected by the provider, otherwise the features are
+    iterated without geometry and with the primary key attributes only.
+
+    :param qgis_layer: the QGIS vector layer instance
+    :type qgis_layer: QgsVectorLayer
+    :param qgis_feature_request: the QGIS feature request
+    :type qgis_feature_request: QgsFeatureRequest, optional
+    :param bbox_filter: BBOX filter in layer's CRS, defaults to None
+    :type bbox_filter: QgsRectangle, optional
+    :param attribute_filters: dictionary of attribute filters combined with AND, defaults to None
+    :type attribute_filters: dict, optional
+    :param search_filter: string filter for all fields
+    :type search_filter: str, optional
+    :param: extra_expression: extra expression for filtering features
+    :type: extra_expression: str, optional
+    :param: extra_subset_string: extra subset string (provider side WHERE condition) for filtering features
+    :type: extra_subset_string: str, optional
+    :return: list of server FIDs
+    :rtype: list
+    """
+
+    if qgis_feature_request is None:
+        qgis_feature_request = QgsFeatureRequest()
+
+    qgis_feature_request = QgsFeatureRequest(qgis_feature_request)
+    qgis_feature_request.setLimit(-1)
+    __set_qgis_feature_request_filters(qgis_layer, qgis_feature_request, bbox_filter, attribute_filters,
+                                       search_filter, extra_expression)
+
+    original_subset_string = qgis_layer.subsetString()
+    if extra_subset_string is not None:
+        if original_subset_string:
+            qgis_layer.setSubsetString("({original_subset_string}) AND ({extra_subset_string})".format(original_subset_string=original_subset_string, extra_subset_string=extra_subset_string))
+        else:
+            qgis_layer.setSubsetString(extra_subset_string)
+
+    try:
+        server_fids = provider_feature_ids(qgis_layer, qgis_feature_request)
+        if server_fids is not None:
+            return server_fids
+
+        # Fallback: iterate features, primary key attributes only
+        # ------------------------------------------------------
+        provider = qgis_layer.dataProvider()
+        qgis_feature_request.setFlags(qgis_feature_request.flags() | QgsFeatureRequest.NoGeometry)
+        if provider.pkAttributeIndexes():
+            qgis_feature_request.setSubsetOfAttributes(provider.pkAttributeIndexes())
+        else:
+            qgis_feature_request.setNoAttributes()
+
+        return [str(server_fid(f, provider)) for f in qgis_layer.getFeatures(qgis_feature_request)]
+
+    finally:
+        if extra_subset_string is not None:
+            qgis_layer.setSubsetString(original_subset_string)
+
+
+def get_qgis_unique_values(qgis_layer, field_name, qgis_feature_request=None, limit=None, prefix=None):
+    """Returns the sorted unique not NULL values of a field for the features matching the request.
+
+    When the filters can be translated into SQL (postgres, spatialite and GeoPackage layers)
+    the values are selected by the provider with a SELECT DISTINCT, otherwise
+    the features are iterated.
+
+    :param qgis_layer: the QGIS vector layer instance
+    :type qgis_layer: QgsVectorLayer
+    :param field_name: name of the field
+    :type field_name: str
+    :param qgis_feature_request: the QGIS feature request
+    :type qgis_feature_request: QgsFeatureRequest, optional
+    :param limit: max number of values to return, defaults to None
+    :type limit: int, optional
+    :param prefix: return only values starting with prefix (case insensitive), defaults to None
+    :type prefix: str, optional
+    :return: list of values
+    :rtype: list
+    """
+
+    field_idx = qgis_layer.fields().lookupField(field_name)
+    if field_idx < 0:
+        raise Exception(_('Field %s does not exist!') % field_name)
+
+    if qgis_feature_request is None:
+        qgis_feature_request = QgsFeatureRequest()
+
+    values = provider_unique_values(qgis_layer, field_name, qgis_feature_request, limit=limit, prefix=prefix)
+    if values is not None:
+        return values
+
+    # Fallback: iterate features ordered by the field
+    # ------------------------------------------------------
+    req = QgsFeatureRequest(qgis_feature_request)
+    req.setFlags(QgsFeatureRequest.NoGeometry)
+    req.setSubsetOfAttributes([field_idx])
+    req.setLimit(-1)
+    req.setOrderBy(QgsFeatureRequest.OrderBy([
+        QgsFeatureRequest.OrderByClause(QgsExpression.quotedColumnRef(field_name), True)]))
+
+    field_ref = QgsExpression.quotedColumnRef(field_name)
+    req.combineFilterExpression(f'{field_ref} IS NOT NULL')
+    if prefix:
+        pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        req.combineFilterExpression(f'to_string({field_ref}) ILIKE {QgsExpression.quotedValue(pattern)}')
+
+    values = []
+    seen = set()
+    for feature in qgis_layer.getFeatures(req):
+        value = feature.attribute(field_idx)
+        key = json.dumps(json.loads(QgsJsonUtils.encodeValue(value)), sort_keys=True)
+        if key in seen:
+            continue
+        seen.add(key)
+        values.append(value)
+        if limit is not None and len(values) >= int(limit):
+            break
+
+    return values
+
+
+class FieldFormattingPlan(object):
+    """Formatting of date, datetime, time and timestamp field values configured
+    into the layer editor widgets (`field_iso_format`, `field_format` and `display_format` options).
+
+    The plan is computed once for a layer and then applied to every feature already fetched
+    (vector API data mode), plans are cached by `for_layer`. Export modes apply the plan
+    while the features are written by QgsVectorFileWriter, see `value_converter`.
+
+    :param qgis_layer: the QGIS vector layer instance
+    :type qgis_layer: QgsVectorLayer
+    """
+
+    FIELD_TYPES = ('date', 'datetime', 'time', 'timestamp')
+
+    def __init__(self, qgis_layer):
+
+        # (field name, field index, format) tuples
+        self.display_formats = []
+        self.raw_formats = []
+
+        for field_idx, field in enumerate(qgis_layer.fields()):
+            if field.typeName().lower() not in self.FIELD_TYPES:
+                continue
+
+            options = qgis_layer.editorWidgetSetup(field_idx).config()
+            if 'field_iso_format' not in options:
+                continue
+
+            if options.get('display_format'):
+                self.display_formats.append((field.name(), field_idx, options['display_format']))
+            if not options['field_iso_format'] and options.get('field_format'):
+                self.raw_formats.append((field.name(), field_idx, options['field_format']))
+
+    @classmethod
+    def for_layer(cls, qgis_layer, version):
+        """Returns the plan of the layer, cached by version and current layer style
+
+        :param qgis_layer: the QGIS vector layer instance
+        :type qgis_layer: QgsVectorLayer
+        :param version: hashable identifier of the layer and of its editor widgets configuration,
+                        i.e. (layer pk, project modification time)
+        :rtype: FieldFormattingPlan
+        """
+
+        key = (version, qgis_layer.styleManager().currentStyle())
+        plan = _formatting_plans.get(key)
+        if plan is None:
+            plan = cls(qgis_layer)
+            if len(_formatting_plans) >= FORMATTING_PLANS_MAX:
+                _formatting_plans.clear()
+            _formatting_plans[key] = plan
+
+        return plan
+
+    def __bool__(self):
+        return bool(self.display_formats or self.raw_formats)
+
+    def value_converter(self, formatted=False):
+        """Returns a QgsVectorFileWriter.FieldValueConverter writing the formatted values,
+        None if there are no values to format
+
+        :param formatted: see formatted_values()
+        :type formatted: bool
+        :rtype: FieldFormattingConverter, None
+        """
+
+        if not (self.display_formats if formatted else self.raw_formats):
+            return None
+
+        return FieldFormattingConverter(self, formatted)
+
+    def formatted_values(self, feature, formatted=False):
+        """Returns a dict of the formatted values of the feature, NULL values are skipped
+
+        :param feature: the QGIS feature
+        :type feature: QgsFeature
+        :param formatted: True to use the widget display format (formatter=1),
+                          False to use the widget field format for not ISO stored values
+        :type formatted: bool
+        :rtype: dict
+        """
+
+        values = {}
+        for field_name, field_idx, field_format in (self.display_formats if formatted else self.raw_formats):
+            value = feature.attribute(field_idx)
+            if hasattr(value, 'toString'):
+                values[field_name] = value.toString(field_format)
+        return values
+
+    def apply(self, feature, jfeature, formatted=False):
+        """Updates the properties of the GeoJSON feature jfeature with the formatted values of feature
+
+        :param feature: the QGIS feature
+        :type feature: QgsFeature
+        :param jfeature: the GeoJSON feature dict of feature
+        :type jfeature: dict
+        :param formatted: see formatted_values()
+        :type formatted: bool
+        """
+
+        jfeature['properties'].update(self.formatted_values(feature, formatted))
+
+
+class FieldFormattingConverter(QgsVectorFileWriter.FieldValueConverter):
+    """QgsVectorFileWriter value converter for the export modes: the fields of a FieldFormattingPlan
+    are written as strings with the plan formats.
+
+    :param plan: the field formatting plan of the layer
+    :type plan: FieldFormattingPlan
+    :param formatted: see FieldFormattingPlan.formatted_values()
+    :type formatted: bool
+    """
+
+    def __init__(self, plan, formatted=False):
+
+        super().__init__()
+        self.plan = plan
+        self.formatted = formatted
+
+        formats = plan.display_formats if formatted else plan.raw_formats
+        self.field_names = {field_name for field_name, __, __ in formats}
+        self.field_formats = {field_idx: field_format for __, field_idx, field_format in formats}
+
+    def fieldDefinition(self, field):
+
+        if field.name() in self.field_names:
+            return QgsField(field.name(), QVariant.String, 'string')
+        return field
+
+    def convert(self, fieldIdxInLayer, value):
+
+        field_format = self.field_formats.get(fieldIdxInLayer)
+        if field_format is not None and hasattr(value, 'toString'):
+            return value.toString(field_format)
+        return value
+
+    def clone(self):
+
+        return FieldFormattingConverter(self.plan, self.formatted)
+
+
 class ExpressionEvalError(Exception):
     """Raised when there was an evaluation error"""
     pass
@@ -3,6 +3,7 @@ from django.http.response import HttpResponse
 from django.http import FileResponse
 from django.core.files import File
 from django.core.exceptions import PermissionDenied
+from django.utils.http import http_date
 #from django_file_form.uploader import FileFormUploadBackend
 import os
 
@@ -15,4 +16,103 @@ def send_file(output_filename, content_type, file, attachment=True):
     :param attachment: True default, to set Content-Disposition http header.
     :return: Django HttpResponse instance.
     """
-    return FileResponse(open(file, 'rb'), filename=output_filename, as_attachment=attachment)
\ No newline at end of file
+    return FileResponse(open(file, 'rb'), filename=output_filename, as_attachment=attachment)
+
+class RangeFileWrapper(object):
+    """
+    File-like object reading only `length` bytes of a file from its current position,
+    used by FileResponse to stream a byte range.
+    """
+
+    def __init__(self, filelike, length):
+        self.filelike = filelike
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.filelike.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.filelike.close()
+
+
+def parse_range_header(header, size):
+    """
+    Parse a single byte range of a HTTP Range header ('bytes=0-99', 'bytes=100-', 'bytes=-100')
+
+    :param header: Range header value
+    :param size: size of the file
+    :return: (start, end) bytes positions (inclusive), None if the header is not a single byte range
+    :raises ValueError: if the range is not satisfiable
+    """
+
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+
+    start, sep, end = header[6:].strip().partition('-')
+    if not sep:
+        return None
+
+    try:
+        if start == '':
+            # Suffix range: last N bytes
+            start, end = size - int(end), size - 1
+        else:
+            start, end = int(start), int(end) if end != '' else size - 1
+    except ValueError:
+        return None
+
+    start = max(start, 0)
+    if start >= size or end < start:
+        raise ValueError('Range not satisfiable')
+
+    return start, min(end, size - 1)
+
+
+def send_file_range(request, file, output_filename, content_type, attachment=True):
+    """
+    Send a file with a streaming FileResponse, single byte range requests (HTTP Range header)
+    are answered with 206 Partial Content, i.e. to resume the download of large files.
+
+    :param request: Django request object.
+    :param file: path of the file to send.
+    :param output_filename: file name to send.
+    :param content_type: mime type file to send.
+    :param attachment: True default, to set Content-Disposition http header.
+    :return: Django FileResponse instance.
+    """
+
+    size = os.path.getsize(file)
+    last_modified = http_date(os.path.getmtime(file))
+
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range or if_range == last_modified:
+        try:
+            byte_range = parse_range_header(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    filelike = open(file, 'rb')
+    if byte_range:
+        start, end = byte_range
+        filelike.seek(start)
+        response = FileResponse(RangeFileWrapper(filelike, end - start + 1), status=206, content_type=content_type,
+                                filename=output_filename, as_attachment=attachment)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    else:
+        response = FileResponse(filelike, content_type=content_type, filename=output_filename,
+                                as_attachment=attachment)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['Last-Modified'] = last_modified
+
+    return response
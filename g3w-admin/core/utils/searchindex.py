@@ -0,0 +1,501 @@
+# coding=utf-8
+"""Search indexes for the 'search' filter of vector layers.
+
+The search filter matches features with `"field" ILIKE '%text%'` OR-ed across the layer fields, a full scan
+with a cast of every column. When a search index exists for the layer, a provider side prefilter is added to
+the layer subset string, the ILIKE expression is still applied so results do not change:
+
+- postgres layers: a GIN trigram (pg_trgm) index on the concatenation of the fields text, created by
+  the `search_index` management command; the prefilter is an ILIKE on the same indexed expression.
+- ogr file layers: a sidecar SQLite file with a FTS5 trigram table of the features text, created by
+  the `search_index` management command and kept in sync by the editing API; the prefilter is the list
+  of matching feature ids.
+
+The concatenated text of the indexed fields contains the text of every field, so the prefilter never
+excludes a feature matched by the ILIKE expression, as long as all the searched fields are indexed.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+
+from django.conf import settings
+from django.core.cache import cache
+from qgis.core import (
+    QgsExpression,
+    QgsExpressionContext,
+    QgsExpressionContextUtils,
+    QgsFeatureRequest,
+    QgsFields,
+    QgsProviderRegistry
+)
+from qgis.PyQt.QtCore import QVariant
+
+from core.utils.pushdown import PostgresSql, PushdownNotSupported
+
+logger = logging.getLogger('module_core')
+
+# Cache timeout (seconds) of the indexed fields of a layer (None when the layer has no search index)
+SEARCH_INDEX_CACHE_TTL = getattr(settings, 'VECTOR_SEARCH_INDEX_CACHE_TTL', 300)
+
+# Directory of the SQLite sidecar files of ogr layers, None to write them next to the layer data source
+SEARCH_INDEX_DIR = getattr(settings, 'VECTOR_SEARCH_INDEX_DIR', None)
+
+# Over this number of matching feature ids the sidecar prefilter is not applied
+SEARCH_INDEX_MAX_FIDS = getattr(settings, 'VECTOR_SEARCH_INDEX_MAX_FIDS', 10000)
+
+# Trigram indexes need at least a sequence of 3 characters without wildcards
+SEARCH_INDEX_MIN_TERM_LENGTH = 3
+
+# Field types without a text representation
+NOT_INDEXABLE_TYPES = (QVariant.ByteArray, QVariant.Invalid)
+
+
+class SearchIndexError(Exception):
+    """Raised when a search index cannot be created or used"""
+    pass
+
+
+def _longest_literal(term):
+    return max((len(p) for p in re.split(r'[%_]', term)), default=0)
+
+
+class SearchIndex(object):
+    """
+    Base class for layer search indexes.
+
+    :param qgis_layer: the QGIS vector layer instance
+    :type qgis_layer: QgsVectorLayer
+    """
+
+    provider = None
+
+    def __init__(self, qgis_layer):
+        self.qgis_layer = qgis_layer
+
+    def identity(self):
+        """Returns a string identifying the indexed data source (subset string excluded)"""
+
+        raise NotImplementedError("All subclasses must implement this method")
+
+    @property
+    def cache_key(self):
+        return 'vector_search_index_' + hashlib.md5(
+            f'{self.provider}:{self.identity()}'.encode('utf-8')).hexdigest()
+
+    def indexable_fields(self, field_names=None):
+        """Returns the names of the provider fields with a text representation
+
+        :param field_names: restrict to these fields, None for every field
+        :type field_names: list, optional
+        :raises SearchIndexError: for fields not indexable
+        :rtype: list
+        """
+
+        fields = self.qgis_layer.fields()
+        names = []
+        for idx, field in enumerate(fields):
+            if field_names is not None and field.name() not in field_names:
+                continue
+            if fields.fieldOrigin(idx) != QgsFields.OriginProvider or field.type() in NOT_INDEXABLE_TYPES:
+                if field_names is not None:
+                    raise SearchIndexError(f'Field "{field.name()}" cannot be indexed')
+                continue
+            names.append(field.name())
+
+        if field_names is not None:
+            missing = set(field_names) - set(names)
+            if missing:
+                raise SearchIndexError(f'Fields not found: {", ".join(sorted(missing))}')
+
+        if not names:
+            raise SearchIndexError('No field to index')
+
+        return names
+
+    def indexed_fields(self):
+        """Returns the names of the indexed fields, None when the layer has no search index.
+        The result is cached.
+
+        :rtype: list, None
+        """
+
+        fields = cache.get(self.cache_key)
+        if fields is None:
+            try:
+                fields = self.read_indexed_fields() or []
+            except Exception as e:
+                logger.warning(f'Search index of layer {self.qgis_layer.name()}: {e}')
+                fields = []
+            cache.set(self.cache_key, fields, SEARCH_INDEX_CACHE_TTL)
+
+        return fields or None
+
+    def read_indexed_fields(self):
+        """Reads the names of the indexed fields from the index storage"""
+
+        raise NotImplementedError("All subclasses must implement this method")
+
+    def create(self, field_names=None):
+        """Creates or rebuilds the search index
+
+        :param field_names: fields to index, None for every field with a text representation
+        :type field_names: list, optional
+        :return: the indexed field names
+        :rtype: list
+        """
+
+        fields = self._create(self.indexable_fields(field_names))
+        cache.delete(self.cache_key)
+        return fields
+
+    def _create(self, field_names):
+        raise NotImplementedError("All subclasses must implement this method")
+
+    def drop(self):
+        """Removes the search index"""
+
+        self._drop()
+        cache.delete(self.cache_key)
+
+    def _drop(self):
+        raise NotImplementedError("All subclasses must implement this method")
+
+    def disable(self):
+        """Disables the search index until it is rebuilt by create(), used when the index
+        cannot be kept in sync with the layer data: the index data are kept"""
+
+        self._disable()
+        cache.delete(self.cache_key)
+
+    def _disable(self):
+        raise NotImplementedError("All subclasses must implement this method")
+
+    def prefilter(self, terms, field_names):
+        """Returns the subset string matching at least the features matched by the search terms in
+        the fields, None if the index cannot be used
+
+        :param terms: search terms (ILIKE patterns without the surrounding '%'), combined with AND
+        :type terms: list
+        :param field_names: the searched fields
+        :type field_names: list
+        :rtype: str, None
+        """
+
+        indexed = self.indexed_fields()
+        if not indexed or not terms or not set(field_names).issubset(indexed):
+            return None
+
+        if any(_longest_literal(t) < SEARCH_INDEX_MIN_TERM_LENGTH for t in terms):
+            return None
+
+        # OGR SQL subset strings cannot be combined
+        if self.qgis_layer.subsetString().strip().lower().startswith('select'):
+            return None
+
+        try:
+            return self._prefilter(terms, indexed)
+        except Exception as e:
+            logger.warning(f'Search index of layer {self.qgis_layer.name()} not used: {e}')
+            return None
+
+    def _prefilter(self, terms, indexed):
+        raise NotImplementedError("All subclasses must implement this method")
+
+    def update_features(self, fids):
+        """Updates the index for the features, called after the features are added or changed and committed.
+        When the index cannot be updated it is disabled.
+
+        :param fids: QGIS feature ids
+        :type fids: list
+        """
+
+        pass
+
+
+class PostgresSearchIndex(SearchIndex):
+    """
+    GIN trigram index on the concatenated text of the fields, maintained by PostgreSQL.
+    The fields list is stored as the index comment.
+    """
+
+    provider = 'postgres'
+
+    # Immutable text cast, used by the index expression for every field type
+    text_function = 'g3w_search_text'
+
+    def __init__(self, qgis_layer):
+        super().__init__(qgis_layer)
+
+        self.sql = PostgresSql(qgis_layer)
+        if self.sql.uri.table().startswith('('):
+            raise PushdownNotSupported('Query layers cannot be indexed')
+
+        self.schema = self.sql.uri.schema() or 'public'
+        self.index_name = 'g3w_search_' + hashlib.md5(self.sql.table().encode('utf-8')).hexdigest()[:16]
+
+    def identity(self):
+        return self.sql.uri.connectionInfo(False) + ' ' + self.sql.table()
+
+    def qualified(self, name):
+        return f'{self.sql.quote_identifier(self.schema)}.{self.sql.quote_identifier(name)}'
+
+    def expression(self, field_names):
+        """Returns the indexed SQL expression"""
+
+        function = self.qualified(self.text_function)
+        return "(" + " || ' ' || ".join(
+            f'{function}({self.sql.quote_identifier(name)})' for name in field_names) + ")"
+
+    def read_indexed_fields(self):
+        rows = self.sql.execute(
+            "SELECT obj_description(c.oid, 'pg_class') FROM pg_class c "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            f"WHERE c.relkind = 'i' AND c.relname = {self.sql.quote_value(self.index_name)} "
+            f"AND n.nspname = {self.sql.quote_value(self.schema)}")
+        if not rows or not rows[0][0]:
+            return None
+        return json.loads(rows[0][0]).get('fields')
+
+    def _create(self, field_names):
+
+        self.sql.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+        # The text cast of some types (i.e. dates) depends on the session settings and it's not immutable:
+        # the wrapper is declared immutable to be used in the index expression
+        self.sql.execute(
+            f"CREATE OR REPLACE FUNCTION {self.qualified(self.text_function)}(anyelement) RETURNS text "
+            "LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$ SELECT coalesce($1::text, '') $$")
+
+        self._drop()
+        self.sql.execute(
+            f'CREATE INDEX CONCURRENTLY {self.sql.quote_identifier(self.index_name)} ON {self.sql.table()} '
+            f'USING gin ({self.expression(field_names)} gin_trgm_ops)')
+        self.sql.execute(
+            f'COMMENT ON INDEX {self.qualified(self.index_name)} IS '
+            f'{self.sql.quote_value(json.dumps({"fields": field_names}))}')
+
+        return field_names
+
+    def _drop(self):
+        self.sql.execute(f'DROP INDEX IF EXISTS {self.qualified(self.index_name)}')
+
+    def _disable(self):
+        # Maintained by the database, never out of sync
+        pass
+
+    def _prefilter(self, terms, indexed):
+        expression = self.expression(indexed)
+        return ' AND '.join(f"{expression} ILIKE {self.sql.quote_value('%' + t + '%')}" for t in terms)
+
+
+class SqliteSearchIndex(SearchIndex):
+    """
+    SQLite FTS5 trigram table of the features text for ogr file layers, stored in a sidecar file.
+    Table rowids are the QGIS feature ids.
+    """
+
+    provider = 'ogr'
+
+    def __init__(self, qgis_layer):
+        super().__init__(qgis_layer)
+
+        parts = QgsProviderRegistry.instance().decodeUri('ogr', qgis_layer.source())
+        self.path = parts.get('path', '')
+        if not self.path or not os.path.isfile(self.path):
+            raise PushdownNotSupported('Only file data sources can be indexed')
+
+        self.layer_name = parts.get('layerName') or str(parts.get('layerId') or '') or \
+            os.path.splitext(os.path.basename(self.path))[0]
+        self.table = 'fts_' + hashlib.md5(self.layer_name.encode('utf-8')).hexdigest()[:16]
+
+    def identity(self):
+        return f'{os.path.abspath(self.path)}|{self.layer_name}'
+
+    @property
+    def sidecar_path(self):
+        if SEARCH_INDEX_DIR:
+            return os.path.join(SEARCH_INDEX_DIR,
+                                hashlib.md5(os.path.abspath(self.path).encode('utf-8')).hexdigest() + '.sqlite')
+        return self.path + '.g3wsearch.sqlite'
+
+    def connect(self):
+        return sqlite3.connect(self.sidecar_path)
+
+    def read_indexed_fields(self):
+        if not os.path.exists(self.sidecar_path):
+            return None
+
+        with self.connect() as conn:
+            try:
+                row = conn.execute('SELECT fields FROM g3w_search_index WHERE layer = ?',
+                                   (self.layer_name, )).fetchone()
+            except sqlite3.OperationalError:
+                return None
+        return json.loads(row[0]) if row and row[0] else None
+
+    def feature_texts(self, field_names, fids=None):
+        """Yields (fid, text) of the features, text is the lowercase concatenation of the field values
+        converted to string like the ILIKE operator of QGIS expressions does"""
+
+        # Every feature of the data source, project subset string excluded: the layer is shared
+        # by concurrent requests, an independent clone is read
+        qgis_layer = self.qgis_layer.clone()
+        qgis_layer.setSubsetString('')
+
+        expression = QgsExpression(" || ' ' || ".join(
+            f"coalesce({QgsExpression.quotedColumnRef(name)} || '', '')" for name in field_names))
+        context = QgsExpressionContext()
+        context.appendScopes(QgsExpressionContextUtils.globalProjectLayerScopes(qgis_layer))
+
+        request = QgsFeatureRequest()
+        request.setFlags(QgsFeatureRequest.NoGeometry)
+        request.setSubsetOfAttributes(field_names, qgis_layer.fields())
+        if fids is not None:
+            request.setFilterFids(fids)
+
+        for feature in qgis_layer.getFeatures(request):
+            context.setFeature(feature)
+            yield feature.id(), (expression.evaluate(context) or '').lower()
+
+    def _create(self, field_names):
+
+        if sqlite3.sqlite_version_info < (3, 34, 0):
+            raise SearchIndexError(f'SQLite {sqlite3.sqlite_version} has no FTS5 trigram tokenizer')
+
+        with self.connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS g3w_search_index (layer TEXT PRIMARY KEY, fields TEXT)')
+            conn.execute('DELETE FROM g3w_search_index WHERE layer = ?', (self.layer_name, ))
+            conn.execute(f'DROP TABLE IF EXISTS "{self.table}"')
+            conn.execute(f'CREATE VIRTUAL TABLE "{self.table}" USING fts5(content, '
+                         f'tokenize="trigram case_sensitive 1")')
+            conn.executemany(f'INSERT INTO "{self.table}" (rowid, content) VALUES (?, ?)',
+                             self.feature_texts(field_names))
+            conn.execute('INSERT INTO g3w_search_index (layer, fields) VALUES (?, ?)',
+                         (self.layer_name, json.dumps(field_names)))
+
+        return field_names
+
+    def _drop(self):
+        if not os.path.exists(self.sidecar_path):
+            return
+
+        with self.connect() as conn:
+            try:
+                conn.execute('DELETE FROM g3w_search_index WHERE layer = ?', (self.layer_name, ))
+            except sqlite3.OperationalError:
+                pass
+            conn.execute(f'DROP TABLE IF EXISTS "{self.table}"')
+
+    def fid_column(self):
+        """Returns the subset string column of the QGIS feature id"""
+
+        pk_idxs = self.qgis_layer.dataProvider().pkAttributeIndexes()
+        if len(pk_idxs) == 1:
+            return QgsExpression.quotedColumnRef(self.qgis_layer.fields()[pk_idxs[0]].name())
+
+        # OGR SQL special field
+        return 'FID'
+
+    @staticmethod
+    def glob_pattern(term):
+        """Returns the GLOB pattern of an ILIKE term, the FTS5 trigram index is used for GLOB
+        by case sensitive tables (the indexed text is lowercase)"""
+
+        pattern = ''
+        for c in term.lower():
+            if c in '*?[':
+                pattern += f'[{c}]'
+            elif c == '%':
+                pattern += '*'
+            elif c == '_':
+                pattern += '?'
+            else:
+                pattern += c
+        return f'*{pattern}*'
+
+    def _prefilter(self, terms, indexed):
+
+        with self.connect() as conn:
+            rows = conn.execute(
+                f'SELECT rowid FROM "{self.table}" WHERE ' + ' AND '.join(['content GLOB ?'] * len(terms)) +
+                f' LIMIT {SEARCH_INDEX_MAX_FIDS + 1}',
+                [self.glob_pattern(t) for t in terms]).fetchall()
+
+        if len(rows) > SEARCH_INDEX_MAX_FIDS:
+            return None
+
+        fids = ', '.join(str(int(r[0])) for r in rows) or '-1'
+        return f'{self.fid_column()} IN ({fids})'
+
+    def update_features(self, fids):
+
+        indexed = self.indexed_fields()
+        if not indexed or not fids:
+            return
+
+        try:
+            with self.connect() as conn:
+                updated = set()
+                for fid, text in self.feature_texts(indexed, fids):
+                    conn.execute(f'INSERT OR REPLACE INTO "{self.table}" (rowid, content) VALUES (?, ?)',
+                                 (fid, text))
+                    updated.add(fid)
+
+            if updated != set(fids):
+                raise SearchIndexError('features not found')
+        except Exception as e:
+
+            # A search index out of sync would hide features
+            logger.error(f'Search index of layer {self.qgis_layer.name()} out of date, disabled until rebuilt: {e}')
+            self.disable()
+
+    def _disable(self):
+        if not os.path.exists(self.sidecar_path):
+            return
+
+        with self.connect() as conn:
+            conn.execute('UPDATE g3w_search_index SET fields = NULL WHERE layer = ?', (self.layer_name, ))
+
+def get_search_index(qgis_layer):
+    """Returns the SearchIndex instance for the layer, None if the layer provider is not supported
+
+    :param qgis_layer: the QGIS vector layer instance
+    :type qgis_layer: QgsVectorLayer
+    :rtype: SearchIndex, None
+    """
+
+    classes = {c.provider: c for c in (PostgresSearchIndex, SqliteSearchIndex)}
+    try:
+        return classes[qgis_layer.providerType()](qgis_layer)
+    except (KeyError, PushdownNotSupported):
+        return None
+
+
+def search_prefilter(qgis_layer, terms, field_names):
+    """Returns the subset string prefilter of a search for the layer search index,
+    None if the layer has no search index or the index cannot be used
+
+    :param qgis_layer: the QGIS vector layer instance
+    :type qgis_layer: QgsVectorLayer
+    :param terms: search terms, combined with AND
+    :type terms: list
+    :param field_names: the searched fields
+    :type field_names: list
+    :rtype: str, None
+    """
+
+    index = get_search_index(qgis_layer)
+    if index is None:
+        return None
+    return index.prefilter(terms, field_names)
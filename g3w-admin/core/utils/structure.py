@@ -3,6 +3,7 @@ from django.apps import apps
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from qdjango.utils.qgis import explode_expression
+from core.utils.geojson import encode_value
 from collections import OrderedDict
 
 import copy
@@ -315,7 +316,7 @@ def mapLayerAttributesFromQgisLayer(qgis_layer, **kwargs):
                     unique=unique,
                     expression=expression,
                     pk=is_pk,
-                    default=default_value
+                    default=encode_value(default_value)
                 )
 
                 # add upload url to image type if module is set
@@ -397,6 +398,7 @@ class APIVectorLayerStructure(object):
     _geometryType = None
     _fields = None
     _editing = None
+    _next = None
 
     def __init__(self, **kwargs):
 
@@ -408,6 +410,10 @@ class APIVectorLayerStructure(object):
         self.fields = kwargs.get('fields', self._fields)
         self.editing = kwargs.get('editing', self._fields)
 
+        # Cursor for the next page, only with keyset pagination
+        self.next = kwargs.get('next', self._next)
+        self.with_next = 'next' in kwargs
+
     def setPkField(self, pkField):
         self._pkField = pkField
 
@@ -441,6 +447,11 @@ class APIVectorLayerStructure(object):
                 'editing': self.editing
             })
 
+        if self.with_next:
+            res['vector'].update({
+                'next': self.next
+            })
+
         return res
 
 
@@ -20,8 +20,8 @@ from rest_framework.exceptions import ValidationError
 
 from core.api.base.vector import MetadataVectorLayer
 from core.api.base.views import BaseVectorApiView
-from core.signals import (post_save_maplayer, pre_delete_maplayer,
-                          pre_save_maplayer)
+from core.signals import (post_commit_maplayer, post_save_maplayer,
+                          pre_delete_maplayer, pre_save_maplayer)
 from core.utils.qgisapi import server_fid, get_layer_fids_from_server_fids
 from editing.models import (EDITING_POST_DATA_ADDED, EDITING_POST_DATA_DELETED,
                             EDITING_POST_DATA_UPDATED)
@@ -518,6 +518,9 @@ class BaseEditingVectorOnModelApiView(BaseVectorApiView):
                         raise Exception(_('Cannot delete feature: %s') %
                                         ', '.join(qgis_layer.dataProvider().errors()))
 
+        # Invalidate caches built on layer data
+        layer.invalidate_data_cache()
+
         return insert_ids, lock_ids, update_ids
 
     def response_commit_mode(self, request):
@@ -659,6 +662,23 @@ class BaseEditingVectorOnModelApiView(BaseVectorApiView):
                 'errors': str(e)
             })
 
+        else:
+
+            # Features committed to the backend
+            post_commit_maplayer.send(
+                self,
+                layer_metadata=self.metadata_layer,
+                server_fids=[f['id'] for f in ref_insert_ids + ref_update_ids],
+                user=request.user
+            )
+            for referencing_layer, relation in relations.items():
+                post_commit_maplayer.send(
+                    self,
+                    layer_metadata=self.metadata_relations[referencing_layer],
+                    server_fids=[f['id'] for f in relation['new'] + relation['update']],
+                    user=request.user
+                )
+
         try:
             self.results.update({
                 'response': {
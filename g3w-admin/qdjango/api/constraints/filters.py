@@ -11,7 +11,7 @@ __date__ = '2020-04-21'
 __copyright__ = 'Copyright 2020, Gis3W'
 
 from core.api.filters import BaseFilterBackend
-from qdjango.models import ConstraintSubsetStringRule, ConstraintExpressionRule, GeoConstraintRule
+from qdjango.utils.filterplan import get_filter_plan
 
 
 class SingleLayerSubsetStringConstraintFilter(BaseFilterBackend):
@@ -26,8 +26,7 @@ class SingleLayerSubsetStringConstraintFilter(BaseFilterBackend):
         qgis_layer = metadata_layer.qgis_layer
 
         # get context from view, default 'v (view)'
-        subset_string = ConstraintSubsetStringRule.get_rule_definition_for_user(request.user, metadata_layer.layer.pk,
-                                                                                context=getattr(view, 'context', 'v'))
+        subset_string = get_filter_plan(request, metadata_layer, view).subset_string
         if not subset_string:
             return
 
@@ -49,8 +48,7 @@ class SingleLayerExpressionConstraintFilter(BaseFilterBackend):
         string) make sure to restore the original state or to work on a clone.
         """
 
-        expression_text = ConstraintExpressionRule.get_rule_definition_for_user(request.user, metadata_layer.layer.pk,
-                                                                                context=getattr(view, 'context', 'v'))
+        expression_text = get_filter_plan(request, metadata_layer, view).expression
         if not expression_text:
             return
 
@@ -62,17 +60,6 @@ class GeoConstraintsFilter(BaseFilterBackend):
 
     def apply_filter(self, request, metadata_layer, qgis_feature_request, view, **kwargs):
 
-        rule_parts = []
-
-        rules = GeoConstraintRule.get_active_constraints_for_user(request.user, metadata_layer.layer,
-                                                                  context=getattr(view, 'context', 'v'))
-
-        for rule in rules:
-            expression = rule.get_qgis_expression()
-            if expression:
-                rule_parts.append(expression)
-
-        if rule_parts:
-            expression = ' AND '.join(rule_parts)
-
+        expression = get_filter_plan(request, metadata_layer, view).geo_expression
+        if expression:
             qgis_feature_request.combineFilterExpression(expression)
@@ -0,0 +1,22 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import BasePermission
+
+from qdjango.utils.exports import read_export_job
+
+
+class VectorExportJobPermission(BasePermission):
+    """
+    API permission for asynchronous vector export jobs urls
+    Allows access only to the user who submitted the export job.
+    """
+
+    def has_permission(self, request, view):
+
+        job = read_export_job(view.kwargs['task_id'])
+
+        # The job file is written when the job is submitted: job not found or removed
+        if job is None:
+            raise NotFound(_('Task not found!'))
+
+        return job['user'] == (None if request.user.is_anonymous else request.user.pk)
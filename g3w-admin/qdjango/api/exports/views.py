@@ -0,0 +1,110 @@
+# coding=utf-8
+""""API views for asynchronous vector export jobs
+
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+
+from core.api.authentication import CsrfExemptSessionAuthentication
+from core.api.views import G3WAPIView
+from core.utils.response import send_file_range
+from django.http import Http404
+from django.urls import reverse
+from django.utils.translation import gettext_lazy as _
+from huey_monitor.models import TaskModel
+from rest_framework import status
+from rest_framework.response import Response
+
+from qdjango.utils.exports import read_export_job, get_export_job_file
+
+from .permissions import VectorExportJobPermission
+
+
+class VectorExportJobView(G3WAPIView):
+    """Status of an asynchronous vector export job (vector API 'shp', 'gpkg', 'xls', 'csv', 'gpx' modes
+    with `async=1` parameter)"""
+
+    authentication_classes = (
+        CsrfExemptSessionAuthentication,
+    )
+
+    permission_classes = (
+        VectorExportJobPermission,
+    )
+
+    def get(self, request, task_id):
+        """Returns the job status and, when the job is complete, the exported file informations.
+
+        Returns 404 in case of task not found
+        Returns 200 ok for all other cases
+
+        Response body:
+
+        {
+            "result": true,
+            "status": "complete",  // or "pending", "executing", "error"
+            "exception": "Normally empty, error message in case of errors",
+            "progress": 100,  // Progress %
+            "task_result": {
+                "filename": "countries.zip",
+                "content_type": "application/x-zip-compressed",
+                "size": 123456,
+                "download_url": "/qdjango/api/vector/export/<task_id>/download/"
+            }
+        }
+        """
+
+        job = read_export_job(task_id)
+
+        if job is None:
+            return Response({'result': False, 'error': _('Task not found!')}, status=status.HTTP_404_NOT_FOUND)
+
+        task_result = None
+        if job['status'] == 'complete':
+            progress_percentage = 100
+            task_result = {
+                'filename': job['filename'],
+                'content_type': job['content_type'],
+                'size': job['size'],
+                'download_url': reverse('qdjango-vector-export-job-download', args=[task_id])
+            }
+        else:
+            try:
+                task_model = TaskModel.objects.get(task_id=task_id)
+                progress_percentage = int(100 * task_model.progress_info[0] / task_model.total)
+            except:
+                progress_percentage = 0
+
+        return Response({
+            'result': True,
+            'status': job['status'],
+            'exception': job.get('exception', ''),
+            'progress': progress_percentage,
+            'task_result': task_result
+        })
+
+
+class VectorExportJobDownloadView(G3WAPIView):
+    """Download the file of a complete vector export job, HTTP Range requests are supported"""
+
+    authentication_classes = (
+        CsrfExemptSessionAuthentication,
+    )
+
+    permission_classes = (
+        VectorExportJobPermission,
+    )
+
+    def get(self, request, task_id):
+
+        path = get_export_job_file(task_id)
+        if path is None:
+            raise Http404
+
+        job = read_export_job(task_id)
+        return send_file_range(request, path, job['filename'], job['content_type'])
@@ -17,6 +17,7 @@ from core.api.filters import BaseFilterBackend
 from core.utils.qgisapi import get_qgs_project, expression_from_server_fids
 from django.conf import settings
 from qdjango.models import SessionTokenFilter, Layer
+from qdjango.utils.filterplan import get_filter_plan
 
 from qgis.core import QgsFeatureRequest, QgsExpression
 
@@ -170,7 +171,7 @@ class ColumnAclFilter(BaseFilterBackend):
 
         try:
             if metadata_layer.layer.has_column_acl:
-                visible_attributes = metadata_layer.layer.visible_fields_for_user(request.user)
+                visible_attributes = get_filter_plan(request, metadata_layer, view).visible_fields
                 subset = qgis_feature_request.subsetOfAttributes()
                 # We need attribute index here
                 attr_idx = []
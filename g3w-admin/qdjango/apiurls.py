@@ -48,6 +48,10 @@ from .api.layerscaleconstraints.views import (
     ScaleVisibilityLayerConstraintList,
     ScaleVisibilityLayerConstraintDetail
 )
+from .api.exports.views import (
+    VectorExportJobView,
+    VectorExportJobDownloadView
+)
 
 from .views import ProjectSetOrderView
 
@@ -406,6 +410,23 @@ urlpatterns = [
      ),
 
 
+    #############################################################
+    # API asynchronous vector export jobs
+    #############################################################
+
+    re_path(
+        r'^api/vector/export/(?P<task_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-5][0-9a-f]{3}-[089ab][0-9a-f]{3}-[0-9a-f]{12})/$',
+        VectorExportJobView.as_view(),
+        name='qdjango-vector-export-job'
+    ),
+
+    re_path(
+        r'^api/vector/export/(?P<task_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-5][0-9a-f]{3}-[089ab][0-9a-f]{3}-[0-9a-f]{12})/download/$',
+        VectorExportJobDownloadView.as_view(),
+        name='qdjango-vector-export-job-download'
+    ),
+
+
     #############################################################
     # API for search widgets
     #############################################################
@@ -12,10 +12,12 @@ from django.core.exceptions import ImproperlyConfigured
 from django.db.models.signals import post_migrate
 
 from qgis.core import QgsApplication, QgsProject, QgsPathResolver
-from qgis.server import QgsServer, QgsServerSettings, QgsConfigCache
+from qgis.server import QgsServerSettings, QgsConfigCache
 
 from usersmanage.configs import *
 
+from .utils.requestcontext import ContextQgsServer, server_lock
+
 logger = logging.getLogger(__name__)
 logger_qgis_server = logging.getLogger('qgis.server')
 
@@ -109,8 +111,9 @@ def init_qgis():
     QGS_SERVER_SETTINGS = QgsServerSettings()
     QGS_SERVER_SETTINGS.load()
 
-    # Singleton server instance (reused across each request)
-    QGS_SERVER = QgsServer()
+    # Singleton server instance (reused across each request), the data of the
+    # current request is stored per thread (see qdjango.utils.requestcontext)
+    QGS_SERVER = ContextQgsServer()
 
     QGS_APPLICATION.messageLog().messageReceived.connect(get_qgis_log)
 
@@ -170,12 +173,20 @@ def get_qgs_project(path: str):
 
     A None is returned if the project could not be loaded.
 
+    The project cache and QgsProject.instance() are shared by the threads
+    of the process: access is serialized by the QGIS Server lock.
+
     :param path: the filesystem path to the project
     :type path: str
     :return: the QgsProject instance or None
     :rtype: QgsProject or None
     """
 
+    with server_lock:
+        return _get_qgs_project(path)
+
+def _get_qgs_project(path: str):
+
     try:
 
         # Call process events in case the project has been updated and the cache
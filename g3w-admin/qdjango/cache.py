@@ -1,3 +1,4 @@
+import logging
 from django.conf import settings
 from django.http.request import QueryDict
 from django.urls import reverse
@@ -18,7 +19,71 @@ def get_layer_to_erase_for_project(layer_id):
 
 if 'caching' in settings.G3WADMIN_LOCAL_MORE_APPS:
 
+    from io import BytesIO
+    from string import Template
+    from django.contrib.auth.models import AnonymousUser
+    from django.http import HttpRequest
+    from PIL import Image
+    from qgis.server import QgsBufferServerRequest, QgsBufferServerResponse
     from caching.utils.layer import TilestacheLayerBase
+    from qdjango.apps import QGS_SERVER, get_qgs_project
+    from qdjango.utils.requestcontext import server_lock, server_request_context
+
+    logger = logging.getLogger('g3wadmin.debug')
+
+    class TilestacheProvider(object):
+        """
+        TileStache provider rendering the tiles of a qdjango layer in process: the WMS GetMap request
+        is handled by QGIS_SERVER on the cached project, without HTTP requests to QDJANGO_SERVER_URL.
+
+        Tiles are rendered as for the anonymous user, with the layers readable (see LayerAclAccessControlFilter)
+        and the constraints of the anonymous user applied.
+
+        :param layer: TileStache layer
+        :param layer_id: qdjango Layer pk
+        :param query: WMS GetMap query string template, with $xmin, $ymin, $xmax, $ymax, $srs, $width, $height
+        """
+
+        def __init__(self, layer, layer_id, query):
+
+            self.layer = layer
+            self.layer_id = layer_id
+            self.template = Template(query)
+
+        def renderArea(self, width, height, srs, xmin, ymin, xmax, ymax, zoom):
+            """Returns the PIL image of the area, called by TileStache for every (meta)tile"""
+
+            layer = Layer.objects.select_related('project').get(pk=self.layer_id)
+            qdjango_project = layer.project
+
+            q = QueryDict(self.template.safe_substitute({
+                'width': width, 'height': height, 'srs': srs, 'zoom': zoom,
+                'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax}), mutable=True)
+
+            djrequest = HttpRequest()
+            djrequest.method = 'GET'
+            djrequest.GET = q
+            djrequest.user = AnonymousUser()
+
+            ows_url = reverse('OWS:ows', kwargs={'group_slug': qdjango_project.group.slug, 'project_type': 'qdjango',
+                                                 'project_id': qdjango_project.id})
+            qgs_request = QgsBufferServerRequest('{}{}?{}'.format(settings.QDJANGO_SERVER_URL, ows_url, q.urlencode()))
+            qgs_response = QgsBufferServerResponse()
+
+            with server_request_context(djrequest, djrequest.user, qdjango_project, caching=True), server_lock:
+                qgs_project = get_qgs_project(qdjango_project.qgis_file.path)
+                if qgs_project is None:
+                    raise Exception('The QGIS project of layer {} could not be loaded'.format(layer.pk))
+
+                QGS_SERVER.handleRequest(qgs_request, qgs_response, qgs_project)
+
+            body = bytes(qgs_response.body())
+            if qgs_response.statusCode() != 200 or \
+                    not qgs_response.headers().get('Content-Type', '').startswith('image/'):
+                logger.error('Tile rendering error for layer {}: {}'.format(layer.pk, body[:1000]))
+                raise Exception('Tile rendering error for layer {}'.format(layer.pk))
+
+            return Image.open(BytesIO(body)).convert('RGBA')
 
     class TilestacheLayer(TilestacheLayerBase):
 
@@ -32,17 +97,14 @@ if 'caching' in settings.G3WADMIN_LOCAL_MORE_APPS:
             else:
                 self.q['LAYERS'] = layer.name
 
-            # add TILESTACHE_CACHE_TOKEN
-            self.q['g3wsuite_caching_token'] = settings.TILESTACHE_CACHE_TOKEN
-
             # build dict
-            # FIXME: QDJANGO_SERVER_URL now points to the base URL
-            qdjango_project = layer.project
-            ows_url = reverse('OWS:ows', kwargs={'group_slug': qdjango_project.group.slug, 'project_type': 'qdjango', 'project_id': qdjango_project.id})
             self.layer_dict = {
                 'provider': {
-                    'name': 'url template',
-                    'template': '{}{}?{}'.format(settings.QDJANGO_SERVER_URL, ows_url, self.q.urlencode(safe='$'))
+                    'class': 'qdjango.cache:TilestacheProvider',
+                    'kwargs': {
+                        'layer_id': layer.pk,
+                        'query': self.q.urlencode(safe='$')
+                    }
                 },
                 'projection': 'caching.utils.projections:CustomXYZGridProjection(\'EPSG:{}\')'.
                     format(layer.project.group.srid.auth_srid)
@@ -1,3 +1,4 @@
+from .cacheversions import *
 from .projects import *
 from .constraints import *
 from .filters import *
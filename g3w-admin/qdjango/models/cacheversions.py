@@ -0,0 +1,71 @@
+# coding=utf-8
+"""" Versions of the data cached by G3W-ADMIN processes
+
+Cached data (i.e. vector API responses, exports, filter plans) are keyed on a version:
+versions are stored in the database to be shared by every process, the Django cache
+can be local to the process (i.e. LocMemCache with uwsgi processes).
+
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import time
+
+from django.db import IntegrityError, models, transaction
+
+
+class CacheVersion(models.Model):
+    """
+    Version of cached data, 0 until the first update
+    """
+
+    key = models.CharField(max_length=255, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    @classmethod
+    def get_version(cls, key):
+        """
+        Returns the version of a key
+
+        :param key: version key
+        :rtype: int
+        """
+
+        return cls.objects.filter(key=key).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def get_versions(cls, keys):
+        """
+        Returns the versions of a list of keys with a single query
+
+        :param keys: version keys
+        :return: {key: version}, keys never updated are missing
+        :rtype: dict
+        """
+
+        return dict(cls.objects.filter(key__in=list(keys)).values_list('key', 'version'))
+
+    @classmethod
+    def update_version(cls, key):
+        """
+        Sets a new version for a key
+
+        :param key: version key
+        :return: the new version
+        :rtype: int
+        """
+
+        version = time.time_ns()
+        if not cls.objects.filter(key=key).update(version=version):
+            try:
+                with transaction.atomic():
+                    cls.objects.create(key=key, version=version)
+            except IntegrityError:
+                # Created by a concurrent request
+                cls.objects.filter(key=key).update(version=version)
+
+        return version
@@ -1,3 +1,4 @@
+import hashlib
 import logging
 import os
 import time
@@ -24,10 +25,13 @@ from guardian.shortcuts import get_perms
 from guardian.utils import get_anonymous_user
 from model_utils import Choices
 from model_utils.models import TimeStampedModel
+from qdjango.utils.exportcache import invalidate_export_cache
+from .cacheversions import CacheVersion
 from qdjango.utils.models import get_constraints4layer, get_widgets4layer
 from qdjango.utils.storage import QgisFileOverwriteStorage
 from qdjango.utils.qgis import get_aliases
-from qgis.core import QgsMapLayerStyle, QgsRectangle, QgsVectorLayer
+from qgis.core import (QgsDataSourceUri, QgsMapLayerStyle, QgsProviderRegistry,
+                       QgsRectangle, QgsVectorLayer)
 from qgis.PyQt.QtXml import QDomDocument
 from usersmanage.configs import *
 from usersmanage.utils import (
@@ -66,6 +70,20 @@ TYPE_RASTER_LAYER_FOR_DOWNLOAD = (
     'raster',
 )
 
+# Datasource URI parts identifying the data of a layer (connection and table or file),
+# credentials, subset string and provider options are left out
+DATA_VERSION_URI_PARTS = (
+    'host',
+    'port',
+    'dbname',
+    'service',
+    'schema',
+    'table',
+    'path',
+    'layerName',
+    'layerId',
+)
+
 
 def buildLayerTreeNodeObject(layerTreeNode):
     """Creates a dictionary that represents the QGIS Project layer tree
@@ -1046,6 +1064,66 @@ class Layer(G3WACLModelMixins, models.Model):
             )
             return layer
 
+    @property
+    def data_version(self):
+        """Returns the version of the layer data, it changes every time data are edited.
+        Layers reading the same table (or file layer) share the same version.
+        Used to build cache keys of data derived from the layer features.
+        The version is stored in the database, shared by every process, and read once per instance.
+
+        :return: the data version
+        :rtype: int
+        """
+
+        if getattr(self, '_data_version', None) is None:
+            self._data_version = CacheVersion.get_version(self._data_version_key())
+        return self._data_version
+
+    def invalidate_data_cache(self):
+        """Updates the layer data version: every cache built on the layer data is invalidated"""
+
+        CacheVersion.update_version(self._data_version_key())
+        self._data_version = None
+
+        # Exported files are stored on disk
+        invalidate_export_cache(self.pk)
+
+    def _data_version_key(self):
+        parts = QgsProviderRegistry.instance().decodeUri(self.layer_type, self.datasource)
+        source = {k: str(v) for k, v in parts.items() if k in DATA_VERSION_URI_PARTS and v not in (None, '')}
+
+        # Providers without URI decoding
+        if not source:
+            uri = QgsDataSourceUri(self.datasource)
+            if uri.table():
+                source = {
+                    'host': uri.host(),
+                    'port': uri.port(),
+                    'dbname': uri.database(),
+                    'service': uri.service(),
+                    'schema': uri.schema(),
+                    'table': uri.table()
+                }
+            else:
+                source = {'datasource': self.datasource}
+
+        datasource_hash = hashlib.md5(
+            f'{self.layer_type}{json.dumps(source, sort_keys=True)}'.encode('utf-8')).hexdigest()
+        return f"{getattr(settings, 'QDJANGO_LAYER_DATA_VERSION_KEY', 'qdjango_layer_data_version_')}{datasource_hash}"
+
+    @property
+    def subset_string(self):
+        """Returns the subset string of the layer defined in the QGIS project, the subset string
+        of the QGIS layer can be temporarily changed by the filters of a request
+
+        :rtype: str
+        """
+
+        parts = QgsProviderRegistry.instance().decodeUri(self.layer_type, self.datasource)
+        if 'subset' in parts:
+            return parts['subset'] or ''
+        return QgsDataSourceUri(self.datasource).sql()
+
     @property
     def styles(self):
         """Returns the layer styles
@@ -26,6 +26,8 @@ from .models import Project, Layer
 from copy import copy
 
 from .auth import QdjangoProjectAuthorizer
+from .utils.aclsnapshot import ProjectAclSnapshot
+from .utils.requestcontext import server_lock, server_request_context
 
 logger = logging.getLogger(__name__)
 
@@ -71,12 +73,6 @@ class OWSRequestHandler(OWSRequestHandlerBase):
                     ows_request = request.POST['REQUEST'][0].upper()
             q['REQUEST'] = ows_request
 
-        # FIXME: proxy or redirect in case of WMS/WFS/XYZ cascading?
-        qgs_project = get_qgs_project(self.project.qgis_file.path)
-
-        if qgs_project is None:
-            raise Http404('The requested QGIS project could not be loaded!')
-
         data = None
         if request.method == 'GET':
             method = QgsBufferServerRequest.GetMethod
@@ -105,12 +101,24 @@ class OWSRequestHandler(OWSRequestHandlerBase):
         logger.debug('Calling QGIS Server: %s' % uri)
         qgs_request = QgsBufferServerRequest(uri, method, headers, data)
 
-        # Attach user and project to the server object to make them accessible by the
-        # server access control plugins (constraints etc.)
-        QGS_SERVER.djrequest = request
-        QGS_SERVER.user = request.user
-        QGS_SERVER.project = self.project
+        # Access control data of the project layers, read by the access control filters
+        acl_snapshot = ProjectAclSnapshot.for_user(self.project, request.user)
+
+        # Request, user and project are made accessible to the server filters (constraints etc.)
+        # by the request context of the current thread, QGIS Server handles a request at a time
+        with server_request_context(request, request.user, self.project, acl_snapshot), server_lock:
+            return self._handle_server_request(qgs_request)
 
+    def _handle_server_request(self, qgs_request):
+        """Calls QGIS Server, must be called with the request context set and the server lock held:
+        the project is read from the cache after acquiring the lock, other threads cannot reload it
+        while the request is handled"""
+
+        # FIXME: proxy or redirect in case of WMS/WFS/XYZ cascading?
+        qgs_project = get_qgs_project(self.project.qgis_file.path)
+
+        if qgs_project is None:
+            raise Http404('The requested QGIS project could not be loaded!')
 
         # For GetPrint QGIS functions that rely on layers visibility, we need to check
         # the layers from LAYERS
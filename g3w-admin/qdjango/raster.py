@@ -10,16 +10,21 @@ __author__ = 'lorenzetti@gis3w.it'
 __date__ = '2022-03-01'
 __copyright__ = 'Copyright 2015 - 2022, Gis3w'
 
-from django.http import HttpResponse, HttpResponseForbidden
+from django.conf import settings
+from django.http import HttpResponseForbidden
 from core.api.base.views import BaseRasterApiView
 from core.utils.qgisapi import get_qgis_layer
+from core.utils.response import send_file_range
 from core.api.base.raster import MetadataRasterLayer
 from core.api.base.views import APIException
 from .models import Layer
+from .utils.overviews import OverviewCache, get_overview_levels
 
+from osgeo import gdal
 from qgis.core import \
     QgsMapLayerType, \
     QgsRasterFileWriter, \
+    QgsRasterLayer, \
     QgsRasterPipe, \
     QgsRectangle, \
     QgsCoordinateTransform, \
@@ -29,6 +34,14 @@ from qgis.core import \
 import tempfile
 import os
 
+# Creation options of the exported Cloud Optimized GeoTIFF: tiles with internal overviews
+RASTER_EXPORT_COG_OPTIONS = getattr(settings, 'RASTER_EXPORT_COG_OPTIONS', [
+    'COMPRESS=DEFLATE',
+    'BLOCKSIZE=512',
+    'OVERVIEWS=AUTO',
+    'BIGTIFF=IF_SAFER'
+])
+
 class LayerRasterView(BaseRasterApiView):
     """
     Qdjango class for ratser layer api rest
@@ -60,15 +73,52 @@ class LayerRasterView(BaseRasterApiView):
             layer_id=self.layer.pk
         )
 
+    def _write_cog(self, file_path, tif_path):
+        """
+        Converts a tiled GeoTIFF into a Cloud Optimized GeoTIFF: GDAL reads the source in windows
+        and writes tiles and internal overviews.
+
+        :param file_path: path of the COG file
+        :param tif_path: path of the tiled GeoTIFF
+        :return: True on success
+        :rtype: bool
+        """
+
+        if gdal.GetDriverByName('COG') is not None:
+            ds = gdal.Translate(file_path, tif_path, format='COG', creationOptions=RASTER_EXPORT_COG_OPTIONS)
+        else:
+
+            # GDAL < 3.1: internal overviews copied before the image data
+            src = gdal.Open(tif_path, gdal.GA_Update)
+            levels = get_overview_levels(src.RasterXSize, src.RasterYSize)
+            if levels:
+                src.BuildOverviews('AVERAGE', levels)
+            src = None
+
+            ds = gdal.Translate(file_path, tif_path, format='GTiff', creationOptions=[
+                'TILED=YES',
+                'COMPRESS=DEFLATE',
+                'COPY_SRC_OVERVIEWS=YES',
+                'BIGTIFF=IF_SAFER'
+            ])
+
+        result = ds is not None
+        ds = None
+
+        return result
+
     def response_geotiff_mode(self, request):
         """
-        Export raster as geotiff
+        Export raster as Cloud Optimized GeoTIFF
         i.e:
         192.168.1.137:8006/raster/api/geotiff/qdjango/190/sfondo_clip_c60533a4_743e_4734_9b95_514ac765ec4e/
         192.168.1.137:8006/raster/api/geotiff/qdjango/190/europa_dem_8f0a9c30_5b96_4661_b747_8ce4f2679d6b/?map_extent=10.515901325263899%2C43.875701513907146%2C10.55669628723769%2C43.92294901234999
 
+        With `max_size` parameter (pixels) the export is downsampled to fit the size, downsampled
+        exports of layers without overviews read from the overview cache (see qdjango.utils.overviews).
+
         :param request: Http Django request object
-        :return: http response with attached file
+        :return: http streaming response with attached file
         """
 
         #if not self.layer.download:
@@ -80,8 +130,13 @@ class LayerRasterView(BaseRasterApiView):
         filename = f"{self.metadata_layer.qgis_layer.name()}.tif"
 
         file_path = os.path.join(tmp_dir.name, filename)
+        tif_path = os.path.join(tmp_dir.name, 'source.tif')
+
+        writer = QgsRasterFileWriter(tif_path)
+
+        # Tiled output: the raster is read and written in blocks
+        writer.setCreateOptions(['TILED=YES', 'BIGTIFF=IF_SAFER'])
 
-        writer = QgsRasterFileWriter(file_path)
         provider = self.metadata_layer.qgis_layer.dataProvider()
         renderer = self.metadata_layer.qgis_layer.renderer()
 
@@ -126,8 +181,34 @@ class LayerRasterView(BaseRasterApiView):
             cols = provider.xSize()
             rows = provider.ySize()
 
+        # Downsampled export
+        downsampling = 1
+        if request.query_params.get('max_size'):
+            try:
+                max_size = int(request.query_params.get('max_size'))
+            except ValueError:
+                max_size = 0
+
+            if max_size < 1:
+                tmp_dir.cleanup()
+                raise APIException("'max_size' parameter must be a positive integer")
+
+            downsampling = max(cols, rows) / max_size
+            if downsampling > 1:
+                cols = max(1, int(cols / downsampling))
+                rows = max(1, int(rows / downsampling))
+
+        # Read downsampled exports from the cached overviews
+        source_provider = provider
+        if downsampling >= 2:
+            vrt_path = OverviewCache().get_or_build(self.layer, self.metadata_layer.qgis_layer)
+            if vrt_path:
+                overview_layer = QgsRasterLayer(vrt_path, self.metadata_layer.qgis_layer.name(), 'gdal')
+                if overview_layer.isValid():
+                    source_provider = overview_layer.dataProvider()
+
         pipe = QgsRasterPipe()
-        pipe.set(provider.clone())
+        pipe.set(source_provider.clone())
         pipe.set(renderer.clone())
 
         error_code = writer.writeRaster(
@@ -139,14 +220,15 @@ class LayerRasterView(BaseRasterApiView):
             self.metadata_layer.qgis_layer.transformContext()
         )
 
-        if error_code != QgsRasterFileWriter.NoError:
+        if error_code != QgsRasterFileWriter.NoError or not self._write_cog(file_path, tif_path):
             tmp_dir.cleanup()
             raise APIException(f"An error occoured on create raster file for export")
 
-        # Grab ZIP file from in-memory, make response with correct MIME-type
-        response = HttpResponse(
-            open(file_path, 'rb').read(), content_type='image/tif')
+        os.remove(tif_path)
+
+        # Stream the file, it is still readable by the response once the temporary directory is removed
+        response = send_file_range(request, file_path, filename, 'image/tif')
+        tmp_dir.cleanup()
 
-        response['Content-Disposition'] = f'attachment; filename={filename}'
         response.set_cookie('fileDownload', 'true')
         return response
@@ -12,14 +12,18 @@ from core.signals import (
     pre_delete_project,
     pre_update_project,
     before_return_vector_data_layer,
-    post_serialize_project
+    post_serialize_project,
+    post_commit_maplayer
 )
+from core.utils.qgisapi import get_layer_fids_from_server_fids
+from core.utils.searchindex import get_search_index
 from django.conf import settings
 from django.urls import (
     reverse, resolve
 )
 from django.http import HttpRequest
 from django.contrib.auth.signals import user_logged_out
+from django.contrib.contenttypes.models import ContentType
 from django.db.models.signals import (
     post_delete,
     post_save,
@@ -28,6 +32,7 @@ from django.db.models.signals import (
 )
 from django.dispatch import receiver
 from django.template import loader
+from guardian.models import GroupObjectPermission, UserObjectPermission
 from qgis.core import QgsProject
 
 from .models import (
@@ -35,6 +40,8 @@ from .models import (
     Layer,
     Project,
     SessionTokenFilter,
+    SingleLayerConstraint,
+    GeoConstraint,
     GeoConstraintRule,
     ConstraintSubsetStringRule,
     ConstraintExpressionRule,
@@ -51,6 +58,7 @@ from .vector import (
     LayerVectorView,
     MODE_DATA
 )
+from .utils.filterplan import invalidate_filter_plans
 from .utils.structure import apply_tree_patch
 
 import json
@@ -172,6 +180,64 @@ def remove_parent_project_from_cache(sender, **kwargs):
 
 
 
+@receiver(post_save, sender=Project)
+def invalidate_layers_data_cache(sender, **kwargs):
+    """
+    Update the data version of the project layers: every cache built on layers data
+    (i.e. vector API responses) is invalidated on project update
+    """
+
+    if kwargs["created"]:
+        return
+
+    for layer in kwargs["instance"].layer_set.all():
+        layer.invalidate_data_cache()
+
+
+@receiver(post_save, sender=Layer)
+def invalidate_layer_data_cache(sender, **kwargs):
+    """
+    Update the data version of the layer on layer update
+    """
+
+    if kwargs["created"]:
+        return
+
+    kwargs["instance"].invalidate_data_cache()
+
+
+@receiver(post_commit_maplayer)
+def update_search_index(sender, **kwargs):
+    """
+    Update the search index of ogr file layers (sidecar FTS table) with the committed features,
+    postgres indexes are maintained by the database
+    """
+
+    metadata_layer = kwargs["layer_metadata"]
+    server_fids = kwargs.get("server_fids")
+    if not server_fids or metadata_layer.qgis_layer.providerType() != 'ogr':
+        return
+
+    index = get_search_index(metadata_layer.qgis_layer)
+    if index is None or not index.indexed_fields():
+        return
+
+    try:
+        fids = get_layer_fids_from_server_fids([str(fid) for fid in server_fids], metadata_layer.qgis_layer)
+    except Exception as e:
+        logger.error(f"Search index update, committed feature ids not found: {e}")
+        fids = []
+
+    # Features missing from the index would be excluded by the prefilter
+    if len(fids) < len(set(server_fids)):
+        logger.error(f"Search index of layer {metadata_layer.qgis_layer.name()} out of date, "
+                     f"committed features not found")
+        index.disable()
+        return
+
+    index.update_features(fids)
+
+
 @receiver(post_save, sender=Layer)
 def update_widget(sender, **kwargs):
     """
@@ -323,6 +389,55 @@ def invalid_prj_cache_by_constraint(**kwargs):
         f"{kwargs['instance'].constraint.layer.project}"
     )
 
+@receiver(post_save, sender=GeoConstraintRule)
+@receiver(pre_delete, sender=GeoConstraintRule)
+@receiver(post_save, sender=ConstraintExpressionRule)
+@receiver(pre_delete, sender=ConstraintExpressionRule)
+@receiver(post_save, sender=ConstraintSubsetStringRule)
+@receiver(pre_delete, sender=ConstraintSubsetStringRule)
+def invalidate_filter_plans_by_constraint_rule(**kwargs):
+    """Invalidate the filter plans of the layer of the constraint rule"""
+
+    invalidate_filter_plans(kwargs['instance'].constraint.layer_id)
+
+
+@receiver(post_save, sender=SingleLayerConstraint)
+@receiver(pre_delete, sender=SingleLayerConstraint)
+@receiver(post_save, sender=GeoConstraint)
+@receiver(pre_delete, sender=GeoConstraint)
+@receiver(post_save, sender=ColumnAcl)
+@receiver(pre_delete, sender=ColumnAcl)
+@receiver(post_save, sender=Layer)
+def invalidate_filter_plans_by_layer(**kwargs):
+    """Invalidate the filter plans of the layer on layer, constraint or column ACL changes"""
+
+    instance = kwargs['instance']
+    invalidate_filter_plans(instance.pk if isinstance(instance, Layer) else instance.layer_id)
+
+
+@receiver(post_save, sender=Project)
+def invalidate_layers_filter_plans(sender, **kwargs):
+    """Invalidate the filter plans of the project layers: layer fields can change on project update"""
+
+    if kwargs["created"]:
+        return
+
+    for layer_pk in kwargs["instance"].layer_set.values_list('pk', flat=True):
+        invalidate_filter_plans(layer_pk)
+
+
+@receiver(post_save, sender=UserObjectPermission)
+@receiver(post_delete, sender=UserObjectPermission)
+@receiver(post_save, sender=GroupObjectPermission)
+@receiver(post_delete, sender=GroupObjectPermission)
+def invalidate_filter_plans_by_layer_permission(**kwargs):
+    """Invalidate the filter plans (and the ACL snapshots) of the layer on layer permission changes"""
+
+    instance = kwargs['instance']
+    if instance.content_type_id == ContentType.objects.get_for_model(Layer).pk:
+        invalidate_filter_plans(int(instance.object_pk))
+
+
 @receiver(post_save, sender=ColumnAcl)
 @receiver(pre_delete, sender=ColumnAcl)
 def invalid_prj_cache_by_columnacl(**kwargs):
@@ -368,6 +483,7 @@ def add_filter_token(**kwargs):
             results = kwargs["sender"].results.results
             if results['result'] and hasattr(kwargs["sender"], 'total_feature_ids'):
                 fids = kwargs["sender"].total_feature_ids
+                fids_token = getattr(kwargs["sender"], 'total_feature_ids_token', None)
 
                 # Add a 'fake' fids array value for to create a filtertoken with zero results
                 if not fids:
@@ -385,7 +501,12 @@ def add_filter_token(**kwargs):
                 req.COOKIES = kwargs["sender"].request.COOKIES
                 req.user = kwargs["sender"].request.user
                 req.resolver_match = resolve(url)
-                req.GET['fidsin'] = ",".join(fids)
+
+                # Large sets of fids are passed by the cache token
+                if fids_token:
+                    req.GET['fidsintoken'] = fids_token
+                else:
+                    req.GET['fidsin'] = ",".join(fids)
 
                 view = LayerVectorView.as_view()
                 res = view(req, *[], **rkwargs).render()
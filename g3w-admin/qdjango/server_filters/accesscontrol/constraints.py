@@ -14,7 +14,8 @@ __copyright__ = 'Copyright 2020, Gis3W'
 from qgis.server import QgsAccessControlFilter
 from qgis.core import QgsMessageLog, Qgis
 from qdjango.apps import QGS_SERVER
-from qdjango.models import ConstraintSubsetStringRule, ConstraintExpressionRule, Layer, GeoConstraintRule
+from qdjango.utils.requestcontext import get_request_context
+from qdjango.utils.aclsnapshot import get_server_acl_snapshot
 
 class SingleLayerSubsetStringAccessControlFilter(QgsAccessControlFilter):
     """A filter that sets a subset string from the layer constraints"""
@@ -25,14 +26,13 @@ class SingleLayerSubsetStringAccessControlFilter(QgsAccessControlFilter):
     def layerFilterSubsetString(self, layer):
         """Retrieve and sets user layer constraints"""
 
-        try:
-            qdjango_layer = Layer.objects.get(project=QGS_SERVER.project, qgs_layer_id=layer.id())
-        except Layer.DoesNotExist:
+        layer_acl = get_server_acl_snapshot(get_request_context()).layer(layer.id())
+        if layer_acl is None:
             return ""
 
-        rule = ConstraintSubsetStringRule.get_rule_definition_for_user(QGS_SERVER.user, qdjango_layer.pk)
+        rule = layer_acl['subset_string']
         if rule:
-            QgsMessageLog.logMessage("SingleLayerSubsetStringAccessControlFilter rule for user %s and layer id %s: %s" % (QGS_SERVER.user, layer.id(), rule), "", Qgis.Info)
+            QgsMessageLog.logMessage("SingleLayerSubsetStringAccessControlFilter rule for user %s and layer id %s: %s" % (get_request_context().user, layer.id(), rule), "", Qgis.Info)
 
         return rule
 
@@ -61,17 +61,16 @@ class SingleLayerExpressionAccessControlFilter(QgsAccessControlFilter):
     def layerFilterExpression(self, layer):
         """Retrieve and sets user layer constraints"""
 
-        try:
-            qdjango_layer = Layer.objects.get(project=QGS_SERVER.project, qgs_layer_id=layer.id())
-        except Layer.DoesNotExist:
+        layer_acl = get_server_acl_snapshot(get_request_context()).layer(layer.id())
+        if layer_acl is None:
             # This is a special case for internal layers, we don't want to log this
             if not layer.customProperty('g3w-suite-internal', False):
-                QgsMessageLog.logMessage("SingleLayerExpressionAccessControlFilter for user %s: layer id %s does not exist!" % (QGS_SERVER.user, layer.id()), "", Qgis.Warning)
+                QgsMessageLog.logMessage("SingleLayerExpressionAccessControlFilter for user %s: layer id %s does not exist!" % (get_request_context().user, layer.id()), "", Qgis.Warning)
             return ""
 
-        rule = ConstraintExpressionRule.get_rule_definition_for_user(QGS_SERVER.user, qdjango_layer.pk)
+        rule = layer_acl['expression']
         if rule:
-            QgsMessageLog.logMessage("SingleLayerExpressionAccessControlFilter rule for user %s and layer id %s: %s" % (QGS_SERVER.user, layer.id(), rule), "", Qgis.Info)
+            QgsMessageLog.logMessage("SingleLayerExpressionAccessControlFilter rule for user %s and layer id %s: %s" % (get_request_context().user, layer.id(), rule), "", Qgis.Info)
 
         return rule
 
@@ -98,17 +97,16 @@ class GeoConstraintAccessControlFilter(QgsAccessControlFilter):
     def layerFilterExpression(self, layer):
         """Retrieve and sets user layer constraints"""
 
-        try:
-            qdjango_layer = Layer.objects.get(project=QGS_SERVER.project, qgs_layer_id=layer.id())
-        except Layer.DoesNotExist:
+        layer_acl = get_server_acl_snapshot(get_request_context()).layer(layer.id())
+        if layer_acl is None:
             # This is a special case for internal layers, we don't want to log this
             if not layer.customProperty('g3w-suite-internal', False):
-                QgsMessageLog.logMessage("SingleLayerExpressionAccessControlFilter for user %s: layer id %s does not exist!" % (QGS_SERVER.user, layer.id()), "", Qgis.Warning)
+                QgsMessageLog.logMessage("SingleLayerExpressionAccessControlFilter for user %s: layer id %s does not exist!" % (get_request_context().user, layer.id()), "", Qgis.Warning)
             return ""
 
-        rule = GeoConstraintRule.get_rule_definition_for_user(QGS_SERVER.user, qdjango_layer)
+        rule = layer_acl['geo_expression']
         if rule:
-            QgsMessageLog.logMessage("SingleLayerExpressionAccessControlFilter rule for user %s and layer id %s: %s" % (QGS_SERVER.user, layer.id(), rule), "", Qgis.Info)
+            QgsMessageLog.logMessage("SingleLayerExpressionAccessControlFilter rule for user %s and layer id %s: %s" % (get_request_context().user, layer.id(), rule), "", Qgis.Info)
 
         return rule
 
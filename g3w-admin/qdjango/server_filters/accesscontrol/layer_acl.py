@@ -11,11 +11,11 @@ __copyright__ = "Copyright 2015 - 2023, Gis3w"
 __license__ = "MPL 2.0"
 
 from django.conf import settings
-from guardian.shortcuts import get_perms, get_anonymous_user
 from qgis.server import QgsAccessControlFilter
 from qgis.core import QgsMessageLog, Qgis
 from qdjango.apps import QGS_SERVER
-from qdjango.models import Layer
+from qdjango.utils.requestcontext import get_request_context
+from qdjango.utils.aclsnapshot import get_server_acl_snapshot
 from urllib.parse import urlparse, parse_qs
 
 
@@ -35,15 +35,16 @@ class LayerAclAccessControlFilter(QgsAccessControlFilter):
         if layer.customProperty('g3w-suite-internal', False):
             rights.canRead = True
 
-        try:
-            qdjango_layer = Layer.objects.get(
-                project=QGS_SERVER.project, qgs_layer_id=layer.id())
+        context = get_request_context()
+        layer_acl = get_server_acl_snapshot(context).layer(layer.id())
+        if layer_acl is not None:
 
-            # Check for caching
+            # Check for caching: tiles rendered by the caching app (see qdjango.cache)
+            # or requests with the caching token
             purl = urlparse(self.server_iface.requestHandler().url())
             qs = parse_qs(purl.query)
             arg = 'g3wsuite_caching_token'.upper()
-            if ((len(set(settings.G3WADMIN_LOCAL_MORE_APPS).intersection(set(['caching', 'qmapproxy']))) > 0 and
+            if context.caching or ((len(set(settings.G3WADMIN_LOCAL_MORE_APPS).intersection(set(['caching', 'qmapproxy']))) > 0 and
                      arg in qs and
                     settings.TILESTACHE_CACHE_TOKEN == qs[arg][0]) and
                     f"{purl.scheme}://{purl.netloc}" == settings.QDJANGO_SERVER_URL):
@@ -55,18 +56,12 @@ class LayerAclAccessControlFilter(QgsAccessControlFilter):
             else:
 
                 # Check permission
-                perms = list(
-                    set(get_perms(QGS_SERVER.user, qdjango_layer)) |
-                    set(get_perms(get_anonymous_user(), qdjango_layer))
-                )
+                perms = layer_acl['perms']
                 rights.canRead = "view_layer" in perms
                 rights.canInsert = "add_layer" in perms
                 rights.canUpdate = "change_layer" in perms
                 rights.canDelete = "delete_layer" in perms
 
-        except Layer.DoesNotExist:
-            pass
-
         return rights
 
 
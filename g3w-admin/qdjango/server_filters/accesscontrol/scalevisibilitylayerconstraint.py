@@ -13,6 +13,7 @@ __copyright__ = 'Copyright 2015 - 2025, Gis3w'
 
 from qgis.server import QgsServerFilter, QgsServerProjectUtils
 from qdjango.apps import QGS_SERVER
+from qdjango.utils.requestcontext import get_request_context
 
 import logging
 
@@ -41,7 +42,8 @@ class ScaleVisibilityLayerConstraintFilter(QgsServerFilter):
         if 'LAYERS' not in params:
             return
 
-        qgs_project = QGS_SERVER.project.qgis_project
+        context = get_request_context()
+        qgs_project = context.project.qgis_project
         use_ids = QgsServerProjectUtils.wmsUseLayerIds(qgs_project)
 
 
@@ -51,7 +53,7 @@ class ScaleVisibilityLayerConstraintFilter(QgsServerFilter):
 
 
 
-        svlc = QGS_SERVER.project.get_scalevisibilitylayerconstraint(user=QGS_SERVER.djrequest.user,use_ids=use_ids)
+        svlc = context.project.get_scalevisibilitylayerconstraint(user=context.user,use_ids=use_ids)
 
         if not svlc:
             return
@@ -81,7 +83,7 @@ class ScaleVisibilityLayerConstraintFilter(QgsServerFilter):
         if not self.restore_ctx:
             return
 
-        qgs_project = QGS_SERVER.project.qgis_project
+        qgs_project = get_request_context().project.qgis_project
         use_ids = QgsServerProjectUtils.wmsUseLayerIds(qgs_project)
 
         for l, v in self.restore_ctx.items():
@@ -14,6 +14,7 @@ __copyright__ = 'Copyright 2015 - 2020, Gis3w'
 from qgis.server import QgsAccessControlFilter
 from qgis.core import QgsMessageLog, Qgis
 from qdjango.apps import QGS_SERVER
+from qdjango.utils.requestcontext import get_request_context
 from qdjango.models import SessionTokenFilter, Layer
 
 
@@ -26,19 +27,21 @@ class SingleLayerSessionTokenAccessControlFilter(QgsAccessControlFilter):
     def layerFilterExpression(self, layer):
         """Retrieve and sets user layer constraints"""
 
-        try:
-            qdjango_layer = Layer.objects.get(project=QGS_SERVER.project, qgs_layer_id=layer.id())
-        except Layer.DoesNotExist:
-            return ""
-
         # check for filtertoken
-        request_data = QGS_SERVER.djrequest.POST if QGS_SERVER.djrequest.method == 'POST' \
-            else QGS_SERVER.djrequest.GET
+        context = get_request_context()
+        request_data = context.djrequest.POST if context.djrequest.method == 'POST' \
+            else context.djrequest.GET
 
         filtertoken = request_data.get('filtertoken')
         if not filtertoken:
             return ""
 
+        # The layer is read only for requests with a filter token
+        try:
+            qdjango_layer = Layer.objects.get(project=context.project, qgs_layer_id=layer.id())
+        except Layer.DoesNotExist:
+            return ""
+
         rule = SessionTokenFilter.get_expr_for_token(filtertoken, qdjango_layer)
         QgsMessageLog.logMessage("SingleLayerSessionTokenAccessControlFilter expression for filtertoken %s layer id %s: %s" % (filtertoken, layer.id(), rule), "", Qgis.Info)
         return rule
@@ -42,6 +42,7 @@ from qgis.PyQt.QtGui import QColor
 from qgis.PyQt.QtCore import Qt, QTemporaryDir
 
 from qdjango.apps import QGS_SERVER, remove_project_from_cache
+from qdjango.utils.requestcontext import get_request_context
 
 
 class AnnotationsPrintFilter(QgsServerFilter):
@@ -230,7 +231,7 @@ class AnnotationsPrintFilter(QgsServerFilter):
         if not self.checkService(params):
             return True
 
-        qgs_project = QGS_SERVER.project.qgis_project
+        qgs_project = get_request_context().project.qgis_project
         use_ids = QgsServerProjectUtils.wmsUseLayerIds(qgs_project)
         epsg_project = qgs_project.crs().authid()
 
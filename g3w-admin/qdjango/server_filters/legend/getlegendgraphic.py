@@ -14,6 +14,7 @@ __copyright__ = 'Copyright 2022, Gis3w'
 from qgis.server import QgsServerFilter, QgsServerProjectUtils
 from qgis.core import Qgis, QgsMessageLog
 from qdjango.apps import QGS_SERVER
+from qdjango.utils.requestcontext import get_request_context
 
 import logging
 import json
@@ -50,7 +51,7 @@ class GetLegendGraphicFilter(QgsServerFilter):
                 'REQUEST' in params and \
                 params['SERVICE'].upper() == 'WMS' and \
                 params['REQUEST'].upper() == 'GETLEGENDGRAPHIC':
-            qgs_project = QGS_SERVER.project.qgis_project
+            qgs_project = get_request_context().project.qgis_project
             use_ids = QgsServerProjectUtils.wmsUseLayerIds(qgs_project)
             layer_id = params['LAYER']
 
@@ -15,6 +15,7 @@ __copyright__ = 'Copyright 2022, Gis3w'
 from qgis.server import QgsServerFilter, QgsServerProjectUtils
 from qgis.core import Qgis, QgsMessageLog, QgsMapLayerStyle
 from qdjango.apps import QGS_SERVER
+from qdjango.utils.requestcontext import get_request_context
 
 import logging
 
@@ -39,7 +40,7 @@ class LegendOnOffFilter(QgsServerFilter):
         if not qs or not ':' in qs:
                 return
 
-        qgs_project = QGS_SERVER.project.qgis_project
+        qgs_project = get_request_context().project.qgis_project
         use_ids = QgsServerProjectUtils.wmsUseLayerIds(qgs_project)
 
         for legend_layer in qs.split(';'):
@@ -124,7 +125,7 @@ class LegendOnOffFilter(QgsServerFilter):
         if len(self.renderers_config) == 0:
             return
 
-        qgs_project = QGS_SERVER.project.qgis_project
+        qgs_project = get_request_context().project.qgis_project
         use_ids = QgsServerProjectUtils.wmsUseLayerIds(qgs_project)
 
         if len(self.renderers_config):
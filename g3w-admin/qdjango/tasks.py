@@ -0,0 +1,112 @@
+# coding=utf-8
+""""Huey tasks for Qdjango
+
+.. note:: This program is free software; you can redistribute it and/or modify
+          it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+from functools import wraps
+
+from django.conf import settings
+from django.db import close_old_connections
+from huey import crontab
+from huey.contrib.djhuey import HUEY, db_periodic_task
+from huey_monitor.tqdm import ProcessInfo
+
+from .utils.exports import run_vector_export, cleanup_export_jobs
+
+VECTOR_EXPORT_CLEANUP_CRONTAB_HOURS = getattr(settings, 'VECTOR_EXPORT_CLEANUP_CRONTAB_HOURS', '1')
+
+task = HUEY.task
+
+
+def close_db(fn):
+    """Decorator called by db_task() to be used with tasks that may operate
+    on the database.
+
+    This implementation is a copy of djhuey implementation but it falls
+    back to noop when HUEY.testing is True.
+
+    Set HUEY.testing to True to skip DB connection close.
+
+    """
+
+    @wraps(fn)
+    def inner(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if not HUEY.immediate and not getattr(HUEY, 'testing', False):
+                close_old_connections()
+    return inner
+
+
+def db_task(*args, **kwargs):
+    """Decorator to be used with tasks that may operate on the database.
+
+    This implementation is a copy of djhuey implementation but it falls
+    back to noop when HUEY.testing is True.
+
+    Set HUEY.testing to True to skip DB connection close.
+
+    """
+
+    def decorator(fn):
+        ret = task(*args, **kwargs)(close_db(fn))
+        ret.call_local = fn
+        return ret
+    return decorator
+
+
+@db_task(context=True)
+def vector_export_task(user_pk, project_type, project_id, layer_name, mode, method, content_type, data, task):
+    """Export a vector layer asynchronously (vector API 'shp', 'gpkg', 'xls', 'csv' and 'gpx' modes),
+    the exported file is kept into the job directory until the retention time expires.
+
+    Returns: {'filename': <file name>, 'content_type': <mime type>, 'size': <bytes>}
+
+    :param user_pk: pk of the user who requested the export, None for anonymous user
+    :type user_pk: int
+    :param project_type: project type, i.e. 'qdjango'
+    :type project_type: str
+    :param project_id: project pk
+    :type project_id: int
+    :param layer_name: layer qgs_layer_id
+    :type layer_name: str
+    :param mode: vector API mode
+    :type mode: str
+    :param method: request method, 'GET' or 'POST'
+    :type method: str
+    :param content_type: request content type, for POST requests
+    :type content_type: str
+    :param data: request parameters or payload
+    :type data: dict
+    :raises Exception: raise on error
+    :rtype: dict
+    """
+
+    process_info = ProcessInfo(
+        task,
+        desc=f'Vector export {mode} of layer {layer_name}'
+    )
+
+    return run_vector_export(task.id, user_pk, project_type, project_id, layer_name, mode, method, content_type, data,
+                             process_info)
+
+
+@db_periodic_task(crontab(minute='0', hour='*/{}'.format(VECTOR_EXPORT_CLEANUP_CRONTAB_HOURS)), context=True)
+def vector_export_cleanup(task):
+    """
+    Cron-like process to remove the expired files of asynchronous vector exports.
+    """
+
+    process_info = ProcessInfo(
+        task,
+        desc='Remove expired vector exports'
+    )
+
+    return cleanup_export_jobs(process_info=process_info)
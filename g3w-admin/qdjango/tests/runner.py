@@ -13,7 +13,8 @@ __date__ = '2021-03-03'
 __copyright__ = 'Copyright 2021, Gis3W'
 
 from django.test.runner import DiscoverRunner, _teardown_databases
-from qdjango.apps import QGS_APPLICATION, QGS_SERVER
+from qdjango.apps import QGS_APPLICATION
+from qgis.core import QgsProject
 from qgis.server import QgsConfigCache
 
 
@@ -23,11 +24,9 @@ class G3wSuiteTestRunner(DiscoverRunner):
     def teardown_databases(self, old_config, **kwargs):
         """Destroy all the non-mirror databases and cleanup projects."""
 
-        global QGS_SERVER
-
+        # The last project loaded by get_qgs_project() is the project instance
         try:
-            QgsConfigCache.instance().removeEntry(QGS_SERVER.project.qgis_project.fileName())
-            QGS_SERVER.project = None
+            QgsConfigCache.instance().removeEntry(QgsProject.instance().fileName())
         except:
             pass
 
@@ -11,11 +11,17 @@ __date__ = '2020-04-14'
 __copyright__ = 'Copyright 2020, Gis3W'
 
 import os
+from unittest.mock import patch
+from django.db import connection
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.conf import settings
+from guardian.shortcuts import assign_perm, remove_perm
 from qdjango.apps import QGS_SERVER, get_qgs_project
-from qdjango.models import Project
+from qdjango.models import Layer, Project, SingleLayerConstraint, ConstraintSubsetStringRule, ConstraintExpressionRule
+from qdjango.utils.aclsnapshot import ProjectAclSnapshot, get_server_acl_snapshot
+from qdjango.utils.requestcontext import get_request_context
 from .base import QdjangoTestBase
 
 
@@ -47,3 +53,87 @@ class AccessControlTest(QdjangoTestBase):
         self.assertFalse(b'<Name>bluemarble</Name>' in response.content)
         self.assertTrue(b'<Name>world</Name>' in response.content)
 
+
+    def test_acl_snapshot(self):
+        """Test ACL snapshot read by the access control filters"""
+
+        world = self.qdjango_project.layer_set.get(qgs_layer_id='world20181008111156525')
+        user = self.test_viewer1
+
+        assign_perm('view_layer', user, world)
+        snapshot = ProjectAclSnapshot.build(self.qdjango_project, user)
+        layer_acl = snapshot.layer(world.qgs_layer_id)
+
+        self.assertEqual(layer_acl['pk'], world.pk)
+        self.assertTrue('view_layer' in layer_acl['perms'])
+        self.assertFalse('change_layer' in layer_acl['perms'])
+        self.assertEqual(layer_acl['subset_string'], '')
+        self.assertEqual(layer_acl['expression'], '')
+        self.assertIsNone(snapshot.layer('not_a_layer'))
+
+        constraint = SingleLayerConstraint(layer=world, active=True)
+        constraint.save()
+        ConstraintSubsetStringRule(constraint=constraint, user=user, rule="NAME != 'ITALY'").save()
+        ConstraintExpressionRule(constraint=constraint, user=user, rule="NAME != 'ITALY'").save()
+
+        # Same rules of the single layer queries
+        snapshot = ProjectAclSnapshot.build(self.qdjango_project, user)
+        layer_acl = snapshot.layer(world.qgs_layer_id)
+        self.assertEqual(layer_acl['subset_string'],
+                         ConstraintSubsetStringRule.get_rule_definition_for_user(user, world.pk))
+        self.assertEqual(layer_acl['expression'],
+                         ConstraintExpressionRule.get_rule_definition_for_user(user, world.pk))
+
+        # Queries don't depend on the number of layers
+        with CaptureQueriesContext(connection) as queries:
+            ProjectAclSnapshot.build(self.qdjango_project, user)
+
+        for i in range(5):
+            Layer.objects.create(name=f'acllayer{i}', title=f'acllayer{i}', origname=f'acllayer{i}',
+                                 qgs_layer_id=f'acllayer{i}_23456', project=self.qdjango_project,
+                                 layer_type='postgres', datasource='')
+
+        with CaptureQueriesContext(connection) as more_layers_queries:
+            snapshot = ProjectAclSnapshot.build(self.qdjango_project, user)
+
+        self.assertIsNotNone(snapshot.layer('acllayer4_23456'))
+        self.assertEqual(len(queries), len(more_layers_queries))
+
+        # Cached snapshot is invalidated by constraint and permission changes
+        snapshot = ProjectAclSnapshot.for_user(self.qdjango_project, user)
+        self.assertEqual(snapshot.layer(world.qgs_layer_id)['subset_string'], "(NAME != 'ITALY')")
+
+        constraint.active = False
+        constraint.save()
+        snapshot = ProjectAclSnapshot.for_user(self.qdjango_project, user)
+        self.assertEqual(snapshot.layer(world.qgs_layer_id)['subset_string'], '')
+
+        remove_perm('view_layer', user, world)
+        snapshot = ProjectAclSnapshot.for_user(self.qdjango_project, user)
+        self.assertFalse('view_layer' in snapshot.layer(world.qgs_layer_id)['perms'])
+
+        # Filters read the snapshot of the request
+        ows_url = reverse('OWS:ows', kwargs={'group_slug': self.qdjango_project.group.slug, 'project_type': 'qdjango', 'project_id': self.qdjango_project.id})
+        c = Client()
+        self.assertTrue(c.login(username='admin01', password='admin01'))
+
+        snapshots = []
+
+        def record_snapshot(context):
+            snapshots.append(get_server_acl_snapshot(context))
+            return snapshots[-1]
+
+        with patch('qdjango.server_filters.accesscontrol.layer_acl.get_server_acl_snapshot',
+                   side_effect=record_snapshot):
+            c.get(ows_url, {
+                'REQUEST': 'GetCapabilities',
+                'SERVICE': 'WMS',
+            })
+
+        self.assertTrue(len(snapshots) > 0)
+        self.assertEqual(snapshots[0].project_pk, self.qdjango_project.pk)
+        self.assertEqual(snapshots[0].user_pk, self.test_user1.pk)
+
+        # The request context is cleared at the end of the request
+        self.assertIsNone(get_request_context())
+        self.assertIsNone(QGS_SERVER.acl_snapshot)
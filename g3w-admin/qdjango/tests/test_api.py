@@ -22,6 +22,7 @@ from django.urls import reverse
 from django.utils.http import int_to_base36
 from django.utils.crypto import salted_hmac
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 from guardian.shortcuts import assign_perm, remove_perm, get_anonymous_user
 from rest_framework.test import APIClient
 
@@ -36,10 +37,15 @@ from qdjango.models.constraints import (
 from qdjango.models.geoconstraints import GeoConstraint, GeoConstraintRule
 from qdjango.api.layers.filters import FILTER_RELATIONONETOMANY_PARAM
 from qdjango.utils.data import QgisProject
+from qdjango.utils.exportcache import ExportCache
+from qdjango.vector import LayerVectorView
+from core.api.base.vector import MetadataVectorLayer
+from qdjango.utils.exports import cleanup_export_jobs, create_export_job
 from qdjango.models import SessionTokenFilter, SessionTokenFilterLayer, FilterLayerSaved
 from usersmanage.models import Group as UserGroup
 from core.tests.base import CoreTestBase
 from core.utils.qgisapi import get_qgs_project, get_qgis_layer
+from core.utils.columnar import pyarrow
 
 from .base import (
     QdjangoTestBase,
@@ -65,6 +71,7 @@ import os
 import zipfile
 import base64
 from io import BytesIO
+from unittest.mock import patch
 import csv
 
 
@@ -1311,7 +1318,7 @@ class TestQdjangoLayersAPI(QdjangoTestBase):
 
         self.assertEqual(response.status_code, 200)
 
-        z = zipfile.ZipFile(BytesIO(response.content))
+        z = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
         temp = QTemporaryDir()
         z.extractall(temp.path())
         vl = QgsVectorLayer(temp.path())
@@ -1332,7 +1339,7 @@ class TestQdjangoLayersAPI(QdjangoTestBase):
         temp = QTemporaryDir()
         fname = temp.path() + '/temp.gpkg'
         with open(fname, 'wb') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1353,7 +1360,7 @@ class TestQdjangoLayersAPI(QdjangoTestBase):
         temp = QTemporaryDir()
         fname = temp.path() + '/temp.xlsx'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1372,7 +1379,7 @@ class TestQdjangoLayersAPI(QdjangoTestBase):
         temp = QTemporaryDir()
         fname = temp.path() + '/temp.csv'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1398,7 +1405,7 @@ class TestQdjangoLayersAPI(QdjangoTestBase):
         temp = QTemporaryDir()
         fname = temp.path() + '/temp.gpx'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         fields = [f for f in vl.fields()]
 
@@ -1844,6 +1851,446 @@ class TestQdjangoLayersAPI(QdjangoTestBase):
 
         self.assertEqual(resp['count'], 1)
 
+        # check 'unique_limit' and 'unique_prefix'
+        # ----------------------------------------
+        uniques = sorted(v for v in qgis_layer.uniqueValues(qgis_layer.fields().indexOf('ISO2_CODE')) if v)
+
+        resp = json.loads(self._testApiCall('core-vector-api',
+                                            ['data', 'qdjango', self.project310.instance.pk,
+                                                cities.qgs_layer_id],
+                                            {
+                                                'unique': 'ISO2_CODE',
+                                                'unique_limit': 3
+                                            }).content)
+
+        self.assertEqual(resp['data'], uniques[:3])
+
+        resp = json.loads(self._testApiCall('core-vector-api',
+                                            ['data', 'qdjango', self.project310.instance.pk,
+                                                cities.qgs_layer_id],
+                                            {
+                                                'unique': 'ISO2_CODE',
+                                                'unique_prefix': 'i'
+                                            }).content)
+
+        self.assertEqual(resp['data'], [v for v in uniques if v.lower().startswith('i')])
+        self.assertIn('IT', resp['data'])
+
+        # 'suggest' on the same field is used as prefix
+        resp = json.loads(self._testApiCall('core-vector-api',
+                                            ['data', 'qdjango', self.project310.instance.pk,
+                                                cities.qgs_layer_id],
+                                            {
+                                                'unique': 'ISO2_CODE',
+                                                'suggest': 'ISO2_CODE|i'
+                                            }).content)
+
+        self.assertEqual(resp['data'], [v for v in uniques if v.lower().startswith('i')])
+
+    @patch('core.api.base.views.VECTOR_RESPONSE_CACHE_TTL', 300)
+    def test_vector_api_response_cache(self):
+        """ Test ETag, Last-Modified and 'If-None-Match' for 'data', 'config' and 'featurecount' vector API """
+
+        cities = Layer.objects.get(
+            project_id=self.project310.instance.pk, origname='cities10000eu')
+
+        args = ['data', 'qdjango', self.project310.instance.pk, cities.qgs_layer_id]
+        params = {'page': '1', 'page_size': '5', 'ordering': 'NAME'}
+
+        response = self._testApiCall('core-vector-api', args, params, logout=False)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertIn('private', response['Cache-Control'])
+        resp = json.loads(response.content)
+
+        # Cached response
+        response = self._testApiCall('core-vector-api', args, params, login=False, logout=False)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content), resp)
+
+        # Conditional GET
+        path = reverse('core-vector-api', args=args)
+        response = self.client.get(path, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        # Different parameters, different ETag
+        response = self.client.get(path, {'page': '2', 'page_size': '5', 'ordering': 'NAME'},
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # Data changes invalidate the ETag
+        cities.invalidate_data_cache()
+        response = self.client.get(path, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # Config and featurecount modes
+        for mode in ('config', 'featurecount'):
+            response = self._testApiCall('core-vector-api',
+                                         [mode, 'qdjango', self.project310.instance.pk, cities.qgs_layer_id],
+                                         login=False, logout=False)
+            path = reverse('core-vector-api',
+                           args=[mode, 'qdjango', self.project310.instance.pk, cities.qgs_layer_id])
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        # Not cached: autofilter
+        response = self.client.get(reverse('core-vector-api', args=args), {'autofilter': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+        self.client.logout()
+
+    def test_layer_data_version(self):
+        """ Test data version of layers: shared by layers reading the same table, read once per instance """
+
+        datasource = "dbname='g3w' host=localhost port=5432 user='{}' password='{}' key='id' srid=4326 " \
+                     "type=Point table=\"public\".\"cities\" (geom) sql={}"
+
+        key = Layer(layer_type='postgres', datasource=datasource.format('admin', 'secret', ''))._data_version_key()
+
+        # Credentials and subset strings are not part of the key
+        self.assertEqual(Layer(layer_type='postgres', datasource=datasource.format(
+            'viewer', 'viewer', '"NAME" = \'Rome\''))._data_version_key(), key)
+
+        # Other table, other key
+        self.assertNotEqual(Layer(layer_type='postgres', datasource=datasource.format(
+            'admin', 'secret', '').replace('cities', 'countries'))._data_version_key(), key)
+
+        # File layers
+        cities = Layer.objects.get(
+            project_id=self.project310.instance.pk, origname='cities10000eu')
+        self.assertEqual(
+            Layer(layer_type=cities.layer_type,
+                  datasource=f'{cities.datasource}|subset="NAME" = \'Rome\'')._data_version_key(),
+            cities._data_version_key())
+
+        # Invalidation updates the version of the instance
+        version = cities.data_version
+        cities.invalidate_data_cache()
+        self.assertNotEqual(cities.data_version, version)
+        self.assertEqual(Layer.objects.get(pk=cities.pk).data_version, cities.data_version)
+
+    @patch('core.api.base.views.VECTOR_RESPONSE_CACHE_TTL', 300)
+    def test_mvt_mode(self):
+        """ Test 'mvt' mode for vector API """
+
+        cities = Layer.objects.get(
+            project_id=self.project310.instance.pk, origname='cities10000eu')
+
+        path = reverse('core-vector-api-mvt', args=['mvt', 'qdjango', self.project310.instance.pk,
+                                                    cities.qgs_layer_id, 0, 0, 0])
+
+        response = self.client.get(path)
+        self.assertIn(response.status_code, [302, 403])
+
+        self.assertTrue(self.client.login(username='admin01', password='admin01'))
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+
+        # Layer name, the server FID property and a field name are in the tile
+        self.assertIn(cities.qgs_layer_id.encode('utf-8'), response.content)
+        self.assertIn(b'g3w_fid', response.content)
+        self.assertIn(b'NAME', response.content)
+
+        # Tile is cached
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        # Filter backends are applied: no features, empty tile
+        response = self.client.get(path, {'field': 'NAME|eq|not_existing_city'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+
+        # Not existing tile
+        response = self.client.get(reverse('core-vector-api-mvt', args=['mvt', 'qdjango', self.project310.instance.pk,
+                                                                        cities.qgs_layer_id, 1, 2, 0]))
+        self.assertEqual(response.status_code, 404)
+
+        self.client.logout()
+
+    def test_columnar_modes(self):
+        """ Test 'fgb' and 'arrow' modes for vector API """
+
+        world = Layer.objects.get(
+            project_id=self.project322.instance.pk, qgs_layer_id='world20181008111156525')
+        args = ['qdjango', self.project322.instance.pk, world.qgs_layer_id]
+
+        world.download_gpkg = False
+        world.save()
+        self._testApiCall('core-vector-api', ['fgb'] + args, status_auth=403)
+
+        world.download_gpkg = True
+        world.save()
+
+        # FlatGeobuf, fields excluded for WMS service are not written
+        response = self._testApiCall('core-vector-api', ['fgb'] + args)
+        self.assertEqual(response['Content-Type'], 'application/flatgeobuf')
+        content = b''.join(response.streaming_content)
+        self.assertEqual(content[:4], b'fgb\x03')
+
+        temp = QTemporaryDir()
+        fname = temp.path() + '/temp.fgb'
+        with open(fname, 'wb') as f:
+            f.write(content)
+
+        vl = QgsVectorLayer(fname)
+        self.assertTrue(vl.isValid())
+        self.assertEqual(vl.fields().names(), ['NAME'])
+        self.assertEqual(vl.featureCount(), world.qgis_layer.featureCount())
+
+        # Filter backends are applied, the layer is not changed
+        response = self._testApiCall('core-vector-api', ['fgb'] + args, {'field': 'NAME|eq|Italy'})
+        with open(fname, 'wb') as f:
+            f.write(b''.join(response.streaming_content))
+        vl = QgsVectorLayer(fname)
+        self.assertEqual(vl.featureCount(), len(list(
+            world.qgis_layer.getFeatures(QgsFeatureRequest().setFilterExpression('"NAME" = \'Italy\'')))))
+        self.assertEqual(world.qgis_layer.selectedFeatureCount(), 0)
+
+        # Without spatial index
+        response = self._testApiCall('core-vector-api', ['fgb'] + args, {'spatial_index': '0'})
+        with open(fname, 'wb') as f:
+            f.write(b''.join(response.streaming_content))
+        vl = QgsVectorLayer(fname)
+        self.assertTrue(vl.isValid())
+        self.assertEqual(vl.featureCount(), world.qgis_layer.featureCount())
+
+        # Arrow IPC stream, pyarrow is required
+        if pyarrow is None:
+            self._testApiCall('core-vector-api', ['arrow'] + args, status_auth=501)
+            return
+
+        response = self._testApiCall('core-vector-api', ['arrow'] + args)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.arrow.stream')
+        content = b''.join(response.streaming_content)
+
+        # Stream begins with the schema message
+        self.assertEqual(content[:4], b'\xff\xff\xff\xff')
+        self.assertIn(b'NAME', content)
+
+    def test_async_export(self):
+        """ Test asynchronous export jobs ('async' parameter of download modes) """
+
+        world = Layer.objects.get(
+            project_id=self.project322.instance.pk, qgs_layer_id='world20181008111156525')
+        world.download_gpkg = True
+        world.save()
+
+        # Test settings run huey in immediate mode: the job is complete when the response is returned
+        response = self._testApiCall('core-vector-api', ['gpkg', 'qdjango', self.project322.instance.pk,
+                                                         world.qgs_layer_id],
+                                     {'async': '1', 'field': 'NAME|eq|Italy'}, logout=False)
+        jresponse = response.json()
+        self.assertTrue(jresponse['result'])
+        self.assertIn(jresponse['task_id'], jresponse['status_url'])
+
+        response = self.client.get(jresponse['status_url'])
+        self.assertEqual(response.status_code, 200)
+        jstatus = response.json()
+        self.assertEqual(jstatus['status'], 'complete')
+        self.assertEqual(jstatus['progress'], 100)
+        self.assertEqual(jstatus['task_result']['content_type'], 'application/geopackage+vnd.sqlite3')
+        self.assertEqual(jstatus['task_result']['download_url'], jresponse['download_url'])
+
+        response = self.client.get(jresponse['download_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        content = b''.join(response.streaming_content)
+        self.assertEqual(len(content), jstatus['task_result']['size'])
+        self.assertEqual(content[:16], b'SQLite format 3\x00')
+
+        # Filter backends and fields excluded for WMS service are applied as in the synchronous request
+        temp = QTemporaryDir()
+        fname = temp.path() + '/temp.gpkg'
+        with open(fname, 'wb') as f:
+            f.write(content)
+
+        vl = QgsVectorLayer(fname)
+        self.assertTrue(vl.isValid())
+        self.assertEqual([f.name() for f in vl.fields() if f.name() != 'fid'], ['NAME'])
+        self.assertEqual(vl.featureCount(), len(list(
+            world.qgis_layer.getFeatures(QgsFeatureRequest().setFilterExpression('"NAME" = \'Italy\'')))))
+
+        # Range requests
+        response = self.client.get(jresponse['download_url'], HTTP_RANGE='bytes=0-15')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 0-15/{len(content)}')
+        self.assertEqual(b''.join(response.streaming_content), content[:16])
+
+        response = self.client.get(jresponse['download_url'], HTTP_RANGE='bytes=-10')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), content[-10:])
+
+        response = self.client.get(jresponse['download_url'], HTTP_RANGE=f'bytes={len(content)}-')
+        self.assertEqual(response.status_code, 416)
+
+        # Only the user who submitted the job can read it
+        self.client.logout()
+        self.assertEqual(self.client.get(jresponse['status_url']).status_code, 403)
+        self.assertEqual(self.client.get(jresponse['download_url']).status_code, 403)
+
+        # Expired jobs are removed
+        cleanup_export_jobs(0)
+        self.assertTrue(self.client.login(username='admin01', password='admin01'))
+        self.assertEqual(self.client.get(jresponse['download_url']).status_code, 404)
+        self.assertEqual(self.client.get(jresponse['status_url']).status_code, 404)
+
+        # Pending jobs: the owner is known before the job starts
+        create_export_job(jresponse['task_id'], None, world.qgs_layer_id, 'gpkg')
+        self.assertEqual(self.client.get(jresponse['status_url']).status_code, 403)
+        self.client.logout()
+        jstatus = self.client.get(jresponse['status_url']).json()
+        self.assertEqual(jstatus['status'], 'pending')
+        self.assertIsNone(jstatus['task_result'])
+        self.assertEqual(self.client.get(jresponse['download_url']).status_code, 404)
+        cleanup_export_jobs(0)
+
+    def test_export_cache(self):
+        """ Test export cache of download modes """
+
+        world = Layer.objects.get(
+            project_id=self.project322.instance.pk, qgs_layer_id='world20181008111156525')
+        world.download = True
+        world.save()
+        args = ['shp', 'qdjango', self.project322.instance.pk, world.qgs_layer_id]
+
+        cache_dir = QTemporaryDir()
+        with override_settings(VECTOR_EXPORT_CACHE_MAX_SIZE=100 * 1024 * 1024,
+                               VECTOR_EXPORT_CACHE_DIR=cache_dir.path()):
+
+            # Miss: file written by QgsVectorFileWriter
+            response = self._testApiCall('core-vector-api', args, {'field': 'NAME|eq|Italy'})
+            content = b''.join(response.streaming_content)
+            self.assertEqual(len(ExportCache().entries()), 1)
+
+            # Hit: cached file
+            response = self._testApiCall('core-vector-api', args, {'field': 'NAME|eq|Italy'})
+            self.assertEqual(b''.join(response.streaming_content), content)
+            self.assertEqual(response['Content-Type'], 'application/x-zip-compressed')
+            self.assertIn('fileDownload', response.cookies)
+
+            # Other filter parameters
+            response = self._testApiCall('core-vector-api', args, {'field': 'NAME|eq|France'})
+            self.assertNotEqual(b''.join(response.streaming_content), content)
+            self.assertEqual(len(ExportCache().entries()), 2)
+
+            # Data changed (i.e. editing commit): entries of the layer are removed
+            world.invalidate_data_cache()
+            self.assertEqual(ExportCache().entries(), [])
+            response = self._testApiCall('core-vector-api', args, {'field': 'NAME|eq|Italy'})
+            self.assertFalse(response.streaming)
+
+            # Size budget: least recently used entries are evicted
+            export_cache = ExportCache(max_size=1)
+            export_cache.evict()
+            self.assertEqual(export_cache.entries(), [])
+
+        cache_dir = QTemporaryDir()
+        export_cache = ExportCache(root=cache_dir.path(), max_size=20)
+        temp = QTemporaryDir()
+        for name in ('a', 'b', 'c'):
+            with open(os.path.join(temp.path(), name), 'wb') as f:
+                f.write(b'0123456789')
+
+        export_cache.put('1/1-a', os.path.join(temp.path(), 'a'))
+        time.sleep(0.01)
+        export_cache.put('1/1-b', os.path.join(temp.path(), 'b'))
+        time.sleep(0.01)
+
+        # Access 'a': 'b' is the least recently used entry
+        self.assertIsNotNone(export_cache.get('1/1-a'))
+        time.sleep(0.01)
+        export_cache.put('1/1-c', os.path.join(temp.path(), 'c'))
+        self.assertIsNone(export_cache.get('1/1-b'))
+        self.assertIsNotNone(export_cache.get('1/1-a'))
+        self.assertIsNotNone(export_cache.get('1/1-c'))
+
+        # New data version: entries of previous versions are removed
+        export_cache.put('1/2-a', os.path.join(temp.path(), 'a'))
+        self.assertEqual([os.path.basename(e[2]) for e in export_cache.entries()], ['2-a'])
+
+    def test_export_layer_clone(self):
+        """ Test exports don't change the QGIS layer shared by the requests """
+
+        world = Layer.objects.get(
+            project_id=self.project322.instance.pk, qgs_layer_id='world20181008111156525')
+        world.download_gpkg = True
+        world.save()
+
+        qgis_layer = world.qgis_layer
+        original_subset_string = qgis_layer.subsetString()
+
+        clone = LayerVectorView._clone_metadata_layer(MetadataVectorLayer(qgis_layer, world.origname, layer=world))
+        self.assertIsNot(clone.qgis_layer, qgis_layer)
+        self.assertEqual(clone.layer, world)
+
+        clone.qgis_layer.setSubsetString('"NAME" = \'Italy\'')
+        clone.qgis_layer.selectAll()
+        self.assertEqual(qgis_layer.subsetString(), original_subset_string)
+        self.assertEqual(qgis_layer.selectedFeatureCount(), 0)
+
+        # Temporary subset string of the shared layer: the clone has the subset string of the project
+        qgis_layer.setSubsetString('"NAME" = \'France\'')
+        try:
+            clone = LayerVectorView._clone_metadata_layer(MetadataVectorLayer(qgis_layer, world.origname, layer=world))
+        finally:
+            qgis_layer.setSubsetString(original_subset_string)
+        self.assertEqual(clone.qgis_layer.subsetString(), world.subset_string)
+        self.assertEqual(world.subset_string, original_subset_string)
+
+        # Filter backends and selection of the exports are applied to a clone
+        changes = []
+        qgis_layer.subsetStringChanged.connect(lambda: changes.append('subset'))
+        qgis_layer.selectionChanged.connect(lambda *args: changes.append('selection'))
+
+        for mode in ('gpkg', 'fgb'):
+            response = self._testApiCall('core-vector-api', [mode, 'qdjango', self.project322.instance.pk,
+                                                             world.qgs_layer_id], {'field': 'NAME|eq|Italy'})
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(changes, [])
+
+    @patch('core.api.base.views.VECTOR_SIMPLIFIED_GEOMETRY_CACHE_TTL', 3600)
+    def test_simplification_api_params(self):
+        """ Test 'resolution', 'map_scale' and 'quantize' params for 'data' vector API """
+
+        world = self.project322.instance.layer_set.get(name='world')
+        args = ['data', 'qdjango', self.project322.instance.pk, world.qgs_layer_id]
+
+        def _vertices(resp):
+            def _count(coordinates):
+                if coordinates and isinstance(coordinates[0], (int, float)):
+                    return 1
+                return sum(_count(c) for c in coordinates)
+            return sum(_count(f['geometry']['coordinates']) for f in resp['vector']['data']['features']
+                       if f['geometry'])
+
+        full = json.loads(self._testApiCall('core-vector-api', args).content)
+        simplified = json.loads(self._testApiCall('core-vector-api', args, {'resolution': '1'}).content)
+
+        self.assertEqual(simplified['vector']['count'], full['vector']['count'])
+        self.assertLess(_vertices(simplified), _vertices(full))
+
+        # Cached simplified geometries
+        self.assertEqual(json.loads(self._testApiCall('core-vector-api', args, {'resolution': '1'}).content),
+                         simplified)
+
+        # Map scale
+        resp = json.loads(self._testApiCall('core-vector-api', args, {'map_scale': '50000000'}).content)
+        self.assertLess(_vertices(resp), _vertices(full))
+
+        # Quantized coordinates: 1 decimal for 0.5 map units per pixel
+        resp = json.loads(self._testApiCall('core-vector-api', args, {'resolution': '0.5', 'quantize': '1'}).content)
+        point = resp['vector']['data']['features'][0]['geometry']['coordinates']
+        while isinstance(point[0], list):
+            point = point[0]
+        self.assertEqual(point, [round(c, 1) for c in point])
+
+        self._testApiCall('core-vector-api', args, {'resolution': '-1'}, status_auth=400)
+        self._testApiCall('core-vector-api', args, {'map_scale': 'not_a_number'}, status_auth=400)
+
     def test_field_formatter_api_param(self):
         """
         Test 'fformatter' url request parameter for 'data' vector API
@@ -1893,6 +2340,24 @@ class TestQdjangoLayersAPI(QdjangoTestBase):
 
         self.assertEqual(resp['data'], [['A', 'Apple'], ['B', 'Banana'], ['B1', 'Blueberry'], ['C', 'Coconut']])
 
+    @patch('core.api.base.views.VECTOR_RESPONSE_CACHE_TTL', 300)
+    def test_field_formatter_api_param_response_cache(self):
+        """
+        Test 'fformatter' url request parameter with RelationReference widget and response cache enabled:
+        referenced values are read by an internal vector API request
+        """
+
+        cities = Layer.objects.get(
+            project_id=self.project328_rrwidget.instance.pk, origname='cities10000eu')
+        args = ['data', 'qdjango', self.project328_rrwidget.instance.pk, cities.qgs_layer_id]
+
+        resp = json.loads(self._testApiCall('core-vector-api', args, {'fformatter': 'ISO2_CODE'}).content)
+        self.assertIn(['IT', 'Italia (IT)'], resp['data'])
+
+        # Cached response
+        self.assertEqual(json.loads(self._testApiCall('core-vector-api', args, {'fformatter': 'ISO2_CODE'}).content),
+                         resp)
+
 
 
 
@@ -2513,7 +2978,7 @@ class TestVectorApiDataDownloadWithRelations(QdjangoTestBase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
-        z = zipfile.ZipFile(BytesIO(res.content))
+        z = zipfile.ZipFile(BytesIO(b''.join(res.streaming_content)))
         temp = QTemporaryDir()
         z.extractall(temp.path())
         vl = QgsVectorLayer(temp.path())
@@ -2529,7 +2994,7 @@ class TestVectorApiDataDownloadWithRelations(QdjangoTestBase):
 
         self.assertEqual(res.status_code, 200)
 
-        z = zipfile.ZipFile(BytesIO(res.content))
+        z = zipfile.ZipFile(BytesIO(b''.join(res.streaming_content)))
         temp = QTemporaryDir()
         z.extractall(temp.path())
         self.assertTrue(len(os.listdir(temp.path())), 4)
@@ -2542,7 +3007,7 @@ class TestVectorApiDataDownloadWithRelations(QdjangoTestBase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
-        z = zipfile.ZipFile(BytesIO(res.content))
+        z = zipfile.ZipFile(BytesIO(b''.join(res.streaming_content)))
         temp = QTemporaryDir()
         z.extractall(temp.path())
         self.assertTrue(len(os.listdir(temp.path())), 8)
@@ -2554,7 +3019,7 @@ class TestVectorApiDataDownloadWithRelations(QdjangoTestBase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
-        z = zipfile.ZipFile(BytesIO(res.content))
+        z = zipfile.ZipFile(BytesIO(b''.join(res.streaming_content)))
         temp = QTemporaryDir()
         z.extractall(temp.path())
 
@@ -2567,7 +3032,7 @@ class TestVectorApiDataDownloadWithRelations(QdjangoTestBase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
-        z = zipfile.ZipFile(BytesIO(res.content))
+        z = zipfile.ZipFile(BytesIO(b''.join(res.streaming_content)))
         temp = QTemporaryDir()
         z.extractall(temp.path())
 
@@ -2584,6 +3049,53 @@ class TestVectorApiDataDownloadWithRelations(QdjangoTestBase):
 
         self.client.logout()
 
+    def test_vector_api_download_relations_workers(self):
+        """
+        Test relation layers written by the worker pool are streamed into the zip file
+        """
+
+        countries = self.project_down_with_relations.instance.layer_set.get(
+            qgs_layer_id='countries_simpl20171228095706310')
+        cities = self.project_down_with_relations.instance.layer_set.get(
+            qgs_layer_id='cities10000eu20171228095720113')
+
+        countries.download = True
+        countries.save()
+        cities.download_csv = True
+        cities.save()
+
+        self.assertTrue(self.client.login(username=self.test_admin1.username, password=self.test_admin1.username))
+
+        url = reverse(
+            'core-vector-api',
+            kwargs={
+                'mode_call': 'shp',
+                'project_type': 'qdjango',
+                'project_id': self.project_down_with_relations.instance.id,
+                'layer_name': countries.qgs_layer_id
+            }
+        ) + '?down_with_relations=1&field=ISOCODE|eq|IT'
+
+        namelists = []
+        for workers in (1, 4):
+            with patch('qdjango.vector.VECTOR_EXPORT_RELATIONS_WORKERS', workers):
+                res = self.client.get(url)
+
+            self.assertEqual(res.status_code, 200)
+            z = zipfile.ZipFile(BytesIO(b''.join(res.streaming_content)))
+            self.assertIsNone(z.testzip())
+            namelists.append(sorted(z.namelist()))
+
+            with z.open('Cities.csv') as f:
+                # 1124 + header
+                self.assertEqual(len(f.read().decode('utf-8').splitlines()), 1125)
+
+        self.assertEqual(namelists[0], namelists[1])
+        self.assertTrue(any(n.endswith('.shp') for n in namelists[0]))
+        self.assertTrue(any(n.endswith('.dbf') for n in namelists[0]))
+
+        self.client.logout()
+
 class TestVectorApiGeoFilter(QdjangoTestBase):
     """ Test /vector/api/config with geo filter
         Test geo_filter_wkt and geo_fitler_mode parameters
@@ -353,7 +353,7 @@ class TestColumnAcl(QdjangoTestBase):
         temp = QTemporaryDir()
         fname = temp.path() + '/temp.csv'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -372,7 +372,7 @@ class TestColumnAcl(QdjangoTestBase):
         self.assertEqual(response.status_code, 200)
 
         self.assertEqual(response.status_code, 200)
-        z = zipfile.ZipFile(BytesIO(response.content))
+        z = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
         temp = QTemporaryDir()
         z.extractall(temp.path())
         vl = QgsVectorLayer(temp.path())
@@ -22,6 +22,7 @@ from django.contrib.auth.models import User
 from django.test import Client
 from django.urls import reverse
 from django.core.files import File
+from django.core.cache import cache
 from guardian.shortcuts import assign_perm, get_anonymous_user
 from qgis.core import QgsVectorLayer, QgsFeatureRequest, QgsExpression, Qgis
 from qgis.PyQt.QtCore import QTemporaryDir
@@ -39,6 +40,7 @@ from qdjango.models import (
     Project,
     ScaleVisibilityLayerConstraint
 )
+from qdjango.utils.filterplan import LayerFilterPlan
 from core.models import Group as CoreGroup, G3WSpatialRefSys
 from unittest import skipIf
 from .base import QdjangoTestBase, CURRENT_PATH, TEST_BASE_PATH, QgisProject
@@ -348,6 +350,43 @@ class SingleLayerSubsetStringConstraints(TestSingleLayerConstraintsBase):
         self.assertFalse(self._check_subset_string())
         self.assertFalse(self._check_wfs_getfeature())
 
+    def test_filter_plan(self):
+        """Test filter plans are cached and invalidated on constraint changes"""
+
+        admin01 = self.test_user1
+
+        plan = LayerFilterPlan.for_user(self.world, admin01)
+        self.assertEqual(plan.subset_string, '')
+        self.assertEqual(plan.expression, '')
+        self.assertEqual(plan.geo_expression, '')
+        self.assertEqual(plan.visible_fields, sorted(self.world.visible_fields_for_user(admin01)))
+
+        # Cached
+        self.assertEqual(cache.get(LayerFilterPlan.cache_key(self.world, admin01)).fingerprint, plan.fingerprint)
+
+        constraint = SingleLayerConstraint(layer=self.world, active=True)
+        constraint.save()
+        rule = ConstraintSubsetStringRule(constraint=constraint, user=admin01, rule="NAME != 'ITALY'")
+        rule.save()
+
+        plan = LayerFilterPlan.for_user(self.world, admin01)
+        self.assertEqual(plan.subset_string, "(NAME != 'ITALY')")
+        fingerprint = plan.fingerprint
+
+        # Other users and contexts have their own plan
+        self.assertEqual(LayerFilterPlan.for_user(self.world, self.test_user2).subset_string, '')
+
+        constraint.active = False
+        constraint.save()
+        self.assertEqual(LayerFilterPlan.for_user(self.world, admin01).subset_string, '')
+
+        constraint.active = True
+        constraint.save()
+        self.assertEqual(LayerFilterPlan.for_user(self.world, admin01).fingerprint, fingerprint)
+
+        rule.delete()
+        self.assertEqual(LayerFilterPlan.for_user(self.world, admin01).subset_string, '')
+
     @skipIf(IS_QGIS_3_10, "In QGIS 3.10 setSubsetString() always returns True")
     def test_validate_sql(self):
         """Test rule validation"""
@@ -393,7 +432,7 @@ class SingleLayerSubsetStringConstraints(TestSingleLayerConstraintsBase):
                                             }.values()
                                             )
         self.assertEqual(response.status_code, 200)
-        z = zipfile.ZipFile(BytesIO(response.content))
+        z = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
         temp = QTemporaryDir()
         z.extractall(temp.path())
         vl = QgsVectorLayer(temp.path())
@@ -425,7 +464,7 @@ class SingleLayerSubsetStringConstraints(TestSingleLayerConstraintsBase):
                                             }.values()
                                             )
         self.assertEqual(response.status_code, 200)
-        z = zipfile.ZipFile(BytesIO(response.content))
+        z = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
         temp = QTemporaryDir()
         z.extractall(temp.path())
         vl = QgsVectorLayer(temp.path())
@@ -662,7 +701,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
                                             }.values()
                                             )
         self.assertEqual(response.status_code, 200)
-        z = zipfile.ZipFile(BytesIO(response.content))
+        z = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
         temp = QTemporaryDir()
         z.extractall(temp.path())
         vl = QgsVectorLayer(temp.path())
@@ -694,7 +733,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
                                             }.values()
                                             )
         self.assertEqual(response.status_code, 200)
-        z = zipfile.ZipFile(BytesIO(response.content))
+        z = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
         temp = QTemporaryDir()
         z.extractall(temp.path())
         vl = QgsVectorLayer(temp.path())
@@ -724,7 +763,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         self.assertEqual(response.status_code, 200)
 
-        z = zipfile.ZipFile(BytesIO(response.content))
+        z = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
         temp = QTemporaryDir()
         z.extractall(temp.path())
         vl = QgsVectorLayer(temp.path())
@@ -751,7 +790,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         self.assertEqual(response.status_code, 200)
 
-        z = zipfile.ZipFile(BytesIO(response.content))
+        z = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
         temp = QTemporaryDir()
         z.extractall(temp.path())
         vl = QgsVectorLayer(temp.path())
@@ -778,7 +817,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         self.assertEqual(response.status_code, 200)
 
-        z = zipfile.ZipFile(BytesIO(response.content))
+        z = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
         temp = QTemporaryDir()
         z.extractall(temp.path())
         vl = QgsVectorLayer(temp.path())
@@ -807,7 +846,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         self.assertEqual(response.status_code, 200)
 
-        z = zipfile.ZipFile(BytesIO(response.content))
+        z = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
         temp = QTemporaryDir()
         z.extractall(temp.path())
         vl = QgsVectorLayer(temp.path())
@@ -844,7 +883,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         response = self.client.get(path)
         self.assertEqual(response.status_code, 200)
-        z = zipfile.ZipFile(BytesIO(response.content))
+        z = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
         temp = QTemporaryDir()
         z.extractall(temp.path())
         vl = QgsVectorLayer(temp.path())
@@ -878,7 +917,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
         temp = QTemporaryDir()
         fname = temp.path() + '/temp.xlsx'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -913,7 +952,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         fname = temp.path() + '/temp2.xlsx'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -943,7 +982,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         fname = temp.path() + '/temp3.xlsx'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -970,7 +1009,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         fname = temp.path() + '/temp4.xlsx'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -997,7 +1036,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         fname = temp.path() + '/temp5.xlsx'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1026,7 +1065,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
         #
         # fname = temp.path() + '/temp6.xlsx'
         # with open(fname, 'wb+') as f:
-        #     f.write(response.content)
+        #     f.write(b''.join(response.streaming_content))
         #
         # vl = QgsVectorLayer(fname)
         # self.assertTrue(vl.isValid())
@@ -1063,7 +1102,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         fname = temp.path() + '/temp7.xlsx'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1093,7 +1132,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
         temp = QTemporaryDir()
         fname = temp.path() + '/temp.gpx'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1128,7 +1167,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         fname = temp.path() + '/temp2.gpx'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1160,7 +1199,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         fname = temp.path() + '/temp3.gpx'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1190,7 +1229,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         fname = temp.path() + '/temp4.gpx'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1220,7 +1259,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         fname = temp.path() + '/temp5.gpx'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1253,7 +1292,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
         #
         # fname = temp.path() + '/temp6.gpx'
         # with open(fname, 'wb+') as f:
-        #     f.write(response.content)
+        #     f.write(b''.join(response.streaming_content))
         #
         # vl = QgsVectorLayer(fname)
         # self.assertTrue(vl.isValid())
@@ -1294,7 +1333,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
         temp = QTemporaryDir()
         fname = temp.path() + '/temp.csv'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1329,7 +1368,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         fname = temp.path() + '/temp2.csv'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1359,7 +1398,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         fname = temp.path() + '/temp3.csv'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1386,7 +1425,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         fname = temp.path() + '/temp4.csv'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1413,7 +1452,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
 
         fname = temp.path() + '/temp5.csv'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1443,7 +1482,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
         #
         # fname = temp.path() + '/temp6.csv'
         # with open(fname, 'wb+') as f:
-        #     f.write(response.content)
+        #     f.write(b''.join(response.streaming_content))
         #
         # vl = QgsVectorLayer(fname)
         # self.assertTrue(vl.isValid())
@@ -1482,7 +1521,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
         temp = QTemporaryDir()
         fname = temp.path() + '/temp.gpkg'
         with open(fname, 'wb') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1519,7 +1558,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
         temp = QTemporaryDir()
         fname = temp.path() + '/temp1.gpkg'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
         self.assertTrue(vl.isValid())
@@ -1553,7 +1592,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
         temp = QTemporaryDir()
         fname = temp.path() + '/temp2.gpkg'
         with open(fname, 'wb') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
 
@@ -1584,7 +1623,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
         temp = QTemporaryDir()
         fname = temp.path() + '/temp3.gpkg'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
 
@@ -1616,7 +1655,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
         temp = QTemporaryDir()
         fname = temp.path() + '/temp4.gpkg'
         with open(fname, 'wb+') as f:
-            f.write(response.content)
+            f.write(b''.join(response.streaming_content))
 
         vl = QgsVectorLayer(fname)
 
@@ -1649,7 +1688,7 @@ class SingleLayerExpressionConstraints(TestSingleLayerConstraintsBase):
         # temp = QTemporaryDir()
         # fname = temp.path() + '/temp5.gpkg'
         # with open(fname, 'wb+') as f:
-        #     f.write(response.content)
+        #     f.write(b''.join(response.streaming_content))
         #
         # vl = QgsVectorLayer(fname)
         #
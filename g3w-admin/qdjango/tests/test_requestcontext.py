@@ -0,0 +1,116 @@
+# coding=utf-8
+""""Tests for the request context of QGIS Server requests with several threads
+
+.. note:: This program is free software; you can redistribute it and/or modify
+          it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import reverse
+
+from qdjango.apps import QGS_SERVER
+from qdjango.ows import OWSRequestHandler
+from qdjango.utils.requestcontext import get_request_context, server_request_context
+from .base import QdjangoTestBase
+
+
+class RequestContextTest(QdjangoTestBase):
+    """Test request context with several threads, as uwsgi workers with `threads` > 1"""
+
+    def test_request_context_threads(self):
+        """Every thread reads its own request context"""
+
+        workers = 8
+        barrier = threading.Barrier(workers)
+
+        def handle(i):
+
+            request = SimpleNamespace(method='GET')
+            user = SimpleNamespace(pk=i)
+            project = SimpleNamespace(pk=i)
+
+            self.assertIsNone(get_request_context())
+
+            with server_request_context(request, user, project) as context:
+                # All threads have their context set at the same time
+                barrier.wait(timeout=30)
+                self.assertIs(get_request_context(), context)
+                self.assertIs(get_request_context().djrequest, request)
+                self.assertIs(QGS_SERVER.user, user)
+                self.assertIs(QGS_SERVER.project, project)
+
+                # Nested contexts restore the outer one on exit
+                with server_request_context(request, user, None):
+                    self.assertIsNone(QGS_SERVER.project)
+                self.assertIs(QGS_SERVER.project, project)
+
+                barrier.wait(timeout=30)
+
+            self.assertIsNone(get_request_context())
+            return i
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            self.assertEqual(sorted(executor.map(handle, range(workers))), list(range(workers)))
+
+        self.assertIsNone(get_request_context())
+
+    def test_ows_threads(self):
+        """OWS requests served by several threads return the responses of serial requests"""
+
+        project = self.project.instance
+        ows_url = reverse('OWS:ows', kwargs={
+            'group_slug': project.group.slug, 'project_type': 'qdjango', 'project_id': project.pk})
+
+        cases = [
+            (self.test_user1, {'TEST_ACCESS_CONTROL': 'bluemarble'}),
+            (self.test_user1, {'TEST_ACCESS_CONTROL': 'world'}),
+            (self.test_user1, {'REQUEST': 'GetMap', 'LAYERS': 'world', 'CRS': 'EPSG:4326',
+                               'BBOX': '-90,-180,90,180', 'WIDTH': '64', 'HEIGHT': '32',
+                               'FORMAT': 'image/png', 'VERSION': '1.3.0'}),
+            (AnonymousUser(), {}),
+        ]
+
+        # The threads share the connection of the test transaction
+        connection = connections['default']
+
+        def ows_request(case):
+
+            connections['default'] = connection
+
+            user, params = cases[case]
+            request = RequestFactory().get(ows_url, dict({'SERVICE': 'WMS', 'REQUEST': 'GetCapabilities'}, **params))
+            request.user = user
+
+            response = OWSRequestHandler(request, group_slug=project.group.slug, project_id=project.pk).doRequest()
+
+            # The request context is cleared at the end of the request
+            self.assertIsNone(get_request_context())
+            return case, response.status_code, bytes(response.content)
+
+        expected = {}
+        for case in range(len(cases)):
+            expected[case] = ows_request(case)[1:]
+
+        self.assertEqual(expected[0][0], 200)
+        self.assertNotEqual(expected[0][1], expected[1][1])
+
+        connection.inc_thread_sharing()
+        try:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                results = list(executor.map(ows_request, list(range(len(cases))) * 5))
+        finally:
+            connection.dec_thread_sharing()
+
+        self.assertEqual(len(results), len(cases) * 5)
+        for case, status_code, content in results:
+            self.assertEqual((status_code, content), expected[case])
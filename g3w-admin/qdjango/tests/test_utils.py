@@ -22,9 +22,12 @@ from qdjango.utils.exceptions import QgisProjectLayerException, QgisProjectExcep
 from qdjango.utils.structure import get_schema_table, datasource2dict, datasourcearcgis2dict, apply_tree_patch
 from qdjango.utils.models import get_widgets4layer, comparedbdatasource, get_capabilities4layer
 from qdjango.utils.qgis import explode_expression
+from qdjango.utils.overviews import OverviewCache, get_overview_levels
 from qdjango.templatetags.qdjango_tags import is_geom_type_gpx_compatible
 from collections import OrderedDict
+from osgeo import gdal
 import os
+import tempfile
 import json
 import requests
 
@@ -976,3 +979,52 @@ class QdjangoTestUtilsQgis(QdjangoTestBase):
         self.assertEqual(dfields['area']['input']['options']['default_expression']['referencing_fields'], ['length'])
         self.assertEqual(dfields['area']['input']['options']['default_expression']['apply_on_update'], False)
 
+
+
+class QdjangoTestUtilsOverviews(TestCase):
+    """ Test for qdjango.utils.overviews module """
+
+    def test_overview_cache(self):
+        """ Test OverviewCache builds the overviews of a raster without overviews """
+
+        temp = tempfile.TemporaryDirectory()
+        source_path = os.path.join(temp.name, 'source.tif')
+
+        ds = gdal.GetDriverByName('GTiff').Create(source_path, 1024, 512, 1, gdal.GDT_Byte)
+        ds.SetGeoTransform((0, 1, 0, 512, 0, -1))
+        ds.GetRasterBand(1).Fill(100)
+        ds = None
+
+        self.assertEqual(get_overview_levels(1024, 512), [2])
+        self.assertEqual(get_overview_levels(100, 100), [])
+
+        layer = Layer(pk=1)
+        overview_cache = OverviewCache(root=os.path.join(temp.name, 'cache'), max_size=10 ** 8)
+
+        key = overview_cache.make_key(layer, source_path)
+        self.assertIsNone(overview_cache.get(key))
+
+        vrt_path = overview_cache.build(key, source_path)
+        self.assertEqual(vrt_path, overview_cache.get(key))
+
+        vrt = gdal.Open(vrt_path)
+        self.assertEqual((vrt.RasterXSize, vrt.RasterYSize), (1024, 512))
+        self.assertEqual(vrt.GetRasterBand(1).GetOverviewCount(), 1)
+        self.assertEqual(vrt.GetRasterBand(1).GetOverview(0).XSize, 512)
+        vrt = None
+
+        # A new version of the source replaces the entry
+        os.utime(source_path, ns=(0, 0))
+        new_key = overview_cache.make_key(layer, source_path)
+        self.assertNotEqual(key, new_key)
+        self.assertIsNotNone(overview_cache.build(new_key, source_path))
+        self.assertIsNone(overview_cache.get(key))
+        self.assertEqual(len(overview_cache.entries()), 1)
+
+        # Sources with overviews are not cached
+        ds = gdal.Open(source_path, gdal.GA_Update)
+        ds.BuildOverviews('NEAREST', [2])
+        ds = None
+        self.assertIsNone(overview_cache.build(overview_cache.make_key(layer, source_path), source_path))
+
+        temp.cleanup()
@@ -0,0 +1,230 @@
+# coding=utf-8
+""""ACL snapshots: the access control data of every layer of a project for a user.
+
+The QGIS Server access control filters (see qdjango.server_filters.accesscontrol) are called for every layer
+on every callback: they read layer permissions, subset string, expression and geo constraints and ColumnAcl
+restricted fields from a snapshot built once per OWS request with bulk queries (see OWSRequestHandler.baseDoRequest).
+
+Snapshots are stored in the Django cache, keyed on project, user, user groups and ACL version:
+the ACL version changes with the filter plan versions of the project layers (see qdjango.utils.filterplan),
+updated by the constraint, ColumnAcl and layer permission receivers (see qdjango.receivers).
+Versions are read from the database, so a change is seen by every process on the next request.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from guardian.core import ObjectPermissionChecker
+from guardian.shortcuts import get_anonymous_user
+
+from qdjango.models import (
+    CacheVersion,
+    ColumnAcl,
+    ConstraintExpressionRule,
+    ConstraintSubsetStringRule,
+    GeoConstraintRule,
+)
+from .filterplan import FILTER_PLAN_VERSION_KEY
+
+# Cache timeout (seconds) of ACL snapshots, 0 to disable the cache
+ACL_SNAPSHOT_CACHE_TTL = getattr(settings, 'QDJANGO_ACL_SNAPSHOT_CACHE_TTL', 300)
+
+
+class ProjectAclSnapshot(object):
+    """
+    Access control data of the layers of a project for a user.
+
+    Every layer is a dictionary keyed on the QGIS layer id:
+
+        - pk: qdjango Layer pk
+        - perms: layer permissions of the user and of the anonymous user
+        - subset_string: subset string constraint rules
+        - expression: expression constraint rules
+        - geo_expression: geo constraint rules
+        - restricted_fields: ColumnAcl restricted fields, None for layers without ColumnAcl
+
+    :param project_pk: qdjango Project pk
+    :param user_pk: user pk, None for anonymous user
+    :param layers: layers data, {qgs_layer_id: dict}
+    :param dependencies: data version of the geo constraint layers, {data version key: version}
+    """
+
+    def __init__(self, project_pk, user_pk, layers=None, dependencies=None):
+
+        self.project_pk = project_pk
+        self.user_pk = user_pk
+        self.layers = layers or {}
+        self.dependencies = dependencies or {}
+
+    @staticmethod
+    def _rules_filter(user, group_pks):
+        """Returns the constraint rules filter for the user"""
+
+        if user.is_anonymous:
+            return Q(anonymoususer=True)
+        if group_pks:
+            return Q(user=user) | Q(group__in=group_pks)
+        return Q(user=user)
+
+    @classmethod
+    def build(cls, project, user):
+        """Loads the snapshot from the database, the number of queries doesn't depend on the number of layers
+
+        :param project: qdjango Project instance
+        :param user: the request user
+        :rtype: ProjectAclSnapshot
+        """
+
+        group_pks = list(user.groups.values_list('pk', flat=True)) if not user.is_anonymous else []
+
+        qdjango_layers = list(project.layer_set.all())
+
+        # Permissions of the user and of the anonymous user
+        checkers = [ObjectPermissionChecker(get_anonymous_user())]
+        if not user.is_anonymous:
+            checkers.append(ObjectPermissionChecker(user))
+        for checker in checkers:
+            checker.prefetch_perms(qdjango_layers)
+
+        layers = {}
+        layers_by_pk = {}
+        for qdjango_layer in qdjango_layers:
+            perms = set()
+            for checker in checkers:
+                perms |= set(checker.get_perms(qdjango_layer))
+
+            layers[qdjango_layer.qgs_layer_id] = layers_by_pk[qdjango_layer.pk] = {
+                'pk': qdjango_layer.pk,
+                'perms': sorted(perms),
+                'subset_string': '',
+                'expression': '',
+                'geo_expression': '',
+                'restricted_fields': [] if qdjango_layer.has_column_acl else None
+            }
+
+        rules_filter = cls._rules_filter(user, group_pks)
+
+        # Subset string and expression constraints for view
+        for key, rule_model in (('subset_string', ConstraintSubsetStringRule),
+                                ('expression', ConstraintExpressionRule)):
+            rules = {}
+            for layer_pk, rule in rule_model.objects.filter(
+                    rules_filter,
+                    constraint__layer__project=project,
+                    constraint__active=True,
+                    **{f'constraint__{k}': v for k, v in rule_model.get_context('v').items()}
+            ).order_by('pk').values_list('constraint__layer_id', 'rule'):
+                rules.setdefault(layer_pk, []).append(f'({rule})')
+
+            for layer_pk, layer_rules in rules.items():
+                layers_by_pk[layer_pk][key] = ' AND '.join(layer_rules)
+
+        # Geo constraints: the constraint geometry is built from the constraint layer features
+        dependencies = {}
+        geo_expressions = {}
+        for rule in GeoConstraintRule.objects.filter(
+                rules_filter,
+                constraint__layer__project=project,
+                constraint__active=True,
+                **{f'constraint__{k}': v for k, v in GeoConstraintRule.get_context('v').items()}
+        ).select_related('constraint__constraint_layer').order_by('pk'):
+
+            constraint_layer = rule.constraint.constraint_layer
+            dependencies[constraint_layer._data_version_key()] = constraint_layer.data_version
+
+            geo_expression = rule.get_qgis_expression()
+            if geo_expression:
+                geo_expressions.setdefault(rule.constraint.layer_id, []).append(geo_expression)
+
+        for layer_pk, layer_expressions in geo_expressions.items():
+            layers_by_pk[layer_pk]['geo_expression'] = ' AND '.join(layer_expressions)
+
+        # ColumnAcl
+        acl_user = get_anonymous_user() if user.is_anonymous else user
+        acl_group_pks = group_pks if not user.is_anonymous else list(acl_user.groups.values_list('pk', flat=True))
+        for layer_pk, restricted_fields in ColumnAcl.objects.filter(
+                Q(user=acl_user) | Q(group__in=acl_group_pks),
+                layer__project=project,
+                layer__has_column_acl=True
+        ).values_list('layer_id', 'restricted_fields'):
+            layers_by_pk[layer_pk]['restricted_fields'] = sorted(
+                set(layers_by_pk[layer_pk]['restricted_fields']) | set(restricted_fields))
+
+        return cls(project.pk, None if user.is_anonymous else user.pk, layers, dependencies)
+
+    @staticmethod
+    def cache_key(project, user):
+
+        layer_pks = sorted(project.layer_set.values_list('pk', flat=True))
+        versions = CacheVersion.get_versions([FILTER_PLAN_VERSION_KEY.format(pk) for pk in layer_pks])
+        acl_version = hashlib.md5(json.dumps([layer_pks, sorted(versions.items())]).encode('utf-8')).hexdigest()
+
+        groups = sorted(user.groups.values_list('pk', flat=True)) if not user.is_anonymous else []
+        return 'qdjango_acl_snapshot_{}_{}_{}_{}'.format(
+            project.pk, user.pk if not user.is_anonymous else 'anonymous',
+            hashlib.md5(json.dumps(groups).encode('utf-8')).hexdigest(), acl_version)
+
+    @classmethod
+    def for_user(cls, project, user):
+        """Returns the snapshot from the cache, built if missing or out of date
+
+        :param project: qdjango Project instance
+        :param user: the request user
+        :rtype: ProjectAclSnapshot
+        """
+
+        if ACL_SNAPSHOT_CACHE_TTL <= 0:
+            return cls.build(project, user)
+
+        key = cls.cache_key(project, user)
+        snapshot = cache.get(key)
+        if snapshot is None or not snapshot.is_current():
+            snapshot = cls.build(project, user)
+            cache.set(key, snapshot, ACL_SNAPSHOT_CACHE_TTL)
+
+        return snapshot
+
+    def is_current(self):
+        """Returns False when the data of a geo constraint layer changed"""
+
+        if not self.dependencies:
+            return True
+
+        versions = CacheVersion.get_versions(self.dependencies.keys())
+        return all(versions.get(k, 0) == v for k, v in self.dependencies.items())
+
+    def layer(self, qgs_layer_id):
+        """Returns the access control data of a layer, None if the layer is not a layer of the project
+
+        :param qgs_layer_id: QGIS layer id
+        :rtype: dict, None
+        """
+
+        return self.layers.get(qgs_layer_id)
+
+
+def get_server_acl_snapshot(context):
+    """Returns the ACL snapshot of the current QGIS Server request,
+    it is built when missing or for another project or user
+
+    :param context: request context of the current thread, see qdjango.utils.requestcontext
+    :rtype: ProjectAclSnapshot
+    """
+
+    snapshot = context.acl_snapshot
+    user_pk = None if context.user.is_anonymous else context.user.pk
+    if snapshot is None or snapshot.project_pk != context.project.pk or snapshot.user_pk != user_pk:
+        snapshot = ProjectAclSnapshot.for_user(context.project, context.user)
+        context.acl_snapshot = snapshot
+
+    return snapshot
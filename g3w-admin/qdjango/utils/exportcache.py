@@ -0,0 +1,195 @@
+# coding=utf-8
+""""Disk cache of the files exported by vector API download modes (shp, gpkg, xls, csv, gpx).
+
+Entries are keyed on layer, export mode, normalized request parameters, user's ACL fingerprint
+and layer data version: an editing commit or a project update changes the data version
+(see qdjango Layer.invalidate_data_cache) and the entries of the layer are removed.
+
+The cache has a size budget, the least recently used entries are evicted when it is exceeded.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def get_export_cache_dir():
+    """Returns the root directory of the export cache"""
+
+    return getattr(settings, 'VECTOR_EXPORT_CACHE_DIR', None) or \
+        os.path.join(tempfile.gettempdir(), 'g3w_vector_export_cache')
+
+
+def link_or_copy(src, dst):
+    """
+    Hard link a file, copy it when source and destination are on different file systems
+
+    :param src: source file path
+    :param dst: destination file path
+    """
+
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def invalidate_export_cache(layer_pk):
+    """
+    Removes every cached export of the layer
+
+    :param layer_pk: qdjango Layer pk
+    :type layer_pk: int
+    """
+
+    shutil.rmtree(os.path.join(get_export_cache_dir(), str(layer_pk)), ignore_errors=True)
+
+
+class ExportCache(object):
+    """
+    LRU disk cache of exported files.
+    Every entry is a directory `<layer pk>/<data version>-<md5 of key data>` with the exported file,
+    the entry directory modification time is the time of the last access.
+
+    :param root: optional, cache directory, default VECTOR_EXPORT_CACHE_DIR setting
+    :param max_size: optional, size budget in bytes, default VECTOR_EXPORT_CACHE_MAX_SIZE setting, 0 disables the cache
+    """
+
+    def __init__(self, root=None, max_size=None):
+
+        self.root = root or get_export_cache_dir()
+        self.max_size = getattr(settings, 'VECTOR_EXPORT_CACHE_MAX_SIZE', 0) if max_size is None else max_size
+
+    @property
+    def enabled(self):
+
+        return self.max_size > 0
+
+    @staticmethod
+    def make_key(layer, data):
+        """
+        Returns the key of an export of the layer
+
+        :param layer: qdjango Layer instance
+        :param data: JSON serializable data identifying the export: mode, parameters, ACL fingerprint...
+        :rtype: str
+        """
+
+        # Versions are stored in the database: 0 (data never edited) is a valid version,
+        # every edit stores a new one
+        version = layer.data_version
+
+        digest = hashlib.md5(json.dumps(
+            [data, layer.project.modified.isoformat()], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+        return f'{layer.pk}/{version}-{digest}'
+
+    def _entry_dir(self, key):
+
+        return os.path.join(self.root, *key.split('/'))
+
+    def get(self, key):
+        """
+        Returns the path of the cached file, None on cache miss
+
+        :param key: key returned by make_key()
+        :rtype: str, None
+        """
+
+        entry_dir = self._entry_dir(key)
+        try:
+            names = os.listdir(entry_dir)
+            if len(names) != 1:
+                return None
+
+            # Last access time for LRU eviction
+            os.utime(entry_dir)
+        except OSError:
+            return None
+
+        return os.path.join(entry_dir, names[0])
+
+    def put(self, key, file_path):
+        """
+        Stores an exported file, entries of previous data versions of the layer are removed
+        and the least recently used entries are evicted when the size budget is exceeded.
+
+        :param key: key returned by make_key()
+        :param file_path: path of the exported file, it is hard linked (or copied) into the cache
+        """
+
+        entry_dir = self._entry_dir(key)
+        layer_dir, entry_name = os.path.split(entry_dir)
+        version = entry_name.split('-')[0]
+
+        try:
+            os.makedirs(layer_dir, exist_ok=True)
+
+            # Write into a temporary directory and rename: readers never see a partial entry
+            tmp_dir = tempfile.mkdtemp(prefix='.tmp', dir=self.root)
+            try:
+                link_or_copy(file_path, os.path.join(tmp_dir, os.path.basename(file_path)))
+                os.rename(tmp_dir, entry_dir)
+            except OSError:
+                # Same entry stored by a concurrent request
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+            for entry in os.scandir(layer_dir):
+                if entry.name.split('-')[0] != version:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+
+        except OSError as e:
+            logger.warning(f'[VECTOR EXPORT CACHE] Cannot store {file_path}: {e}')
+            return
+
+        self.evict()
+
+    def entries(self):
+        """
+        Returns the cache entries
+
+        :return: list of (last access time, size, path) tuples
+        :rtype: list
+        """
+
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+
+        for layer_entry in os.scandir(self.root):
+            if layer_entry.name.startswith('.') or not layer_entry.is_dir():
+                continue
+            for entry in os.scandir(layer_entry.path):
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                    entries.append((entry.stat().st_mtime, size, entry.path))
+                except OSError:
+                    continue
+
+        return entries
+
+    def evict(self):
+        """Removes the least recently used entries while the size budget is exceeded"""
+
+        entries = sorted(self.entries())
+        total = sum(e[1] for e in entries)
+
+        for mtime, size, path in entries:
+            if total <= self.max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
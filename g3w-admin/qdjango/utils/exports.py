@@ -0,0 +1,261 @@
+# coding=utf-8
+""""Asynchronous export jobs of vector API download modes (shp, gpkg, xls, csv, gpx).
+
+A job runs the vector API view inside the huey worker (see qdjango.tasks.vector_export_task)
+and writes the exported file into its own job directory, named with the huey task id.
+The job directory holds a `job.json` file with the job owner, status and result.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+from django.urls import reverse
+from qgis.core import QgsFeedback
+
+logger = logging.getLogger(__name__)
+
+# Directory of the asynchronous export jobs files
+VECTOR_EXPORT_DIR = getattr(settings, 'VECTOR_EXPORT_DIR',
+                            os.path.join(tempfile.gettempdir(), 'g3w_vector_exports'))
+
+# Hours the exported files are kept on disk
+VECTOR_EXPORT_RETENTION_HOURS = getattr(settings, 'VECTOR_EXPORT_RETENTION_HOURS', 24)
+
+# Request parameter to run the export as asynchronous job
+VECTOR_EXPORT_ASYNC_PARAM = 'async'
+
+EXPORT_JOB_FILE = 'job.json'
+
+
+class VectorExportError(Exception):
+    """Export of a layer failed"""
+    pass
+
+
+def get_export_job_dir(job_id):
+    """
+    Returns the directory of an export job
+
+    :param job_id: huey task id
+    :type job_id: str
+    :raises ValueError: if job_id is not a valid task id
+    :rtype: str
+    """
+
+    return os.path.join(VECTOR_EXPORT_DIR, str(uuid.UUID(job_id)))
+
+
+def read_export_job(job_id):
+    """
+    Returns the export job data, None if the job does not exist (or has been removed)
+
+    :param job_id: huey task id
+    :type job_id: str
+    :rtype: dict, None
+    """
+
+    try:
+        with open(os.path.join(get_export_job_dir(job_id), EXPORT_JOB_FILE)) as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        return None
+
+
+def write_export_job(job_id, **data):
+    """
+    Updates the export job data
+
+    :param job_id: huey task id
+    :type job_id: str
+    :param data: job data to update
+    :return: job data
+    :rtype: dict
+    """
+
+    job_dir = get_export_job_dir(job_id)
+    job = read_export_job(job_id) or {}
+    job.update(data)
+
+    # Atomic replace: the job file is read by the status API while the job is running
+    tmp_path = os.path.join(job_dir, EXPORT_JOB_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(job, f)
+    os.replace(tmp_path, os.path.join(job_dir, EXPORT_JOB_FILE))
+
+    return job
+
+
+def create_export_job(job_id, user_pk, layer_name, mode):
+    """
+    Creates the directory and the data of a pending export job, before the job is enqueued:
+    the job owner is known while the job waits in the queue
+
+    :param job_id: huey task id
+    :type job_id: str
+    :param user_pk: pk of the user who requested the export, None for anonymous user
+    :param layer_name: layer qgs_layer_id
+    :param mode: vector API mode, i.e. 'shp'
+    :return: job data
+    :rtype: dict
+    """
+
+    os.makedirs(get_export_job_dir(job_id), exist_ok=True)
+    return write_export_job(job_id, user=user_pk, layer=layer_name, mode=mode, status='pending',
+                            created=time.time())
+
+
+def get_export_job_file(job_id):
+    """
+    Returns the path of the file exported by a completed job, None if the job is not complete
+
+    :param job_id: huey task id
+    :type job_id: str
+    :rtype: str, None
+    """
+
+    job = read_export_job(job_id)
+    if not job or job.get('status') != 'complete':
+        return None
+
+    path = os.path.join(get_export_job_dir(job_id), job['filename'])
+    return path if os.path.exists(path) else None
+
+
+def run_vector_export(job_id, user_pk, project_type, project_id, layer_name, mode, method, content_type, data,
+                      process_info=None):
+    """
+    Runs a vector API export (shp, gpkg, xls, csv, gpx mode) and keeps the exported file
+    into the job directory.
+
+    The vector API view is called with the same parameters and user of the original request:
+    permissions, constraints and filters are the same.
+
+    :param job_id: huey task id
+    :param user_pk: pk of the user who requested the export, None for anonymous user
+    :param project_type: project type, i.e. 'qdjango'
+    :param project_id: project pk
+    :param layer_name: layer qgs_layer_id
+    :param mode: vector API mode, i.e. 'shp'
+    :param method: 'GET' or 'POST'
+    :param content_type: request content type, for POST requests
+    :param data: request parameters (GET) or payload (POST), without the async parameter
+    :param process_info: optional Huey process information
+    :type process_info: ProcessInfo
+    :raises VectorExportError: raise on error
+    :return: {'filename': <file name>, 'content_type': <mime type>, 'size': <bytes>}
+    :rtype: dict
+    """
+
+    # Avoid circular imports
+    from core.api.views import layer_vector_view
+
+    job_dir = get_export_job_dir(job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    write_export_job(job_id, user=user_pk, layer=layer_name, mode=mode, status='executing', created=time.time())
+
+    try:
+        path = reverse('core-vector-api', kwargs={
+            'mode_call': mode,
+            'project_type': project_type,
+            'project_id': project_id,
+            'layer_name': layer_name
+        })
+
+        factory = RequestFactory()
+        if method == 'POST' and content_type == 'application/json':
+            request = factory.post(path, data=json.dumps(data), content_type=content_type)
+        elif method == 'POST':
+            request = factory.post(path, data)
+        else:
+            request = factory.get(path, data)
+
+        request.user = get_user_model().objects.get(pk=user_pk) if user_pk else AnonymousUser()
+
+        # The request is built by the worker, not sent by a browser
+        request._dont_enforce_csrf_checks = True
+
+        # Feedback of QgsVectorFileWriter as task progress
+        feedback = QgsFeedback()
+        if process_info is not None:
+            process_info.update_total(100)
+            done = [0]
+
+            def update_progress(progress):
+                if int(progress) > done[0]:
+                    process_info.update(n=int(progress) - done[0])
+                    done[0] = int(progress)
+
+            feedback.progressChanged.connect(update_progress)
+
+        response = layer_vector_view(request, project_type, project_id, layer_name, mode_call=mode,
+                                     export_dir=job_dir, export_feedback=feedback)
+
+        if response.status_code != 200:
+            raise VectorExportError(f'Export failed with status {response.status_code}: {response.reason_phrase}')
+
+        result = {
+            'filename': response.data['filename'],
+            'content_type': response.data['content_type'],
+            'size': os.path.getsize(os.path.join(job_dir, response.data['filename']))
+        }
+
+    except Exception as e:
+        logger.error(f'[VECTOR EXPORT] Job {job_id}: {e}')
+        write_export_job(job_id, status='error', exception=str(e))
+        raise
+
+    write_export_job(job_id, status='complete', **result)
+
+    return result
+
+
+def cleanup_export_jobs(retention_hours=None, process_info=None):
+    """
+    Removes the export jobs older than the retention time
+
+    :param retention_hours: optional, hours the jobs are kept, default VECTOR_EXPORT_RETENTION_HOURS
+    :param process_info: optional Huey process information
+    :type process_info: ProcessInfo
+    :return: number of the removed jobs
+    :rtype: int
+    """
+
+    if retention_hours is None:
+        retention_hours = VECTOR_EXPORT_RETENTION_HOURS
+
+    if not os.path.isdir(VECTOR_EXPORT_DIR):
+        return 0
+
+    limit = time.time() - retention_hours * 3600
+    removed = 0
+    entries = list(os.scandir(VECTOR_EXPORT_DIR))
+    if process_info is not None:
+        process_info.update_total(len(entries))
+
+    for entry in entries:
+        if process_info is not None:
+            process_info.update(n=1)
+        try:
+            if entry.is_dir() and entry.stat().st_mtime <= limit:
+                shutil.rmtree(entry.path)
+                removed += 1
+        except OSError as e:
+            logger.error(f'[VECTOR EXPORT] Cannot remove export job {entry.name}: {e}')
+
+    return removed
@@ -0,0 +1,163 @@
+# coding=utf-8
+""""Filter plans: the static part of the vector API filters for a layer and a user.
+
+Subset string, expression and geo constraints and the ColumnAcl visible fields depend only on the layer,
+the user (and the user groups) and the constraint context: they are computed once and stored in the Django cache.
+The filter backends read them from the plan and bind only the request parameters (bbox, field, search...).
+
+Plans are keyed on the filter plan version of the layer, stored in the database (see qdjango.models.CacheVersion)
+and updated by the constraint and ACL receivers (see qdjango.receivers) so every process sees the changes;
+plans with geo constraints are rebuilt when the data of the constraint layers change.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from qdjango.models import CacheVersion, ConstraintSubsetStringRule, ConstraintExpressionRule, GeoConstraintRule
+
+# Cache timeout (seconds) of filter plans
+FILTER_PLAN_CACHE_TTL = getattr(settings, 'QDJANGO_FILTER_PLAN_CACHE_TTL', 600)
+
+FILTER_PLAN_VERSION_KEY = 'qdjango_filter_plan_version_{}'
+
+
+def invalidate_filter_plans(layer_pk):
+    """Invalidates every cached filter plan of the layer
+
+    :param layer_pk: qdjango Layer pk
+    :type layer_pk: int
+    """
+
+    CacheVersion.update_version(FILTER_PLAN_VERSION_KEY.format(layer_pk))
+
+
+class LayerFilterPlan(object):
+    """
+    Constraints and visible fields of a layer for a user.
+
+    :param layer_pk: qdjango Layer pk
+    :param subset_string: subset string constraint rules
+    :param expression: expression constraint rules
+    :param geo_expression: geo constraint rules, combined with AND
+    :param visible_fields: names of the fields visible by the user (ColumnAcl)
+    :param dependencies: data version of the layers the plan depends on, {data version key: version}
+    """
+
+    def __init__(self, layer_pk, subset_string='', expression='', geo_expression='',
+                 visible_fields=None, dependencies=None):
+
+        self.layer_pk = layer_pk
+        self.subset_string = subset_string
+        self.expression = expression
+        self.geo_expression = geo_expression
+        self.visible_fields = visible_fields or []
+        self.dependencies = dependencies or {}
+
+    @classmethod
+    def build(cls, layer, user, context='v'):
+        """Computes the filter plan from the database
+
+        :param layer: qdjango Layer instance
+        :param user: the request user
+        :param context: SingleLayerConstraint context 'v (view)' 'e (editing)' 've (view + editing)'
+        :rtype: LayerFilterPlan
+        """
+
+        geo_expressions = []
+        dependencies = {}
+        for rule in GeoConstraintRule.get_active_constraints_for_user(user, layer, context=context):
+
+            # The constraint geometry is built from the constraint layer features
+            constraint_layer = rule.constraint.constraint_layer
+            dependencies[constraint_layer._data_version_key()] = constraint_layer.data_version
+
+            geo_expression = rule.get_qgis_expression()
+            if geo_expression:
+                geo_expressions.append(geo_expression)
+
+        return cls(
+            layer.pk,
+            subset_string=ConstraintSubsetStringRule.get_rule_definition_for_user(user, layer.pk, context=context),
+            expression=ConstraintExpressionRule.get_rule_definition_for_user(user, layer.pk, context=context),
+            geo_expression=' AND '.join(geo_expressions),
+            visible_fields=sorted(layer.visible_fields_for_user(user)),
+            dependencies=dependencies
+        )
+
+    @staticmethod
+    def cache_key(layer, user, context='v'):
+
+        groups = sorted(user.groups.values_list('pk', flat=True)) if not user.is_anonymous else []
+        version = CacheVersion.get_version(FILTER_PLAN_VERSION_KEY.format(layer.pk))
+        return 'qdjango_filter_plan_{}_{}_{}_{}_{}'.format(
+            layer.pk, version, user.pk if not user.is_anonymous else 'anonymous',
+            hashlib.md5(json.dumps(groups).encode('utf-8')).hexdigest(), context)
+
+    @classmethod
+    def for_user(cls, layer, user, context='v'):
+        """Returns the filter plan from the cache, computed if missing or out of date
+
+        :param layer: qdjango Layer instance
+        :param user: the request user
+        :param context: SingleLayerConstraint context 'v (view)' 'e (editing)' 've (view + editing)'
+        :rtype: LayerFilterPlan
+        """
+
+        key = cls.cache_key(layer, user, context)
+        plan = cache.get(key)
+        if plan is None or not plan.is_current():
+            plan = cls.build(layer, user, context)
+            cache.set(key, plan, FILTER_PLAN_CACHE_TTL)
+
+        return plan
+
+    def is_current(self):
+        """Returns False when the data of a layer the plan depends on changed"""
+
+        if not self.dependencies:
+            return True
+
+        versions = CacheVersion.get_versions(self.dependencies.keys())
+        return all(versions.get(k, 0) == v for k, v in self.dependencies.items())
+
+    @property
+    def fingerprint(self):
+        """Fingerprint of the effective constraints: users with the same fingerprint see the same data"""
+
+        fingerprint = [self.subset_string, self.expression, self.geo_expression, self.visible_fields]
+        return hashlib.md5(json.dumps(fingerprint).encode('utf-8')).hexdigest()
+
+
+def get_filter_plan(request, metadata_layer, view=None):
+    """Returns the filter plan of the request user for the layer,
+    the plans are stored in the view for the request lifetime
+
+    :param request: Django request
+    :param metadata_layer: MetadataVectorLayer instance
+    :param view: Django view, optional
+    :rtype: LayerFilterPlan
+    """
+
+    context = getattr(view, 'context', 'v')
+    key = (metadata_layer.layer.pk, context)
+
+    plans = getattr(view, 'filter_plans', None)
+    if plans is None:
+        plans = {}
+        if view is not None:
+            view.filter_plans = plans
+
+    if key not in plans:
+        plans[key] = LayerFilterPlan.for_user(metadata_layer.layer, request.user, context)
+
+    return plans[key]
@@ -0,0 +1,217 @@
+# coding=utf-8
+""""Disk cache of overview pyramids of raster layers, used by the raster API geotiff mode.
+
+GDAL raster sources without overviews are read at full resolution also when the export is downsampled:
+the cache stores for every layer a VRT of the source with an external overviews file (`.vrt.ovr`),
+GDAL reads the downsampled exports from the overviews of the VRT.
+
+Entries are keyed on layer and source file modification time and size: when the source file changes
+a new entry is built and the entries of previous versions are removed.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from osgeo import gdal
+from qgis.core import QgsProviderRegistry
+
+from .exportcache import ExportCache
+
+logger = logging.getLogger(__name__)
+
+# Overviews are built up to this size (pixels) of the smallest overview
+OVERVIEW_MIN_SIZE = 256
+
+
+def get_overview_cache_dir():
+    """Returns the root directory of the overview cache"""
+
+    return getattr(settings, 'RASTER_OVERVIEW_CACHE_DIR', None) or \
+        os.path.join(tempfile.gettempdir(), 'g3w_raster_overview_cache')
+
+
+def get_overview_levels(xsize, ysize, min_size=OVERVIEW_MIN_SIZE):
+    """
+    Returns the overview decimation factors of a raster: 2, 4, 8... until the overview
+    is smaller than min_size pixels
+
+    :param xsize: raster width
+    :param ysize: raster height
+    :param min_size: minimal size of the smallest overview
+    :rtype: list
+    """
+
+    levels = []
+    level = 2
+    while min(xsize, ysize) / level >= min_size:
+        levels.append(level)
+        level *= 2
+
+    return levels
+
+
+class OverviewCache(ExportCache):
+    """
+    LRU disk cache of overview pyramids of GDAL raster layers.
+    Every entry is a directory `<layer pk>/<source version>-<md5 of source path>` with the VRT file
+    and its overviews file, the entry directory modification time is the time of the last access.
+
+    :param root: optional, cache directory, default RASTER_OVERVIEW_CACHE_DIR setting
+    :param max_size: optional, size budget in bytes, default RASTER_OVERVIEW_CACHE_MAX_SIZE setting, 0 disables the cache
+    """
+
+    def __init__(self, root=None, max_size=None):
+
+        self.root = root or get_overview_cache_dir()
+        self.max_size = getattr(settings, 'RASTER_OVERVIEW_CACHE_MAX_SIZE', 0) if max_size is None else max_size
+        self.resampling = getattr(settings, 'RASTER_OVERVIEW_CACHE_RESAMPLING', 'AVERAGE')
+
+    @staticmethod
+    def get_source_path(qgis_layer):
+        """
+        Returns the path of the file of a GDAL raster layer,
+        None for other providers (WMS, PostGIS raster...) or sources that are not files
+
+        :param qgis_layer: QgsRasterLayer instance
+        :rtype: str, None
+        """
+
+        provider = qgis_layer.dataProvider()
+        if provider is None or provider.name() != 'gdal':
+            return None
+
+        path = QgsProviderRegistry.instance().decodeUri('gdal', provider.dataSourceUri()).get('path')
+        return path if path and os.path.isfile(path) else None
+
+    @staticmethod
+    def make_key(layer, source_path):
+        """
+        Returns the key of the overviews of the layer
+
+        :param layer: qdjango Layer instance
+        :param source_path: path of the raster file
+        :rtype: str
+        """
+
+        stat = os.stat(source_path)
+        digest = hashlib.md5(source_path.encode('utf-8')).hexdigest()
+
+        return f'{layer.pk}/{stat.st_mtime_ns}{stat.st_size}-{digest}'
+
+    def get(self, key):
+        """
+        Returns the path of the VRT file of the cached overviews, None on cache miss
+
+        :param key: key returned by make_key()
+        :rtype: str, None
+        """
+
+        entry_dir = self._entry_dir(key)
+        vrt_path = os.path.join(entry_dir, 'source.vrt')
+        try:
+            if not os.path.exists(vrt_path + '.ovr'):
+                return None
+
+            # Last access time for LRU eviction
+            os.utime(entry_dir)
+        except OSError:
+            return None
+
+        return vrt_path
+
+    def build(self, key, source_path):
+        """
+        Builds the overviews of a raster file, entries of previous versions of the layer are removed
+        and the least recently used entries are evicted when the size budget is exceeded.
+
+        Sources with their own overviews are not cached.
+
+        :param key: key returned by make_key()
+        :param source_path: path of the raster file
+        :return: path of the VRT file, None if the overviews are not built
+        :rtype: str, None
+        """
+
+        src = gdal.OpenEx(source_path, gdal.OF_READONLY | gdal.OF_RASTER)
+        if src is None or src.RasterCount == 0 or src.GetRasterBand(1).GetOverviewCount() > 0:
+            return None
+
+        levels = get_overview_levels(src.RasterXSize, src.RasterYSize)
+        src = None
+        if not levels:
+            return None
+
+        entry_dir = self._entry_dir(key)
+        layer_dir, entry_name = os.path.split(entry_dir)
+        version = entry_name.split('-')[0]
+
+        try:
+            os.makedirs(layer_dir, exist_ok=True)
+
+            # Build into a temporary directory and rename: readers never see a partial entry
+            tmp_dir = tempfile.mkdtemp(prefix='.tmp', dir=self.root)
+            try:
+                vrt = gdal.BuildVRT(os.path.join(tmp_dir, 'source.vrt'), [source_path])
+                if vrt is None:
+                    raise OSError(gdal.GetLastErrorMsg())
+
+                gdal.SetConfigOption('COMPRESS_OVERVIEW', 'DEFLATE')
+                gdal.SetConfigOption('BIGTIFF_OVERVIEW', 'IF_SAFER')
+                try:
+                    error = vrt.BuildOverviews(self.resampling, levels)
+                finally:
+                    gdal.SetConfigOption('COMPRESS_OVERVIEW', None)
+                    gdal.SetConfigOption('BIGTIFF_OVERVIEW', None)
+                vrt = None
+                if error != 0:
+                    raise OSError(gdal.GetLastErrorMsg())
+
+                os.rename(tmp_dir, entry_dir)
+            except OSError:
+                # Same entry built by a concurrent request or build error
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                if not os.path.isdir(entry_dir):
+                    raise
+
+            for entry in os.scandir(layer_dir):
+                if entry.name.split('-')[0] != version:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+
+        except OSError as e:
+            logger.warning(f'[RASTER OVERVIEW CACHE] Cannot build overviews of {source_path}: {e}')
+            return None
+
+        self.evict()
+
+        return self.get(key)
+
+    def get_or_build(self, layer, qgis_layer):
+        """
+        Returns the VRT file with the overviews of the layer, built on cache miss
+
+        :param layer: qdjango Layer instance
+        :param qgis_layer: QgsRasterLayer instance
+        :return: path of the VRT file, None if the cache is disabled or the layer has no cacheable source
+        :rtype: str, None
+        """
+
+        if not self.enabled:
+            return None
+
+        source_path = self.get_source_path(qgis_layer)
+        if source_path is None:
+            return None
+
+        key = self.make_key(layer, source_path)
+        return self.get(key) or self.build(key, source_path)
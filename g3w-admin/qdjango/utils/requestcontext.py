@@ -0,0 +1,118 @@
+# coding=utf-8
+""""Request context of the OWS requests handled by QGIS Server.
+
+The QGIS Server filters and services read the Django request, the user, the qdjango project and
+the ACL snapshot of the request they are called for from a context stored per handling thread
+(see OWSRequestHandler.baseDoRequest), several threads of a uwsgi worker can serve OWS requests
+for different users and projects.
+
+QGIS Server itself handles one request at a time: the request handler of the server interface,
+the state of the filters and the projects of QgsConfigCache are shared by all the threads of the
+process, QgsServer.handleRequest() and QgsConfigCache access are serialized by `server_lock`.
+
+Only OWS requests are covered: the vector and editing APIs, the exports and the tile caching use the
+QgsProject layers (i.e. Layer.qgis_layer) without `server_lock`, workers with several threads must
+serve OWS requests only.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+    it under the terms of the Mozilla Public License 2.0.
+
+"""
+
+__date__ = '2026-10-18'
+__copyright__ = 'Copyright 2015 - 2026, Gis3W'
+
+import threading
+from contextlib import contextmanager
+
+from qgis.server import QgsServer
+
+_local = threading.local()
+
+# Serializes the QGIS Server calls of the threads of the process, reentrant:
+# services and filters can load projects while a request is handled
+server_lock = threading.RLock()
+
+
+class ServerRequestContext(object):
+    """
+    Data of the OWS request handled by QGIS Server in the current thread
+
+    :param djrequest: Django request
+    :param user: the request user
+    :param project: qdjango Project instance
+    :param acl_snapshot: optional, ProjectAclSnapshot of project and user
+    :param caching: optional, True for the tiles rendered by the caching app, the layers are readable
+    """
+
+    def __init__(self, djrequest=None, user=None, project=None, acl_snapshot=None, caching=False):
+
+        self.djrequest = djrequest
+        self.user = user
+        self.project = project
+        self.acl_snapshot = acl_snapshot
+        self.caching = caching
+
+
+def get_request_context():
+    """Returns the request context of the current thread, None outside OWS requests
+
+    :rtype: ServerRequestContext, None
+    """
+
+    return getattr(_local, 'context', None)
+
+
+@contextmanager
+def server_request_context(djrequest, user, project, acl_snapshot=None, caching=False):
+    """
+    Sets the request context of the current thread, the previous context is restored on exit
+
+    :param djrequest: Django request
+    :param user: the request user
+    :param project: qdjango Project instance
+    :param acl_snapshot: optional, ProjectAclSnapshot of project and user
+    :param caching: optional, True for the tiles rendered by the caching app
+    :rtype: ServerRequestContext
+    """
+
+    previous = get_request_context()
+    _local.context = ServerRequestContext(djrequest, user, project, acl_snapshot, caching)
+    try:
+        yield _local.context
+    finally:
+        _local.context = previous
+
+
+class RequestContextAttribute(object):
+    """Descriptor of an attribute of the request context of the current thread"""
+
+    def __init__(self, name):
+
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+
+        if obj is None:
+            return self
+        return getattr(get_request_context(), self.name, None)
+
+    def __set__(self, obj, value):
+
+        context = get_request_context()
+        if context is None:
+            context = _local.context = ServerRequestContext()
+        setattr(context, self.name, value)
+
+
+class ContextQgsServer(QgsServer):
+    """
+    QgsServer with the attributes of the current request of previous versions
+    (`djrequest`, `user`, `project` and `acl_snapshot`): they are read from and written to
+    the request context of the current thread, use get_request_context() in new code.
+    """
+
+    djrequest = RequestContextAttribute('djrequest')
+    user = RequestContextAttribute('user')
+    project = RequestContextAttribute('project')
+    acl_snapshot = RequestContextAttribute('acl_snapshot')
@@ -1,17 +1,27 @@
-import io
 import os
 import tempfile
 import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from copy import copy
 
 from django.conf import settings
-from django.http import HttpResponse, HttpResponseForbidden
+from django.http import FileResponse, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.urls import reverse
 from qgis.core import \
     QgsVectorFileWriter, \
-    QgsJsonUtils, \
     Qgis, \
     QgsFieldConstraints, \
     QgsWkbTypes, \
-    QgsVectorLayer
+    QgsVectorLayer, \
+    QgsCoordinateReferenceSystem, \
+    QgsCoordinateTransform, \
+    QgsCsException, \
+    QgsFields, \
+    QgsFeatureRequest, \
+    QgsExpression
+from huey.contrib.djhuey import HUEY
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
 
 from core.api.base.vector import MetadataVectorLayer
 from core.api.base.views import (
@@ -27,7 +37,11 @@ from core.api.base.views import (
     MODE_GPKG,
     IntersectsBBoxFilter,
     MODE_FEATURE_COUNT,
-    MODE_EDITORFORMSTRUCTURE_COUNT
+    MODE_EDITORFORMSTRUCTURE_COUNT,
+    MODE_MVT,
+    MODE_FGB,
+    MODE_ARROW,
+    MIME_TYPES_MOD
 )
 from core.api.filters import (
     IntersectsBBoxFilter,
@@ -43,8 +57,20 @@ from core.api.permissions import ProjectPermission
 from core.utils.qgisapi import (
     get_qgis_layer,
     get_qgis_featurecount,
-    get_layer_fids_from_server_fids
+    get_layer_fids_from_server_fids,
+    get_cached_feature_ids,
+    server_fid
 )
+from core.utils.columnar import (
+    ColumnarWriterError,
+    iter_arrow_ipc,
+    project_features,
+    pyarrow,
+    write_ogr_file
+)
+from core.utils.geojson import encode_value
+from core.utils.mvt import MvtTileEncoder
+from core.utils.response import send_file_range
 from core.utils.structure import mapLayerAttributesFromQgisLayer
 from core.utils.vector import BaseUserMediaHandler
 
@@ -57,20 +83,37 @@ from qdjango.api.layers.filters import (
     FidFilter,
     SingleLayerSessionTokenFilter,
     ColumnAclFilter,
-    FILTER_FID_PARAM
+    FILTER_FID_PARAM,
+    FILTER_SESSION_PARAM
 )
 
-from .models import Layer, SessionTokenFilter, SessionTokenFilterLayer, FilterLayerSaved
+from .models import (
+    Layer,
+    SessionTokenFilter,
+    SessionTokenFilterLayer,
+    FilterLayerSaved
+)
+from .tasks import vector_export_task
 from .utils.data import QGIS_LAYER_TYPE_NO_GEOM
+from .utils.exportcache import ExportCache, link_or_copy
+from .utils.exports import VectorExportError, VECTOR_EXPORT_ASYNC_PARAM, create_export_job
+from .utils.filterplan import get_filter_plan
 from .utils.edittype import MAPPING_EDITTYPE_QGISEDITTYPE
 from .utils.structure import get_attributes
 
+import hashlib
 import json
 import logging
 import re
 
 MODE_WIDGET = 'widget'
 
+# Vector tiles feature property with the server FID
+MVT_FID_PROPERTY = 'g3w_fid'
+
+# Number of threads writing the relation layers of the downloads with relations
+VECTOR_EXPORT_RELATIONS_WORKERS = getattr(settings, 'VECTOR_EXPORT_RELATIONS_WORKERS', 4)
+
 logger = logging.getLogger(__name__)
 
 
@@ -303,13 +346,60 @@ class LayerVectorView(QGISLayerVectorViewMixin, BaseVectorApiView):
         MODE_GPKG,  # get GeoPackage
         MODE_FILTER_TOKEN,  # get session filter token
         MODE_FEATURE_COUNT, # return the number of feature for every style category
-        MODE_EDITORFORMSTRUCTURE_COUNT # return the editor form structure for a layer by style
+        MODE_EDITORFORMSTRUCTURE_COUNT, # return the editor form structure for a layer by style
+        MODE_MVT,  # get a Mapbox Vector Tile
+        MODE_FGB,  # get FlatGeobuf
+        MODE_ARROW  # get Arrow IPC stream
+    ]
+
+    # Modes call with cached responses and ETag
+    cacheable_modes_call = [
+        MODE_CONFIG,
+        MODE_DATA,
+        MODE_FEATURE_COUNT,
+        MODE_MVT
     ]
 
     mapping_layer_attributes_function = mapLayerAttributesFromQgisLayer
 
     shp_extentions = ('.shp', '.shx', '.dbf', '.prj')
 
+    # Export modes: QgsVectorFileWriter driver and options, file extension and mime type
+    export_formats = {
+        MODE_SHP: {
+            'driver': 'ESRI Shapefile',
+            'ext': '',
+            'content_type': 'application/x-zip-compressed'
+        },
+        MODE_GPX: {
+            'driver': 'GPX',
+            'ext': '.gpx',
+            'content_type': 'application/octet-stream',
+            'datasource_options': [
+                "GPX_USE_EXTENSIONS=1",
+                "GPX_EXTENSIONS_NS_URL=http://osgeo.org/gdal",
+                "GPX_EXTENSIONS_NS=ogr"
+            ]
+        },
+        MODE_XLS: {
+            'driver': 'xlsx',
+            'ext': '.xlsx',
+            'content_type': 'application/ms-excel'
+        },
+        MODE_GPKG: {
+            'driver': 'gpkg',
+            'ext': '.gpkg',
+            'content_type': 'application/geopackage+vnd.sqlite3'
+        },
+        MODE_CSV: {
+            'driver': 'csv',
+            'ext': '.csv',
+            'content_type': 'text/csv',
+            'layer_options': ['GEOMETRY=AS_WKT'],
+            'relations_mode': MODE_GPKG
+        }
+    }
+
     def initial(self, request, *args, **kwargs):
 
         if 'widget_type' in kwargs:
@@ -317,6 +407,21 @@ class LayerVectorView(QGISLayerVectorViewMixin, BaseVectorApiView):
 
         super(LayerVectorView, self).initial(request, *args, **kwargs)
 
+    def get_acl_fingerprint(self, request):
+        """
+        Return a fingerprint of the user's constraints (subset string, expression and geo constraints),
+        of the visible fields (ColumnAcl) and of the session filter token expression:
+        users with the same effective constraints share the cached responses.
+        """
+
+        fingerprint = [get_filter_plan(request, self.metadata_layer, self).fingerprint]
+
+        filtertoken = self.request_data.get(FILTER_SESSION_PARAM)
+        if filtertoken:
+            fingerprint.append(SessionTokenFilter.get_expr_for_token(filtertoken, self.layer))
+
+        return hashlib.md5(json.dumps(fingerprint).encode('utf-8')).hexdigest()
+
     def get_forms(self):
         """
         Check if edittype is set for layer and build inputtype
@@ -400,7 +505,7 @@ class LayerVectorView(QGISLayerVectorViewMixin, BaseVectorApiView):
             tores = []
             for u in uniques:
                 try:
-                    tores.append(json.loads(QgsJsonUtils.encodeValue(u)))
+                    tores.append(encode_value(u))
                 except Exception as e:
                     logger.error(f'Response vector widget unique: {e}')
                     continue
@@ -458,12 +563,19 @@ class LayerVectorView(QGISLayerVectorViewMixin, BaseVectorApiView):
         # parameters to check:
         # mode: create, update, delete
         # fidsin: fids list to filter
+        # fidsintoken: token of a fids list to filter stored in cache (i.e. 'fidstoken' of 'autofilter' data)
         # fidsout: fids filter to exclude from filtering
 
         mode = request_data.get('mode', 'create_update')
         fidsin = request_data.get('fidsin')
         fidsout = request_data.get('fidsout')
 
+        if request_data.get('fidsintoken') and not fidsin:
+            fids = get_cached_feature_ids(self.layer.pk, request_data.get('fidsintoken'))
+            if fids is None:
+                raise APIException("'fidsintoken' parameter is not valid or it is expired.")
+            fidsin = ','.join(fids) if fids else '-99999'
+
         token_data = {}
 
         def _create_qgs_expr(s, fidsin=None, fidsout=None):
@@ -624,6 +736,79 @@ class LayerVectorView(QGISLayerVectorViewMixin, BaseVectorApiView):
 
         self.results.update({'data': get_qgis_featurecount(self.metadata_layer.qgis_layer, self.style)})
 
+    def response_mvt_mode(self, request):
+        """
+        Return a Mapbox Vector Tile of the layer features, tile coordinates come from
+        'z', 'x' and 'y' URL kwargs (XYZ scheme, EPSG:3857 grid).
+        Every filter backend is applied, geometries are clipped and simplified for the tile zoom,
+        properties are the fields visible for the user plus the server FID (MVT_FID_PROPERTY).
+        """
+
+        qgis_layer = self.metadata_layer.qgis_layer
+        if not qgis_layer.isSpatial():
+            raise APIException(f'Layer {self.layer_name} has no geometry')
+
+        z, x, y = (int(self.kwargs[k]) for k in ('z', 'x', 'y'))
+        if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            raise NotFound(f'Tile {z}/{x}/{y} does not exist')
+
+        encoder = MvtTileEncoder(z, x, y)
+        tile_crs = QgsCoordinateReferenceSystem('EPSG:3857')
+        response = HttpResponse(content_type=MIME_TYPES_MOD[MODE_MVT]['mime_type'])
+
+        # Apply filter backends, store original subset string
+        qgs_request = self.instance_qgsfeaturerequest()
+        original_subset_string = qgis_layer.subsetString()
+        if hasattr(self, 'filter_backends'):
+            for backend in self.filter_backends:
+                backend().apply_filter(request, self.metadata_layer, qgs_request, self)
+
+        try:
+            # Tile extent (buffer included) in layer CRS
+            try:
+                tile_rect = QgsCoordinateTransform(tile_crs, qgis_layer.crs(), qgis_layer.transformContext()) \
+                    .transformBoundingBox(encoder.clip_rect)
+            except QgsCsException:
+                return response
+
+            filter_rect = qgs_request.filterRect()
+            if filter_rect is not None and not filter_rect.isNull():
+                tile_rect = tile_rect.intersect(filter_rect)
+                if tile_rect.isEmpty():
+                    return response
+            qgs_request.setFilterRect(tile_rect)
+
+            # Only visible fields and primary keys for the server FID
+            provider = qgis_layer.dataProvider()
+            visiblefields = get_filter_plan(request, self.metadata_layer, self).visible_fields
+            attributes = [(idx, name) for idx, name in enumerate(qgis_layer.fields().names()) if name in visiblefields]
+            qgs_request.setSubsetOfAttributes(
+                sorted(set([idx for idx, __ in attributes] + provider.pkAttributeIndexes())))
+
+            # The iterator works on a snapshot of the layer, subset string included
+            features = qgis_layer.getFeatures(qgs_request)
+
+        finally:
+            qgis_layer.setSubsetString(original_subset_string)
+
+        ct = QgsCoordinateTransform(qgis_layer.crs(), tile_crs, qgis_layer.transformContext())
+
+        def tile_features():
+            for feature in features:
+                geometry = feature.geometry()
+                try:
+                    geometry.transform(ct)
+                except QgsCsException:
+                    continue
+                feature.setGeometry(geometry)
+                yield feature
+
+        encoder.add_layer(self.layer.qgs_layer_id, tile_features(), attributes,
+                          fid_callback=lambda f: {MVT_FID_PROPERTY: server_fid(f, provider)})
+        response.content = encoder.encode()
+
+        return response
+
     def response_editorformstructure_mode(self, request):
         """
         Returns layer properties dependent on layer styles
@@ -640,27 +825,54 @@ class LayerVectorView(QGISLayerVectorViewMixin, BaseVectorApiView):
             })
 
 
-    def _selection_responde_download_mode(self, qgs_request, save_options):
-        """ Filter download response mode: shp, xls, gpx.."""
+    def _selection_responde_download_mode(self, qgs_request, save_options, qgis_layer):
+        """ Filter download response mode: shp, xls, gpx..
+        The selection is made on `qgis_layer`, the clone of the layer used for the export
+        (see _clone_metadata_layer()).
+        """
 
         # Make a selection based on the request
         if qgs_request.filterExpression() is not None:
-            self.metadata_layer.qgis_layer.selectByExpression(
+            qgis_layer.selectByExpression(
                 qgs_request.filterExpression().expression())
             save_options.onlySelectedFeatures = True
 
         if qgs_request.filterFid() != -1:
-            self.metadata_layer.qgis_layer.selectByIds(
+            qgis_layer.selectByIds(
                 [qgs_request.filterFid()]
             )
             save_options.onlySelectedFeatures = True
 
         if qgs_request.filterFids() != []:
-            self.metadata_layer.qgis_layer.selectByIds(
+            qgis_layer.selectByIds(
                 qgs_request.filterFids()
             )
             save_options.onlySelectedFeatures = True
 
+    @staticmethod
+    def _clone_metadata_layer(metadata_layer):
+        """
+        Return a copy of the metadata layer with a clone of its QGIS layer.
+
+        The QGIS layer of the metadata layer is shared by the requests (QgsConfigCache): exports
+        apply the filter backends (which can set the subset string) and select the features
+        on the clone, with its own data provider, so that concurrent exports don't change each other.
+
+        :param metadata_layer: MetadataVectorLayer instance
+        :return: MetadataVectorLayer instance
+        """
+
+        export_metadata_layer = copy(metadata_layer)
+        export_metadata_layer.qgis_layer = metadata_layer.qgis_layer.clone()
+
+        # The subset string of the shared layer can be a temporary one set by the filters of another
+        # request: the clone starts from the subset string defined in the project
+        layer = getattr(metadata_layer, 'layer', None)
+        if layer is not None:
+            export_metadata_layer.qgis_layer.setSubsetString(layer.subset_string)
+
+        return export_metadata_layer
+
 
     def _build_download_filename(self, request):
         """Build file name on filter context"""
@@ -795,16 +1007,39 @@ class LayerVectorView(QGISLayerVectorViewMixin, BaseVectorApiView):
             new_attributes_list = sorted(new_attributes_list, key=lambda x: original_oreder.get(x, float('inf')))
             save_options.attributes = new_attributes_list
 
-    def _download_relations(self, fsave_options, mode, tmp_dir, request):
+    def _set_download_formatting(self, save_options, **kwargs):
         """
-        Download relations of data: get relations layer with selected features to download
+        Set the value converter of the date/time fields formatting plan (see get_formatting_plan())
+        to QgsVectorFileWriter.SaveVectorOptions instance: exported values are formatted as data mode values.
+        """
+
+        layer = kwargs.get('layer', self.layer)
+        metadata_layer = kwargs.get('metadata_layer', self.metadata_layer)
+
+        converter = self.get_formatting_plan(layer, metadata_layer.qgis_layer).value_converter()
+        if converter is not None:
+
+            # Save options don't own the converter: it's kept until the export is written
+            self.value_converters.append(converter)
+            save_options.fieldValueConverter = converter
+
+    def _download_relations(self, fsave_options, mode, export_dir, request, export_layer):
+        """
+        Download relations of data: get relations layer with selected features to download.
+        The features to write are selected here on a clone of every relation layer,
+        files are written by _write_layer_clone() in a worker pool.
+
         :param save_options: QgsVectorFileWriter.SaveVectorOptions instance of father layer
         :param mode: mode of download, i.e. 'shp', 'xls', 'gpx', etc..
-        :param tmp_dir: temporary directory for files
+        :param export_dir: directory for files
         :param request: http request object
+        :param export_layer: clone of the father QGIS layer, with the features to export selected
+        :return: list of (QGIS layer clone, selected feature ids, file path, transform context, save options)
+                 to write
+        :rtype: list
         """
 
-        files_saved = []
+        relation_writes = []
         # Iterate
         for qgs_layer_id, metadata_relation in self.metadata_relations.items():
 
@@ -817,13 +1052,17 @@ class LayerVectorView(QGISLayerVectorViewMixin, BaseVectorApiView):
                 qgs_prj = self.layer.project.qgis_project
                 qgs_relation = qgs_prj.relationManager().relation(metadata_relation.relation_id)
 
+                # Relation layer clone: filter backends and selection don't change the shared layer
+                export_relation = self._clone_metadata_layer(metadata_relation)
+
                 # Check for selected features
-                ffeatures = self.metadata_layer.qgis_layer.selectedFeatures() if fsave_options.onlySelectedFeatures \
-                    else self.metadata_layer.qgis_layer.getFeatures()
+                ffeatures = export_layer.getSelectedFeatures() if fsave_options.onlySelectedFeatures \
+                    else export_layer.getFeatures()
 
                 cids = []
                 for ffeat in ffeatures:
-                    cfeatures = qgs_relation.getRelatedFeatures(ffeat)
+                    cfeatures = export_relation.qgis_layer.getFeatures(
+                        QgsFeatureRequest(QgsExpression(qgs_relation.getRelatedFeaturesFilter(ffeat))))
                     for cfeat in cfeatures:
                         cids.append(cfeat.id())
 
@@ -831,11 +1070,10 @@ class LayerVectorView(QGISLayerVectorViewMixin, BaseVectorApiView):
 
                     # Instance a QgsFeatureRequest
                     qgs_request = self.instance_qgsfeaturerequest()
-                    original_subset_string = self.metadata_layer.qgis_layer.subsetString()
 
                     if hasattr(self, 'relations_filter_backends'):
                         for backend in self.relations_filter_backends:
-                            backend().apply_filter(request, metadata_relation, qgs_request, self)
+                            backend().apply_filter(request, export_relation, qgs_request, self)
 
                     # Instance save options
                     save_options = QgsVectorFileWriter.SaveVectorOptions()
@@ -843,12 +1081,14 @@ class LayerVectorView(QGISLayerVectorViewMixin, BaseVectorApiView):
 
                     # Set attributes
                     self._set_download_attributes(qgs_request, save_options,
-                                                  layer=metadata_relation.layer, metadata_layer=metadata_relation)
+                                                  layer=metadata_relation.layer, metadata_layer=export_relation)
+                    self._set_download_formatting(save_options, layer=metadata_relation.layer,
+                                                  metadata_layer=export_relation)
 
-                    metadata_relation.qgis_layer.selectByIds(cids)
+                    export_relation.qgis_layer.selectByIds(cids)
 
                     if qgs_request.filterExpression():
-                        metadata_relation.qgis_layer.selectByExpression(
+                        export_relation.qgis_layer.selectByExpression(
                             qgs_request.filterExpression().expression())
 
 
@@ -863,7 +1103,7 @@ class LayerVectorView(QGISLayerVectorViewMixin, BaseVectorApiView):
                         fmode = dfs[0]
 
                     # Create file path
-                    file_path = os.path.join(tmp_dir.name, metadata_relation.layer.name)
+                    file_path = os.path.join(export_dir, metadata_relation.layer.name)
 
                     # Switch mode
                     if fmode == 'shp':
@@ -888,292 +1128,371 @@ class LayerVectorView(QGISLayerVectorViewMixin, BaseVectorApiView):
                         save_options.layerOptions = ['GEOMETRY=AS_WKT']
                         file_path += '.csv'
 
-
-                    error_code, error_message, new_file_path, new_layer_name = QgsVectorFileWriter.writeAsVectorFormatV3(
-                        metadata_relation.qgis_layer,
+                    relation_writes.append((
+                        export_relation.qgis_layer,
+                        export_relation.qgis_layer.selectedFeatureIds(),
                         file_path,
                         metadata_relation.qgis_layer.transformContext(),
                         save_options
-                    )
+                    ))
+
+        return relation_writes
+
+    @staticmethod
+    def _write_layer(qgis_layer, file_path, transform_context, save_options):
+        """
+        Write a layer with QgsVectorFileWriter, it can run in a worker thread:
+        the layer must be a clone used only by this writer.
+
+        :raises VectorExportError: if the file cannot be written
+        :return: path of the written file
+        :rtype: str
+        """
+
+        error_code, error_message, new_file_path, new_layer_name = QgsVectorFileWriter.writeAsVectorFormatV3(
+            qgis_layer,
+            file_path,
+            transform_context,
+            save_options
+        )
 
-                    if error_code != QgsVectorFileWriter.NoError:
-                        tmp_dir.cleanup()
-                        return HttpResponse(status=500, reason=error_message)
+        if error_code != QgsVectorFileWriter.NoError:
+            raise VectorExportError(error_message)
 
-                    # Add file to list
-                    files_saved.append(new_file_path)
+        return new_file_path or file_path
 
-                    # Reset
-                    metadata_relation.qgis_layer.selectByIds([])
-                    metadata_relation.qgis_layer.setSubsetString(original_subset_string)
+    @classmethod
+    def _write_layer_clone(cls, qgis_layer, selected_ids, file_path, transform_context, save_options):
+        """
+        Write a layer in a worker thread: the layer is cloned by the worker, so the clone
+        and its data provider belong to the worker thread; the selection is made on the clone.
+
+        :param qgis_layer: QGIS layer created by the request thread, not used by it while the worker runs
+        :param selected_ids: ids of the features to write with save_options.onlySelectedFeatures
+        :raises VectorExportError: if the file cannot be written
+        :return: path of the written file
+        :rtype: str
+        """
 
-        return files_saved
+        export_layer = qgis_layer.clone()
+        if save_options.onlySelectedFeatures:
+            export_layer.selectByIds(selected_ids)
 
-    def _create_zip_file(self, filenames, zip_filename, tmp_dir, relation_files):
+        return cls._write_layer(export_layer, file_path, transform_context, save_options)
+
+    def _add_to_zip_file(self, zf, file_path):
         """
-        Create a zipfile with the list of filenames for download when is necessary
+        Add a written file to the zip file and remove it from disk, for shapefiles
+        the other shapefile files are added too.
 
-        :param filenames: list of filenames to add to zip
-        :param zip_filename: name of zip file
-        :param tmp_dir: temporary directory
-        :param relation_files: list of relation files to add to zip
-        :return: BytesIO object with zip file
+        :param zf: ZipFile instance
+        :param file_path: path of the file written by QgsVectorFileWriter
         """
-        # Open BytesIO to grab in-memory ZIP contents
-        s = io.BytesIO()
 
-        # The zip compressor
-        zf = zipfile.ZipFile(s, "w")
+        base, ext = os.path.splitext(file_path)
 
-        for fpath in filenames:
+        # Shapefile path without extension
+        if not ext and os.path.exists(file_path + '.shp'):
+            base, ext = file_path, '.shp'
 
-            # Add file, at correct path
-            ftoadd = os.path.join(tmp_dir.name, fpath)
-            if os.path.exists(ftoadd):
-                zf.write(ftoadd, fpath)
+        if ext == '.shp':
+            fpaths = [base + shp_ext for shp_ext in self.shp_extentions]
+        else:
+            fpaths = [file_path]
 
-        # Add relations files saved
-        for fpath in relation_files:
+        for fpath in fpaths:
             if os.path.exists(fpath):
                 zf.write(fpath, os.path.basename(fpath))
+                os.remove(fpath)
 
-            # Check for other shapefile files
-            if fpath.endswith(".shp"):
-                for ext in self.shp_extentions:
-                    if ext != ".shp":
-                        ftoadd = fpath.replace(".shp", ext)
-                        if os.path.exists(ftoadd):
-                            zf.write(ftoadd, os.path.basename(ftoadd))
-
-        # Must close zip for all contents to be written
-        zf.close()
-
-        return s
-
-    def response_shp_mode(self, request):
+    def _write_export(self, request, mode, export_dir, feedback=None):
         """
-        Download Shapefile of data
+        Write the features of the layer (and of the relations with `down_with_relations`)
+        in the format of the export mode. Shapefiles and relation files are zipped.
+
+        With files to zip, the layer and the relation layers are written by a pool of
+        VECTOR_EXPORT_RELATIONS_WORKERS threads, see _write_layer_clone(): every file is added
+        to the zip file as soon as it is complete.
 
         :param request: Http Django request object
-        :return: http response with attached file
+        :param mode: export mode, i.e. 'shp', 'xls', 'gpx', etc..
+        :param export_dir: directory for files
+        :param feedback: optional QgsFeedback instance for the progress of the writer
+        :raises VectorExportError: if a file cannot be written
+        :return: (file path, file name, content type) of the file to send
+        :rtype: tuple
         """
 
-        if not self.layer.download:
-            return HttpResponseForbidden()
+        export_format = self.export_formats[mode]
 
-        tmp_dir = tempfile.TemporaryDirectory()
+        # Filter backends and selection are applied to a clone of the layer
+        export_metadata_layer = self._clone_metadata_layer(self.metadata_layer)
+        qgis_layer = export_metadata_layer.qgis_layer
 
-        filename = self._build_download_filename(request)
+        filename = self._build_download_filename(request) + export_format['ext']
 
-        # Apply filter backends, store original subset string
+        # Apply filter backends
         qgs_request = self.instance_qgsfeaturerequest()
-        original_subset_string = self.metadata_layer.qgis_layer.subsetString()
         if hasattr(self, 'filter_backends'):
             for backend in self.filter_backends:
-                backend().apply_filter(request, self.metadata_layer, qgs_request, self)
+                backend().apply_filter(request, export_metadata_layer, qgs_request, self)
 
         save_options = QgsVectorFileWriter.SaveVectorOptions()
-        save_options.driverName = 'ESRI Shapefile'
+        save_options.driverName = export_format['driver']
         save_options.fileEncoding = 'utf-8'
+        save_options.datasourceOptions = export_format.get('datasource_options', [])
+        save_options.layerOptions = export_format.get('layer_options', [])
+        if feedback is not None:
+            save_options.feedback = feedback
 
-        # Set attributes
-        self._set_download_attributes(qgs_request, save_options)
+        # Set attributes and date/time fields formatting
+        self.value_converters = []
+        self._set_download_attributes(qgs_request, save_options, metadata_layer=export_metadata_layer)
+        self._set_download_formatting(save_options, metadata_layer=export_metadata_layer)
 
         # Make a selection based on the request
-        self._selection_responde_download_mode(qgs_request, save_options)
+        self._selection_responde_download_mode(qgs_request, save_options, qgis_layer)
 
-        file_path = os.path.join(tmp_dir.name, filename)
-        error_code, error_message, new_file_path, new_layer_name = QgsVectorFileWriter.writeAsVectorFormatV3(
-            self.metadata_layer.qgis_layer,
-            file_path,
-            self.metadata_layer.qgis_layer.transformContext(),
-            save_options
-        )
+        file_path = os.path.join(export_dir, filename)
+        transform_context = self.metadata_layer.qgis_layer.transformContext()
 
-        # Once saved the father layer, save the children layers (relations)
-        # -----------------------------------------------------------------
-        relation_files = []
+        # Children layers (relations) to save
+        # -----------------------------------
+        relation_writes = []
         if self.download_relations:
-            relation_files = self._download_relations(save_options, 'shp', tmp_dir, request)
+            relation_writes = self._download_relations(
+                save_options, export_format.get('relations_mode', mode), export_dir, request, qgis_layer)
 
+        # If not empty relation files send a zip file
+        if mode != MODE_SHP and not relation_writes:
+            self._write_layer(qgis_layer, file_path, transform_context, save_options)
+            return file_path, filename, export_format['content_type']
 
-        # Restore the original subset string and select no features
-        self.metadata_layer.qgis_layer.selectByIds([])
-        self.metadata_layer.qgis_layer.setSubsetString(original_subset_string)
+        zip_filename = f'{filename}.zip'
+        zip_path = os.path.join(export_dir, zip_filename)
 
-        if error_code != QgsVectorFileWriter.NoError:
-            tmp_dir.cleanup()
-            return HttpResponse(status=500, reason=error_message)
+        with zipfile.ZipFile(zip_path, 'w') as zf, \
+                ThreadPoolExecutor(max_workers=VECTOR_EXPORT_RELATIONS_WORKERS) as executor:
 
-        # Check for extra fields to add
-        self._add_extrafields(request, file_path, filename)
+            # The father layer future is the one with value True
+            futures = {executor.submit(self._write_layer_clone, qgis_layer, qgis_layer.selectedFeatureIds(),
+                                       file_path, transform_context, save_options): True}
+            for relation_write in relation_writes:
+                futures[executor.submit(self._write_layer_clone, *relation_write)] = False
 
-        filenames = ["{}{}".format(filename, ftype)
-                     for ftype in self.shp_extentions]
+            for future in as_completed(futures):
+                new_file_path = future.result()
 
-        zip_filename = "{}.zip".format(filename)
-        s = self._create_zip_file(filenames, zip_filename, tmp_dir, relation_files)
-        tmp_dir.cleanup()
+                # Check for extra fields to add, read from the database by this thread
+                if futures[future] and mode == MODE_SHP:
+                    self._add_extrafields(request, file_path, filename)
 
-        # Grab ZIP file from in-memory, make response with correct MIME-type
-        response = HttpResponse(
-            s.getvalue(), content_type="application/x-zip-compressed")
+                self._add_to_zip_file(zf, new_file_path)
 
-        self._set_filename_cookie(response, zip_filename)
-        return response
+        return zip_path, zip_filename, 'application/x-zip-compressed'
 
-    def response_gpx_mode(self, request):
+    def is_async_export_request(self):
         """
-        Download GPX of data
-        :param request: Http Django request object
-        :return: http response with attached file
+        Export runs as asynchronous job: `async=1` request parameter, not inside the job itself
         """
 
-        if not self.layer.download_gpx:
-            return HttpResponseForbidden()
+        return (str(self.request_data.get(VECTOR_EXPORT_ASYNC_PARAM, '0')) == '1'
+                and 'export_dir' not in self.kwargs)
 
-        # check for vector type
-        if self.metadata_layer.qgis_layer.geometryType() == QgsWkbTypes.PolygonGeometry:
-            return HttpResponseForbidden()
+    def _submit_export_job(self, request):
+        """
+        Submit the export to huey queue, see qdjango.tasks.vector_export_task
 
-        tmp_dir = tempfile.TemporaryDirectory()
+        :param request: Http Django request object
+        :return: http response with the task id and the URLs for job status and download
+        """
 
-        # Apply filter backends, store original subset string
-        qgs_request = self.instance_qgsfeaturerequest()
-        original_subset_string = self.metadata_layer.qgis_layer.subsetString()
-        if hasattr(self, 'filter_backends'):
-            for backend in self.filter_backends:
-                backend().apply_filter(request, self.metadata_layer, qgs_request, self)
+        # Same request parameters, without async parameter
+        if hasattr(self.request_data, 'getlist'):
+            data = {k: self.request_data.getlist(k) for k in self.request_data.keys()}
+        else:
+            data = dict(self.request_data)
+        data.pop(VECTOR_EXPORT_ASYNC_PARAM, None)
+
+        user_pk = None if request.user.is_anonymous else request.user.pk
+        job = vector_export_task.s(
+            user_pk,
+            self.kwargs['project_type'],
+            self.kwargs['project_id'],
+            self.kwargs['layer_name'],
+            self.mode_call,
+            request.method,
+            request.content_type,
+            data
+        )
 
-        save_options = QgsVectorFileWriter.SaveVectorOptions()
-        save_options.driverName = 'GPX'
-        save_options.fileEncoding = 'utf-8'
-        save_options.datasourceOptions = [
-            "GPX_USE_EXTENSIONS=1",
-            "GPX_EXTENSIONS_NS_URL=http://osgeo.org/gdal",
-            "GPX_EXTENSIONS_NS=ogr"
-        ]
+        # Pending job owned by the user, before the worker can start it
+        create_export_job(job.id, user_pk, self.kwargs['layer_name'], self.mode_call)
+        HUEY.enqueue(job)
 
-        # Set attributes
-        self._set_download_attributes(qgs_request, save_options)
+        return Response({
+            'result': True,
+            'task_id': job.id,
+            'status_url': reverse('qdjango-vector-export-job', args=[job.id]),
+            'download_url': reverse('qdjango-vector-export-job-download', args=[job.id])
+        })
 
-        filename = self._build_download_filename(request) + '.gpx'
+    def get_export_cache_key(self, request, mode):
+        """
+        Return the key of the export into the export cache, None if the export cannot be cached.
+        The key combines export mode, normalized request parameters, the user's ACL fingerprint
+        and the data version of the layer (and of the relation layers with `down_with_relations`).
 
-        # Make a selection based on the request
-        self._selection_responde_download_mode(qgs_request, save_options)
+        :param request: Http Django request object
+        :param mode: export mode
+        :return: str, None
+        """
 
-        gpx_tmp_path = os.path.join(tmp_dir.name, filename)
-        error_code, error_message, new_file_path, new_layer_name = QgsVectorFileWriter.writeAsVectorFormatV3(
-            self.metadata_layer.qgis_layer,
-            gpx_tmp_path,
-            self.metadata_layer.qgis_layer.transformContext(),
-            save_options
-        )
+        # Extra fields are read from another layer
+        if 'sbp_qgs_layer_id' in self.request_data:
+            return None
 
-        # Once saved the father layer, save the children layers (relations)
-        # -----------------------------------------------------------------
-        relation_files = []
+        if hasattr(self.request_data, 'getlist'):
+            params = [(k, self.request_data.getlist(k)) for k in self.request_data.keys()]
+        else:
+            params = list(self.request_data.items())
+        params = sorted(p for p in params if p[0] != VECTOR_EXPORT_ASYNC_PARAM)
+
+        relations_versions = []
         if self.download_relations:
-            relation_files = self._download_relations(save_options, 'gpx', tmp_dir, request)
+            relations_versions = sorted(
+                (r.layer.pk, r.layer.data_version) for r in self.metadata_relations.values())
 
-        # Restore the original subset string and select no features
-        self.metadata_layer.qgis_layer.selectByIds([])
-        self.metadata_layer.qgis_layer.setSubsetString(original_subset_string)
+        return ExportCache.make_key(self.layer, [
+            mode,
+            params,
+            self.get_acl_fingerprint(request),
+            relations_versions
+        ])
 
-        if error_code != QgsVectorFileWriter.NoError:
-            tmp_dir.cleanup()
-            return HttpResponse(status=500, reason=error_message)
+    def _cached_export_response(self, request, mode, cached_path, export_dir=None):
+        """
+        Response of an export served by the export cache
 
-        # If not empty relation files send a zip file
-        if relation_files:
-            filenames = [filename]
-            zip_filename = "{}.zip".format(filename)
-            s = self._create_zip_file(filenames, zip_filename, tmp_dir, relation_files)
-            response = HttpResponse(
-                s.getvalue(), content_type="application/x-zip-compressed")
-
-            # Replace file name for set cookie
-            filename = zip_filename
-        else:
-            response = HttpResponse(
-                open(gpx_tmp_path, 'rb').read(), content_type='application/octet-stream')
-            tmp_dir.cleanup()
+        :param request: Http Django request object
+        :param mode: export mode
+        :param cached_path: path of the cached file
+        :param export_dir: directory of the asynchronous job, the cached file is linked into it
+        :return: http response, None if the cached file has been evicted meanwhile
+        """
+
+        filename = os.path.basename(cached_path)
+        content_type = 'application/x-zip-compressed' if filename.endswith('.zip') \
+            else self.export_formats[mode]['content_type']
+
+        try:
+            if export_dir:
+                link_or_copy(cached_path, os.path.join(export_dir, filename))
+                return Response({'result': True, 'filename': filename, 'content_type': content_type})
+
+            response = send_file_range(request, cached_path, filename, content_type)
+        except OSError:
+            return None
 
         self._set_filename_cookie(response, filename)
 
         return response
 
-    def response_xls_mode(self, request):
+    def _export_response(self, request, mode):
         """
-        Download xls of data
+        Response of the export modes: shp, gpx, xls, gpkg and csv.
+
+        With `async=1` request parameter the export is submitted as asynchronous job and
+        the response contains the task id: job status and exported file are available
+        by qdjango-vector-export-job and qdjango-vector-export-job-download APIs.
+        Inside the job (`export_dir` view kwarg) the file is written into the job directory
+        and the response contains only file name and content type.
+        Exported files are stored into the export cache, see get_export_cache_key().
+
         :param request: Http Django request object
+        :param mode: export mode
         :return: http response with attached file
         """
 
-        if not self.layer.download_xls:
-            return HttpResponseForbidden()
+        if self.is_async_export_request():
+            return self._submit_export_job(request)
 
-        # Apply filter backends, store original subset string
-        qgs_request = self.instance_qgsfeaturerequest()
-        original_subset_string = self.metadata_layer.qgis_layer.subsetString()
-        if hasattr(self, 'filter_backends'):
-            for backend in self.filter_backends:
-                backend().apply_filter(request, self.metadata_layer, qgs_request, self)
+        export_dir = self.kwargs.get('export_dir')
 
-        save_options = QgsVectorFileWriter.SaveVectorOptions()
-        save_options.driverName = 'xlsx'
-        save_options.fileEncoding = 'utf-8'
+        # Serve the file from the export cache
+        export_cache = ExportCache()
+        cache_key = self.get_export_cache_key(request, mode) if export_cache.enabled else None
+        if cache_key:
+            cached_path = export_cache.get(cache_key)
+            response = self._cached_export_response(request, mode, cached_path, export_dir) if cached_path else None
+            if response is not None:
+                return response
 
-        # Set attributes
-        self._set_download_attributes(qgs_request, save_options)
+        tmp_dir = None if export_dir else tempfile.TemporaryDirectory()
 
-        tmp_dir = tempfile.TemporaryDirectory()
+        try:
+            try:
+                file_path, filename, content_type = self._write_export(
+                    request, mode, export_dir or tmp_dir.name, feedback=self.kwargs.get('export_feedback'))
+            except VectorExportError as e:
+                return HttpResponse(status=500, reason=str(e))
 
-        filename = self._build_download_filename(request) + '.xlsx'
+            if cache_key:
+                export_cache.put(cache_key, file_path)
 
-        # Make a selection based on the request
-        self._selection_responde_download_mode(qgs_request, save_options)
+            if export_dir:
+                return Response({'result': True, 'filename': filename, 'content_type': content_type})
 
-        xls_tmp_path = os.path.join(tmp_dir.name, filename)
-        error_code, error_message, new_file_path, new_layer_name = QgsVectorFileWriter.writeAsVectorFormatV3(
-            self.metadata_layer.qgis_layer,
-            xls_tmp_path,
-            self.metadata_layer.qgis_layer.transformContext(),
-            save_options
-        )
+            # The file opened by the response is still readable when the directory is removed
+            response = send_file_range(request, file_path, filename, content_type)
+        finally:
+            if tmp_dir:
+                tmp_dir.cleanup()
 
-        # Once saved the father layer, save the children layers (relations)
-        # -----------------------------------------------------------------
-        relation_files = []
-        if self.download_relations:
-            relation_files = self._download_relations(save_options, 'xls', tmp_dir, request)
+        self._set_filename_cookie(response, filename)
 
-        # Restore the original subset string and select no features
-        self.metadata_layer.qgis_layer.selectByIds([])
-        self.metadata_layer.qgis_layer.setSubsetString(original_subset_string)
+        return response
 
-        if error_code != QgsVectorFileWriter.NoError:
-            tmp_dir.cleanup()
-            return HttpResponse(status=500, reason=error_message)
+    def response_shp_mode(self, request):
+        """
+        Download Shapefile of data
+
+        :param request: Http Django request object
+        :return: http response with attached file
+        """
 
-        if relation_files:
-            filenames = [filename]
-            zip_filename = "{}.zip".format(filename)
-            s = self._create_zip_file(filenames, zip_filename, tmp_dir, relation_files)
-            response = HttpResponse(
-                s.getvalue(), content_type="application/x-zip-compressed")
+        if not self.layer.download:
+            return HttpResponseForbidden()
 
-            # Replace file name for set cookie
-            filename = zip_filename
-        else:
-            response = HttpResponse(
-                open(xls_tmp_path, 'rb').read(), content_type='application/ms-excel')
+        return self._export_response(request, MODE_SHP)
 
-        tmp_dir.cleanup()
+    def response_gpx_mode(self, request):
+        """
+        Download GPX of data
+        :param request: Http Django request object
+        :return: http response with attached file
+        """
 
-        self._set_filename_cookie(response, filename)
+        if not self.layer.download_gpx:
+            return HttpResponseForbidden()
 
-        return response
+        # check for vector type
+        if self.metadata_layer.qgis_layer.geometryType() == QgsWkbTypes.PolygonGeometry:
+            return HttpResponseForbidden()
+
+        return self._export_response(request, MODE_GPX)
+
+    def response_xls_mode(self, request):
+        """
+        Download xls of data
+        :param request: Http Django request object
+        :return: http response with attached file
+        """
+
+        if not self.layer.download_xls:
+            return HttpResponseForbidden()
+
+        return self._export_response(request, MODE_XLS)
 
     def response_gpkg_mode(self, request):
         """
@@ -1185,139 +1504,127 @@ class LayerVectorView(QGISLayerVectorViewMixin, BaseVectorApiView):
         if not self.layer.download_gpkg:
             return HttpResponseForbidden()
 
-        # Apply filter backends, store original subset string
+        return self._export_response(request, MODE_GPKG)
+
+    def _columnar_features(self, request):
+        """
+        Return the features to write in binary columnar formats (FlatGeobuf, Arrow):
+        every filter backend is applied to the QgsFeatureRequest and only attributes not excluded
+        for WMS service and allowed by ColumnAcl are read.
+        The layer is not changed: filter backends are applied to a clone of the layer.
+
+        :param request: Http Django request object
+        :return: (features, fields) the feature iterator and the QgsFields of the features
+        :rtype: tuple
+        """
+
+        export_metadata_layer = self._clone_metadata_layer(self.metadata_layer)
+        qgis_layer = export_metadata_layer.qgis_layer
+
+        # Apply filter backends
         qgs_request = self.instance_qgsfeaturerequest()
-        original_subset_string = self.metadata_layer.qgis_layer.subsetString()
         if hasattr(self, 'filter_backends'):
             for backend in self.filter_backends:
-                backend().apply_filter(request, self.metadata_layer, qgs_request, self)
+                backend().apply_filter(request, export_metadata_layer, qgs_request, self)
 
         save_options = QgsVectorFileWriter.SaveVectorOptions()
-        save_options.driverName = 'gpkg'
-        save_options.fileEncoding = 'utf-8'
+        self._set_download_attributes(qgs_request, save_options, metadata_layer=export_metadata_layer)
+        attributes = save_options.attributes or qgis_layer.attributeList()
+        qgs_request.setSubsetOfAttributes(attributes)
 
-        # Set attributes
-        self._set_download_attributes(qgs_request, save_options)
+        # The iterator owns a snapshot of the clone data source
+        features = qgis_layer.getFeatures(qgs_request)
 
-        tmp_dir = tempfile.TemporaryDirectory()
+        fields = QgsFields()
+        layer_fields = qgis_layer.fields()
+        for idx in attributes:
+            fields.append(layer_fields.at(idx))
 
-        filename = self._build_download_filename(request) + '.gpkg'
+        return project_features(features, attributes, fields), fields
 
-        # Make a selection based on the request
-        self._selection_responde_download_mode(qgs_request, save_options)
-
-        gpkg_tmp_path = os.path.join(tmp_dir.name, filename)
-        error_code, error_message, new_file_path, new_layer_name = QgsVectorFileWriter.writeAsVectorFormatV3(
-            self.metadata_layer.qgis_layer,
-            gpkg_tmp_path,
-            self.metadata_layer.qgis_layer.transformContext(),
-            save_options
-        )
+    def response_fgb_mode(self, request):
+        """
+        Download FlatGeobuf of data, with packed Hilbert R-tree spatial index unless `spatial_index=0`
+        request parameter is set.
+        The file is written in a temporary directory (the spatial index needs all the features
+        before the first one is written) and streamed in chunks, the payload is not kept in memory.
+        Allowed for layers with GeoPackage download enabled.
+        :param request: Http Django request object
+        :return: http streaming response with attached file
+        """
 
-        # Once saved the father layer, save the children layers (relations)
-        # -----------------------------------------------------------------
-        relation_files = []
-        if self.download_relations:
-            relation_files = self._download_relations(save_options, 'gpkg', tmp_dir, request)
+        if not self.layer.download_gpkg:
+            return HttpResponseForbidden()
 
-        # Restore the original subset string and select no features
-        self.metadata_layer.qgis_layer.selectByIds([])
-        self.metadata_layer.qgis_layer.setSubsetString(original_subset_string)
+        qgis_layer = self.metadata_layer.qgis_layer
+        if not qgis_layer.isSpatial():
+            raise APIException(f'Layer {self.layer_name} has no geometry')
 
-        if error_code != QgsVectorFileWriter.NoError:
-            tmp_dir.cleanup()
-            return HttpResponse(status=500, reason=error_message)
+        spatial_index = str(self.request_data.get('spatial_index', '1')) != '0'
 
+        features, fields = self._columnar_features(request)
 
-        if relation_files:
-            filenames = [filename]
-            zip_filename = "{}.zip".format(filename)
-            s = self._create_zip_file(filenames, zip_filename, tmp_dir, relation_files)
-            response = HttpResponse(
-                s.getvalue(), content_type="application/x-zip-compressed")
+        tmp_dir = tempfile.TemporaryDirectory()
+        try:
+            path = os.path.join(tmp_dir.name, f"export.{MIME_TYPES_MOD[MODE_FGB]['ext']}")
+            write_ogr_file(
+                features,
+                fields,
+                qgis_layer.wkbType(),
+                qgis_layer.crs(),
+                qgis_layer.transformContext(),
+                'FlatGeobuf',
+                path,
+                qgis_layer.name(),
+                layer_options=[f"SPATIAL_INDEX={'YES' if spatial_index else 'NO'}"]
+            )
 
-            # Replace file name for set cookie
-            filename = zip_filename
-        else:
-            response = HttpResponse(
-                open(gpkg_tmp_path, 'rb').read(), content_type='application/geopackage+vnd.sqlite3')
+            # The open file is still readable when the directory is removed
+            response = FileResponse(open(path, 'rb'), content_type=MIME_TYPES_MOD[MODE_FGB]['mime_type'])
+        except ColumnarWriterError as e:
+            logger.error(f'FlatGeobuf download of layer {self.layer_name}: {e}')
+            return HttpResponse(status=500, reason=str(e))
+        finally:
             tmp_dir.cleanup()
 
-        self._set_filename_cookie(response, filename)
+        self._set_filename_cookie(response, self._build_download_filename(request) + '.fgb')
 
         return response
 
-    def response_csv_mode(self, request):
+    def response_arrow_mode(self, request):
         """
-        Download csv of data
+        Download Arrow IPC stream of data, geometries as WKB (GeoArrow 'geoarrow.wkb' encoding).
+        Record batches are streamed while the features are read, pyarrow is required.
+        Allowed for layers with GeoPackage download enabled.
         :param request: Http Django request object
-        :return: http response with attached file
+        :return: http streaming response with attached file
         """
 
-        if not self.layer.download_csv:
+        if not self.layer.download_gpkg:
             return HttpResponseForbidden()
 
-        # Apply filter backends, store original subset string
-        qgs_request = self.instance_qgsfeaturerequest()
-        original_subset_string = self.metadata_layer.qgis_layer.subsetString()
-        if hasattr(self, 'filter_backends'):
-            for backend in self.filter_backends:
-                backend().apply_filter(request, self.metadata_layer, qgs_request, self)
-
-        save_options = QgsVectorFileWriter.SaveVectorOptions()
-        save_options.driverName = 'csv'
-        save_options.fileEncoding = 'utf-8'
-        save_options.layerOptions = ['GEOMETRY=AS_WKT']
-
-        # Set attributes
-        self._set_download_attributes(qgs_request, save_options)
-
-        tmp_dir = tempfile.TemporaryDirectory()
+        if pyarrow is None:
+            return HttpResponse(status=501, reason='Arrow download requires pyarrow')
 
-        filename = self._build_download_filename(request) + '.csv'
-
-        # Make a selection based on the request
-        self._selection_responde_download_mode(qgs_request, save_options)
-
-        xls_tmp_path = os.path.join(tmp_dir.name, filename)
-        error_code, error_message, new_file_path, new_layer_name = QgsVectorFileWriter.writeAsVectorFormatV3(
-            self.metadata_layer.qgis_layer,
-            xls_tmp_path,
-            self.metadata_layer.qgis_layer.transformContext(),
-            save_options
-        )
-
-        # Once saved the father layer, save the children layers (relations)
-        # -----------------------------------------------------------------
-        relation_files = []
-        if self.download_relations:
-            relation_files = self._download_relations(save_options, 'gpkg', tmp_dir, request)
+        features, fields = self._columnar_features(request)
 
-        # Restore the original subset string and select no features
-        self.metadata_layer.qgis_layer.selectByIds([])
-        self.metadata_layer.qgis_layer.setSubsetString(original_subset_string)
+        response = StreamingHttpResponse(iter_arrow_ipc(features, fields, self.metadata_layer.qgis_layer.crs()),
+                                         content_type=MIME_TYPES_MOD[MODE_ARROW]['mime_type'])
+        self._set_filename_cookie(response, self._build_download_filename(request) + '.arrows')
 
-        if error_code != QgsVectorFileWriter.NoError:
-            tmp_dir.cleanup()
-            return HttpResponse(status=500, reason=error_message)
-
-        if relation_files:
-            filenames = [filename]
-            zip_filename = "{}.zip".format(filename)
-            s = self._create_zip_file(filenames, zip_filename, tmp_dir, relation_files)
-            response = HttpResponse(
-                s.getvalue(), content_type="application/x-zip-compressed")
+        return response
 
-            # Replace file name for set cookie
-            filename = zip_filename
-        else:
-            response = HttpResponse(
-                open(xls_tmp_path, 'rb').read(), content_type='text/csv')
-            tmp_dir.cleanup()
+    def response_csv_mode(self, request):
+        """
+        Download csv of data
+        :param request: Http Django request object
+        :return: http response with attached file
+        """
 
-        self._set_filename_cookie(response, filename)
+        if not self.layer.download_csv:
+            return HttpResponseForbidden()
 
-        return response
+        return self._export_response(request, MODE_CSV)
 
 
 class UserMediaHandler(BaseUserMediaHandler):
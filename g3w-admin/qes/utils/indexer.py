@@ -15,6 +15,7 @@ from django.conf import settings
 from django.urls import reverse, resolve
 from django.http import HttpRequest
 from qdjango.vector import LayerVectorView
+from core.utils.geojson import encode_value, geometry_to_geojson
 from usersmanage.models import User
 
 from qgis.core import (
@@ -27,7 +28,6 @@ from elasticsearch_dsl import connections
 import json
 import datetime
 
-from qgis.PyQt.QtCore import NULL
 
 import logging
 
@@ -345,9 +345,7 @@ class QGISElasticsearchIndexer:
                         field_value = feature[field_name]
 
                         # Save attribute value
-                        if field_value == NULL:
-
-                            field_value = None
+                        field_value = encode_value(field_value)
                         attrs[field_name] = field_value
 
                         # Add the value to the text content
@@ -367,7 +365,7 @@ class QGISElasticsearchIndexer:
                                 qgeometry = qgeometry.makeValid()
 
                             # To GeoJSON
-                            geometry = json.loads(qgeometry.asJson())
+                            geometry = geometry_to_geojson(qgeometry)
 
                             # Check again, is not valid create an empty geometry
                             if not qgeometry.isGeosValid():